@@ -0,0 +1,177 @@
+"""
+Compressed archives of old behavior tracking months.
+
+A month past retention is written to ``ANALYTICS_ARCHIVE_DIR`` as one gzip
+NDJSON file, ``behavior-YYYY-MM.ndjson.gz``, before its rows or partition
+are dropped. Rows are sorted by user and each user's rows are compressed as
+separate gzip members (at most ``MEMBER_ROWS`` rows each). The file is
+still an ordinary gzip stream for other tools, while the sidecar
+``behavior-YYYY-MM.index.json`` maps every user to the byte ranges of their
+members, so reading one user's month decompresses only their rows.
+
+``manifest.json`` lists the archived months with their row and event type
+counts. Files are written under temporary names and renamed into place, and
+a month is only dropped from the database after its archive is complete, so
+an interrupted run simply archives the month again.
+"""
+
+import gzip
+import json
+import os
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .partitions import add_months, drop_month, month_queryset, month_start, stored_months
+
+FIELDS = (
+    'id', 'user', 'event_type', 'content_type', 'content_id', 'page_url',
+    'referrer_url', 'session_id', 'duration_seconds', 'metadata', 'timestamp',
+)
+
+MEMBER_ROWS = 10000
+
+
+def _path(name):
+    return os.path.join(settings.ANALYTICS_ARCHIVE_DIR, name)
+
+
+def _data_name(month):
+    return f'behavior-{month:%Y-%m}.ndjson.gz'
+
+
+def _index_name(month):
+    return f'behavior-{month:%Y-%m}.index.json'
+
+
+def _write_json(path, data):
+    partial = f'{path}.partial'
+    with open(partial, 'w') as output:
+        json.dump(data, output, separators=(',', ':'))
+        output.flush()
+        os.fsync(output.fileno())
+    os.replace(partial, path)
+
+
+def load_manifest():
+    """Return the archive manifest: {'months': {'YYYY-MM': {...}}}."""
+    try:
+        with open(_path('manifest.json')) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {'months': {}}
+
+
+def archive_month(month):
+    """
+    Write a month of behavior rows to its archive file.
+
+    Returns:
+        int: Number of rows archived
+    """
+    os.makedirs(settings.ANALYTICS_ARCHIVE_DIR, exist_ok=True)
+    data_path = _path(_data_name(month))
+    partial = f'{data_path}.partial'
+    index = {}
+    event_types = Counter()
+    rows = 0
+
+    def write_member(output, user_id, lines):
+        member = gzip.compress(b''.join(lines))
+        index.setdefault(user_id, []).append([output.tell(), len(member)])
+        output.write(member)
+
+    queryset = month_queryset(month).order_by('user', 'id').values_list(*FIELDS)
+    with open(partial, 'wb') as output:
+        lines, member_user = [], None
+        for values in queryset.iterator(chunk_size=5000):
+            row = dict(zip(FIELDS, values))
+            user_id = str(row['user'])
+            if lines and (user_id != member_user or len(lines) >= MEMBER_ROWS):
+                write_member(output, member_user, lines)
+                lines = []
+            member_user = user_id
+            lines.append(json.dumps(row, cls=DjangoJSONEncoder, separators=(',', ':')).encode() + b'\n')
+            event_types[row['event_type']] += 1
+            rows += 1
+        if lines:
+            write_member(output, member_user, lines)
+        output.flush()
+        os.fsync(output.fileno())
+
+    if not rows:
+        os.remove(partial)
+        return 0
+
+    os.replace(partial, data_path)
+    _write_json(_path(_index_name(month)), index)
+    manifest = load_manifest()
+    manifest['months'][f'{month:%Y-%m}'] = {
+        'file': _data_name(month),
+        'index': _index_name(month),
+        'rows': rows,
+        'users': len(index),
+        'event_types': dict(event_types),
+        'archived_at': timezone.now().isoformat(),
+    }
+    _write_json(_path('manifest.json'), manifest)
+    return rows
+
+
+@lru_cache(maxsize=8)
+def _load_index(path, mtime):
+    with open(path) as index:
+        return json.load(index)
+
+
+def read_month(month, user_id=None):
+    """
+    Yield the archived behavior rows of a month, optionally of one user only.
+
+    Rows are dicts keyed by ``FIELDS`` with JSON-encoded values.
+    """
+    entry = load_manifest()['months'].get(f'{month:%Y-%m}')
+    if entry is None:
+        return
+    data_path = _path(entry['file'])
+
+    if user_id is None:
+        with gzip.open(data_path, 'rb') as archive:
+            for line in archive:
+                yield json.loads(line)
+        return
+
+    index_path = _path(entry['index'])
+    members = _load_index(index_path, os.path.getmtime(index_path)).get(str(user_id), [])
+    with open(data_path, 'rb') as archive:
+        for offset, length in members:
+            archive.seek(offset)
+            for line in gzip.decompress(archive.read(length)).splitlines():
+                yield json.loads(line)
+
+
+def expire_months(keep_months=None, keep_detached=False, dry_run=False):
+    """
+    Archive and drop every stored month older than the retention window.
+
+    The current month and the ``keep_months`` before it are kept.
+
+    Returns:
+        list: (month, rows archived) per expired month
+    """
+    keep_months = settings.ANALYTICS_BEHAVIOR_RETENTION_MONTHS if keep_months is None else keep_months
+    cutoff = add_months(month_start(timezone.now()), -keep_months)
+    expired = []
+    for month in stored_months():
+        if month >= cutoff:
+            break
+        if dry_run:
+            expired.append((month, month_queryset(month).count()))
+            continue
+        rows = archive_month(month)
+        drop_month(month, keep_detached=keep_detached)
+        expired.append((month, rows))
+    return expired
@@ -0,0 +1,402 @@
+"""
+Batched ingestion of behavior tracking events.
+
+``POST /api/analytics/behavior/batch/`` takes up to
+``ANALYTICS_INGEST_MAX_EVENTS`` events per request, either as a JSON array
+(or ``{"events": [...]}``) or as newline-delimited JSON
+(``application/x-ndjson``). Each event is checked against a small
+hand-written schema instead of a ``ModelSerializer``; valid events are
+queued in a buffer and written to ``UserBehaviorTracking`` with
+``bulk_create`` in batches of ``ANALYTICS_INGEST_BATCH_SIZE`` by a flusher,
+off the request.
+
+Ids (UUIDv7) and timestamps are assigned on ingestion and batches are
+inserted with ``ignore_conflicts``, so re-inserting a batch after a crashed
+flush does not duplicate events.
+
+Buffers report the time of the oldest event they have not written yet
+(``oldest_pending``), so rollups never read past events still on their way
+to the table.
+
+The buffer holds at most ``ANALYTICS_INGEST_BUFFER_LIMIT`` events. A request
+that does not fit is refused as a whole with ``429`` and ``Retry-After``, so
+memory stays bounded and clients back off while the database catches up.
+
+Two buffers are provided:
+
+* ``RedisIngestBuffer`` keeps a list in Redis shared by all workers and is
+  drained by ``manage.py flush_behavior_events``. Batches are moved to an
+  in-flight list before they are written; leftovers of a crashed flusher
+  are written first by the next run.
+* ``LocalIngestBuffer`` is an in-process queue for a single development
+  process, flushed from a background thread and at exit.
+"""
+
+import atexit
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+from django.utils.module_loading import import_string
+
+from apps.core.ids import uuid7, uuid7_time
+
+logger = logging.getLogger(__name__)
+
+MAX_METADATA_BYTES = 4096
+
+STRING_LIMITS = {
+    'page_url': 500,
+    'referrer_url': 500,
+    'session_id': 100,
+}
+
+
+class IngestError(ValueError):
+    """The request body cannot be read as a batch of events."""
+
+
+def _choices(field_name):
+    from .models import UserBehaviorTracking
+    return frozenset(value for value, _ in UserBehaviorTracking._meta.get_field(field_name).choices)
+
+
+_event_types = None
+_content_types = None
+
+
+def parse_events(body, content_type=''):
+    """
+    Decode a request body into a list of raw events.
+
+    Args:
+        body: Request body (bytes)
+        content_type: Request content type; ``application/x-ndjson`` selects
+            newline-delimited JSON, anything else a JSON document
+
+    Returns:
+        list: Decoded events, not validated yet
+
+    Raises:
+        IngestError: When the body is malformed or holds too many events
+    """
+    limit = settings.ANALYTICS_INGEST_MAX_EVENTS
+    try:
+        if content_type.startswith(('application/x-ndjson', 'application/jsonl')):
+            lines = body.splitlines()
+            if len(lines) > limit:
+                raise IngestError(f'At most {limit} events per request.')
+            events = [json.loads(line) for line in lines if line.strip()]
+        else:
+            events = json.loads(body)
+            if isinstance(events, dict):
+                events = events.get('events')
+    except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise IngestError(f'Malformed JSON: {exc}')
+
+    if not isinstance(events, list):
+        raise IngestError('Expected a list of events.')
+    if len(events) > limit:
+        raise IngestError(f'At most {limit} events per request.')
+    return events
+
+
+def validate_event(event, user_id):
+    """
+    Check one raw event and turn it into a ``UserBehaviorTracking`` row.
+
+    Returns:
+        tuple: (row, None) for a valid event, (None, errors) otherwise
+    """
+    global _event_types, _content_types
+    if _event_types is None:
+        _event_types, _content_types = _choices('event_type'), _choices('content_type')
+
+    if not isinstance(event, dict):
+        return None, {'non_field_errors': 'Expected an object.'}
+
+    errors = {}
+    event_id = uuid7()
+    row = {'id': event_id.hex, 'user_id': user_id, 'timestamp': uuid7_time(event_id)}
+
+    event_type = event.get('event_type')
+    if event_type not in _event_types:
+        errors['event_type'] = 'Missing or unknown event type.'
+    row['event_type'] = event_type
+
+    content_type = event.get('content_type')
+    if content_type is not None and content_type not in _content_types:
+        errors['content_type'] = 'Unknown content type.'
+    row['content_type'] = content_type
+
+    content_id = event.get('content_id')
+    if content_id is not None:
+        try:
+            content_id = uuid.UUID(str(content_id)).hex
+        except ValueError:
+            errors['content_id'] = 'Must be a UUID.'
+    row['content_id'] = content_id
+
+    for name, max_length in STRING_LIMITS.items():
+        value = event.get(name)
+        if value is not None and (not isinstance(value, str) or len(value) > max_length):
+            errors[name] = f'Must be a string of at most {max_length} characters.'
+        row[name] = value or None
+
+    duration = event.get('duration_seconds')
+    if duration is not None and (
+        isinstance(duration, bool) or not isinstance(duration, (int, float)) or not 0 <= duration < 1e7
+    ):
+        errors['duration_seconds'] = 'Must be a non-negative number.'
+    row['duration_seconds'] = duration
+
+    metadata = event.get('metadata') or {}
+    if not isinstance(metadata, dict):
+        errors['metadata'] = 'Must be an object.'
+    elif metadata and len(json.dumps(metadata, separators=(',', ':'))) > MAX_METADATA_BYTES:
+        errors['metadata'] = f'Must encode to at most {MAX_METADATA_BYTES} bytes.'
+    row['metadata'] = metadata
+
+    if errors:
+        return None, errors
+    return row, None
+
+
+def write_events(rows, batch_size=None):
+    """
+    Insert buffered rows into ``UserBehaviorTracking``.
+
+    Rows of users deleted since the events were queued are dropped. Should
+    the batch still be refused (e.g. a user deleted meanwhile), its rows are
+    inserted one at a time and those that fail are logged and dropped, so
+    one bad row cannot hold up the buffer.
+
+    Returns:
+        int: Number of rows written
+    """
+    from django.contrib.auth import get_user_model
+
+    from .models import UserBehaviorTracking
+
+    if not rows:
+        return 0
+    users = set(map(str, get_user_model().objects.filter(
+        pk__in={row.get('user_id') for row in rows} - {None}
+    ).values_list('pk', flat=True)))
+    events = [UserBehaviorTracking(**row) for row in rows if str(row.get('user_id')) in users]
+    if len(events) < len(rows):
+        logger.warning('Dropped %d behavior events of deleted users', len(rows) - len(events))
+
+    try:
+        with transaction.atomic():
+            UserBehaviorTracking.objects.bulk_create(
+                events,
+                batch_size=batch_size or settings.ANALYTICS_INGEST_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        return len(events)
+    except (DataError, IntegrityError):
+        logger.warning('Behavior event batch refused, writing its rows one at a time', exc_info=True)
+
+    written = 0
+    for event in events:
+        try:
+            with transaction.atomic():
+                UserBehaviorTracking.objects.bulk_create([event], ignore_conflicts=True)
+        except (DataError, IntegrityError) as exc:
+            logger.warning('Dropped behavior event %s of user %s: %s', event.id, event.user_id, exc)
+        else:
+            written += 1
+    return written
+
+
+def _row_time(row):
+    """Return the ingestion time of a buffered row, from its UUIDv7 id."""
+    return uuid7_time(uuid.UUID(str(row['id'])))
+
+
+class BaseIngestBuffer:
+    """Interface implemented by behavior event buffers."""
+
+    def offer(self, rows):
+        """Queue all rows, or none when they do not fit; return whether they were queued."""
+        raise NotImplementedError
+
+    def flush(self, batch_size=None):
+        """Write queued rows to the database; return rows written."""
+        raise NotImplementedError
+
+    def oldest_pending(self):
+        """Return the ingestion time of the oldest row queued or being written, or None."""
+        raise NotImplementedError
+
+
+class RedisIngestBuffer(BaseIngestBuffer):
+    """Behavior event buffer shared by all workers through Redis."""
+
+    # Append the batch only if the queue has room for all of it
+    OFFER_SCRIPT = """
+        if redis.call('LLEN', KEYS[1]) + #ARGV > tonumber(redis.call('GET', KEYS[2]) or '0') then
+            return 0
+        end
+        redis.call('RPUSH', KEYS[1], unpack(ARGV))
+        return 1
+    """
+
+    # Move up to ARGV[1] rows from the head of the queue to the in-flight list
+    CLAIM_SCRIPT = """
+        local rows = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+        if #rows > 0 then
+            redis.call('RPUSH', KEYS[2], unpack(rows))
+            redis.call('LTRIM', KEYS[1], #rows, -1)
+        end
+        return rows
+    """
+
+    lock_timeout = 300
+
+    # Lua's unpack() is limited by the stack size, so scripts get bounded chunks
+    script_chunk_size = 5000
+
+    def __init__(self, url=None, prefix='behavior', limit=None):
+        import redis
+
+        self.redis = redis.Redis.from_url(url or settings.ANALYTICS_INGEST_REDIS_URL, decode_responses=True)
+        self.queue_key = f'{prefix}:queue'
+        self.flight_key = f'{prefix}:flight'
+        self.limit_key = f'{prefix}:limit'
+        self.lock_key = f'{prefix}:flush-lock'
+        self.redis.set(self.limit_key, limit or settings.ANALYTICS_INGEST_BUFFER_LIMIT)
+        self._offer = self.redis.register_script(self.OFFER_SCRIPT)
+        self._claim = self.redis.register_script(self.CLAIM_SCRIPT)
+
+    def offer(self, rows):
+        if not rows:
+            return True
+        if len(rows) > self.script_chunk_size:
+            raise ValueError(f'At most {self.script_chunk_size} rows per offer')
+        encoded = [json.dumps(row, separators=(',', ':'), default=str) for row in rows]
+        return bool(self._offer(keys=[self.queue_key, self.limit_key], args=encoded))
+
+    def flush(self, batch_size=None):
+        batch_size = min(batch_size or settings.ANALYTICS_INGEST_BATCH_SIZE, self.script_chunk_size)
+        lock = self.redis.lock(self.lock_key, timeout=self.lock_timeout, blocking=False)
+        if not lock.acquire():
+            return 0
+        try:
+            # Finish a batch a crashed flusher left in flight before claiming more
+            written = self._write_flight(self.redis.lrange(self.flight_key, 0, -1), batch_size)
+            while True:
+                claimed = self._claim(keys=[self.queue_key, self.flight_key], args=[batch_size])
+                if not claimed:
+                    return written
+                written += self._write_flight(claimed, batch_size)
+        finally:
+            lock.release()
+
+    def oldest_pending(self):
+        # Read both heads at once: a claim moves rows from the queue to the flight list
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.lindex(self.flight_key, 0)
+        pipe.lindex(self.queue_key, 0)
+        heads = [json.loads(encoded) for encoded in pipe.execute() if encoded]
+        return min((_row_time(row) for row in heads), default=None)
+
+    def _write_flight(self, encoded, batch_size):
+        if not encoded:
+            return 0
+        written = write_events([json.loads(row) for row in encoded], batch_size)
+        # Only forget the in-flight rows once they are committed
+        self.redis.delete(self.flight_key)
+        return written
+
+
+class LocalIngestBuffer(BaseIngestBuffer):
+    """Bounded in-process behavior event buffer, for development."""
+
+    def __init__(self, limit=None, flush_interval=None):
+        self.limit = limit or settings.ANALYTICS_INGEST_BUFFER_LIMIT
+        self.flush_interval = flush_interval or settings.ANALYTICS_INGEST_FLUSH_INTERVAL
+        self._rows = deque()
+        self._flight = []
+        self._lock = threading.Condition()
+        self._flush_lock = threading.Lock()
+
+        flusher = threading.Thread(target=self._run_flusher, name='behavior-flusher', daemon=True)
+        flusher.start()
+        atexit.register(self.flush)
+
+    def offer(self, rows):
+        with self._lock:
+            if len(self._rows) + len(rows) > self.limit:
+                return False
+            self._rows.extend(rows)
+            if len(self._rows) >= settings.ANALYTICS_INGEST_BATCH_SIZE:
+                self._lock.notify()
+            return True
+
+    def flush(self, batch_size=None):
+        batch_size = batch_size or settings.ANALYTICS_INGEST_BATCH_SIZE
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._rows.popleft() for _ in range(min(batch_size, len(self._rows)))]
+                    self._flight = batch
+                if not batch:
+                    return written
+                try:
+                    written += write_events(batch, batch_size)
+                except Exception:
+                    # Put the batch back in front; it is retried on the next flush
+                    with self._lock:
+                        self._rows.extendleft(reversed(batch))
+                        self._flight = []
+                    raise
+                with self._lock:
+                    self._flight = []
+
+    def oldest_pending(self):
+        with self._lock:
+            heads = [rows[0] for rows in (self._flight, self._rows) if rows]
+        return min((_row_time(row) for row in heads), default=None)
+
+    def _run_flusher(self):
+        while True:
+            with self._lock:
+                # Wake up early once a full batch is waiting
+                self._lock.wait_for(
+                    lambda: len(self._rows) >= settings.ANALYTICS_INGEST_BATCH_SIZE,
+                    timeout=self.flush_interval,
+                )
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush behavior events')
+                time.sleep(self.flush_interval)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+BUFFERS = {
+    'redis': RedisIngestBuffer,
+    'local': LocalIngestBuffer,
+}
+
+
+def get_ingest_buffer():
+    """Return the configured behavior event buffer (``ANALYTICS_INGEST_BUFFER``)."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                name = settings.ANALYTICS_INGEST_BUFFER
+                buffer_class = BUFFERS.get(name) or import_string(name)
+                _buffer = buffer_class()
+    return _buffer
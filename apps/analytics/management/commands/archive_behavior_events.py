@@ -0,0 +1,33 @@
+"""
+Django management command to archive and drop old behavior tracking months.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.analytics.archive import expire_months
+
+
+class Command(BaseCommand):
+    help = 'Archives behavior tracking months past retention to compressed NDJSON and drops them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months', type=int, default=settings.ANALYTICS_BEHAVIOR_RETENTION_MONTHS,
+            help='Complete months to keep in the database besides the current one',
+        )
+        parser.add_argument(
+            '--keep-detached', action='store_true',
+            help='Detach expired partitions without dropping them (PostgreSQL)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only list the months that would expire')
+
+    def handle(self, *args, **options):
+        expired = expire_months(
+            keep_months=options['keep_months'],
+            keep_detached=options['keep_detached'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        for month, rows in expired:
+            self.stdout.write(f'{verb} {month:%Y-%m}: {rows} events')
+        self.stdout.write(self.style.SUCCESS(f'{len(expired)} months past retention'))
@@ -0,0 +1,37 @@
+"""
+Django management command to flush buffered behavior tracking events.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.analytics.ingest import get_ingest_buffer
+
+
+class Command(BaseCommand):
+    help = 'Writes buffered behavior tracking events to the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ANALYTICS_INGEST_BATCH_SIZE,
+            help='Events per bulk insert',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep flushing every ANALYTICS_INGEST_FLUSH_INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        buffer = get_ingest_buffer()
+        while True:
+            started = time.monotonic()
+            written = buffer.flush(batch_size=options['batch_size'])
+            if written or not options['loop']:
+                elapsed = time.monotonic() - started
+                self.stdout.write(self.style.SUCCESS(
+                    f'Flushed {written} behavior events in {elapsed:.2f}s ({written / max(elapsed, 1e-6):.0f}/s)'
+                ))
+            if not options['loop']:
+                return
+            time.sleep(settings.ANALYTICS_INGEST_FLUSH_INTERVAL)
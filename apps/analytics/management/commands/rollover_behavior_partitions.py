@@ -0,0 +1,44 @@
+"""
+Django management command to prepare monthly behavior tracking partitions.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.analytics import partitions
+
+
+class Command(BaseCommand):
+    help = 'Creates monthly partitions of the behavior tracking table ahead of time (PostgreSQL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=settings.ANALYTICS_PARTITIONS_AHEAD,
+            help='Months to prepare after the current one',
+        )
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='Convert a plain behavior table into a partitioned one first (locks the table)',
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.is_supported():
+            self.stdout.write(
+                'This database has no native partitions; months are handled logically by archive_behavior_events.'
+            )
+            return
+
+        until = partitions.add_months(partitions.month_start(timezone.now()), options['ahead'])
+        if not partitions.is_partitioned():
+            if not options['convert']:
+                self.stdout.write(self.style.WARNING(
+                    'The behavior table is not partitioned yet; run again with --convert.'
+                ))
+                return
+            copied = partitions.convert_to_partitioned(until)
+            self.stdout.write(self.style.SUCCESS(f'Converted the behavior table, copying {copied} rows'))
+
+        created = partitions.ensure_partitions(until)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(created)} partitions; partitions ready through {until:%Y-%m}'
+        ))
@@ -0,0 +1,42 @@
+"""
+Django management command to roll up learning activity into LearningAnalytics.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.analytics import rollups
+
+
+class Command(BaseCommand):
+    help = 'Updates LearningAnalytics from behavior events, lesson progress and quiz attempts since the last run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.ANALYTICS_ROLLUP_BATCH_SIZE,
+            help='Behavior events per transaction',
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Discard existing rollups and recompute them from all history',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep rolling up every ANALYTICS_ROLLUP_INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rollups.reset()
+
+        while True:
+            started = time.monotonic()
+            done = rollups.run(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Rolled up {done['events']} events, progress of {done['progress_students']} students "
+                f"and quizzes of {done['quiz_students']} students in {time.monotonic() - started:.2f}s"
+            ))
+            if not options['loop']:
+                return
+            time.sleep(settings.ANALYTICS_ROLLUP_INTERVAL)
@@ -0,0 +1,32 @@
+"""
+Django management command to snapshot platform-wide analytics.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.analytics import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Stores a snapshot of platform totals and daily activity for the admin dashboard'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep taking snapshots every ANALYTICS_SNAPSHOT_INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            snapshot, refreshed = snapshots.refresh()
+            if refreshed:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Snapshot as of {snapshot.as_of:%Y-%m-%d %H:%M:%S} took {snapshot.duration_ms:.0f}ms'
+                ))
+            else:
+                self.stdout.write(self.style.WARNING('Another worker is taking a snapshot, skipped'))
+            if not options['loop']:
+                return
+            time.sleep(settings.ANALYTICS_SNAPSHOT_INTERVAL)
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from apps.core.ids import uuid7
 from apps.courses.models import Course, Lesson
 from apps.quizzes.models import Quiz
 import uuid
@@ -38,8 +40,12 @@ class AnalyticsReport(models.Model):
 class UserBehaviorTracking(models.Model):
     """
     Model for tracking detailed user behavior.
+
+    Ids are time-ordered (UUIDv7) so inserts land at the end of the primary
+    key index; on PostgreSQL the table can be partitioned by month on them
+    (see ``apps.analytics.partitions``).
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='behavior_tracking')
     event_type = models.CharField(max_length=50, choices=[
         ('page_view', 'Page View'),
@@ -68,7 +74,7 @@ class UserBehaviorTracking(models.Model):
     session_id = models.CharField(max_length=100, null=True, blank=True)
     duration_seconds = models.FloatField(null=True, blank=True)  # For events that have duration
     metadata = models.JSONField(default=dict)  # Additional event-specific data
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)  # Batched events carry their receive time
     
     class Meta:
         ordering = ['-timestamp']
@@ -127,6 +133,35 @@ class LearningAnalytics(models.Model):
         return f"Analytics for {self.user.username}"
 
 
+class RollupWatermark(models.Model):
+    """
+    Model for storing how far a rollup source has been processed.
+    """
+    source = models.CharField(max_length=50, primary_key=True)
+    state = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.state}"
+
+
+class PlatformSnapshot(models.Model):
+    """
+    Model for storing periodic snapshots of platform-wide metrics.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
+    as_of = models.DateTimeField(db_index=True)  # Moment the metrics describe
+    metrics = models.JSONField(default=dict)  # Platform totals
+    series = models.JSONField(default=dict)  # Daily buckets: {'days': [...], metric: [...]}
+    duration_ms = models.FloatField(default=0.0)  # Time taken to compute the snapshot
+
+    class Meta:
+        ordering = ['-as_of']
+
+    def __str__(self):
+        return f"Platform snapshot as of {self.as_of}"
+
+
 class DashboardWidget(models.Model):
     """
     Model for storing dashboard widget configurations.
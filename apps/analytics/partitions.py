@@ -0,0 +1,302 @@
+"""
+Monthly partitions of the behavior tracking table.
+
+On PostgreSQL ``UserBehaviorTracking`` can be converted into a table
+partitioned by range of its primary key. Ids are UUIDv7, whose leading bits
+are the creation time, so each monthly partition holds one contiguous id
+range (``uuid7_floor`` of the first instant of the month up to that of the
+next). Keeping the id as the partition key keeps it a plain unique primary
+key, which ``ignore_conflicts`` batch inserts rely on.
+
+Dropping a month then is a ``DETACH PARTITION`` and ``DROP TABLE`` instead
+of a long ``DELETE`` followed by vacuum. A default partition catches ids
+outside the prepared ranges, so inserts never fail for lack of a partition.
+When the partition of a month that already has rows in the default
+partition is created late, those rows are moved into it; months past
+retention are also deleted from the default partition.
+
+Other databases keep a single table and treat months as logical
+partitions: month queries filter on ``timestamp`` and dropping a month
+deletes its rows in batches.
+
+``manage.py rollover_behavior_partitions`` converts the table and creates
+partitions ahead of time; ``manage.py archive_behavior_events`` archives
+and drops months past retention (see ``archive.py``).
+"""
+
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from apps.core.ids import uuid7_floor
+
+from .models import UserBehaviorTracking
+
+TABLE = UserBehaviorTracking._meta.db_table
+
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+DELETE_BATCH_SIZE = 5000
+
+# Rewrites a legacy (UUIDv4) id into a UUIDv7 of the row's timestamp, keeping its random bits
+LEGACY_ID_SQL = """
+    CASE WHEN substr(id::text, 15, 1) = '7' THEN id ELSE (
+        lpad(to_hex(floor(extract(epoch FROM timestamp) * 1000)::bigint), 12, '0')
+        || '7' || substr(replace(id::text, '-', ''), 14, 3)
+        || '8' || substr(replace(id::text, '-', ''), 18, 15)
+    )::uuid END
+"""
+
+
+def month_start(day):
+    """Return the first day of the month of ``day``."""
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def parse_month(value):
+    """Parse 'YYYY-MM' into the first day of that month; raise ValueError otherwise."""
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+def month_range(month):
+    """Return the [start, end) datetimes (UTC) of a month."""
+    start = datetime.combine(month, time.min, tzinfo=dt_timezone.utc)
+    return start, datetime.combine(add_months(month, 1), time.min, tzinfo=dt_timezone.utc)
+
+
+def month_bounds(month):
+    """Return the [lower, upper) primary key range of a month."""
+    start, end = month_range(month)
+    return uuid7_floor(start), uuid7_floor(end)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y%m}'
+
+
+def is_supported():
+    """Whether the database supports native partitions."""
+    return connection.vendor == 'postgresql'
+
+
+def is_partitioned():
+    """Whether the behavior table is a partitioned table."""
+    if not is_supported():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE]
+        )
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def list_partitions():
+    """
+    Return the monthly partitions of the behavior table.
+
+    Returns:
+        dict: {first day of month: partition table name}
+    """
+    if not is_partitioned():
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+        """, [TABLE])
+        names = [name for name, in cursor.fetchall()]
+    partitions = {}
+    prefix = f'{TABLE}_p'
+    for name in names:
+        if name.startswith(prefix):
+            partitions[datetime.strptime(name[len(prefix):], '%Y%m').date()] = name
+    return partitions
+
+
+def month_queryset(month, partitioned=None):
+    """Return the behavior rows of a month, using the partition key where there is one."""
+    partitioned = is_partitioned() if partitioned is None else partitioned
+    if partitioned:
+        lower, upper = month_bounds(month)
+        return UserBehaviorTracking.objects.filter(id__gte=lower, id__lt=upper)
+    start, end = month_range(month)
+    return UserBehaviorTracking.objects.filter(timestamp__gte=start, timestamp__lt=end)
+
+
+def _default_months(cursor):
+    """Return the months of the rows in the default partition, if there is one."""
+    quote = connection.ops.quote_name
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [DEFAULT_PARTITION])
+    if not cursor.fetchone()[0]:
+        return set()
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC')::date "
+        f'FROM {quote(DEFAULT_PARTITION)}'
+    )
+    return {month for month, in cursor.fetchall()}
+
+
+def stored_months():
+    """Return the months that hold behavior rows, oldest first."""
+    if is_partitioned():
+        months = {month for month in list_partitions() if month_queryset(month, True).exists()}
+        with connection.cursor() as cursor:
+            months |= _default_months(cursor)
+        return sorted(months)
+    first = UserBehaviorTracking.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if first is None:
+        return []
+    last = UserBehaviorTracking.objects.order_by('-timestamp').values_list('timestamp', flat=True).first()
+    months = []
+    month = month_start(first.astimezone(dt_timezone.utc))
+    while month <= month_start(last.astimezone(dt_timezone.utc)):
+        if month_queryset(month, False).exists():
+            months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _create_partition(cursor, month):
+    """
+    Create the partition of a month, moving its rows out of the default partition.
+
+    PostgreSQL refuses a new partition while the default partition holds
+    rows of its range, so the default partition is detached, the new one
+    created, the rows moved over and the default reattached. Run in a
+    transaction.
+    """
+    quote = connection.ops.quote_name
+    lower, upper = month_bounds(month)
+    bounds = [str(lower), str(upper)]
+
+    cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [DEFAULT_PARTITION])
+    stranded = False
+    if cursor.fetchone()[0]:
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} WHERE id >= %s AND id < %s)', bounds)
+        stranded = cursor.fetchone()[0]
+
+    if stranded:
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(DEFAULT_PARTITION)}')
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS {quote(partition_name(month))} '
+        f'PARTITION OF {quote(TABLE)} FOR VALUES FROM (%s) TO (%s)',
+        bounds,
+    )
+    if stranded:
+        columns = ', '.join(quote(field.column) for field in UserBehaviorTracking._meta.concrete_fields)
+        cursor.execute(
+            f'INSERT INTO {quote(TABLE)} ({columns}) SELECT {columns} FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE id >= %s AND id < %s',
+            bounds,
+        )
+        cursor.execute(f'DELETE FROM {quote(DEFAULT_PARTITION)} WHERE id >= %s AND id < %s', bounds)
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(DEFAULT_PARTITION)} DEFAULT')
+
+
+def ensure_partitions(until):
+    """
+    Create the monthly partitions up to and including the month of ``until``.
+
+    Rows that reached the default partition because a rollover ran late are
+    moved into the partition of their month.
+
+    Returns:
+        list: Months whose partition was created
+    """
+    existing = list_partitions()
+    if not existing:
+        return []
+    created = []
+    month = max(existing)
+    while month < month_start(until):
+        month = add_months(month, 1)
+        with transaction.atomic(), connection.cursor() as cursor:
+            _create_partition(cursor, month)
+        created.append(month)
+    return created
+
+
+def convert_to_partitioned(until):
+    """
+    Turn the plain behavior table into a partitioned one, in one transaction.
+
+    Existing rows are copied into monthly partitions; legacy UUIDv4 ids are
+    rewritten into UUIDv7 ids of their timestamp so that they land in the
+    partition of their month. The table is locked for the copy.
+
+    Returns:
+        int: Number of rows copied
+    """
+    quote = connection.ops.quote_name
+    legacy = f'{TABLE}_legacy'
+    columns = ', '.join(quote(field.column) for field in UserBehaviorTracking._meta.concrete_fields)
+    values = ', '.join(
+        LEGACY_ID_SQL if field.primary_key else quote(field.column)
+        for field in UserBehaviorTracking._meta.concrete_fields
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} RENAME TO {quote(legacy)}')
+        cursor.execute(
+            f'CREATE TABLE {quote(TABLE)} (LIKE {quote(legacy)} INCLUDING DEFAULTS '
+            f'INCLUDING CONSTRAINTS INCLUDING INDEXES) PARTITION BY RANGE (id)'
+        )
+        # LIKE does not copy foreign keys
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'", [legacy]
+        )
+        for name, definition in cursor.fetchall():
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT {quote(name)} {definition}')
+
+        cursor.execute(f'SELECT min(timestamp) FROM {quote(legacy)}')
+        first, = cursor.fetchone()
+        month = month_start((first or datetime.now(dt_timezone.utc)).astimezone(dt_timezone.utc))
+        while month <= month_start(until):
+            _create_partition(cursor, month)
+            month = add_months(month, 1)
+        cursor.execute(f'CREATE TABLE {quote(TABLE + "_default")} PARTITION OF {quote(TABLE)} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {quote(TABLE)} ({columns}) SELECT {values} FROM {quote(legacy)}')
+        copied = cursor.rowcount
+        cursor.execute(f'DROP TABLE {quote(legacy)}')
+    return copied
+
+
+def drop_month(month, keep_detached=False):
+    """
+    Remove a month of behavior rows.
+
+    Detaches (and unless ``keep_detached``, drops) its partition, or deletes
+    its rows in batches where the table is not partitioned. Rows of the
+    month in the default partition are deleted in batches as well.
+
+    Returns:
+        int: Number of rows deleted, or None when a whole partition was detached
+    """
+    quote = connection.ops.quote_name
+    partitioned = is_partitioned()
+    partition = list_partitions().get(month) if partitioned else None
+    if partition is not None:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(partition)}')
+            if not keep_detached:
+                cursor.execute(f'DROP TABLE {quote(partition)}')
+
+    # Without the partition, whatever is left of the month is in the default partition
+    queryset = month_queryset(month, partitioned)
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:DELETE_BATCH_SIZE])
+        if not ids:
+            return None if partition is not None else deleted
+        deleted += UserBehaviorTracking.objects.filter(id__in=ids).delete()[0]
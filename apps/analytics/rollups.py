@@ -0,0 +1,550 @@
+"""
+Incremental rollups of learning activity into ``LearningAnalytics``.
+
+Rows are kept at four levels, told apart by which keys are set:
+
+* user (no course, lesson or quiz): totals over all of a user's activity
+* course: activity within one course, completion from the enrollment
+* lesson (course and lesson): activity on one lesson and its completion
+* quiz (course and quiz): attempts and scores of one quiz
+
+``run()`` only reads what changed since the previous run, tracked by one
+``RollupWatermark`` per source:
+
+* Behavior events are additive. They are read in primary key order (UUIDv7,
+  i.e. time order) after the last processed id, summed per row with NumPy
+  (``bincount`` over group codes) and added to the stored counters in the
+  transaction that advances the watermark, so every event counts once.
+* Lesson progress, enrollments and quiz attempts are state. Rows changed
+  since the watermark name the affected students, whose completion and
+  quiz figures are recomputed and overwritten; repeating a window is
+  harmless.
+
+Sources are read up to ``ANALYTICS_ROLLUP_LAG_SECONDS`` in the past, so rows
+still being committed are not skipped. Behavior events are additionally
+read only up to the oldest event the ingest buffer has not written yet, so
+a flush that falls behind holds the watermark back instead of letting it
+pass events still buffered. The first run backfills
+all history; after that a run costs in proportion to the new data and the
+students it touches.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.ids import uuid7_floor, uuid7_time
+from apps.courses.models import Course, Lesson
+from apps.enrollment.models import Enrollment, LessonProgress
+from apps.quizzes.models import Attempt, Quiz
+
+from .models import LearningAnalytics, RollupWatermark, UserBehaviorTracking
+
+logger = logging.getLogger(__name__)
+
+# Columns of the behavior aggregation, in order
+BEHAVIOR_COLUMNS = (
+    'time_spent_seconds', 'page_views', 'video_views', 'video_completions',
+    'discussions_participated', 'comments_made',
+)
+
+COUNTED_EVENTS = {
+    'page_views': 'page_view',
+    'video_views': 'video_play',
+    'video_completions': 'video_complete',
+    'discussions_participated': 'discussion_post',
+    'comments_made': 'comment_add',
+}
+
+QUERY_CHUNK_SIZE = 1000
+
+
+def _chunks(items, size=QUERY_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _codes(values):
+    """
+    Map hashable values to dense integer codes.
+
+    Returns:
+        tuple: (codes array, list of values by code)
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def _group(codes, columns):
+    """
+    Sum the rows of ``columns`` per group code.
+
+    Returns:
+        tuple: (group codes, array of sums with one row per group)
+    """
+    groups, inverse = np.unique(codes, return_inverse=True)
+    sums = np.column_stack([
+        np.bincount(inverse, weights=column, minlength=len(groups)) for column in columns.T
+    ])
+    return groups, sums
+
+
+def _group_means(codes, values):
+    groups, sums = _group(codes, np.column_stack([values, np.ones_like(values)]))
+    return groups, sums[:, 0] / sums[:, 1]
+
+
+class RollupWriter:
+    """Collects counter increments and new values for LearningAnalytics rows and writes them in bulk."""
+
+    def __init__(self):
+        self.increments = defaultdict(dict)
+        self.values = defaultdict(dict)
+
+    def add(self, key, field, amount):
+        self.increments[key][field] = self.increments[key].get(field, 0) + amount
+
+    def set(self, key, **values):
+        self.values[key].update(values)
+
+    def _load(self, keys):
+        rows = {}
+        by_user = defaultdict(set)
+        for user_id, course_id, _, _ in keys:
+            by_user[user_id].add(course_id)
+        for users in _chunks(by_user):
+            course_ids = {course_id for user_id in users for course_id in by_user[user_id] if course_id}
+            for row in LearningAnalytics.objects.filter(
+                Q(course__isnull=True) | Q(course_id__in=course_ids), user_id__in=users
+            ):
+                rows[(row.user_id, row.course_id, row.lesson_id, row.quiz_id)] = row
+        return rows
+
+    def write(self):
+        """
+        Apply everything collected, recompute scores and save.
+
+        Returns:
+            int: Number of rows written
+        """
+        keys = set(self.increments) | set(self.values)
+        if not keys:
+            return 0
+        rows = self._load(keys)
+        now = timezone.now()
+        created, updated = [], []
+
+        for key in keys:
+            row = rows.get(key)
+            if row is None:
+                user_id, course_id, lesson_id, quiz_id = key
+                row = LearningAnalytics(user_id=user_id, course_id=course_id, lesson_id=lesson_id, quiz_id=quiz_id)
+                created.append(row)
+            else:
+                updated.append(row)
+            increments = dict(self.increments.get(key, {}))
+            if 'video_views' in increments or 'video_completions' in increments:
+                # Completions are kept implicitly, as a rate of plays; completions
+                # beyond the number of plays (no play event seen) are clamped away
+                completions = round(row.video_completion_rate * row.video_views / 100)
+                completions += increments.pop('video_completions', 0)
+                row.video_views += increments.pop('video_views', 0)
+                row.video_completion_rate = min(100.0, 100.0 * completions / row.video_views) if row.video_views else 0.0
+            for field, amount in increments.items():
+                # Sum in float, then round once for integer columns (e.g. fractional seconds)
+                total = float(getattr(row, field)) + float(amount)
+                setattr(row, field, round(total) if isinstance(getattr(row, field), int) else total)
+            for field, value in self.values.get(key, {}).items():
+                setattr(row, field, value)
+            row.calculated_at = now
+
+        score_rows(created + updated)
+        with transaction.atomic():
+            # Replacing rows is far cheaper than bulk_update's per-row CASE expressions
+            for chunk in _chunks([row.pk for row in updated]):
+                LearningAnalytics.objects.filter(pk__in=chunk).delete()
+            LearningAnalytics.objects.bulk_create(created + updated, batch_size=QUERY_CHUNK_SIZE)
+        self.increments.clear()
+        self.values.clear()
+        return len(created) + len(updated)
+
+
+def score_rows(rows):
+    """
+    Recompute the engagement and performance scores (0-100) of rows in place.
+
+    Engagement gives each kind of activity a fixed share that fills up
+    logarithmically towards a target (100 page views, 50 video plays, 10
+    hours, 20 posts or comments, 10 quiz attempts), so no single one
+    dominates. Performance blends quiz scores with completion.
+    """
+    if not rows:
+        return
+
+    def column(field):
+        return np.fromiter((getattr(row, field) for row in rows), dtype=float, count=len(rows))
+
+    def saturating(values, target):
+        return np.minimum(1.0, np.log1p(values) / np.log1p(target))
+
+    quiz_attempts = column('quiz_attempts')
+    engagement = (
+        20 * saturating(column('page_views'), 100)
+        + 25 * saturating(column('video_views'), 50)
+        + 25 * saturating(column('time_spent_seconds') / 60, 600)
+        + 15 * saturating(column('discussions_participated') + column('comments_made'), 20)
+        + 15 * saturating(quiz_attempts, 10)
+    )
+    completion = column('course_completion_rate')
+    performance = np.where(quiz_attempts > 0, 0.6 * column('quiz_average_score') + 0.4 * completion, completion)
+    for row, engagement_score, performance_score in zip(rows, engagement.tolist(), performance.tolist()):
+        row.engagement_score = round(engagement_score, 2)
+        row.performance_score = round(performance_score, 2)
+
+
+def _content_courses(events):
+    """
+    Resolve the course and lesson of each event from its content reference.
+
+    References to content that does not exist (any more) resolve to None.
+    """
+    course_ids = {content_id for _, _, content_type, content_id, _ in events if content_type == 'course' and content_id}
+    lesson_ids = {content_id for _, _, content_type, content_id, _ in events if content_type == 'lesson' and content_id}
+    quiz_ids = {content_id for _, _, content_type, content_id, _ in events if content_type == 'quiz' and content_id}
+    known_courses, lesson_courses, quiz_courses = set(), {}, {}
+    for chunk in _chunks(course_ids):
+        known_courses.update(Course.objects.filter(id__in=chunk).values_list('id', flat=True))
+    for chunk in _chunks(lesson_ids):
+        lesson_courses.update(Lesson.objects.filter(id__in=chunk).values_list('id', 'course_id'))
+    for chunk in _chunks(quiz_ids):
+        quiz_courses.update(Quiz.objects.filter(id__in=chunk).values_list('id', 'course_id'))
+
+    courses, lessons = [], []
+    for _, _, content_type, content_id, _ in events:
+        if content_type == 'course':
+            courses.append(content_id if content_id in known_courses else None)
+            lessons.append(None)
+        elif content_type == 'lesson':
+            courses.append(lesson_courses.get(content_id))
+            lessons.append(content_id if content_id in lesson_courses else None)
+        elif content_type == 'quiz':
+            courses.append(quiz_courses.get(content_id))
+            lessons.append(None)
+        else:
+            courses.append(None)
+            lessons.append(None)
+    return courses, lessons
+
+
+def add_behavior(writer, events):
+    """
+    Add a batch of behavior events to the user, course and lesson counters.
+
+    Args:
+        writer: RollupWriter collecting the increments
+        events: Sequence of (user_id, event_type, content_type, content_id, duration_seconds)
+    """
+    if not events:
+        return
+    users, event_types, _, _, durations = zip(*events)
+    courses, lessons = _content_courses(events)
+
+    event_types = np.array(event_types, dtype=object)
+    columns = np.column_stack(
+        [np.nan_to_num(np.array(durations, dtype=float))]
+        + [(event_types == COUNTED_EVENTS[name]).astype(float) for name in BEHAVIOR_COLUMNS[1:]]
+    )
+    user_codes, user_keys = _codes(users)
+    course_codes, course_keys = _codes(courses)
+    lesson_codes, lesson_keys = _codes(lessons)
+
+    def collect(codes, mask, key_of):
+        if not mask.any():
+            return
+        groups, sums = _group(codes[mask], columns[mask])
+        for group, totals in zip(groups.tolist(), sums.tolist()):
+            key = key_of(group)
+            for field, amount in zip(BEHAVIOR_COLUMNS, totals):
+                if amount:
+                    writer.add(key, field, amount)
+
+    everything = np.ones(len(events), dtype=bool)
+    collect(user_codes, everything, lambda group: (user_keys[group], None, None, None))
+
+    width = len(course_keys)
+    has_course = np.array([course is not None for course in courses])
+    collect(
+        user_codes * width + course_codes, has_course,
+        lambda group: (user_keys[group // width], course_keys[group % width], None, None),
+    )
+
+    width = len(lesson_keys)
+    has_lesson = np.array([lesson is not None for lesson in lessons])
+    lesson_course = dict(zip(lessons, courses))
+    collect(
+        user_codes * width + lesson_codes, has_lesson,
+        lambda group: (
+            user_keys[group // width], lesson_course[lesson_keys[group % width]], lesson_keys[group % width], None
+        ),
+    )
+
+
+def refresh_progress(writer, student_ids, lesson_progress=()):
+    """
+    Overwrite completion figures of the given students.
+
+    Args:
+        writer: RollupWriter collecting the values
+        student_ids: Students whose course and user rows are recomputed
+        lesson_progress: Changed (student_id, course_id, lesson_id, is_completed) rows
+    """
+    for student_id, course_id, lesson_id, is_completed in lesson_progress:
+        writer.set(
+            (student_id, course_id, lesson_id, None),
+            lessons_completed=int(is_completed), total_lessons=1,
+            course_completion_rate=100.0 if is_completed else 0.0,
+        )
+
+    for chunk in _chunks(student_ids):
+        enrollments = list(Enrollment.objects.filter(student_id__in=chunk).values_list(
+            'student_id', 'course_id', 'progress_percentage', 'completed_lessons', 'total_lessons'
+        ))
+        if not enrollments:
+            continue
+        students, courses, percentages, completed, totals = zip(*enrollments)
+        for student_id, course_id, percentage, done, total in enrollments:
+            writer.set(
+                (student_id, course_id, None, None),
+                course_completion_rate=float(percentage), lessons_completed=done, total_lessons=total,
+            )
+
+        codes, keys = _codes(students)
+        groups, sums = _group(codes, np.column_stack([
+            np.array(completed, dtype=float), np.array(totals, dtype=float)
+        ]))
+        _, mean_completion = _group_means(codes, np.array(percentages, dtype=float))
+        for group, (done, total), completion in zip(groups.tolist(), sums.tolist(), mean_completion.tolist()):
+            writer.set(
+                (keys[group], None, None, None),
+                lessons_completed=int(done), total_lessons=int(total), course_completion_rate=round(completion, 2),
+            )
+
+
+def refresh_quizzes(writer, student_ids):
+    """Overwrite quiz attempt counts, average scores and improvement of the given students."""
+    for chunk in _chunks(student_ids):
+        attempts = list(Attempt.objects.filter(
+            student_id__in=chunk, submitted_at__isnull=False
+        ).order_by('submitted_at').values_list('student_id', 'quiz_id', 'quiz__course_id', 'score'))
+        if not attempts:
+            continue
+        students, quizzes, courses, scores = zip(*attempts)
+        scores = np.array(scores, dtype=float)
+        ones = np.ones_like(scores)
+        student_codes, student_keys = _codes(students)
+        quiz_codes, quiz_keys = _codes(quizzes)
+        course_codes, course_keys = _codes(courses)
+        quiz_course_codes = np.empty(len(quiz_keys), dtype=np.int64)
+        quiz_course_codes[quiz_codes] = course_codes
+        width = len(quiz_keys)
+
+        # Per quiz: attempts, mean score, and last minus first score (attempts are in time order)
+        pair_codes = student_codes * width + quiz_codes
+        pairs, first_index, counts = np.unique(pair_codes, return_index=True, return_counts=True)
+        _, last_from_end = np.unique(pair_codes[::-1], return_index=True)
+        improvements = scores[len(pair_codes) - 1 - last_from_end] - scores[first_index]
+        _, pair_means = _group_means(pair_codes, scores)
+        for pair, count, mean, improvement in zip(
+            pairs.tolist(), counts.tolist(), pair_means.tolist(), improvements.tolist()
+        ):
+            quiz_code = pair % width
+            writer.set(
+                (student_keys[pair // width], course_keys[quiz_course_codes[quiz_code]], None, quiz_keys[quiz_code]),
+                quiz_attempts=count, quiz_average_score=round(mean, 2),
+                improvement_rate=round(improvement, 2) if count > 1 else 0.0,
+            )
+
+        # Courses and users: all their attempts, and the mean improvement of quizzes taken more than once
+        retaken = counts > 1
+        pair_students = pairs // width
+        pair_courses = quiz_course_codes[pairs % width]
+        levels = (
+            (student_codes * len(course_keys) + course_codes, pair_students * len(course_keys) + pair_courses,
+             lambda group: (student_keys[group // len(course_keys)], course_keys[group % len(course_keys)], None, None)),
+            (student_codes, pair_students, lambda group: (student_keys[group], None, None, None)),
+        )
+        for attempt_groups, pair_groups, key_of in levels:
+            improvement = {}
+            if retaken.any():
+                groups, means = _group_means(pair_groups[retaken], improvements[retaken])
+                improvement = dict(zip(groups.tolist(), means.tolist()))
+            groups, sums = _group(attempt_groups, np.column_stack([scores, ones]))
+            for group, (total, count) in zip(groups.tolist(), sums.tolist()):
+                writer.set(
+                    key_of(group),
+                    quiz_attempts=int(count), quiz_average_score=round(total / count, 2),
+                    improvement_rate=round(improvement.get(group, 0.0), 2),
+                )
+
+
+def _watermark(source):
+    watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(source=source)
+    return watermark
+
+
+def _behavior_batch(state, upper, batch_size):
+    """
+    Return the next batch of behavior events and the state after it.
+
+    Without a watermark every event before ``upper`` is backfilled in id
+    order first; afterwards events are read by id range.
+    """
+    fields = ('id', 'user_id', 'event_type', 'content_type', 'content_id', 'duration_seconds')
+    if state.get('after') is None or state.get('backfill_until'):
+        until = datetime.fromisoformat(state['backfill_until']) if state.get('backfill_until') else upper
+        queryset = UserBehaviorTracking.objects.filter(timestamp__lt=until)
+        if state.get('after'):
+            queryset = queryset.filter(id__gt=state['after'])
+        rows = list(queryset.order_by('id').values_list(*fields)[:batch_size])
+        if rows:
+            return rows, {'after': str(rows[-1][0]), 'backfill_until': until.isoformat()}
+        # Backfill done; continue by id from the point it covered
+        return [], {'after': str(uuid7_floor(until)), 'backfill_until': None}
+
+    after = state['after']
+    rows = list(UserBehaviorTracking.objects.filter(
+        # Legacy random ids that happen to fall in the range were counted by the backfill
+        id__gt=after, id__lt=uuid7_floor(upper), timestamp__gte=uuid7_time(UserBehaviorTracking._meta.pk.to_python(after)),
+    ).order_by('id').values_list(*fields)[:batch_size])
+    if rows:
+        return rows, {'after': str(rows[-1][0]), 'backfill_until': None}
+    return [], state
+
+
+def roll_up_behavior(upper, batch_size):
+    """
+    Add new behavior events to the counters, one transaction per batch.
+
+    Returns:
+        int: Number of events processed
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark = _watermark('behavior')
+            rows, state = _behavior_batch(watermark.state, upper, batch_size)
+            writer = RollupWriter()
+            add_behavior(writer, [row[1:] for row in rows])
+            writer.write()
+            moved = state != watermark.state
+            watermark.state = state
+            watermark.save()
+        processed += len(rows)
+        if not rows and not moved:
+            return processed
+
+
+def _window(source, upper):
+    watermark = RollupWatermark.objects.filter(source=source).first()
+    since = watermark.state.get('since') if watermark else None
+    return (datetime.fromisoformat(since) if since else None), upper
+
+
+def _advance(source, upper):
+    RollupWatermark.objects.update_or_create(source=source, defaults={'state': {'since': upper.isoformat()}})
+
+
+def roll_up_progress(upper):
+    """
+    Recompute completion figures of students with new enrollments or progress.
+
+    Returns:
+        int: Number of students refreshed
+    """
+    since, until = _window('progress', upper)
+    progress = LessonProgress.objects.filter(last_accessed__lt=until)
+    enrollments = Enrollment.objects.filter(enrolled_at__lt=until)
+    if since is not None:
+        progress = progress.filter(last_accessed__gte=since)
+        enrollments = enrollments.filter(enrolled_at__gte=since)
+    changed = list(progress.values_list(
+        'enrollment__student_id', 'enrollment__course_id', 'lesson_id', 'is_completed'
+    ).iterator(chunk_size=5000))
+    students = {row[0] for row in changed} | set(enrollments.values_list('student_id', flat=True))
+
+    writer = RollupWriter()
+    refresh_progress(writer, students, changed)
+    with transaction.atomic():
+        writer.write()
+        _advance('progress', until)
+    return len(students)
+
+
+def roll_up_quizzes(upper):
+    """
+    Recompute quiz figures of students with newly submitted attempts.
+
+    Returns:
+        int: Number of students refreshed
+    """
+    since, until = _window('quizzes', upper)
+    attempts = Attempt.objects.filter(submitted_at__lt=until)
+    if since is not None:
+        attempts = attempts.filter(submitted_at__gte=since)
+    students = set(attempts.order_by().values_list('student_id', flat=True).distinct())
+
+    writer = RollupWriter()
+    refresh_quizzes(writer, students)
+    with transaction.atomic():
+        writer.write()
+        _advance('quizzes', until)
+    return len(students)
+
+
+def behavior_upper(upper):
+    """
+    Clamp the behavior window to the oldest event still in the ingest buffer.
+
+    Events get their id when they are ingested but reach the table only
+    when the buffer is flushed, possibly later than the rollup lag. Reading
+    past the oldest pending event would move the id watermark beyond it.
+    """
+    from .ingest import get_ingest_buffer
+
+    try:
+        oldest = get_ingest_buffer().oldest_pending()
+    except Exception:
+        logger.warning('Could not read the ingest buffer; rolling up to the lag only', exc_info=True)
+        return upper
+    return upper if oldest is None else min(upper, oldest)
+
+
+def run(batch_size=None):
+    """
+    Bring every rollup up to date with changes older than the rollup lag.
+
+    Returns:
+        dict: Work done per source
+    """
+    upper = timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS)
+    batch_size = batch_size or settings.ANALYTICS_ROLLUP_BATCH_SIZE
+    return {
+        'events': roll_up_behavior(behavior_upper(upper), batch_size),
+        'progress_students': roll_up_progress(upper),
+        'quiz_students': roll_up_quizzes(upper),
+    }
+
+
+def reset():
+    """Forget all rollups and watermarks; the next run recomputes from history."""
+    with transaction.atomic():
+        RollupWatermark.objects.all().delete()
+        LearningAnalytics.objects.all().delete()
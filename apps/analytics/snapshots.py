@@ -0,0 +1,188 @@
+"""
+Scheduled snapshots of platform-wide analytics.
+
+Counting every user, course and lesson and aggregating ``LearningAnalytics``
+on each admin dashboard load scans whole tables. Instead
+``take_snapshot()`` runs on a schedule (``snapshot_platform_analytics
+--loop``) and stores the totals and a daily time series in a
+``PlatformSnapshot``. Dashboards read the latest snapshot and add a
+``delta`` of rows created since it was taken, which only touches the
+recent end of the ``created_at`` indexes and the newest behavior partition.
+
+Daily buckets are carried over from the previous snapshot: only the days
+since it was taken (minus the rollup lag, for events still being flushed)
+are recounted, so a snapshot's series costs in proportion to new rows.
+
+``refresh()`` is single-flight across workers through an ``add`` lock in
+the shared cache; callers that lose the race wait for the winner's
+snapshot instead of computing another one.
+"""
+
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.core.ids import uuid7_floor
+from apps.courses.models import Course, Lesson
+from apps.enrollment.models import Enrollment
+from apps.users.models import User
+
+from .models import LearningAnalytics, PlatformSnapshot, UserBehaviorTracking
+
+logger = logging.getLogger(__name__)
+
+SERIES = ('new_users', 'new_enrollments', 'events', 'active_users')
+
+LOCK_KEY = 'analytics:platform-snapshot:lock'
+POLL_INTERVAL = 0.1
+
+
+def _midnight(day):
+    return datetime.combine(day, dt_time.min, tzinfo=timezone.get_current_timezone())
+
+
+def _daily_counts(since, until):
+    """
+    Count activity per day in ``[since, until)``.
+
+    Returns:
+        dict: ISO day -> {metric: count}
+    """
+    days = defaultdict(dict)
+    for name, queryset, field in (
+        ('new_users', User.objects.filter(created_at__gte=since, created_at__lt=until), 'created_at'),
+        ('new_enrollments', Enrollment.objects.filter(enrolled_at__gte=since, enrolled_at__lt=until), 'enrolled_at'),
+    ):
+        rows = queryset.annotate(day=TruncDate(field)).order_by().values('day').annotate(count=Count('pk'))
+        for row in rows:
+            days[row['day'].isoformat()][name] = row['count']
+
+    # Event ids are UUIDv7, so an id range selects the time range through the primary key;
+    # the timestamp range drops legacy rows whose random ids happen to fall in it, as in delta()
+    events = UserBehaviorTracking.objects.filter(
+        id__gte=uuid7_floor(since), id__lt=uuid7_floor(until),
+        timestamp__gte=since, timestamp__lt=until,
+    )
+    rows = events.annotate(day=TruncDate('timestamp')).order_by().values('day').annotate(
+        events=Count('pk'), active_users=Count('user', distinct=True),
+    )
+    for row in rows:
+        days[row['day'].isoformat()].update(events=row['events'], active_users=row['active_users'])
+    return days
+
+
+def build_series(now, previous=None):
+    """
+    Return the daily series for the ``ANALYTICS_SNAPSHOT_SERIES_DAYS`` days up to ``now``.
+
+    Days that were complete when ``previous`` was taken are copied from it;
+    the rest are counted.
+    """
+    today = timezone.localdate(now)
+    days = [today - timedelta(days=offset) for offset in range(settings.ANALYTICS_SNAPSHOT_SERIES_DAYS - 1, -1, -1)]
+    recount_from = days[0]
+    known = {}
+    if previous is not None and previous.series.get('days'):
+        settled = previous.as_of - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS)
+        recount_from = max(recount_from, timezone.localdate(settled))
+        for index, day in enumerate(previous.series['days']):
+            if day < recount_from.isoformat():
+                known[day] = {name: previous.series[name][index] for name in SERIES}
+
+    known.update(_daily_counts(_midnight(recount_from), now))
+    series = {'days': [day.isoformat() for day in days]}
+    for name in SERIES:
+        series[name] = [known.get(day, {}).get(name, 0) for day in series['days']]
+    return series
+
+
+def compute_metrics():
+    """Return platform totals."""
+    course_analytics = LearningAnalytics.objects.filter(
+        course__isnull=False, lesson__isnull=True, quiz__isnull=True
+    ).aggregate(total_time=Sum('time_spent_seconds'), avg_completion=Avg('course_completion_rate'))
+    return {
+        'total_users': User.objects.count(),
+        'total_courses': Course.objects.count(),
+        'total_lessons': Lesson.objects.count(),
+        'total_enrollments': Enrollment.objects.count(),
+        'total_learning_hours': (course_analytics['total_time'] or 0) / 3600,
+        'average_completion_rate': course_analytics['avg_completion'] or 0.0,
+    }
+
+
+def latest():
+    return PlatformSnapshot.objects.order_by('-as_of').first()
+
+
+def take_snapshot():
+    """Compute and store a new snapshot, dropping those past retention."""
+    started = time.monotonic()
+    now = timezone.now()
+    snapshot = PlatformSnapshot.objects.create(
+        as_of=now,
+        metrics=compute_metrics(),
+        series=build_series(now, latest()),
+        duration_ms=(time.monotonic() - started) * 1000,
+    )
+    PlatformSnapshot.objects.filter(
+        as_of__lt=now - timedelta(days=settings.ANALYTICS_SNAPSHOT_RETENTION_DAYS)
+    ).delete()
+    return snapshot
+
+
+def delta(snapshot):
+    """Count rows created since ``snapshot`` was taken; deletions are not reflected."""
+    since = snapshot.as_of
+    return {
+        'since': since.isoformat(),
+        'new_users': User.objects.filter(created_at__gt=since).count(),
+        'new_courses': Course.objects.filter(created_at__gt=since).count(),
+        'new_lessons': Lesson.objects.filter(created_at__gt=since).count(),
+        'new_enrollments': Enrollment.objects.filter(enrolled_at__gt=since).count(),
+        # The id bound uses the primary key index; the timestamp excludes older rows with non-time-ordered ids
+        'events': UserBehaviorTracking.objects.filter(id__gte=uuid7_floor(since), timestamp__gte=since).count(),
+    }
+
+
+def _cache_call(method, *args, default=None):
+    try:
+        return getattr(cache, method)(*args)
+    except Exception:
+        logger.warning('Cache %s(%s) failed', method, args[:1], exc_info=True)
+        return default
+
+
+def refresh(wait_timeout=None):
+    """
+    Take a snapshot unless another worker is already taking one.
+
+    A caller that finds the lock held waits up to ``wait_timeout`` seconds
+    for that snapshot to appear.
+
+    Returns:
+        tuple: (latest snapshot or None, whether it is newer than when called)
+    """
+    before = latest()
+    if _cache_call('add', LOCK_KEY, 1, settings.ANALYTICS_SNAPSHOT_LOCK_TIMEOUT, default=True):
+        try:
+            return take_snapshot(), True
+        finally:
+            _cache_call('delete', LOCK_KEY)
+
+    if wait_timeout is None:
+        wait_timeout = settings.ANALYTICS_SNAPSHOT_WAIT_TIMEOUT
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        time.sleep(POLL_INTERVAL)
+        current = latest()
+        refreshed = current is not None and (before is None or current.pk != before.pk)
+        if refreshed or time.monotonic() >= deadline or not _cache_call('get', LOCK_KEY):
+            return current, refreshed
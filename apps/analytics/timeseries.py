@@ -0,0 +1,466 @@
+"""
+Bucketed time-series queries for dashboard widgets.
+
+A query is a small declarative spec::
+
+    {
+        "source": "behavior",          # see SOURCES
+        "aggregate": "count",          # count, sum or avg
+        "metric": "duration_seconds",  # required for sum and avg
+        "interval": "day",             # hour, day, week or month
+        "group_by": "event_type",      # optional dimension
+        "filters": {"content_type": ["lesson", "quiz"]},
+        "days": 30                     # or "start" / "end" dates, inclusive
+    }
+
+and the answer is columnar: one list of bucket labels and one list of
+values per group, ready for a line or bar chart.
+
+Two engines answer the same spec:
+
+* ``sql`` (PostgreSQL) pushes everything down: ``date_trunc`` buckets,
+  ``GROUP BY`` the dimension and the aggregate, so only the result rows
+  leave the database.
+* ``numpy`` (other databases) extracts the columns it needs one day at a
+  time into cached blocks (seconds since midnight, metric values and
+  dimension codes) and bins them with ``bincount``. Closed days of
+  append-only sources are immutable and cached for
+  ``ANALYTICS_TIMESERIES_BLOCK_TIMEOUT``, so widgets over the same source
+  share the extraction and only the current day is read again. Sources
+  whose rows change after they are created (enrollments progress and
+  complete) are only cached for ``ANALYTICS_TIMESERIES_LIVE_TIMEOUT``.
+
+Results are cached per normalized spec and scope (staff see every user,
+everyone else only themselves) and computed single-flight.
+"""
+
+import hashlib
+import json
+from datetime import date, datetime, time as dt_time, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Count, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from apps.core.cache import TwoTierCache
+from apps.enrollment.models import Enrollment
+from apps.quizzes.models import Attempt
+
+from .models import UserBehaviorTracking
+
+AGGREGATES = ('count', 'sum', 'avg')
+INTERVALS = ('hour', 'day', 'week', 'month')
+
+MAX_GROUPS = 50
+
+# Accepted dates, far enough from date.min and date.max for bucket and time zone arithmetic
+EARLIEST_DATE = date(1970, 1, 1)
+LATEST_DATE = date(9000, 12, 31)
+
+timeseries_cache = TwoTierCache()
+
+
+class QueryError(ValueError):
+    """The time-series spec is invalid."""
+
+
+class Source:
+    """A table that can be queried: its time column, owner column, metrics and dimensions."""
+
+    def __init__(self, model, time_field, user_field, metrics, dimensions, append_only=True):
+        self.model = model
+        self.time_field = time_field
+        self.user_field = user_field
+        self.metrics = metrics
+        self.dimensions = dimensions  # Spec name -> model field
+        # Whether rows keep their metrics and dimensions once written, so closed days never change
+        self.append_only = append_only
+
+    def timeout(self, closed):
+        """Return how long blocks and results of this source may be cached."""
+        if closed and self.append_only:
+            return settings.ANALYTICS_TIMESERIES_BLOCK_TIMEOUT
+        return settings.ANALYTICS_TIMESERIES_LIVE_TIMEOUT
+
+    def queryset(self, since, until, scope):
+        queryset = self.model.objects.filter(**{
+            f'{self.time_field}__gte': since, f'{self.time_field}__lt': until,
+        })
+        if scope is not None:
+            queryset = queryset.filter(**{self.user_field: scope})
+        return queryset.order_by()
+
+
+SOURCES = {
+    'behavior': Source(
+        UserBehaviorTracking, 'timestamp', 'user_id',
+        metrics=('duration_seconds',),
+        dimensions={'event_type': 'event_type', 'content_type': 'content_type'},
+    ),
+    'enrollments': Source(
+        Enrollment, 'enrolled_at', 'student_id',
+        metrics=('progress_percentage',),
+        dimensions={'course': 'course_id', 'is_completed': 'is_completed'},
+        append_only=False,
+    ),
+    'attempts': Source(
+        Attempt, 'submitted_at', 'student_id',
+        metrics=('score', 'time_taken_seconds', 'earned_points'),
+        dimensions={'quiz': 'quiz_id', 'passed': 'passed'},
+    ),
+}
+
+
+def _parse_date(value, name):
+    try:
+        parsed = date.fromisoformat(str(value))
+    except ValueError:
+        raise QueryError(f'{name} must be a date formatted YYYY-MM-DD.')
+    if not EARLIEST_DATE <= parsed <= LATEST_DATE:
+        raise QueryError(f'{name} must be between {EARLIEST_DATE} and {LATEST_DATE}.')
+    return parsed
+
+
+def normalize_spec(spec, today=None):
+    """
+    Validate a spec and resolve its range to absolute dates.
+
+    Returns:
+        dict: The spec with every key present, in canonical form
+
+    Raises:
+        QueryError: When the spec is invalid
+    """
+    if not isinstance(spec, dict):
+        raise QueryError('Expected an object.')
+    source = SOURCES.get(spec.get('source'))
+    if source is None:
+        raise QueryError(f"source must be one of: {', '.join(SOURCES)}.")
+
+    aggregate = spec.get('aggregate', 'count')
+    if aggregate not in AGGREGATES:
+        raise QueryError(f"aggregate must be one of: {', '.join(AGGREGATES)}.")
+    metric = spec.get('metric')
+    if aggregate == 'count':
+        metric = None
+    elif metric not in source.metrics:
+        raise QueryError(f"metric must be one of: {', '.join(source.metrics)}.")
+
+    interval = spec.get('interval', 'day')
+    if interval not in INTERVALS:
+        raise QueryError(f"interval must be one of: {', '.join(INTERVALS)}.")
+
+    group_by = spec.get('group_by')
+    if group_by is not None and group_by not in source.dimensions:
+        raise QueryError(f"group_by must be one of: {', '.join(source.dimensions)}.")
+
+    if not isinstance(spec.get('filters') or {}, dict):
+        raise QueryError('filters must be an object.')
+    filters = {}
+    for name, values in (spec.get('filters') or {}).items():
+        if name not in source.dimensions:
+            raise QueryError(f"filters may only use: {', '.join(source.dimensions)}.")
+        values = values if isinstance(values, list) else [values]
+        filters[name] = sorted(str(value).lower() if isinstance(value, bool) else str(value) for value in values)
+
+    today = today or timezone.localdate()
+    if 'start' in spec or 'end' in spec:
+        end = _parse_date(spec['end'], 'end') if 'end' in spec else today
+        start = _parse_date(spec['start'], 'start') if 'start' in spec else end - timedelta(days=29)
+    else:
+        try:
+            days = int(spec.get('days', 30))
+        except (TypeError, ValueError):
+            raise QueryError('days must be an integer.')
+        # Checked before the date arithmetic, which overflows for huge values
+        if not 1 <= days <= settings.ANALYTICS_TIMESERIES_MAX_DAYS:
+            raise QueryError(f'days must be between 1 and {settings.ANALYTICS_TIMESERIES_MAX_DAYS}.')
+        end, start = today, today - timedelta(days=days - 1)
+    if start > end:
+        raise QueryError('start must not be after end.')
+    if (end - start).days + 1 > settings.ANALYTICS_TIMESERIES_MAX_DAYS:
+        raise QueryError(f'The range may span at most {settings.ANALYTICS_TIMESERIES_MAX_DAYS} days.')
+    if interval == 'hour' and (end - start).days + 1 > 31:
+        raise QueryError('Hourly series may span at most 31 days.')
+
+    try:
+        limit = min(MAX_GROUPS, max(1, int(spec.get('limit', 10))))
+    except (TypeError, ValueError):
+        raise QueryError('limit must be an integer.')
+
+    return {
+        'source': spec['source'], 'aggregate': aggregate, 'metric': metric, 'interval': interval,
+        'group_by': group_by, 'filters': filters, 'start': start.isoformat(), 'end': end.isoformat(),
+        'limit': limit,
+    }
+
+
+def _midnight(day):
+    return datetime.combine(day, dt_time.min, tzinfo=timezone.get_current_timezone())
+
+
+def _bucket_start(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_labels(start, end, interval):
+    """Return the label of every bucket overlapping ``[start, end]``, in order."""
+    if interval == 'hour':
+        return [
+            (_midnight(start) + timedelta(hours=hour)).isoformat()
+            for hour in range(((end - start).days + 1) * 24)
+        ]
+    labels, day = [], _bucket_start(start, interval)
+    while day <= end:
+        labels.append(day.isoformat())
+        if interval == 'month':
+            day = (day + timedelta(days=32)).replace(day=1)
+        else:
+            day += timedelta(days=7 if interval == 'week' else 1)
+    return labels
+
+
+def _label(value, interval):
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return value.isoformat() if interval == 'hour' else value.date().isoformat()
+
+
+def _dimension_label(value):
+    if value is None:
+        return None
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+def engine():
+    configured = settings.ANALYTICS_TIMESERIES_ENGINE
+    if configured != 'auto':
+        return configured
+    return 'sql' if connection.vendor == 'postgresql' else 'numpy'
+
+
+# SQL engine
+
+def _query_sql(source, spec, scope, buckets):
+    start, end = date.fromisoformat(spec['start']), date.fromisoformat(spec['end'])
+    queryset = source.queryset(_midnight(start), _midnight(end + timedelta(days=1)), scope)
+    for name, values in spec['filters'].items():
+        field = source.dimensions[name]
+        if source.model._meta.get_field(field).get_internal_type() == 'BooleanField':
+            values = [value == 'true' for value in values]
+        queryset = queryset.filter(**{f'{field}__in': values})
+
+    group_field = source.dimensions.get(spec['group_by'])
+    if spec['aggregate'] == 'count':
+        aggregate = Count('pk')
+    else:
+        aggregate = (Sum if spec['aggregate'] == 'sum' else Avg)(spec['metric'])
+    rows = queryset.annotate(
+        bucket=Trunc(source.time_field, spec['interval'])
+    ).values('bucket', *([group_field] if group_field else [])).annotate(value=aggregate)
+
+    index = {label: position for position, label in enumerate(buckets)}
+    values, present = {}, {}
+    for row in rows:
+        key = _dimension_label(row[group_field]) if group_field else None
+        position = index.get(_label(row['bucket'], spec['interval']))
+        if position is None or row['value'] is None:
+            continue
+        values.setdefault(key, np.zeros(len(buckets)))[position] = float(row['value'])
+        present.setdefault(key, np.zeros(len(buckets), dtype=bool))[position] = True
+    return values, present
+
+
+# NumPy engine
+
+def _block_key(source_name, scope, day):
+    return f"timeseries:block:{source_name}:{scope if scope is not None else 'all'}:{day.isoformat()}"
+
+
+def _encode(values):
+    index = {}
+    codes = np.fromiter(
+        (index.setdefault(_dimension_label(value), len(index)) for value in values), dtype=np.int32, count=len(values)
+    )
+    return codes, list(index)
+
+
+def _extract_blocks(source, scope, start, end):
+    """
+    Read the columns of ``source`` for the days ``start`` to ``end`` in one query.
+
+    Returns:
+        dict: date -> block
+    """
+    since = _midnight(start)
+    fields = [source.time_field, *source.metrics, *source.dimensions.values()]
+    rows = list(
+        source.queryset(since, _midnight(end + timedelta(days=1)), scope).order_by(source.time_field).values_list(*fields)
+    )
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    moments = np.fromiter(((row[0] - since).total_seconds() for row in rows), dtype=float, count=len(rows))
+    bounds = np.searchsorted(moments, [(_midnight(day) - since).total_seconds() for day in days + [end + timedelta(days=1)]])
+
+    blocks = {}
+    for position, day in enumerate(days):
+        chunk = rows[bounds[position]:bounds[position + 1]]
+        columns = list(zip(*chunk)) if chunk else [()] * len(fields)
+        offset = (_midnight(day) - since).total_seconds()
+        blocks[day] = {
+            'seconds': (moments[bounds[position]:bounds[position + 1]] - offset).astype(np.int32),
+            'metrics': {
+                name: np.array(column, dtype=float) for name, column in zip(source.metrics, columns[1:])
+            },
+            'dimensions': {
+                name: _encode(column)
+                for name, column in zip(source.dimensions, columns[1 + len(source.metrics):])
+            },
+        }
+    return blocks
+
+
+def _load_blocks(source_name, scope, start, end):
+    """Return the column blocks of every day in the range, extracting only the uncached ones."""
+    source = SOURCES[source_name]
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    keys = {day: _block_key(source_name, scope, day) for day in days}
+    cached = timeseries_cache._l2_call('get_many', list(keys.values()), default={})
+    blocks = {day: cached[key] for day, key in keys.items() if key in cached}
+
+    missing = [day for day in days if day not in blocks]
+    settled = timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS)
+    run = []
+    for day in missing + [None]:
+        if run and (day is None or day != run[-1] + timedelta(days=1)):
+            for block_day, block in _extract_blocks(source, scope, run[0], run[-1]).items():
+                blocks[block_day] = block
+                closed = _midnight(block_day + timedelta(days=1)) <= settled
+                timeseries_cache._l2_call('set', keys[block_day], block, source.timeout(closed))
+            run = []
+        if day is not None:
+            run.append(day)
+    return [(day, blocks[day]) for day in days]
+
+
+def _query_numpy(source, spec, scope, buckets):
+    start, end = date.fromisoformat(spec['start']), date.fromisoformat(spec['end'])
+    interval, group_by, metric = spec['interval'], spec['group_by'], spec['metric']
+    first = _bucket_start(start, interval)
+    group_labels = {}
+    bucket_parts, group_parts, value_parts = [], [], []
+
+    for day, block in _load_blocks(spec['source'], scope, start, end):
+        mask = np.ones(len(block['seconds']), dtype=bool)
+        for name, wanted in spec['filters'].items():
+            codes, labels = block['dimensions'][name]
+            mask &= np.isin(codes, [code for code, label in enumerate(labels) if label in wanted])
+        if not mask.any():
+            continue
+
+        if interval == 'hour':
+            buckets_of_rows = (day - start).days * 24 + block['seconds'][mask] // 3600
+        else:
+            if interval == 'month':
+                position = (day.year - first.year) * 12 + day.month - first.month
+            else:
+                position = (_bucket_start(day, interval) - first).days // (7 if interval == 'week' else 1)
+            buckets_of_rows = np.full(int(mask.sum()), position)
+        bucket_parts.append(buckets_of_rows.astype(np.int64))
+
+        if group_by:
+            codes, labels = block['dimensions'][group_by]
+            mapping = np.array([group_labels.setdefault(label, len(group_labels)) for label in labels], dtype=np.int64)
+            group_parts.append(mapping[codes[mask]])
+        else:
+            group_parts.append(np.zeros(int(mask.sum()), dtype=np.int64))
+        if metric:
+            value_parts.append(block['metrics'][metric][mask])
+
+    if not bucket_parts:
+        return {}, {}
+    keys = list(group_labels) if group_by else [None]
+    width = len(buckets)
+    cells = np.concatenate(group_parts) * width + np.concatenate(bucket_parts)
+    size = len(keys) * width
+    if metric:
+        metric_values = np.concatenate(value_parts)
+        known = ~np.isnan(metric_values)
+        counts = np.bincount(cells[known], minlength=size)
+        totals = np.bincount(cells[known], weights=metric_values[known], minlength=size)
+        result = totals / np.maximum(counts, 1) if spec['aggregate'] == 'avg' else totals
+    else:
+        counts = np.bincount(cells, minlength=size)
+        result = counts.astype(float)
+    result, counts = result.reshape(len(keys), width), counts.reshape(len(keys), width)
+    return (
+        {key: result[row] for row, key in enumerate(keys)},
+        {key: counts[row] > 0 for row, key in enumerate(keys)},
+    )
+
+
+def _format(spec, buckets, values, present, engine_name):
+    """Turn per-group value arrays into the columnar response, largest groups first."""
+    series = []
+    for key, row in values.items():
+        has_value = present[key]
+        if spec['aggregate'] == 'avg':
+            column = [round(value, 4) if known else None for value, known in zip(row.tolist(), has_value.tolist())]
+        elif spec['aggregate'] == 'count':
+            column = [int(value) for value in row.tolist()]
+        else:
+            column = [round(value, 4) for value in row.tolist()]
+        series.append({'key': key, 'values': column, 'total': float(row[has_value].sum())})
+    series.sort(key=lambda entry: -entry['total'])
+    for entry in series:
+        del entry['total']
+    if not series and not spec['group_by']:
+        empty = None if spec['aggregate'] == 'avg' else 0
+        series = [{'key': None, 'values': [empty] * len(buckets)}]
+    return {
+        'spec': spec,
+        'engine': engine_name,
+        'buckets': buckets,
+        'series': series[:spec['limit']],
+        'truncated': len(series) > spec['limit'],
+    }
+
+
+def run_query(spec, scope=None):
+    """
+    Answer a spec, from the cache when the same spec and scope were asked recently.
+
+    Args:
+        spec: Query spec, validated here
+        scope: User id the rows are restricted to, or None for every user
+
+    Returns:
+        dict: Bucket labels and one series of values per group
+
+    Raises:
+        QueryError: When the spec is invalid
+    """
+    spec = normalize_spec(spec)
+    digest = hashlib.md5(
+        json.dumps([spec, str(scope) if scope is not None else None], sort_keys=True).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    end = date.fromisoformat(spec['end'])
+    closed = _midnight(end + timedelta(days=1)) <= timezone.now() - timedelta(seconds=settings.ANALYTICS_ROLLUP_LAG_SECONDS)
+
+    def compute():
+        source = SOURCES[spec['source']]
+        buckets = _bucket_labels(date.fromisoformat(spec['start']), end, spec['interval'])
+        engine_name = engine()
+        query = _query_sql if engine_name == 'sql' else _query_numpy
+        values, present = query(source, spec, scope, buckets)
+        return _format(spec, buckets, values, present, engine_name)
+
+    return timeseries_cache.get_or_set(
+        f'timeseries:result:{digest}', compute, timeout=SOURCES[spec['source']].timeout(closed),
+    )
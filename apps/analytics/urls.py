@@ -9,6 +9,8 @@ urlpatterns = [
     # User Behavior Tracking URLs
     path('behavior/', views.UserBehaviorTrackingListCreateView.as_view(), name='user-behavior-list-create'),
     path('behavior/track/', views.track_user_behavior, name='track-user-behavior'),
+    path('behavior/batch/', views.ingest_behavior_events, name='ingest-behavior-events'),
+    path('behavior/archive/', views.archived_behavior_events, name='archived-behavior-events'),
     
     # Learning Analytics URLs
     path('learning/', views.LearningAnalyticsListView.as_view(), name='learning-analytics-list'),
@@ -17,6 +19,10 @@ urlpatterns = [
     # Dashboard Widgets URLs
     path('widgets/', views.DashboardWidgetListCreateView.as_view(), name='dashboard-widget-list-create'),
     path('widgets/<uuid:pk>/', views.DashboardWidgetDetailView.as_view(), name='dashboard-widget-detail'),
+    path('widgets/<uuid:pk>/data/', views.get_widget_data, name='dashboard-widget-data'),
+    
+    # Time Series URLs
+    path('timeseries/', views.query_timeseries, name='analytics-timeseries'),
     
     # Analytics Summary URLs
     path('summary/', views.get_user_analytics_summary, name='user-analytics-summary'),
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
@@ -9,8 +10,11 @@ from apps.analytics.serializers import (
     AnalyticsReportSerializer, UserBehaviorTrackingSerializer, 
     LearningAnalyticsSerializer, DashboardWidgetSerializer
 )
-from apps.courses.models import Course, Lesson
-from apps.users.models import User
+from apps.analytics import archive, snapshots, timeseries
+from apps.analytics.ingest import IngestError, get_ingest_buffer, parse_events, validate_event
+from apps.analytics.partitions import parse_month
+from apps.courses.models import Course
+from apps.core.pagination import SignedCursorPagination
 
 
 class AnalyticsReportListCreateView(generics.ListCreateAPIView):
@@ -44,6 +48,8 @@ class UserBehaviorTrackingListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = UserBehaviorTrackingSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SignedCursorPagination
+    cursor_ordering = '-timestamp'
 
     def get_queryset(self):
         return UserBehaviorTracking.objects.filter(user=self.request.user)
@@ -68,6 +74,79 @@ def track_user_behavior(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ingest_behavior_events(request):
+    """
+    Track a batch of user behavior events.
+
+    Accepts a JSON array (or ``{"events": [...]}``) or newline-delimited
+    JSON. Valid events are queued and written in bulk; invalid ones are
+    reported by their index and dropped.
+    """
+    try:
+        events = parse_events(request.body, request.content_type or '')
+    except IngestError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows, rejected = [], []
+    for index, event in enumerate(events):
+        row, errors = validate_event(event, request.user.pk)
+        if errors:
+            rejected.append({'index': index, 'errors': errors})
+        else:
+            rows.append(row)
+
+    if not get_ingest_buffer().offer(rows):
+        response = Response(
+            {'error': 'Event buffer is full, retry later.'},
+            status=status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        response['Retry-After'] = str(settings.ANALYTICS_INGEST_RETRY_AFTER)
+        return response
+
+    return Response({
+        'accepted': len(rows),
+        'rejected': rejected,
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def archived_behavior_events(request):
+    """
+    List archived months, or a user's archived events of one month (?month=YYYY-MM).
+
+    Staff may read another user's events with ?user=<id>.
+    """
+    months = archive.load_manifest()['months']
+    if 'month' not in request.query_params:
+        return Response({
+            'months': [
+                {'month': month, 'rows': entry['rows'], 'archived_at': entry['archived_at']}
+                for month, entry in sorted(months.items())
+            ]
+        }, status=status.HTTP_200_OK)
+
+    try:
+        month = parse_month(request.query_params['month'])
+    except ValueError:
+        return Response({'error': 'month must be formatted YYYY-MM.'}, status=status.HTTP_400_BAD_REQUEST)
+    if f'{month:%Y-%m}' not in months:
+        return Response({'error': 'This month is not archived.'}, status=status.HTTP_404_NOT_FOUND)
+
+    user_id = request.user.pk
+    if request.query_params.get('user') and (request.user.is_staff or request.user.is_superuser):
+        user_id = request.query_params['user']
+    results = list(archive.read_month(month, user_id=user_id))
+    results.sort(key=lambda row: row['timestamp'], reverse=True)
+    return Response({
+        'month': f'{month:%Y-%m}',
+        'count': len(results),
+        'results': results,
+    }, status=status.HTTP_200_OK)
+
+
 class LearningAnalyticsListView(generics.ListAPIView):
     """
     List learning analytics for the user.
@@ -115,6 +194,44 @@ class DashboardWidgetDetailView(generics.RetrieveUpdateDestroyAPIView):
         return DashboardWidget.objects.filter(owner=self.request.user)
 
 
+def _timeseries_response(request, spec):
+    scope = None if (request.user.is_staff or request.user.is_superuser) else request.user.pk
+    try:
+        return Response(timeseries.run_query(spec, scope=scope), status=status.HTTP_200_OK)
+    except timeseries.QueryError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def query_timeseries(request):
+    """
+    Answer a bucketed time-series query (see ``apps.analytics.timeseries``).
+
+    Staff query every user's rows, everyone else only their own.
+    """
+    return _timeseries_response(request, request.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_widget_data(request, pk):
+    """
+    Get the time series of a dashboard widget.
+
+    The query is the widget's ``configuration['query']``; its source
+    defaults to the widget's ``data_source``.
+    """
+    widget = get_object_or_404(DashboardWidget, pk=pk, owner=request.user)
+    spec = widget.configuration.get('query')
+    if not isinstance(spec, dict):
+        return Response(
+            {'error': 'This widget has no query configured.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return _timeseries_response(request, {'source': widget.data_source, **spec})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_analytics_summary(request):
@@ -123,8 +240,10 @@ def get_user_analytics_summary(request):
     """
     user = request.user
     
-    # Get user's learning analytics
-    learning_analytics = LearningAnalytics.objects.filter(user=user)
+    # Get user's learning analytics, one rolled-up row per course
+    learning_analytics = LearningAnalytics.objects.filter(
+        user=user, course__isnull=False, lesson__isnull=True, quiz__isnull=True
+    )
     
     # Calculate overall metrics
     total_courses = learning_analytics.values('course').distinct().count()
@@ -146,7 +265,7 @@ def get_user_analytics_summary(request):
     ).order_by('-timestamp')[:10]
     
     # Get user's enrolled courses
-    enrolled_courses = Course.objects.filter(enrollments__user=user)
+    enrolled_courses = Course.objects.filter(enrollments__student=user)
     
     return Response({
         'summary': {
@@ -166,16 +285,19 @@ def get_user_analytics_summary(request):
                 'completion_rate': la.course_completion_rate,
                 'performance': la.performance_score
             }
-            for la in learning_analytics.filter(course__isnull=False)[:5]
+            for la in learning_analytics.select_related('course')[:5]
         ]
     }, status=status.HTTP_200_OK)
 
 
-@api_view(['GET'])
+@api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def get_platform_analytics(request):
     """
     Get platform-wide analytics for instructors/admins.
+
+    Serves the latest scheduled snapshot plus the rows created since it was
+    taken. POST takes a fresh snapshot first; concurrent refreshes share one.
     """
     if not (request.user.is_staff or request.user.is_superuser):
         return Response(
@@ -183,30 +305,25 @@ def get_platform_analytics(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    # Get platform metrics
-    total_users = User.objects.count()
-    total_courses = Course.objects.count()
-    total_lessons = Lesson.objects.count()
-    
-    # Get engagement metrics
-    total_learning_time = LearningAnalytics.objects.aggregate(
-        total_time=Sum('time_spent_seconds')
-    )['total_time'] or 0
-    
-    avg_completion_rate = LearningAnalytics.objects.aggregate(
-        avg_completion=Avg('course_completion_rate')
-    )['avg_completion'] or 0.0
+    snapshot = snapshots.latest()
+    refreshing = False
+    if request.method == 'POST' or snapshot is None:
+        snapshot, refreshed = snapshots.refresh()
+        refreshing = not refreshed
+    if snapshot is None:
+        return Response(
+            {'error': 'Platform analytics are being computed, retry later.'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     
     # Get recent user activity
     recent_activities = UserBehaviorTracking.objects.order_by('-timestamp')[:20]
     
     return Response({
-        'platform_metrics': {
-            'total_users': total_users,
-            'total_courses': total_courses,
-            'total_lessons': total_lessons,
-            'total_learning_hours': total_learning_time / 3600,  # Convert to hours
-            'average_completion_rate': avg_completion_rate,
-        },
+        'as_of': snapshot.as_of,
+        'refreshing': refreshing,
+        'platform_metrics': snapshot.metrics,
+        'delta': snapshots.delta(snapshot),
+        'series': snapshot.series,
         'recent_activities': UserBehaviorTrackingSerializer(recent_activities, many=True).data
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    }, status=status.HTTP_200_OK)
@@ -3,7 +3,7 @@ Admin configuration for certificates app.
 """
 
 from django.contrib import admin
-from .models import Certificate
+from .models import Certificate, CertificateTemplate
 
 
 @admin.register(Certificate)
@@ -12,3 +12,11 @@ class CertificateAdmin(admin.ModelAdmin):
     list_filter = ['completion_date', 'created_at']
     search_fields = ['certificate_id', 'student_name', 'course_name', 'student__username']
     readonly_fields = ['certificate_id', 'student_name', 'course_name', 'instructor_name', 'completion_date', 'verification_url', 'created_at']
+
+
+@admin.register(CertificateTemplate)
+class CertificateTemplateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'instructor', 'course', 'is_active', 'updated_at']
+    list_filter = ['is_active', 'updated_at']
+    search_fields = ['name', 'instructor__username', 'course__title']
+    raw_id_fields = ['instructor', 'course']
@@ -0,0 +1,423 @@
+"""
+Certificate layouts compiled to PDF.
+
+A layout is a page size and a list of elements (``rect``, ``line`` and
+``text``) in JSON. Text may contain fields such as ``{student_name}``.
+``compile_layout`` splits a layout once into:
+
+* a static layer: every element that does not depend on a field, drawn
+  into a PDF form XObject and serialized, together with the catalog, page
+  and font objects, as a constant document prefix;
+* the variable text elements.
+
+``CompiledLayout.render(fields)`` then only lays out the variable text,
+wrapping it to its box with the font metrics (shrinking it down to
+``min_size`` before cutting it off), and appends one small content stream
+and the cross-reference table. Nothing is redrawn and no font is resolved
+per certificate.
+
+Only the standard PDF fonts are supported: they need no embedding, and
+text is encoded as WinAnsi (characters outside it print as '?').
+
+Elements (coordinates in points; negative ``x`` values count from the
+right edge, ``top`` from the top edge instead of ``y`` from the bottom):
+
+``rect``
+    ``inset`` from every page edge, or ``x``, ``y``, ``width``, ``height``;
+    ``stroke`` and/or ``fill`` colors, ``line_width``.
+``line``
+    ``x1`` and ``x2``, or a ``length`` centered on ``x`` (default: page
+    center); ``y`` or ``top``; ``stroke``, ``line_width``.
+``text``
+    ``text``, ``font``, ``size``, ``color``, ``align`` (left, center,
+    right) at ``x`` (default: page center, or the margin), ``y`` or
+    ``top`` of the first baseline, or ``after: {id, gap}`` to sit ``gap``
+    points below the last line of the text element with that ``id``;
+    ``width`` of the wrapping box, ``max_lines``, ``leading``,
+    ``min_size``; ``underline: {offset, color, line_width}``.
+"""
+
+import zlib
+from string import Formatter
+
+from reportlab.lib.pagesizes import A4, LETTER
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+FIELDS = ('student_name', 'course_name', 'instructor_name', 'completion_date', 'certificate_id', 'verification_url')
+
+PAGE_SIZES = {'A4': A4, 'letter': LETTER}
+
+STANDARD_FONTS = (
+    'Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique', 'Helvetica-BoldOblique',
+    'Times-Roman', 'Times-Bold', 'Times-Italic', 'Times-BoldItalic',
+    'Courier', 'Courier-Bold', 'Courier-Oblique', 'Courier-BoldOblique',
+)
+
+MARGIN = 70
+MAX_FONT_SIZE = 200
+MAX_LINES = 20
+ELLIPSIS = '…'.encode('cp1252')
+
+DEFAULT_LAYOUT = {
+    'page_size': 'A4',
+    'elements': [
+        {'type': 'rect', 'inset': 30, 'stroke': '#1e40af', 'line_width': 3},
+        {'type': 'rect', 'inset': 40, 'stroke': '#d97706', 'line_width': 1},
+        {'type': 'text', 'text': 'CERTIFICATE', 'font': 'Helvetica-Bold', 'size': 48, 'color': '#1e40af', 'top': 120},
+        {'type': 'text', 'text': 'OF COMPLETION', 'font': 'Helvetica', 'size': 24, 'top': 160},
+        {'type': 'line', 'x1': 150, 'x2': -150, 'top': 180, 'stroke': '#d97706', 'line_width': 2},
+        {'type': 'text', 'text': 'This is to certify that', 'font': 'Helvetica', 'size': 14, 'color': '#808080', 'top': 230},
+        {
+            'type': 'text', 'text': '{student_name}', 'font': 'Helvetica-Bold', 'size': 32, 'color': '#1e40af',
+            'top': 280, 'min_size': 20, 'underline': {'offset': 10, 'color': '#d97706', 'line_width': 1},
+        },
+        {
+            'type': 'text', 'text': 'has successfully completed the course', 'font': 'Helvetica', 'size': 14,
+            'color': '#808080', 'top': 330,
+        },
+        {
+            'type': 'text', 'id': 'course', 'text': '{course_name}', 'font': 'Helvetica-Bold', 'size': 24,
+            'top': 380, 'max_lines': 2, 'leading': 30, 'min_size': 16,
+        },
+        {
+            'type': 'text', 'text': 'Completed on {completion_date}', 'font': 'Helvetica', 'size': 12,
+            'color': '#808080', 'after': {'id': 'course', 'gap': 60},
+        },
+        {
+            'type': 'text', 'text': 'Certificate ID: {certificate_id}', 'font': 'Helvetica', 'size': 10,
+            'color': '#808080', 'after': {'id': 'course', 'gap': 90},
+        },
+        {'type': 'text', 'text': '{instructor_name}', 'font': 'Helvetica-Bold', 'size': 14, 'y': 150},
+        {'type': 'line', 'length': 200, 'y': 145, 'line_width': 1},
+        {'type': 'text', 'text': 'Course Instructor', 'font': 'Helvetica', 'size': 10, 'color': '#808080', 'y': 130},
+        {'type': 'text', 'text': 'E-Learning Platform', 'font': 'Helvetica', 'size': 8, 'color': '#808080', 'y': 80},
+        {'type': 'text', 'text': 'Verify at: {verification_url}', 'font': 'Helvetica', 'size': 8, 'color': '#808080', 'y': 65},
+    ],
+}
+
+
+class LayoutError(ValueError):
+    """The layout cannot be compiled."""
+
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.')
+
+
+def _color(value, operator):
+    value = (value or '#000000').lstrip('#')
+    if len(value) != 6:
+        raise LayoutError(f'Colors must be #rrggbb, not {value!r}')
+    try:
+        red, green, blue = (int(value[start:start + 2], 16) / 255 for start in (0, 2, 4))
+    except ValueError:
+        raise LayoutError(f'Colors must be #rrggbb, not {value!r}')
+    return f'{red:.3f} {green:.3f} {blue:.3f} {operator}'
+
+
+_widths = {}
+
+
+def _width_table(font):
+    """Glyph widths of ``font`` at size 1, indexed by WinAnsi code."""
+    table = _widths.get(font)
+    if table is None:
+        table = [stringWidth(bytes([code]).decode('cp1252', 'replace'), font, 1) for code in range(256)]
+        _widths[font] = table
+    return table
+
+
+def _measure(encoded, table):
+    """Width of WinAnsi text at size 1; glyph widths simply add up, as no kerning is applied."""
+    return sum(map(table.__getitem__, encoded))
+
+
+def _break(widths, space, limit):
+    """Greedily break words of the given widths into lines; return (first, last + 1, width) per line."""
+    lines, start, width = [], 0, 0.0
+    for index, word in enumerate(widths):
+        if index > start and width + space + word > limit:
+            lines.append((start, index, width))
+            start, width = index, word
+        else:
+            width += (space if index > start else 0) + word
+    lines.append((start, len(widths), width))
+    return lines
+
+
+def fit(text, font, size, min_size, width, max_lines):
+    """
+    Wrap ``text`` into at most ``max_lines`` lines no wider than ``width``,
+    shrinking it a point at a time down to ``min_size``.
+
+    Lines are broken at spaces; text that still does not fit is cut off
+    with an ellipsis.
+
+    Returns:
+        tuple: (lines encoded as WinAnsi, font size)
+    """
+    table = _width_table(font)
+    words = text.encode('cp1252', 'replace').split()
+    widths = [_measure(word, table) for word in words]
+    while True:
+        lines = _break(widths, table[32], width / size)
+        if len(lines) <= max_lines and all(line_width * size <= width for _, _, line_width in lines):
+            break
+        if size - 1 < min_size:
+            break
+        size -= 1
+
+    overflow = len(lines) > max_lines
+    lines = [b' '.join(words[start:stop]) for start, stop, _ in lines[:max_lines]]
+    return [
+        _cut(line, table, width / size, overflow and position == len(lines) - 1)
+        for position, line in enumerate(lines)
+    ], size
+
+
+def _cut(line, table, limit, force):
+    """End ``line`` with an ellipsis where it is wider than ``limit``, or when ``force`` is set."""
+    if not force and _measure(line, table) <= limit:
+        return line
+    while line and _measure(line, table) + table[ELLIPSIS[0]] > limit:
+        line = line[:-1]
+    return line.rstrip() + ELLIPSIS
+
+
+class _Text:
+    """A text element with its geometry resolved against the page."""
+
+    def __init__(self, spec, page_width, page_height, fonts):
+        self.id = spec.get('id')
+        self.template = str(spec.get('text', ''))
+        parsed = [(name, conversion, format_spec) for _, name, format_spec, conversion in Formatter().parse(self.template)]
+        self.fields = {name for name, _, _ in parsed if name is not None}
+        unknown = self.fields - set(FIELDS)
+        if unknown:
+            raise LayoutError(f'Unknown fields: {", ".join(sorted(unknown))}')
+        if any(conversion or format_spec for _, conversion, format_spec in parsed):
+            raise LayoutError('Fields take no conversions or format specs')
+        self.font = spec.get('font', 'Helvetica')
+        if self.font not in STANDARD_FONTS:
+            raise LayoutError(f'Unsupported font {self.font!r}')
+        self.font_name = fonts.setdefault(self.font, f'F{len(fonts) + 1}')
+        self.size = float(spec.get('size', 12))
+        self.min_size = min(float(spec.get('min_size', self.size)), self.size)
+        if not 1 <= self.min_size <= self.size <= MAX_FONT_SIZE:
+            raise LayoutError(f'Font sizes must be between 1 and {MAX_FONT_SIZE}')
+        self.leading = float(spec.get('leading', self.size * 1.25))
+        self.max_lines = min(max(1, int(spec.get('max_lines', 1))), MAX_LINES)
+        self.color = _color(spec.get('color'), 'rg')
+        self.align = spec.get('align', 'center')
+        if self.align not in ('left', 'center', 'right'):
+            raise LayoutError(f'Unknown alignment {self.align!r}')
+        default_x = {'left': MARGIN, 'center': page_width / 2, 'right': page_width - MARGIN}[self.align]
+        self.x = _x(spec.get('x', default_x), page_width)
+        self.width = float(spec.get('width', page_width - 2 * MARGIN))
+        self.after = spec.get('after')
+        self.y = None if self.after else _y(spec, page_height)
+        underline = spec.get('underline')
+        if underline:
+            self.underline = (
+                float(underline.get('offset', 3)), _color(underline.get('color'), 'RG'),
+                float(underline.get('line_width', 1)),
+            )
+        else:
+            self.underline = None
+
+    def draw(self, fields, bottoms):
+        """Return the operators drawing this element, recording its last baseline in ``bottoms``."""
+        if self.after:
+            try:
+                y = bottoms[self.after['id']] - float(self.after.get('gap', self.leading))
+            except KeyError:
+                raise LayoutError(f'Text placed after unknown element {self.after.get("id")!r}')
+        else:
+            y = self.y
+        text = self.template.format_map(fields) if self.fields else self.template
+        lines, size = fit(text, self.font, self.size, self.min_size, self.width, self.max_lines)
+        leading = self.leading * size / self.size
+        table = _width_table(self.font)
+
+        operators = []
+        for line in lines:
+            line_width = _measure(line, table) * size
+            left = {'left': self.x, 'center': self.x - line_width / 2, 'right': self.x - line_width}[self.align]
+            operators.append(
+                f'BT /{self.font_name} {_number(size)} Tf {self.color} '
+                f'1 0 0 1 {_number(left)} {_number(y)} Tm <{line.hex()}> Tj ET'
+            )
+            if self.underline:
+                offset, color, width = self.underline
+                operators.append(
+                    f'{color} {_number(width)} w {_number(left)} {_number(y - offset)} m '
+                    f'{_number(left + line_width)} {_number(y - offset)} l S'
+                )
+            y -= leading
+        if self.id:
+            bottoms[self.id] = y + leading
+        return operators
+
+
+def _x(value, page_width):
+    value = float(value)
+    return page_width + value if value < 0 else value
+
+
+def _y(spec, page_height):
+    if 'top' in spec:
+        return page_height - float(spec['top'])
+    if 'y' in spec:
+        return float(spec['y'])
+    raise LayoutError(f'{spec.get("type")} element needs y or top')
+
+
+def _shape(spec, page_width, page_height):
+    """Return the operators drawing a rect or line element."""
+    operators = ['q']
+    if spec.get('stroke') or spec['type'] == 'line':
+        operators.append(_color(spec.get('stroke'), 'RG'))
+    if spec.get('fill'):
+        operators.append(_color(spec['fill'], 'rg'))
+    operators.append(f'{_number(float(spec.get("line_width", 1)))} w')
+
+    if spec['type'] == 'rect':
+        if 'inset' in spec:
+            inset = float(spec['inset'])
+            x, y, width, height = inset, inset, page_width - 2 * inset, page_height - 2 * inset
+        else:
+            try:
+                x, y = _x(spec['x'], page_width), _y(spec, page_height)
+                width, height = float(spec['width']), float(spec['height'])
+            except KeyError as error:
+                raise LayoutError(f'rect element needs {error.args[0]}')
+        paint = {(True, False): 'S', (False, True): 'f', (True, True): 'B'}.get(
+            (bool(spec.get('stroke')), bool(spec.get('fill'))), 'S'
+        )
+        operators.append(f'{_number(x)} {_number(y)} {_number(width)} {_number(height)} re {paint}')
+    else:
+        y = _y(spec, page_height)
+        if 'length' in spec:
+            center = _x(spec.get('x', page_width / 2), page_width)
+            x1, x2 = center - float(spec['length']) / 2, center + float(spec['length']) / 2
+        else:
+            try:
+                x1, x2 = _x(spec['x1'], page_width), _x(spec['x2'], page_width)
+            except KeyError as error:
+                raise LayoutError(f'line element needs {error.args[0]} or length')
+        operators.append(f'{_number(x1)} {_number(y)} m {_number(x2)} {_number(y)} l S')
+    operators.append('Q')
+    return operators
+
+
+class CompiledLayout:
+    """A layout ready to stamp certificates with."""
+
+    def __init__(self, prefix, xref, content_number, variable, static_bottoms):
+        self.prefix = prefix
+        self.xref = xref
+        self.content_number = content_number
+        self.variable = variable
+        self.static_bottoms = static_bottoms
+
+    def render(self, fields):
+        """
+        Render one certificate.
+
+        Args:
+            fields: Values for every name in ``FIELDS``
+
+        Returns:
+            bytes: PDF document
+        """
+        # Variable text placed after static text starts from where that text ended
+        bottoms = dict(self.static_bottoms)
+        operators = ['q 1 0 0 1 0 0 cm /Static Do Q']
+        for element in self.variable:
+            operators.extend(element.draw(fields, bottoms))
+        content = '\n'.join(operators).encode('latin-1')
+        stream = b'%d 0 obj\n<< /Length %d >>\nstream\n%s\nendstream\nendobj\n' % (
+            self.content_number, len(content), content
+        )
+        startxref = len(self.prefix) + len(stream)
+        return b''.join((
+            self.prefix, stream, self.xref,
+            b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self.content_number + 1, startxref),
+        ))
+
+
+def compile_layout(layout):
+    """
+    Compile a layout (see the module docstring).
+
+    Raises:
+        LayoutError: The layout is invalid
+
+    Returns:
+        CompiledLayout
+    """
+    if not isinstance(layout, dict) or not isinstance(layout.get('elements'), list):
+        raise LayoutError('A layout needs a list of elements')
+    try:
+        page_width, page_height = PAGE_SIZES[layout.get('page_size', 'A4')]
+    except KeyError:
+        raise LayoutError(f'Unknown page size {layout.get("page_size")!r}')
+
+    fonts = {}
+    static, variable, variable_ids, static_bottoms = [], [], set(), {}
+    for position, spec in enumerate(layout['elements']):
+        if not isinstance(spec, dict):
+            raise LayoutError('Elements must be objects')
+        kind = spec.get('type')
+        try:
+            if kind in ('rect', 'line'):
+                static.extend(_shape(spec, page_width, page_height))
+            elif kind == 'text':
+                element = _Text(spec, page_width, page_height, fonts)
+                anchor = element.after.get('id') if element.after else None
+                if element.fields or anchor in variable_ids:
+                    if anchor is not None and anchor not in variable_ids and anchor not in static_bottoms:
+                        raise LayoutError(f'Text placed after unknown element {anchor!r}')
+                    variable.append(element)
+                    if element.id:
+                        variable_ids.add(element.id)
+                else:
+                    static.extend(element.draw({}, static_bottoms))
+            else:
+                raise LayoutError(f'Unknown element type {kind!r}')
+        except LayoutError as error:
+            raise LayoutError(f'Element {position}: {error}')
+        except (AttributeError, TypeError, ValueError) as error:
+            raise LayoutError(f'Element {position}: invalid value ({error})')
+
+    font_resources = ' '.join(f'/{name} {5 + index} 0 R' for index, name in enumerate(fonts.values()))
+    form = zlib.compress('\n'.join(static).encode('latin-1'))
+    box = f'0 0 {_number(page_width)} {_number(page_height)}'
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [{box}] '
+            f'/Resources << /Font << {font_resources} >> /XObject << /Static 4 0 R >> >> '
+            f'/Contents {5 + len(fonts)} 0 R >>'
+        ).encode(),
+        (
+            f'<< /Type /XObject /Subtype /Form /BBox [{box}] /Resources << /Font << {font_resources} >> >> '
+            f'/Filter /FlateDecode /Length {len(form)} >>\nstream\n'
+        ).encode() + form + b'\nendstream',
+    ] + [
+        f'<< /Type /Font /Subtype /Type1 /BaseFont /{font} /Encoding /WinAnsiEncoding >>'.encode()
+        for font in fonts
+    ]
+
+    prefix = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(prefix))
+        prefix += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    content_number = len(objects) + 1
+    offsets.append(len(prefix))
+    xref = b'xref\n0 %d\n0000000000 65535 f \n%s' % (
+        content_number + 1, b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    )
+    return CompiledLayout(bytes(prefix), xref, content_number, variable, static_bottoms)
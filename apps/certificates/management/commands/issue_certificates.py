@@ -0,0 +1,26 @@
+"""
+Django management command to issue certificates to a course cohort.
+"""
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from apps.certificates.rendering import issue_for_course
+from apps.courses.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Issues certificates to every learner who completed a course; PDFs are rendered by render_certificates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', help='Course id or slug')
+
+    def handle(self, *args, **options):
+        course = Course.objects.select_related('instructor').filter(slug=options['course']).first()
+        if course is None:
+            try:
+                course = Course.objects.select_related('instructor').get(pk=options['course'])
+            except (Course.DoesNotExist, ValueError, ValidationError):
+                raise CommandError(f'Course {options["course"]} not found')
+
+        issued = issue_for_course(course)
+        self.stdout.write(self.style.SUCCESS(f'Issued {issued} certificates for "{course.title}"'))
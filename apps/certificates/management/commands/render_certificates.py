@@ -0,0 +1,63 @@
+"""
+Django management command to render queued certificate PDFs.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.certificates import rendering
+
+
+class Command(BaseCommand):
+    help = 'Renders pending certificate PDFs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.CERTIFICATES_RENDER_WORKERS or os.cpu_count(),
+            help='Rendering processes (defaults to one per core)',
+        )
+        parser.add_argument('--batch-size', type=int, default=0, help='Certificates claimed per batch (default: 4 per worker)')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new certificates instead of exiting once the queue is drained',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        batch_size = options['batch_size'] or workers * 4
+        stop = threading.Event()
+        rendered = 0
+        started = time.monotonic()
+
+        # Workers only draw PDFs; spawning keeps the parent's database connections out of them
+        context = multiprocessing.get_context('spawn')
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                try:
+                    claimed = rendering.process_batch(batch_size, pool=pool)
+                except BrokenExecutor:
+                    self.stderr.write('A rendering process died; starting a new pool')
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                    continue
+                rendered += claimed
+                if not claimed:
+                    if not options['loop']:
+                        break
+                    stop.wait(settings.CERTIFICATES_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            stop.set()
+        finally:
+            pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {rendered} certificates with {workers} workers in {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.14 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+def mark_rendered(apps, schema_editor):
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Certificate.objects.exclude(pdf_file='').exclude(pdf_file__isnull=True).update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certificate',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('rendering', 'Rendering'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='available_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='certificate',
+            name='rendered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(fields=['status', 'available_at'], name='certificate_status_c80bc2_idx'),
+        ),
+        migrations.RunPython(mark_rendered, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-16 22:47
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0004_render_queue'),
+        ('courses', '0004_created_at_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CertificateTemplate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('layout', models.JSONField(default=dict)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='certificate_templates', to='courses.course')),
+                ('instructor', models.ForeignKey(blank=True, limit_choices_to={'role': 'instructor'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='certificate_templates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'certificate_templates',
+                'ordering': ['-updated_at'],
+                'indexes': [models.Index(fields=['course'], name='certificate_course__9f6c31_idx'), models.Index(fields=['instructor'], name='certificate_instruc_f87705_idx')],
+            },
+        ),
+    ]
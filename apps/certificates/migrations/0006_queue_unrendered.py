@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-17 11:20
+
+from django.db import migrations
+from django.utils import timezone
+
+
+def queue_unrendered(apps, schema_editor):
+    # Certificates without a PDF were left pending by 0004 with no available_at, which claim() never picks up
+    Certificate = apps.get_model('certificates', 'Certificate')
+    Certificate.objects.filter(status='pending', available_at__isnull=True).update(available_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('certificates', '0005_certificate_templates'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_unrendered, migrations.RunPython.noop),
+    ]
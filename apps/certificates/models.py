@@ -2,15 +2,111 @@
 Certificate model for course completion.
 """
 
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
 from apps.users.models import User
 from apps.courses.models import Course
+from .layouts import LayoutError, compile_layout
 import uuid
 
 
+class CertificateTemplateQuerySet(models.QuerySet):
+    """Custom queryset for certificate templates."""
+    
+    def for_courses(self, course_ids):
+        """
+        Pick the template of each course: its own, else its instructor's, else the platform's.
+        
+        Returns:
+            dict: course id -> active CertificateTemplate, or None for the built-in layout
+        """
+        instructors = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'instructor_id'))
+        candidates = self.filter(is_active=True).filter(
+            Q(course_id__in=course_ids)
+            | Q(course__isnull=True, instructor_id__in=set(instructors.values()))
+            | Q(course__isnull=True, instructor__isnull=True)
+        ).order_by('-updated_at')
+        
+        by_course, by_instructor, platform = {}, {}, None
+        for template in candidates:
+            if template.course_id:
+                by_course.setdefault(template.course_id, template)
+            elif template.instructor_id:
+                by_instructor.setdefault(template.instructor_id, template)
+            elif platform is None:
+                platform = template
+        return {
+            course_id: by_course.get(course_id) or by_instructor.get(instructors.get(course_id)) or platform
+            for course_id in course_ids
+        }
+
+
+class CertificateTemplate(models.Model):
+    """Layout certificates are drawn with (see apps.certificates.layouts)."""
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    name = models.CharField(max_length=200)
+    
+    # Scope: a course, all courses of an instructor (no course), or the whole platform (neither)
+    instructor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='certificate_templates',
+        null=True,
+        blank=True,
+        limit_choices_to={'role': 'instructor'}
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='certificate_templates',
+        null=True,
+        blank=True
+    )
+    
+    layout = models.JSONField(default=dict)
+    is_active = models.BooleanField(default=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = CertificateTemplateQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'certificate_templates'
+        ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['course']),
+            models.Index(fields=['instructor']),
+        ]
+    
+    def clean(self):
+        try:
+            compile_layout(self.layout)
+        except LayoutError as error:
+            raise ValidationError({'layout': str(error)})
+    
+    @property
+    def layout_key(self):
+        """Identifies this version of the layout, for caching its compiled form."""
+        return f"{self.pk}:{self.updated_at.timestamp()}"
+    
+    def __str__(self):
+        return self.name
+
+
 class Certificate(models.Model):
     """Certificate awarded upon course completion."""
     
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('rendering', 'Rendering'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     student = models.ForeignKey(
         User, 
@@ -27,8 +123,15 @@ class Certificate(models.Model):
     instructor_name = models.CharField(max_length=200)
     completion_date = models.DateField(auto_now_add=True)
     
-    # PDF file
+    # PDF file, rendered in the background by apps.certificates.rendering
     pdf_file = models.FileField(upload_to='certificates/', blank=True, null=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    rendered_at = models.DateTimeField(null=True, blank=True)
     
     # Verification
     verification_url = models.URLField(blank=True)
@@ -43,9 +146,11 @@ class Certificate(models.Model):
         indexes = [
             models.Index(fields=['certificate_id']),
             models.Index(fields=['student', 'course']),
+            models.Index(fields=['status', 'available_at']),
         ]
     
-    def save(self, *args, **kwargs):
+    def fill_details(self):
+        """Set the certificate id and the names printed on it, where not set yet."""
         if not self.certificate_id:
             # Generate unique certificate ID
             import random
@@ -63,7 +168,9 @@ class Certificate(models.Model):
         if not self.instructor_name:
             instructor = self.course.instructor
             self.instructor_name = f"{instructor.first_name} {instructor.last_name}".strip() or instructor.username
-        
+    
+    def save(self, *args, **kwargs):
+        self.fill_details()
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -0,0 +1,206 @@
+"""
+Background rendering of certificate PDFs.
+
+Issuing a certificate only creates its row; ``enqueue`` marks it
+``pending``. ``manage.py render_certificates`` claims pending certificates
+in batches and draws them in a process pool, so a graduating cohort is
+rendered on every core of a worker host instead of inside web requests.
+Each certificate is drawn with its course's ``CertificateTemplate``.
+Storing the PDF moves the certificate to ``ready``, which publishes
+``certificate.ready`` and notifies the student.
+
+Claims take a lease like the event outbox (``apps.events.bus``): a
+certificate left in ``rendering`` by a crashed worker is claimed again once
+its lease runs out. Failed renders are retried with exponential backoff up
+to ``CERTIFICATES_MAX_ATTEMPTS`` and then left ``failed``; requesting the
+certificate again re-queues it.
+
+With ``CERTIFICATES_ASYNC = False`` (the default when ``EVENTS_ASYNC`` is
+off) certificates are rendered in-process right after the issuing
+transaction commits, in the request thread, for setups without a worker.
+"""
+
+import logging
+import traceback
+import uuid
+from concurrent.futures import BrokenExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apps.enrollment.models import Enrollment
+from apps.quizzes.models import Attempt, Quiz
+
+from .models import Certificate, CertificateTemplate
+from .services import certificate_context, render_certificate_pdf, verification_url
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the certificate while it was being rendered."""
+
+
+def enqueue(certificate):
+    """Queue a certificate for rendering, as part of the current transaction."""
+    certificate.status = 'pending'
+    certificate.attempts = 0
+    certificate.available_at = timezone.now()
+    certificate.claimed_by = ''
+    certificate.locked_until = None
+    certificate.last_error = ''
+    certificate.save(update_fields=['status', 'attempts', 'available_at', 'claimed_by', 'locked_until', 'last_error'])
+
+    if not settings.CERTIFICATES_ASYNC:
+        pk = certificate.pk
+        transaction.on_commit(lambda: process_batch(1, extra=Q(pk=pk)), robust=True)
+
+
+def claim(batch_size, extra=None):
+    """
+    Claim due certificates for this worker.
+
+    Pending certificates without ``available_at`` (created without
+    ``enqueue``) are due right away.
+
+    Returns:
+        list: Claimed ``Certificate`` rows
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = (
+        Q(status='pending', available_at__lte=now)
+        | Q(status='pending', available_at__isnull=True)
+        | Q(status='rendering', locked_until__lt=now)
+    )
+    if extra is not None:
+        due &= extra
+
+    with transaction.atomic():
+        candidates = list(
+            Certificate.objects.filter(due)
+            .order_by(F('available_at').asc(nulls_first=True))
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not candidates:
+            return []
+        # Re-checking ``due`` keeps concurrent claimers apart where rows cannot be locked
+        Certificate.objects.filter(due, id__in=candidates).update(
+            status='rendering',
+            claimed_by=token,
+            locked_until=now + timedelta(seconds=settings.CERTIFICATES_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+        )
+    return list(
+        Certificate.objects.filter(claimed_by=token, status='rendering')
+        .order_by(F('available_at').asc(nulls_first=True))
+    )
+
+
+def _store(certificate, pdf):
+    """Save a rendered PDF and mark the certificate ready, if it is still ours."""
+    name = f'certificate_{certificate.certificate_id}.pdf'
+    with transaction.atomic():
+        locked = Certificate.objects.select_for_update().filter(
+            pk=certificate.pk, claimed_by=certificate.claimed_by, status='rendering'
+        ).first()
+        if locked is None:
+            raise LeaseLost(certificate.pk)
+        locked.pdf_file.save(name, ContentFile(pdf), save=False)
+        locked.status = 'ready'
+        locked.verification_url = verification_url(locked)
+        locked.rendered_at = timezone.now()
+        locked.claimed_by = ''
+        locked.locked_until = None
+        locked.last_error = ''
+        locked.save(update_fields=[
+            'pdf_file', 'status', 'verification_url', 'rendered_at', 'claimed_by', 'locked_until', 'last_error',
+        ])
+
+
+def _fail(certificate):
+    give_up = certificate.attempts >= settings.CERTIFICATES_MAX_ATTEMPTS
+    delay = min(settings.CERTIFICATES_RETRY_BASE_SECONDS * 2 ** (certificate.attempts - 1), 3600)
+    Certificate.objects.filter(
+        pk=certificate.pk, claimed_by=certificate.claimed_by, status='rendering'
+    ).update(
+        status='failed' if give_up else 'pending',
+        available_at=timezone.now() + timedelta(seconds=delay),
+        claimed_by='',
+        locked_until=None,
+        last_error=traceback.format_exc()[-4000:],
+    )
+
+
+def process_batch(batch_size=20, pool=None, extra=None):
+    """
+    Claim and render one batch of due certificates.
+
+    Args:
+        batch_size: Certificates claimed at once
+        pool: ``concurrent.futures`` executor to render in; in-process when None
+        extra: Additional filter on the certificates claimed
+
+    Returns:
+        int: Number of certificates claimed
+
+    Raises:
+        BrokenExecutor: ``pool`` can no longer run tasks
+    """
+    certificates = claim(batch_size, extra)
+    if not certificates:
+        return 0
+    templates = CertificateTemplate.objects.for_courses({certificate.course_id for certificate in certificates})
+    contexts = [certificate_context(certificate, templates[certificate.course_id]) for certificate in certificates]
+    if pool is not None:
+        results = [pool.submit(render_certificate_pdf, context) for context in contexts]
+    else:
+        results = contexts
+
+    for certificate, result in zip(certificates, results):
+        try:
+            pdf = result.result() if pool is not None else render_certificate_pdf(result)
+            _store(certificate, pdf)
+        except LeaseLost:
+            logger.warning('Lease on certificate %s expired before it was stored; left to its new owner', certificate.pk)
+        except BrokenExecutor:
+            # A worker process died; the rest of the batch is claimed again when its lease runs out
+            _fail(certificate)
+            raise
+        except Exception:
+            logger.exception('Rendering certificate %s failed', certificate.pk)
+            _fail(certificate)
+    return len(certificates)
+
+
+def issue_for_course(course):
+    """
+    Issue and queue certificates for every learner who completed ``course`` and has none yet.
+
+    Learners must have passed the course's final quiz, if it has one.
+
+    Returns:
+        int: Number of certificates issued
+    """
+    enrollments = Enrollment.objects.filter(course=course, is_completed=True).exclude(
+        student__certificates__course=course
+    ).select_related('student')
+    final_quiz = Quiz.objects.filter(course=course, is_final_quiz=True).first()
+    if final_quiz:
+        enrollments = enrollments.filter(
+            student__in=Attempt.objects.filter(quiz=final_quiz, passed=True).values('student')
+        )
+
+    issued = 0
+    for enrollment in enrollments.iterator(chunk_size=500):
+        with transaction.atomic():
+            certificate, created = Certificate.objects.get_or_create(student=enrollment.student, course=course)
+            if created:
+                enqueue(certificate)
+                issued += 1
+    return issued
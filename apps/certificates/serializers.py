@@ -2,8 +2,10 @@
 Serializers for certificates app.
 """
 
+from django.conf import settings
 from rest_framework import serializers
-from .models import Certificate
+from .layouts import LayoutError, compile_layout
+from .models import Certificate, CertificateTemplate
 from apps.courses.serializers import CourseListSerializer
 
 
@@ -16,7 +18,39 @@ class CertificateSerializer(serializers.ModelSerializer):
         model = Certificate
         fields = [
             'id', 'certificate_id', 'student_name', 'course_name',
-            'instructor_name', 'completion_date', 'pdf_file',
+            'instructor_name', 'completion_date', 'pdf_file', 'status',
             'verification_url', 'course', 'created_at'
         ]
-        read_only_fields = ['id', 'certificate_id', 'student_name', 'course_name', 'instructor_name', 'completion_date', 'verification_url', 'created_at']
+        read_only_fields = ['id', 'certificate_id', 'student_name', 'course_name', 'instructor_name', 'completion_date', 'status', 'verification_url', 'created_at']
+
+
+class CertificateTemplateSerializer(serializers.ModelSerializer):
+    """Serializer for certificate templates."""
+    
+    class Meta:
+        model = CertificateTemplate
+        fields = ['id', 'name', 'course', 'layout', 'is_active', 'instructor', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'instructor', 'created_at', 'updated_at']
+    
+    def validate_layout(self, value):
+        try:
+            compile_layout(value)
+        except LayoutError as error:
+            raise serializers.ValidationError(str(error))
+        return value
+    
+    def validate_course(self, value):
+        user = self.context['request'].user
+        if value is not None and not user.is_admin_user and value.instructor_id != user.id:
+            raise serializers.ValidationError('You can only add templates to your own courses.')
+        return value
+
+
+class CertificateBatchVerifySerializer(serializers.Serializer):
+    """Certificate UUIDs or certificate IDs to verify at once."""
+    
+    ids = serializers.ListField(
+        child=serializers.CharField(max_length=64),
+        allow_empty=False,
+        max_length=settings.CERTIFICATES_VERIFY_BATCH_MAX
+    )
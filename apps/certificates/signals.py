@@ -0,0 +1,24 @@
+"""
+Signals for keeping certificate verification current.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Certificate
+from .verification import certificate_issued, forget
+
+
+@receiver(post_save, sender=Certificate)
+def publish_certificate_for_verification(sender, instance, created, **kwargs):
+    """New certificates must pass every process's bloom filter."""
+    if created:
+        ids = (instance.pk, instance.certificate_id)
+        transaction.on_commit(lambda: certificate_issued(*ids))
+
+
+@receiver(post_delete, sender=Certificate)
+def forget_deleted_certificate(sender, instance, **kwargs):
+    """A deleted certificate no longer verifies."""
+    ids = (instance.pk, instance.certificate_id)
+    transaction.on_commit(lambda: forget(*ids))
@@ -5,7 +5,8 @@ URL patterns for certificates API.
 from django.urls import path
 from .views import (
     CertificateListView, CertificateGenerateView,
-    CertificateDetailView, CertificateVerifyView
+    CertificateDetailView, CertificateStatusView, CertificateVerifyView, CertificateBatchVerifyView,
+    CertificateTemplateListCreateView, CertificateTemplateDetailView, CertificateTemplatePreviewView
 )
 
 app_name = 'certificates'
@@ -13,6 +14,12 @@ app_name = 'certificates'
 urlpatterns = [
     path('', CertificateListView.as_view(), name='certificate_list'),
     path('<uuid:pk>/', CertificateDetailView.as_view(), name='certificate_detail'),
+    path('<uuid:pk>/status/', CertificateStatusView.as_view(), name='certificate_status'),
     path('generate/<uuid:course_id>/', CertificateGenerateView.as_view(), name='certificate_generate'),
+    path('verify/batch/', CertificateBatchVerifyView.as_view(), name='certificate_verify_batch'),
     path('verify/<uuid:certificate_id>/', CertificateVerifyView.as_view(), name='certificate_verify'),
+    path('verify/<str:certificate_id>/', CertificateVerifyView.as_view(), name='certificate_verify_code'),
+    path('templates/', CertificateTemplateListCreateView.as_view(), name='template_list'),
+    path('templates/<uuid:pk>/', CertificateTemplateDetailView.as_view(), name='template_detail'),
+    path('templates/<uuid:pk>/preview/', CertificateTemplatePreviewView.as_view(), name='template_preview'),
 ]
@@ -0,0 +1,243 @@
+"""
+Public certificate verification.
+
+Verification links are printed on certificates and shared on profiles, so
+lookups come mostly from crawlers, repeatedly for the same certificates and
+often for IDs that do not exist. ``lookup_many`` answers them with as
+little database work as possible:
+
+* Malformed IDs, and IDs the per-process bloom filter has never seen, are
+  rejected without a query. The filter holds the UUID and ``certificate_id``
+  of every certificate. Issuing a certificate bumps a shared generation;
+  each process adds the certificates created since its last refresh when it
+  sees the counter move, so a new certificate is never rejected for longer
+  than the generation's L1 timeout.
+* Payloads are cached under both IDs. Everything in them is fixed when the
+  certificate is issued, so they are only dropped when it is deleted.
+  Unknown IDs that pass the filter are remembered briefly.
+
+Each payload carries a ``signature``, an HMAC of its canonical JSON keyed
+with ``SECRET_KEY``, which also serves as its HTTP ETag.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.cache import Generations, TwoTierCache
+
+from .models import Certificate
+
+logger = logging.getLogger(__name__)
+
+CODE_PATTERN = re.compile(r'^CERT-[A-Z0-9]{12}$')
+SIGNING_SALT = 'certificates.verification'
+PAYLOAD_FIELDS = ('id', 'certificate_id', 'student_name', 'course_name', 'instructor_name', 'completion_date', 'created_at')
+
+# Payloads never change, so processes may keep them a while; deletions reach other processes within a minute
+verification_cache = TwoTierCache(l1_timeout=60)
+verification_generations = Generations(verification_cache, prefix='cert-verify')
+
+
+def normalize(value):
+    """Return the canonical form of a certificate UUID or ``certificate_id``, or None if it is neither."""
+    value = str(value).strip()
+    if CODE_PATTERN.match(value.upper()):
+        return value.upper()
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
+
+
+def _cache_key(key):
+    return f'cert-verify:{key}'
+
+
+def sign(payload):
+    """Return the signature of a payload (without its ``signature`` entry)."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return signing.Signer(salt=SIGNING_SALT).signature(canonical)
+
+
+def build_payload(certificate):
+    """Return the signed verification payload of a certificate."""
+    payload = {
+        'id': str(certificate.id),
+        'certificate_id': certificate.certificate_id,
+        'student_name': certificate.student_name,
+        'course_name': certificate.course_name,
+        'instructor_name': certificate.instructor_name,
+        'completion_date': certificate.completion_date.isoformat(),
+        'issued_at': certificate.created_at.isoformat(),
+    }
+    payload['signature'] = sign(payload)
+    return payload
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings, using double hashing of a blake2b digest."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, keys):
+        digests = b''.join(hashlib.blake2b(key.encode(), digest_size=16).digest() for key in keys)
+        halves = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        # Wrapping uint64 arithmetic is intended here
+        return (halves[:, :1] + steps * halves[:, 1:]) % np.uint64(self.size)
+
+    def add(self, keys):
+        if not keys:
+            return
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, (positions // 8).astype(np.intp), np.left_shift(1, positions % 8).astype(np.uint8))
+        self.count += len(keys)
+
+    def contains(self, keys):
+        """Return a boolean array: False where a key was certainly never added."""
+        if not keys:
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(keys)
+        bits = self.bits[(positions // 8).astype(np.intp)] >> (positions % 8).astype(np.uint8)
+        return (bits & 1).all(axis=1)
+
+
+class KnownCertificates:
+    """
+    Per-process bloom filter of every issued certificate's IDs.
+
+    The filter is built on first use, sized for twice the current number
+    of certificates, and rebuilt when it fills up. Deleted certificates
+    stay in it until then; they only cost a cache or database lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._generation = None
+        self._since = None
+
+    def _add_rows(self, certificates):
+        keys = []
+        for pk, code in certificates.values_list('id', 'certificate_id').iterator(chunk_size=10000):
+            keys.extend((str(pk), code))
+            if len(keys) >= 20000:
+                self._filter.add(keys)
+                keys = []
+        self._filter.add(keys)
+
+    def _refresh(self):
+        generation, = verification_generations.get('issued')
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation == self._generation:
+                return
+            started = timezone.now()
+            if self._filter is None or self._filter.count > self._filter.capacity:
+                count = Certificate.objects.count()
+                self._filter = BloomFilter(
+                    max(4 * count, settings.CERTIFICATES_VERIFY_BLOOM_MIN_CAPACITY),
+                    settings.CERTIFICATES_VERIFY_BLOOM_ERROR_RATE,
+                )
+                self._add_rows(Certificate.objects.all())
+            else:
+                # Overlap the previous refresh to catch rows whose transaction committed after it
+                since = self._since - timedelta(seconds=settings.CERTIFICATES_VERIFY_BLOOM_OVERLAP)
+                self._add_rows(Certificate.objects.filter(created_at__gte=since))
+            self._since = started
+            self._generation = generation
+
+    def might_exist(self, keys):
+        """Return, for each normalized ID, whether a certificate may have it."""
+        if not settings.CERTIFICATES_VERIFY_BLOOM:
+            return [True] * len(keys)
+        try:
+            self._refresh()
+        except Exception:
+            # Never reject a certificate because the filter could not be brought up to date
+            logger.warning('Could not refresh the certificate bloom filter', exc_info=True)
+            return [True] * len(keys)
+        return self._filter.contains(keys).tolist()
+
+
+known_certificates = KnownCertificates()
+
+
+def _fetch(keys):
+    """Load payloads from the database, keyed by both IDs of each certificate found."""
+    codes = [key for key in keys if key.startswith('CERT-')]
+    uuids = [key for key in keys if not key.startswith('CERT-')]
+    certificates = Certificate.objects.filter(Q(certificate_id__in=codes) | Q(id__in=uuids)).only(*PAYLOAD_FIELDS)
+    payloads = {}
+    for certificate in certificates:
+        payload = build_payload(certificate)
+        payloads[payload['id']] = payloads[payload['certificate_id']] = payload
+    return payloads
+
+
+def lookup_many(values):
+    """
+    Verify certificates by UUID or ``certificate_id``.
+
+    Args:
+        values: IDs as given by the client, in any case and with or without dashes
+
+    Returns:
+        dict: each value -> its signed payload, or None when no certificate has that ID
+    """
+    normalized = {value: normalize(value) for value in values}
+    keys = list(dict.fromkeys(key for key in normalized.values() if key))
+    keys = [key for key, maybe in zip(keys, known_certificates.might_exist(keys)) if maybe]
+
+    found = {}
+    if keys:
+        cached = verification_cache.get_many([_cache_key(key) for key in keys])
+        found = {key: cached[_cache_key(key)] for key in keys if _cache_key(key) in cached}
+        missing = [key for key in keys if key not in found]
+        if missing:
+            payloads = _fetch(missing)
+            if payloads:
+                verification_cache.set_many(
+                    {_cache_key(key): payload for key, payload in payloads.items()},
+                    settings.CERTIFICATES_VERIFY_CACHE_TIMEOUT,
+                )
+            unknown = {_cache_key(key): False for key in missing if key not in payloads}
+            if unknown:
+                verification_cache.set_many(unknown, settings.CERTIFICATES_VERIFY_MISS_TIMEOUT)
+            found.update({key: payloads.get(key, False) for key in missing})
+    return {value: found.get(key) or None for value, key in normalized.items()}
+
+
+def lookup(value):
+    """Verify one certificate; see ``lookup_many``."""
+    return lookup_many([value])[value]
+
+
+def forget(*ids):
+    """Drop the cached payloads (or cached misses) of certificate IDs."""
+    for key in ids:
+        verification_cache.delete(_cache_key(str(key)))
+
+
+def certificate_issued(*ids):
+    """Make a new certificate verifiable in every process, given its IDs."""
+    forget(*ids)
+    verification_generations.bump('issued')
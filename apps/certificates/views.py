@@ -5,15 +5,21 @@ Views for certificates app.
 from rest_framework import generics, views, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.shortcuts import get_object_or_404
+from rest_framework.throttling import ScopedRateThrottle
 from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.http import parse_etags
 
-from .models import Certificate
+from .models import Certificate, CertificateTemplate
 from apps.enrollment.models import Enrollment
 from apps.quizzes.models import Quiz, Attempt
-from .serializers import CertificateSerializer
-from .services import generate_certificate_pdf
-from apps.users.permissions import IsStudent
+from .serializers import CertificateSerializer, CertificateTemplateSerializer, CertificateBatchVerifySerializer
+from .rendering import enqueue
+from .services import compiled_layout
+from .verification import lookup, lookup_many
+from apps.users.permissions import IsInstructorOrAdmin, IsStudent
 
 
 class CertificateListView(generics.ListAPIView):
@@ -27,7 +33,12 @@ class CertificateListView(generics.ListAPIView):
 
 
 class CertificateGenerateView(views.APIView):
-    """Generate certificate for a completed course."""
+    """
+    Issue the certificate for a completed course.
+    
+    The PDF is rendered in the background: until it is ready the response
+    is 202 with a ``status_url`` to poll.
+    """
     
     permission_classes = [IsAuthenticated, IsStudent]
     
@@ -68,23 +79,16 @@ class CertificateGenerateView(views.APIView):
             course=enrollment.course
         )
         
-        if created or not certificate.pdf_file:
-            # Generate PDF
-            pdf_content = generate_certificate_pdf(certificate)
-            certificate.pdf_file.save(
-                f'certificate_{certificate.certificate_id}.pdf',
-                pdf_content,
-                save=True
-            )
-            
-            # Set verification URL
-            certificate.verification_url = f"{settings.FRONTEND_URL}/certificates/verify/{certificate.id}/"
-            certificate.save()
+        if created or certificate.status == 'failed' or (certificate.status == 'ready' and not certificate.pdf_file):
+            enqueue(certificate)
         
-        return Response(
-            CertificateSerializer(certificate).data,
-            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        data = CertificateSerializer(certificate).data
+        if certificate.status == 'ready':
+            return Response(data, status=status.HTTP_200_OK)
+        data['status_url'] = request.build_absolute_uri(
+            reverse('certificates:certificate_status', args=[certificate.pk])
         )
+        return Response(data, status=status.HTTP_202_ACCEPTED)
 
 
 class CertificateDetailView(generics.RetrieveAPIView):
@@ -99,24 +103,136 @@ class CertificateDetailView(generics.RetrieveAPIView):
         return Certificate.objects.all()
 
 
+class CertificateStatusView(views.APIView):
+    """Rendering status of a certificate, for polling after generation."""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, pk):
+        certificates = Certificate.objects.all()
+        if request.user.is_student:
+            certificates = certificates.filter(student=request.user)
+        certificate = get_object_or_404(certificates.only('id', 'status', 'pdf_file', 'attempts'), pk=pk)
+        return Response({
+            'id': certificate.id,
+            'status': certificate.status,
+            'attempts': certificate.attempts,
+            'pdf_file': request.build_absolute_uri(certificate.pdf_file.url) if certificate.pdf_file else None,
+        })
+
+
 class CertificateVerifyView(views.APIView):
-    """Public endpoint to verify certificate authenticity."""
+    """
+    Public endpoint to verify certificate authenticity, by UUID or certificate ID.
+    
+    Responses are the same for everyone, so they are cacheable by browsers
+    and proxies; the payload's signature is its ETag.
+    """
     
     permission_classes = [AllowAny]
+    authentication_classes = []
     
     def get(self, request, certificate_id):
-        try:
-            certificate = Certificate.objects.get(id=certificate_id)
-            return Response({
-                'valid': True,
-                'certificate_id': certificate.certificate_id,
-                'student_name': certificate.student_name,
-                'course_name': certificate.course_name,
-                'instructor_name': certificate.instructor_name,
-                'completion_date': certificate.completion_date,
-            })
-        except Certificate.DoesNotExist:
+        payload = lookup(certificate_id)
+        if payload is None:
             return Response({
                 'valid': False,
                 'error': 'Certificate not found.'
-            }, status=status.HTTP_404_NOT_FOUND)
+            }, status=status.HTTP_404_NOT_FOUND, headers={
+                'Cache-Control': f'public, max-age={settings.CERTIFICATES_VERIFY_MISS_MAX_AGE}'
+            })
+        
+        headers = {
+            'ETag': f'"{payload["signature"]}"',
+            'Cache-Control': f'public, max-age={settings.CERTIFICATES_VERIFY_MAX_AGE}',
+        }
+        if headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response({'valid': True, **payload}, headers=headers)
+
+
+class CertificateBatchVerifyView(views.APIView):
+    """
+    Verify up to ``CERTIFICATES_VERIFY_BATCH_MAX`` certificates in one request.
+    
+    Results are in request order; each echoes the ``query`` it answers.
+    """
+    
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'certificate_verify_batch'
+    
+    def post(self, request):
+        serializer = CertificateBatchVerifySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        
+        found = lookup_many(ids)
+        results = [
+            {'query': value, 'valid': True, **found[value]} if found[value] else {'query': value, 'valid': False}
+            for value in ids
+        ]
+        return Response({
+            'count': len(results),
+            'valid_count': sum(result['valid'] for result in results),
+            'results': results,
+        })
+
+
+def _templates_for(user):
+    """Return the certificate templates a user manages."""
+    if user.is_admin_user:
+        return CertificateTemplate.objects.all()
+    return CertificateTemplate.objects.filter(instructor=user)
+
+
+class CertificateTemplateListCreateView(generics.ListCreateAPIView):
+    """
+    List and create certificate templates.
+    
+    Instructors manage templates for their own courses (or, without a
+    course, for all of them); admins manage platform-wide templates.
+    """
+    
+    serializer_class = CertificateTemplateSerializer
+    permission_classes = [IsAuthenticated, IsInstructorOrAdmin]
+    
+    def get_queryset(self):
+        return _templates_for(self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(instructor=None if self.request.user.is_admin_user else self.request.user)
+
+
+class CertificateTemplateDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Get, update or delete a certificate template."""
+    
+    serializer_class = CertificateTemplateSerializer
+    permission_classes = [IsAuthenticated, IsInstructorOrAdmin]
+    
+    def get_queryset(self):
+        return _templates_for(self.request.user)
+
+
+class CertificateTemplatePreviewView(generics.GenericAPIView):
+    """Render a certificate template with sample data, as a PDF (read-only)."""
+    
+    permission_classes = [IsAuthenticated, IsInstructorOrAdmin]
+    
+    SAMPLE = {
+        'student_name': 'Jane Doe',
+        'course_name': 'Introduction to the Course',
+        'instructor_name': 'John Smith',
+        'completion_date': 'January 01, 2025',
+        'certificate_id': 'CERT-SAMPLE000000',
+        'verification_url': 'https://example.com/certificates/verify/',
+    }
+    
+    def get_queryset(self):
+        return _templates_for(self.request.user)
+    
+    def get(self, request, *args, **kwargs):
+        template = self.get_object()
+        layout = compiled_layout(template.layout_key, template.layout)
+        return HttpResponse(layout.render(self.SAMPLE), content_type='application/pdf')
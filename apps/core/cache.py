@@ -0,0 +1,174 @@
+"""
+Two-tier caching helpers shared across apps.
+
+``TwoTierCache`` puts a short-lived per-process cache (L1, local memory) in
+front of the shared cache (L2, Redis) and recomputes missing values
+single-flight, so a cold key costs one computation instead of one per
+concurrent request. ``Generations`` implements namespaced version counters
+that make invalidation O(1): bump a counter and every key built from it
+stops being read.
+"""
+
+import logging
+import threading
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class TwoTierCache:
+    """Read-through cache with a local L1 in front of a shared L2."""
+
+    lock_stripes = 64
+
+    def __init__(self, l1_alias=None, l2_alias='default', l1_timeout=5,
+                 lock_timeout=10, wait_timeout=2.0, poll_interval=0.02):
+        self.l1_alias = l1_alias or getattr(settings, 'LOCAL_CACHE_ALIAS', 'local')
+        self.l2_alias = l2_alias
+        self.l1_timeout = l1_timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._locks = [threading.Lock() for _ in range(self.lock_stripes)]
+
+    @property
+    def l1(self):
+        return caches[self.l1_alias]
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _l2_call(self, method, *args, default=None, **kwargs):
+        """Call the shared cache, degrading to a miss if it is unavailable."""
+        try:
+            return getattr(self.l2, method)(*args, **kwargs)
+        except Exception:
+            logger.warning('Shared cache %s(%s) failed', method, args[:1], exc_info=True)
+            return default
+
+    def get(self, key, default=None):
+        value = self.l1.get(key, MISSING)
+        if value is not MISSING:
+            return value
+        value = self._l2_call('get', key, MISSING, default=MISSING)
+        if value is MISSING:
+            return default
+        self.l1.set(key, value, self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=None):
+        self._l2_call('set', key, value, timeout)
+        self.l1.set(key, value, min(self.l1_timeout, timeout) if timeout else self.l1_timeout)
+
+    def get_many(self, keys):
+        """Return a dict of the cached values among ``keys``, one round trip per tier."""
+        found = self.l1.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self._l2_call('get_many', missing, default={})
+            if shared:
+                self.l1.set_many(shared, self.l1_timeout)
+                found.update(shared)
+        return found
+
+    def set_many(self, mapping, timeout=None):
+        self._l2_call('set_many', mapping, timeout)
+        self.l1.set_many(mapping, min(self.l1_timeout, timeout) if timeout else self.l1_timeout)
+
+    def delete(self, key):
+        self.l1.delete(key)
+        self._l2_call('delete', key)
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        Return the cached value for ``key``, computing it at most once.
+
+        Threads in this process serialize on a striped lock; processes
+        coordinate through an ``add``-based lock in L2. A caller that loses
+        the race waits briefly for the winner's value before computing it
+        itself, so a stuck worker never blocks readers for long.
+        """
+        value = self.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        with self._locks[zlib.crc32(key.encode()) % self.lock_stripes]:
+            value = self.get(key, MISSING)
+            if value is not MISSING:
+                return value
+
+            lock_key = f'{key}:lock'
+            if self._l2_call('add', lock_key, 1, self.lock_timeout, default=True):
+                try:
+                    value = compute()
+                    self.set(key, value, timeout)
+                finally:
+                    self._l2_call('delete', lock_key)
+                return value
+
+            deadline = time.monotonic() + self.wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = self._l2_call('get', key, MISSING, default=MISSING)
+                if value is not MISSING:
+                    self.l1.set(key, value, self.l1_timeout)
+                    return value
+
+            value = compute()
+            self.set(key, value, timeout)
+            return value
+
+
+class Generations:
+    """
+    Named generation counters stored in the shared cache.
+
+    Counters are read through L1 for ``l1_timeout`` seconds, which bounds
+    how long another process can keep serving a superseded generation.
+    """
+
+    def __init__(self, cache, prefix, l1_timeout=1):
+        self.cache = cache
+        self.prefix = prefix
+        self.l1_timeout = l1_timeout
+
+    def _key(self, name):
+        return f'{self.prefix}:gen:{name}'
+
+    def get(self, *names):
+        """Return the current generation of each name as a tuple."""
+        keys = [self._key(name) for name in names]
+        found = self.cache.l1.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.cache._l2_call('get_many', missing, default={})
+            for key in missing:
+                if key not in shared:
+                    # Seed from the clock so a counter lost to eviction never
+                    # restarts at a value that older keys were built with
+                    seed = time.time_ns()
+                    self.cache._l2_call('add', key, seed, None)
+                    shared[key] = self.cache._l2_call('get', key, default=seed) or seed
+            self.cache.l1.set_many(shared, self.l1_timeout)
+            found.update(shared)
+        return tuple(found[key] for key in keys)
+
+    def bump(self, *names):
+        """Advance the named generations, invalidating every key built on them."""
+        for name in names:
+            key = self._key(name)
+            try:
+                self.cache.l2.incr(key)
+            except ValueError:
+                # Counter not initialised (or evicted): any new value invalidates
+                self.cache._l2_call('set', key, time.time_ns(), None)
+            except Exception:
+                logger.warning('Failed to bump generation %s', key, exc_info=True)
+            self.cache.l1.delete(key)
@@ -3,7 +3,7 @@ Admin configuration for courses app.
 """
 
 from django.contrib import admin
-from .models import Category, Course, Lesson
+from .models import Category, Course, Lesson, LessonVideo
 
 
 @admin.register(Category)
@@ -34,3 +34,11 @@ class LessonAdmin(admin.ModelAdmin):
     list_display = ['title', 'course', 'lesson_type', 'chapter_number', 'order', 'duration_minutes', 'is_preview']
     list_filter = ['lesson_type', 'is_preview', 'course']
     search_fields = ['title', 'course__title']
+
+
+@admin.register(LessonVideo)
+class LessonVideoAdmin(admin.ModelAdmin):
+    list_display = ['lesson', 'status', 'attempts', 'duration_seconds', 'transcoded_at']
+    list_filter = ['status']
+    search_fields = ['lesson__title', 'lesson__course__title']
+    readonly_fields = ['source_name', 'directory', 'renditions', 'posters', 'duration_seconds', 'transcoded_at', 'last_error']
@@ -0,0 +1,71 @@
+"""
+Versioned read-through cache for the published course catalog.
+
+Catalog pages are cached under keys built from the normalized request
+parameters plus generation counters: a global one, and one per category
+when the listing is filtered by category. Changes to courses, lessons,
+reviews (through the course rating update) and categories bump the
+affected counters from ``apps.courses.signals``, so invalidation is a
+couple of ``INCR`` calls regardless of how many pages are cached.
+"""
+
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+
+from apps.core.cache import TwoTierCache, Generations
+
+
+# Query parameters that shape a catalog page; anything else is ignored
+API_PARAMS = (
+    'category', 'difficulty', 'is_free', 'min_price', 'max_price',
+    'search', 'ordering', 'page', 'cursor', 'page_size', 'include_count',
+)
+TEMPLATE_PARAMS = ('q', 'category', 'difficulty', 'is_free', 'sort', 'page')
+
+catalog_cache = TwoTierCache(l1_timeout=getattr(settings, 'CATALOG_CACHE_L1_TIMEOUT', 5))
+catalog_generations = Generations(catalog_cache, prefix='catalog')
+
+
+def normalize_params(params, allowed):
+    """Keep the allowed, non-empty parameters in a canonical order."""
+    normalized = []
+    for name in allowed:
+        value = params.get(name)
+        if value not in (None, ''):
+            normalized.append((name, str(value).strip()))
+    return urlencode(normalized)
+
+
+def catalog_key(namespace, params, allowed, category=None):
+    """
+    Build the cache key of a catalog page.
+
+    Args:
+        namespace: Kind of payload, e.g. 'api' or 'page'
+        params: Request query parameters
+        allowed: Parameter names that affect the result
+        category: Category id the listing is filtered by, if any
+
+    Returns:
+        str: Cache key bound to the current generations
+    """
+    if category:
+        generation = catalog_generations.get(f'category:{category}')
+    else:
+        generation = catalog_generations.get('global')
+    digest = hashlib.md5(normalize_params(params, allowed).encode()).hexdigest()
+    return f'catalog:{namespace}:{":".join(map(str, generation))}:{digest}'
+
+
+def get_catalog_page(namespace, params, allowed, build, category=None):
+    """Return a cached catalog payload, building it single-flight on a miss."""
+    key = catalog_key(namespace, params, allowed, category)
+    return catalog_cache.get_or_set(key, build, settings.CATALOG_CACHE_TIMEOUT)
+
+
+def invalidate_catalog(*category_ids):
+    """Invalidate unfiltered listings and the listings of the given categories."""
+    names = ['global'] + [f'category:{category_id}' for category_id in category_ids if category_id]
+    catalog_generations.bump(*names)
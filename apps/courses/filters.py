@@ -0,0 +1,27 @@
+"""
+Filter backends for the course catalog API.
+"""
+
+from rest_framework import filters
+
+from .search import search_courses
+
+
+class CourseSearchFilter(filters.SearchFilter):
+    """Full-text search over the course index instead of ``icontains`` scans."""
+    
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return search_courses(queryset, query)
+
+
+class CourseOrderingFilter(filters.OrderingFilter):
+    """Order search results by relevance unless an explicit ordering is requested."""
+    
+    def get_default_ordering(self, view):
+        search_param = filters.SearchFilter.search_param
+        if view.request.query_params.get(search_param, '').strip():
+            return ['-search_rank']
+        return super().get_default_ordering(view)
@@ -0,0 +1,23 @@
+"""
+Django management command to rebuild the course similarity index.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from apps.courses.similarity import get_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Re-embeds all courses for related-course lookups and refreshes IDF weights'
+
+    def handle(self, *args, **kwargs):
+        index = get_similarity_index()
+        self.stdout.write(f'Rebuilding course similarity index in {index.directory}...')
+
+        started = time.monotonic()
+        count = index.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Embedded {count} courses in {time.monotonic() - started:.2f}s'
+        ))
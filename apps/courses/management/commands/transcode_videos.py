@@ -0,0 +1,50 @@
+"""
+Django management command to transcode queued lesson videos to HLS.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.courses import transcoding
+
+
+class Command(BaseCommand):
+    help = 'Transcodes uploaded lesson videos to HLS renditions with a pool of ffmpeg processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.LESSON_VIDEO_TRANSCODE_WORKERS,
+            help='Videos transcoded at once, one ffmpeg process each',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new videos instead of exiting once the queue is drained',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        stop = threading.Event()
+        transcoded = 0
+        started = time.monotonic()
+
+        # ffmpeg does the work in its own processes; threads only wait on it and store the output
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transcode') as pool:
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    claimed = transcoding.process_batch(workers, pool=pool)
+                    transcoded += claimed
+                    if not claimed:
+                        if not options['loop']:
+                            break
+                        stop.wait(settings.LESSON_VIDEO_POLL_INTERVAL)
+            except KeyboardInterrupt:
+                stop.set()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {transcoded} videos with {workers} workers in {time.monotonic() - started:.2f}s'
+        ))
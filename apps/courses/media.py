@@ -0,0 +1,201 @@
+"""
+Delivery of protected lesson files (videos and documents).
+
+Lesson files are not public. ``LessonMediaView`` checks once that the user
+may open the lesson and hands out a signed URL that stays valid for
+``LESSON_MEDIA_URL_TTL`` seconds; the player's many range requests then go
+to ``lesson_media_stream``, which checks only the signature. HLS output
+(``apps.courses.transcoding``) is signed by directory, so the relative
+playlist and segment URIs in it resolve under the same token.
+
+* With ``LESSON_MEDIA_ACCEL_PREFIX`` set, the response is an empty
+  ``X-Accel-Redirect`` to an ``internal`` nginx location, and nginx serves
+  the file, ranges included.
+* Otherwise Django streams the file with ``FileResponse``, answering a
+  single-range ``Range`` request with 206. The response wraps the open file
+  itself, so WSGI servers that use ``sendfile`` (gunicorn) send it without
+  copying it through Python.
+
+Under ``DEBUG`` the development media route goes through
+``serve_public_media``, which refuses the lesson file prefixes just as the
+nginx config does.
+"""
+
+import mimetypes
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import reverse
+from django.views import static
+
+from apps.enrollment.models import Enrollment
+
+MEDIA_FIELDS = {'video': 'video_file', 'document': 'document_file'}
+PROTECTED_PREFIXES = ('lesson_videos/', 'lesson_documents/', 'lesson_hls/')
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+mimetypes.add_type('application/vnd.apple.mpegurl', '.m3u8')
+mimetypes.add_type('video/mp2t', '.ts')
+
+signer = signing.TimestampSigner(salt='courses.lesson-media')
+
+
+def can_access(user, lesson):
+    """Whether ``user`` may open a lesson's files: a preview, or their own or an enrolled course."""
+    if lesson.is_preview:
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.is_admin_user or lesson.course.instructor_id == user.id:
+        return True
+    return Enrollment.objects.filter(student=user, course_id=lesson.course_id).exists()
+
+
+def available(lesson, kind):
+    """Whether a lesson has a file of ``kind``: 'video', 'document', or 'hls' once transcoded."""
+    if kind == 'hls':
+        asset = getattr(lesson, 'video_asset', None)
+        return asset is not None and asset.status == 'ready'
+    return kind in MEDIA_FIELDS and bool(getattr(lesson, MEDIA_FIELDS[kind]))
+
+
+def signed_url(lesson, kind, path=''):
+    """
+    Return a URL that serves a lesson file without further permission checks.
+
+    The file name is part of the signature, so replacing the file retires
+    URLs handed out for the old one. For 'hls' the URL is for ``path``
+    (the master playlist by default) in the lesson's current renditions.
+    """
+    if kind == 'hls':
+        token = signer.sign_object({'d': lesson.video_asset.directory})
+        return reverse('courses:lesson_media_file', args=[token, path or 'master.m3u8'])
+    name = getattr(lesson, MEDIA_FIELDS[kind]).name
+    return reverse('courses:lesson_media_stream', args=[signer.sign_object({'n': name})])
+
+
+def unsign(token, path=''):
+    """
+    Return the file name a signed URL token grants access to.
+
+    For a directory token, ``path`` names the file inside it.
+
+    Returns:
+        str: Storage name, or None when ``path`` does not fit the token
+
+    Raises:
+        BadSignature: The token is forged or has expired
+    """
+    grant = signer.unsign_object(token, max_age=settings.LESSON_MEDIA_URL_TTL)
+    if 'd' not in grant:
+        return None if path else grant['n']
+    path = posixpath.normpath(path) if path else ''
+    if not path or path.startswith(('/', '..')):
+        return None
+    return posixpath.join(grant['d'], path)
+
+
+def parse_range(header, size):
+    """
+    Return the inclusive byte range requested by a ``Range`` header.
+
+    Returns:
+        tuple: (start, end), or None to send the whole file (no header, a
+        multi-range or malformed header, or an empty file)
+
+    Raises:
+        ValueError: The range lies outside the file
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.groups() == ('', '') or not size:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not int(last):
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class FileRange:
+    """
+    The ``length`` bytes of an open file starting at ``start``.
+
+    Exposes ``fileno`` and ``tell`` so ``sendfile`` can start at the right
+    offset; the response's Content-Length bounds what it sends.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def serve(request, name):
+    """Send a stored file, by nginx when configured, honouring ``Range``."""
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    cache_control = f'private, max-age={settings.LESSON_MEDIA_URL_TTL}'
+
+    if settings.LESSON_MEDIA_ACCEL_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.LESSON_MEDIA_ACCEL_PREFIX + quote(name)
+        response['Cache-Control'] = cache_control
+        return response
+
+    try:
+        file = default_storage.open(name, 'rb')
+    except FileNotFoundError:
+        raise Http404('File not found.')
+    size = file.size
+
+    try:
+        requested = parse_range(request.headers.get('Range'), size)
+    except ValueError:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if requested is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = requested
+        response = FileResponse(FileRange(file, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def serve_public_media(request, path, document_root=None):
+    """Development view for ``MEDIA_URL`` that leaves lesson files to the signed URLs."""
+    if posixpath.normpath(path).lstrip('/').startswith(PROTECTED_PREFIXES):
+        raise Http404('File not found.')
+    return static.serve(request, path, document_root=document_root)
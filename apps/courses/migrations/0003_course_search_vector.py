@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-16 09:12
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_vector_index(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL; other databases use the in-memory backend
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS courses_search_vector_gin ON courses USING GIN (search_vector)'
+        )
+
+
+def drop_search_vector_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS courses_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vector_index, drop_search_vector_index),
+    ]
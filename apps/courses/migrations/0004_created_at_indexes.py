@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created_at'], name='courses_created_0aa93c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['created_at'], name='lessons_created_12f153_idx'),
+        ),
+    ]
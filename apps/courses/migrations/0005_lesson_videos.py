@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-16 22:58
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+def queue_existing_videos(apps, schema_editor):
+    Lesson = apps.get_model('courses', 'Lesson')
+    LessonVideo = apps.get_model('courses', 'LessonVideo')
+    now = django.utils.timezone.now()
+    lessons = Lesson.objects.exclude(video_file='').exclude(video_file__isnull=True).values_list('id', 'video_file')
+    LessonVideo.objects.bulk_create(
+        [LessonVideo(lesson_id=lesson_id, source_name=name, available_at=now) for lesson_id, name in lessons.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0004_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonVideo',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('source_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField(blank=True, null=True)),
+                ('claimed_by', models.CharField(blank=True, max_length=32)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('directory', models.CharField(blank=True, max_length=255)),
+                ('renditions', models.JSONField(blank=True, default=list)),
+                ('posters', models.JSONField(blank=True, default=list)),
+                ('duration_seconds', models.FloatField(blank=True, null=True)),
+                ('transcoded_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lesson', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='video_asset', to='courses.lesson')),
+            ],
+            options={
+                'db_table': 'lesson_videos',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='lesson_vide_status_56a531_idx')],
+            },
+        ),
+        migrations.RunPython(queue_existing_videos, migrations.RunPython.noop),
+    ]
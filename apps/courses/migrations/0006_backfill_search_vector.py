@@ -0,0 +1,51 @@
+# Generated by Django 5.0.14 on 2026-10-17 09:05
+
+from django.db import migrations
+from django.db.models import TextField, Value
+
+# Mirrors apps.courses.search.FIELD_WEIGHTS at the time of writing
+WEIGHTS = {'title': 'A', 'what_you_will_learn': 'B', 'requirements': 'C', 'description': 'C', 'lessons': 'D'}
+
+
+def _join(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value)
+    return str(value or '')
+
+
+def backfill_search_vectors(apps, schema_editor):
+    # Courses created before 0003 have no vector and would never match; later edits are indexed by signals
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    Course = apps.get_model('courses', 'Course')
+    Lesson = apps.get_model('courses', 'Lesson')
+    courses = Course.objects.filter(search_vector__isnull=True).only(
+        'id', 'title', 'description', 'requirements', 'what_you_will_learn'
+    )
+    for course in courses.iterator(chunk_size=500):
+        lessons = Lesson.objects.filter(course_id=course.pk).values_list('title', 'content')
+        document = {
+            'title': course.title,
+            'what_you_will_learn': _join(course.what_you_will_learn),
+            'requirements': _join(course.requirements),
+            'description': course.description,
+            'lessons': ' '.join(f'{title} {content}' for title, content in lessons),
+        }
+        vector = None
+        for field, text in document.items():
+            part = SearchVector(Value(text, output_field=TextField()), weight=WEIGHTS[field], config='english')
+            vector = part if vector is None else vector + part
+        Course.objects.filter(pk=course.pk).update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_lesson_videos'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vectors, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ Includes Category, Course, and Lesson models.
 """
 
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.utils.text import slugify
 from apps.users.models import User
 import uuid
@@ -33,6 +34,31 @@ class Category(models.Model):
         return self.name
 
 
+class CourseQuerySet(models.QuerySet):
+    """QuerySet with the annotations used by course listings."""
+    
+    def with_stats(self):
+        """Annotate lesson count and total lesson minutes in the same query."""
+        return self.annotate(
+            lesson_count=models.Count('lessons'),
+            lesson_minutes=models.Sum('lessons__duration_minutes'),
+        )
+    
+    def for_listing(self):
+        """Join everything the list serializers read, so pages cost a fixed number of queries."""
+        return self.select_related('instructor__profile', 'category').with_stats()
+    
+    def published_counts_by_category(self):
+        """Return {category_id: published course count} from one grouped query."""
+        return dict(
+            self.filter(status='published')
+            .order_by()
+            .values('category')
+            .annotate(count=models.Count('id'))
+            .values_list('category', 'count')
+        )
+
+
 class Course(models.Model):
     """Course model with all details."""
     
@@ -94,6 +120,11 @@ class Course(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
     
+    # Full-text search document, maintained by apps.courses.search
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    objects = CourseQuerySet.as_manager()
+    
     class Meta:
         db_table = 'courses'
         ordering = ['-created_at']
@@ -103,6 +134,7 @@ class Course(models.Model):
             models.Index(fields=['category']),
             models.Index(fields=['instructor']),
             models.Index(fields=['-average_rating']),
+            models.Index(fields=['created_at']),
         ]
     
     def save(self, *args, **kwargs):
@@ -116,10 +148,15 @@ class Course(models.Model):
     
     @property
     def total_lessons(self):
+        # Use the with_stats() annotation when the queryset provided it
+        if hasattr(self, 'lesson_count'):
+            return self.lesson_count
         return self.lessons.count()
     
     @property
     def total_duration_minutes(self):
+        if hasattr(self, 'lesson_minutes'):
+            return self.lesson_minutes or 0
         return self.lessons.aggregate(
             total=models.Sum('duration_minutes')
         )['total'] or 0
@@ -165,7 +202,56 @@ class Lesson(models.Model):
         ordering = ['course', 'chapter_number', 'order']
         indexes = [
             models.Index(fields=['course', 'chapter_number', 'order']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
         return f"{self.course.title} - {self.title}"
+
+
+class LessonVideo(models.Model):
+    """HLS renditions of a lesson's uploaded video (see apps.courses.transcoding)."""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name='video_asset')
+    source_name = models.CharField(max_length=255)  # Lesson.video_file these renditions are made from
+    
+    # Transcoding queue
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    # Output, stored under ``directory``: master.m3u8, one playlist per rendition, posters
+    directory = models.CharField(max_length=255, blank=True)
+    renditions = models.JSONField(default=list, blank=True)
+    posters = models.JSONField(default=list, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    transcoded_at = models.DateTimeField(null=True, blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'lesson_videos'
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+    
+    @property
+    def manifest(self):
+        """Storage name of the master playlist."""
+        return f"{self.directory}/master.m3u8" if self.directory else ''
+    
+    def __str__(self):
+        return f"Video of {self.lesson_id} ({self.status})"
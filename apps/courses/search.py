@@ -0,0 +1,442 @@
+"""
+Full-text search for the course catalog.
+
+Courses are indexed from their title, description, requirements,
+learning outcomes and lesson text. Two interchangeable backends are
+provided:
+
+* ``PostgresSearchBackend`` stores a weighted ``tsvector`` on each course
+  (GIN indexed) and ranks with ``ts_rank_cd``.
+* ``InMemorySearchBackend`` keeps a tokenized, stemmed inverted index in
+  process and ranks with BM25. It is meant for SQLite and tests; production
+  settings select the PostgreSQL backend.
+
+The index is kept current by the signal handlers in ``apps.courses.signals``.
+Each process holds its own in-memory index, so a write bumps a shared
+generation counter and every process rebuilds its copy, off the request,
+when it sees the counter move.
+"""
+
+import bisect
+import logging
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils.module_loading import import_string
+
+from apps.core.cache import Generations, TwoTierCache
+
+logger = logging.getLogger(__name__)
+
+search_generations = Generations(TwoTierCache(), prefix='course-search')
+
+# Field weights shared by both backends (PostgreSQL weight class, BM25F boost)
+FIELD_WEIGHTS = {
+    'title': ('A', 3.0),
+    'what_you_will_learn': ('B', 1.5),
+    'requirements': ('C', 1.0),
+    'description': ('C', 1.0),
+    'lessons': ('D', 0.5),
+}
+
+STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has have in into is it its of on or
+    that the their then there these this to was were will with you your
+""".split())
+
+TOKEN_RE = re.compile(r"[a-z0-9]+[+#]*")
+
+# Suffixes stripped by the light stemmer, longest first
+SUFFIXES = (
+    ('ational', 'ate'), ('ization', 'ize'), ('fulness', 'ful'),
+    ('iveness', 'ive'), ('ousness', 'ous'), ('ments', ''), ('ement', ''),
+    ('ment', ''), ('ness', ''), ('ings', ''), ('ing', ''), ('ies', 'y'),
+    ('ied', 'y'), ('edly', ''), ('ed', ''), ('ly', ''), ('es', ''), ('s', ''),
+)
+
+
+def stem(word):
+    """Reduce an English word to a crude stem (light suffix stripping)."""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    for suffix, replacement in SUFFIXES:
+        if word.endswith(suffix):
+            base = word[:-len(suffix)] + replacement
+            if len(base) < 3:
+                continue
+            if suffix == 's' and word.endswith(('ss', 'us', 'is')):
+                return word
+            if suffix == 'es' and not word.endswith(('ches', 'shes', 'sses', 'xes', 'zes')):
+                # "courses" -> "course", not "cours"
+                return word[:-1]
+            # "running" -> "run", "stopped" -> "stop"
+            if suffix in ('ing', 'ed') and len(base) > 3 and base[-1] == base[-2] and base[-1] not in 'lsz':
+                base = base[:-1]
+            return base
+    return word
+
+
+def tokenize(text):
+    """Split text into lowercase tokens, dropping stop words."""
+    return [
+        token for token in TOKEN_RE.findall(text.lower())
+        if token not in STOP_WORDS
+    ]
+
+
+def analyze(text):
+    """Tokenize and stem text into index terms."""
+    return [stem(token) for token in tokenize(text)]
+
+
+def _join(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(item) for item in value)
+    return str(value or '')
+
+
+def build_course_document(course, lessons=None):
+    """
+    Build the searchable text of a course, keyed by field name.
+
+    Args:
+        course: Course model instance
+        lessons: Optional iterable of (title, content) pairs; fetched if omitted
+
+    Returns:
+        dict: Field name to text
+    """
+    if lessons is None:
+        lessons = course.lessons.values_list('title', 'content')
+
+    return {
+        'title': course.title,
+        'what_you_will_learn': _join(course.what_you_will_learn),
+        'requirements': _join(course.requirements),
+        'description': course.description,
+        'lessons': ' '.join(f'{title} {content}' for title, content in lessons),
+    }
+
+
+class BaseSearchBackend:
+    """Interface implemented by course search backends."""
+
+    def index_course(self, course, lessons=None):
+        raise NotImplementedError
+
+    def remove_course(self, course_id):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query):
+        """Restrict a Course queryset to matches, annotated with ``search_rank``."""
+        raise NotImplementedError
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Pure-Python inverted index ranked with BM25.
+
+    Postings map each stemmed term to ``{course_id: weighted term frequency}``.
+    A sorted vocabulary supports prefix expansion of the last query term for
+    type-ahead.
+
+    The index is built on a background thread the first time it is needed
+    and again whenever the shared generation moves past the one it was
+    built at. Until the first build finishes, queries fall back to a plain
+    ``icontains`` match on the title and description.
+    """
+
+    k1 = 1.2
+    b = 0.75
+    max_prefix_expansions = 50
+
+    def __init__(self, max_results=1000):
+        self.max_results = max_results
+        self._lock = threading.RLock()
+        self._built = False
+        self._generation = None
+        self._building = False
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(dict)
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._total_length = 0.0
+        self._vocabulary = []
+
+    def _refresh(self):
+        """Start a background rebuild if the index is missing or another process changed it."""
+        generation, = search_generations.get('index')
+        with self._lock:
+            if self._building or (self._built and generation == self._generation):
+                return
+            self._building = True
+        threading.Thread(target=self._build_in_background, name='course-search-build', daemon=True).start()
+
+    def _build_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception('Failed to build the course search index')
+        finally:
+            self._building = False
+            connection.close()
+
+    def rebuild(self):
+        from .models import Course, Lesson
+
+        # Read before the courses, so changes made during the build trigger another one
+        generation, = search_generations.get('index')
+        lessons_by_course = defaultdict(list)
+        for course_id, title, content in Lesson.objects.values_list(
+            'course_id', 'title', 'content'
+        ).iterator(chunk_size=2000):
+            lessons_by_course[course_id].append((title, content))
+
+        with self._lock:
+            self._reset()
+            for course in Course.objects.only(
+                'id', 'title', 'description', 'requirements', 'what_you_will_learn'
+            ).iterator(chunk_size=2000):
+                self._add(course.id, build_course_document(course, lessons_by_course.get(course.id, ())))
+            self._built = True
+            self._generation = generation
+
+    def index_course(self, course, lessons=None):
+        document = build_course_document(course, lessons)
+        with self._lock:
+            # Before a full build, the build picks this course up
+            if self._built:
+                self._remove(course.id)
+                self._add(course.id, document)
+        search_generations.bump('index')
+
+    def remove_course(self, course_id):
+        with self._lock:
+            self._remove(course_id)
+        search_generations.bump('index')
+
+    def _add(self, course_id, document):
+        frequencies = defaultdict(float)
+        for field, text in document.items():
+            boost = FIELD_WEIGHTS[field][1]
+            for term in analyze(text):
+                frequencies[term] += boost
+
+        for term, frequency in frequencies.items():
+            postings = self._postings[term]
+            if not postings:
+                bisect.insort(self._vocabulary, term)
+            postings[course_id] = frequency
+
+        length = sum(frequencies.values())
+        self._doc_terms[course_id] = tuple(frequencies)
+        self._doc_lengths[course_id] = length
+        self._total_length += length
+
+    def _remove(self, course_id):
+        terms = self._doc_terms.pop(course_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(course_id)
+        for term in terms:
+            postings = self._postings[term]
+            postings.pop(course_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._vocabulary, term)
+                if index < len(self._vocabulary) and self._vocabulary[index] == term:
+                    del self._vocabulary[index]
+
+    def _expand_prefix(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + self.max_prefix_expansions]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query, limit=None):
+        """
+        Rank courses matching every query term.
+
+        The last term is treated as a prefix so partially typed words match.
+
+        Returns:
+            list: (course_id, score) pairs, best first, or None while the
+            index is being built for the first time
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        self._refresh()
+        with self._lock:
+            if not self._built:
+                return None
+            doc_count = len(self._doc_lengths)
+            if not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+
+            # Each query token expands to one or more index terms
+            term_groups = [[stem(token)] for token in tokens[:-1]]
+            last = tokens[-1]
+            term_groups.append(sorted(set([stem(last)] + self._expand_prefix(last))))
+
+            candidates = None
+            for group in term_groups:
+                matched = set()
+                for term in group:
+                    matched.update(self._postings.get(term, ()))
+                candidates = matched if candidates is None else candidates & matched
+                if not candidates:
+                    return []
+
+            scores = dict.fromkeys(candidates, 0.0)
+            for group in term_groups:
+                for term in group:
+                    postings = self._postings.get(term)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for course_id in candidates.intersection(postings):
+                        frequency = postings[course_id]
+                        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[course_id] / avg_length)
+                        scores[course_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:limit or self.max_results]
+
+    def filter_queryset(self, queryset, query):
+        ranked = self.search(query)
+        if ranked is None:
+            matches = Q()
+            for token in tokenize(query):
+                matches &= Q(title__icontains=token) | Q(description__icontains=token)
+            return queryset.filter(matches).annotate(search_rank=Value(0.0, output_field=FloatField()))
+        if not ranked:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        return queryset.filter(pk__in=[course_id for course_id, _ in ranked]).annotate(
+            search_rank=Case(
+                *[When(pk=course_id, then=Value(score)) for course_id, score in ranked],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL full-text search over ``Course.search_vector``.
+
+    The vector is weighted per field (see ``FIELD_WEIGHTS``) and backed by a
+    GIN index, so matching never scans the courses table.
+    """
+
+    config = 'english'
+
+    def __init__(self, max_results=1000):
+        self.max_results = max_results
+
+    def _vector(self, document):
+        from django.contrib.postgres.search import SearchVector
+        from django.db.models import TextField
+
+        vector = None
+        for field, text in document.items():
+            part = SearchVector(
+                Value(text, output_field=TextField()),
+                weight=FIELD_WEIGHTS[field][0],
+                config=self.config,
+            )
+            vector = part if vector is None else vector + part
+        return vector
+
+    def index_course(self, course, lessons=None):
+        from .models import Course
+
+        document = build_course_document(course, lessons)
+        Course.objects.filter(pk=course.pk).update(search_vector=self._vector(document))
+
+    def remove_course(self, course_id):
+        # The vector lives on the course row and goes away with it
+        pass
+
+    def rebuild(self):
+        from .models import Course
+
+        for course in Course.objects.only(
+            'id', 'title', 'description', 'requirements', 'what_you_will_learn'
+        ).iterator(chunk_size=500):
+            self.index_course(course)
+
+    def _query(self, query):
+        from django.contrib.postgres.search import SearchQuery
+
+        # tsquery syntax only allows plain lexemes here ("c++" -> "c")
+        tokens = [token.rstrip('+#') for token in tokenize(query)]
+        if not tokens:
+            return None
+        # Every term must match; the last one is a prefix for type-ahead
+        terms = tokens[:-1] + [f'{tokens[-1]}:*']
+        return SearchQuery(' & '.join(terms), search_type='raw', config=self.config)
+
+    def filter_queryset(self, queryset, query):
+        from django.contrib.postgres.search import SearchRank
+
+        search_query = self._query(query)
+        if search_query is None:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query, cover_density=True, normalization=32)
+        )
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    """Return the configured search backend, chosen by database vendor by default."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_path = getattr(settings, 'COURSE_SEARCH_BACKEND', '')
+                if backend_path:
+                    backend_class = import_string(backend_path)
+                elif connection.vendor == 'postgresql':
+                    backend_class = PostgresSearchBackend
+                else:
+                    backend_class = InMemorySearchBackend
+                _backend = backend_class(
+                    max_results=getattr(settings, 'COURSE_SEARCH_MAX_RESULTS', 1000)
+                )
+    return _backend
+
+
+def search_courses(queryset, query):
+    """
+    Filter a Course queryset by a full-text query.
+
+    Args:
+        queryset: Course queryset to restrict
+        query: Raw user search string
+
+    Returns:
+        QuerySet: Matching courses annotated with ``search_rank``
+    """
+    return get_search_backend().filter_queryset(queryset, query)
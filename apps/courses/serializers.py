@@ -2,8 +2,10 @@
 Serializers for courses app.
 """
 
+from django.urls import reverse
 from rest_framework import serializers
 from .models import Category, Course, Lesson
+from . import media
 from apps.users.serializers import UserSerializer
 
 
@@ -18,20 +20,53 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'slug', 'created_at']
     
     def get_course_count(self, obj):
+        # Prefer the queryset annotation, then the rollup passed in by the view
+        if hasattr(obj, 'published_course_count'):
+            return obj.published_course_count
+        counts = self.context.get('category_course_counts')
+        if counts is not None:
+            return counts.get(obj.id, 0)
         return obj.courses.filter(status='published').count()
 
 
 class LessonSerializer(serializers.ModelSerializer):
     """Serializer for lesson model."""
     
+    video_media_url = serializers.SerializerMethodField()
+    document_media_url = serializers.SerializerMethodField()
+    hls_manifest_url = serializers.SerializerMethodField()
+    
     class Meta:
         model = Lesson
         fields = [
             'id', 'title', 'description', 'lesson_type', 'chapter_number',
             'order', 'video_url', 'video_file', 'document_file', 'content',
-            'duration_minutes', 'is_preview', 'created_at', 'updated_at'
+            'duration_minutes', 'is_preview', 'video_media_url', 'document_media_url', 'hls_manifest_url',
+            'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        # Uploaded files are only reachable through the *_media_url endpoints (apps.courses.media)
+        extra_kwargs = {
+            'video_file': {'write_only': True},
+            'document_file': {'write_only': True},
+        }
+    
+    def _media_url(self, obj, kind):
+        if not media.available(obj, kind):
+            return None
+        url = reverse('courses:lesson_media', args=[obj.pk, kind])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def get_video_media_url(self, obj):
+        return self._media_url(obj, 'video')
+    
+    def get_document_media_url(self, obj):
+        return self._media_url(obj, 'document')
+    
+    def get_hls_manifest_url(self, obj):
+        # Set once the upload has been transcoded (apps.courses.transcoding)
+        return self._media_url(obj, 'hls')
 
 
 class CourseListSerializer(serializers.ModelSerializer):
@@ -0,0 +1,140 @@
+"""
+Signals for keeping the course search index, similarity index, catalog cache
+and lesson video renditions current.
+"""
+
+import logging
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Category, Course, Lesson, LessonVideo
+from .cache import invalidate_catalog
+from .search import get_search_backend
+from .similarity import get_similarity_index
+from .transcoding import delete_directory, sync_lesson
+
+logger = logging.getLogger(__name__)
+
+
+# Course fields that feed the search document
+SEARCHABLE_FIELDS = {'title', 'description', 'requirements', 'what_you_will_learn'}
+
+# Course fields that feed the similarity embedding
+SIMILARITY_FIELDS = SEARCHABLE_FIELDS | {'category', 'difficulty', 'language', 'status'}
+
+# Counter-only updates are left to the catalog cache TTL
+COUNTER_FIELDS = {'enrollment_count'}
+
+
+def reindex_course(course_id):
+    """Rebuild the search document of a course, or drop it if the course is gone."""
+    course = Course.objects.filter(id=course_id).only(
+        'id', 'title', 'description', 'requirements', 'what_you_will_learn'
+    ).first()
+    backend = get_search_backend()
+    if course is None:
+        backend.remove_course(course_id)
+    else:
+        backend.index_course(course)
+
+
+def update_similarity(course_id, removed=False):
+    """Re-embed a course in the similarity index; a failure only leaves it stale."""
+    try:
+        index = get_similarity_index()
+        if removed:
+            index.remove(course_id)
+        else:
+            index.update([course_id])
+    except Exception:
+        logger.warning('Failed to update course %s in the similarity index', course_id, exc_info=True)
+
+
+@receiver(pre_save, sender=Course)
+def remember_previous_category(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored category so moving a course invalidates both listings."""
+    instance._previous_category_id = None
+    if instance._state.adding or (update_fields and 'category' not in update_fields):
+        return
+    instance._previous_category_id = Course.objects.filter(
+        pk=instance.pk
+    ).values_list('category_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def index_course_on_save(sender, instance, update_fields=None, **kwargs):
+    """Re-index a course when its searchable content changes."""
+    if update_fields and not SEARCHABLE_FIELDS.intersection(update_fields):
+        # e.g. rating or enrollment counter updates
+        return
+    transaction.on_commit(lambda: reindex_course(instance.id))
+
+
+@receiver(post_save, sender=Course)
+def embed_course_on_save(sender, instance, update_fields=None, **kwargs):
+    """Re-embed a course when its content, category, level, language or status changes."""
+    if update_fields and not SIMILARITY_FIELDS.intersection(update_fields):
+        return
+    course_id = instance.id
+    transaction.on_commit(lambda: update_similarity(course_id))
+
+
+@receiver(post_save, sender=Course)
+def invalidate_catalog_on_course_save(sender, instance, update_fields=None, **kwargs):
+    """Course edits, publishing and rating updates from reviews change listings."""
+    if update_fields and set(update_fields) <= COUNTER_FIELDS:
+        return
+    category_ids = (instance.category_id, getattr(instance, '_previous_category_id', None))
+    transaction.on_commit(lambda: invalidate_catalog(*category_ids))
+
+
+@receiver(post_delete, sender=Course)
+def remove_course_from_index(sender, instance, **kwargs):
+    """Drop a deleted course from the search index and catalog."""
+    course_id, category_id = instance.id, instance.category_id
+    transaction.on_commit(lambda: get_search_backend().remove_course(course_id))
+    transaction.on_commit(lambda: update_similarity(course_id, removed=True))
+    transaction.on_commit(lambda: invalidate_catalog(category_id))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def reindex_course_on_lesson_change(sender, instance, **kwargs):
+    """Lesson titles and content are part of the course document."""
+    course_id = instance.course_id
+    transaction.on_commit(lambda: reindex_course(course_id))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_catalog_on_lesson_change(sender, instance, **kwargs):
+    """Lesson counts are part of every catalog entry."""
+    category_id = Course.objects.filter(
+        pk=instance.course_id
+    ).values_list('category_id', flat=True).first()
+    transaction.on_commit(lambda: invalidate_catalog(category_id))
+
+
+@receiver(post_save, sender=Lesson)
+def transcode_lesson_video(sender, instance, update_fields=None, **kwargs):
+    """Queue a new or replaced upload for HLS transcoding, and drop renditions of a removed one."""
+    if update_fields and 'video_file' not in update_fields:
+        return
+    sync_lesson(instance)
+
+
+@receiver(post_delete, sender=LessonVideo)
+def delete_lesson_video_renditions(sender, instance, **kwargs):
+    """Renditions of a removed video (or a deleted lesson) are not kept."""
+    directory = instance.directory
+    if directory:
+        transaction.on_commit(lambda: delete_directory(directory))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_catalog_on_category_change(sender, instance, **kwargs):
+    """Categories are embedded in catalog entries and the filter list."""
+    category_id = instance.id
+    transaction.on_commit(lambda: invalidate_catalog(category_id))
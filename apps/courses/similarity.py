@@ -0,0 +1,361 @@
+"""
+Content-based course similarity ("related courses").
+
+Every course is embedded as one fixed-width, L2-normalized float32 row:
+
+* text: TF-IDF of the stemmed title, learning outcomes, requirements and
+  description (same analyzer and field boosts as ``apps.courses.search``),
+  feature-hashed with a sign bit into ``COURSE_SIMILARITY_DIMENSIONS``
+  columns;
+* category and language: hashed one-hot blocks;
+* difficulty: a point on a quarter circle, so neighbouring levels are
+  partly similar and beginner / advanced are not.
+
+Each part is scaled so the cosine of two rows is ``PART_WEIGHTS``-weighted:
+60% text, 25% same category, 10% difficulty, 5% language.
+
+Rows live in a memory-mapped file shared by every process, next to a file
+of fixed-width course ids (slot order) and one byte per slot marking
+published courses. A query is one matrix-vector product over the mapped
+rows plus ``argpartition``: about 30M multiply-adds for 100k courses, a few
+milliseconds, no service and no GPU. ``similar_to_vectors`` batches several
+query rows into one matrix product.
+
+Saving a course rewrites its row in place (or appends a slot) under a file
+lock; readers notice appended slots by file size. IDF weights are frozen at
+the last ``rebuild_course_similarity``, which writes a new version directory
+and switches the ``current`` symlink atomically. Nothing else builds the
+index: until that command has run, queries return no courses and saves are
+not recorded.
+"""
+
+import fcntl
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from .search import FIELD_WEIGHTS, analyze, build_course_document
+
+logger = logging.getLogger(__name__)
+
+TEXT_FIELDS = ('title', 'what_you_will_learn', 'requirements', 'description')
+
+# Share of each row's squared norm, and so of the cosine, given to each part
+PART_WEIGHTS = {'text': 0.6, 'category': 0.25, 'difficulty': 0.1, 'language': 0.05}
+
+CATEGORY_DIMENSIONS = 48
+DIFFICULTY_DIMENSIONS = 2
+LANGUAGE_DIMENSIONS = 14
+DIFFICULTY_LEVELS = ('beginner', 'intermediate', 'advanced')
+
+COURSE_FIELDS = (
+    'id', 'title', 'description', 'requirements', 'what_you_will_learn',
+    'category', 'difficulty', 'language', 'status',
+)
+
+ID_WIDTH = 33  # 32 hex digits and a newline
+
+
+def _hash(value):
+    return zlib.crc32(value.encode())
+
+
+class CourseSimilarityIndex:
+    """Memory-mapped course embeddings with exact top-k cosine queries."""
+
+    def __init__(self, directory=None, dimensions=None):
+        self.directory = directory or settings.COURSE_SIMILARITY_DIR
+        self.text_dimensions = dimensions or settings.COURSE_SIMILARITY_DIMENSIONS
+        self.width = self.text_dimensions + CATEGORY_DIMENSIONS + DIFFICULTY_DIMENSIONS + LANGUAGE_DIMENSIONS
+        self._lock = threading.RLock()
+        self._version = None
+        self._idf = None
+        self._reset()
+
+    def _reset(self):
+        self._vectors = np.zeros((0, self.width), dtype=np.float32)
+        self._published = np.zeros(0, dtype=bool)
+        self._ids = []
+        self._slots = {}
+
+    # Files
+
+    @property
+    def _current(self):
+        return os.path.join(self.directory, 'current')
+
+    def _path(self, version, name):
+        return os.path.join(self.directory, version, name)
+
+    def _file_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        handle = open(os.path.join(self.directory, 'lock'), 'a')
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        return handle
+
+    @property
+    def built(self):
+        """Whether ``rebuild_course_similarity`` has built a version yet."""
+        return os.path.exists(self._current)
+
+    def _refresh(self):
+        """Map the current version, picking up slots appended since the last call."""
+        version = os.readlink(self._current)
+        if version != self._version:
+            self._reset()
+            self._version = version
+            self._idf = None
+
+        count = os.path.getsize(self._path(version, 'ids')) // ID_WIDTH
+        if count == len(self._ids):
+            return
+        with open(self._path(version, 'ids'), 'rb') as ids:
+            ids.seek(len(self._ids) * ID_WIDTH)
+            for line in ids.read((count - len(self._ids)) * ID_WIDTH).split(b'\n')[:-1]:
+                course_id = uuid.UUID(line.decode())
+                self._slots[course_id] = len(self._ids)
+                self._ids.append(course_id)
+        # Rows and flags are written before ids, so they cover every listed slot
+        self._vectors = np.memmap(self._path(version, 'vectors'), dtype=np.float32, mode='r', shape=(count, self.width))
+        self._published = np.memmap(self._path(version, 'published'), dtype=np.bool_, mode='r', shape=(count,))
+
+    def _load_idf(self):
+        if self._idf is None:
+            with open(self._path(self._version, 'idf.json')) as handle:
+                self._idf = json.load(handle)
+        return self._idf
+
+    # Embedding
+
+    def _terms(self, course):
+        document = build_course_document(course, lessons=())
+        weights = Counter()
+        for field in TEXT_FIELDS:
+            for term in analyze(document[field]):
+                weights[term] += FIELD_WEIGHTS[field][1]
+        return weights
+
+    def _embed(self, course, terms, idf):
+        row = np.zeros(self.width, dtype=np.float32)
+        text = row[:self.text_dimensions]
+        documents, frequencies = idf['documents'], idf['df']
+        for term, weight in terms.items():
+            value = (1 + math.log(weight)) * (math.log((1 + documents) / (1 + frequencies.get(term, 0))) + 1)
+            hashed = _hash(term)
+            text[hashed % self.text_dimensions] += value if hashed & 0x80000000 else -value
+        norm = np.linalg.norm(text)
+        if norm:
+            text *= math.sqrt(PART_WEIGHTS['text']) / norm
+
+        offset = self.text_dimensions
+        if course.category_id:
+            row[offset + _hash(str(course.category_id)) % CATEGORY_DIMENSIONS] = math.sqrt(PART_WEIGHTS['category'])
+        offset += CATEGORY_DIMENSIONS
+        if course.difficulty in DIFFICULTY_LEVELS:
+            angle = DIFFICULTY_LEVELS.index(course.difficulty) * math.pi / 4
+            row[offset:offset + 2] = np.array([math.cos(angle), math.sin(angle)]) * math.sqrt(PART_WEIGHTS['difficulty'])
+        offset += DIFFICULTY_DIMENSIONS
+        if course.language:
+            row[offset + _hash(course.language.strip().lower()) % LANGUAGE_DIMENSIONS] = math.sqrt(PART_WEIGHTS['language'])
+
+        norm = np.linalg.norm(row)
+        return row / norm if norm else row
+
+    # Writing
+
+    def rebuild(self):
+        """
+        Embed every course into a new version and switch to it.
+
+        Returns:
+            int: Number of courses indexed
+        """
+        from .models import Course
+
+        with self._lock, self._file_lock():
+            courses = list(Course.objects.only(*COURSE_FIELDS).order_by().iterator(chunk_size=2000))
+            terms = [self._terms(course) for course in courses]
+            frequencies = Counter()
+            for weights in terms:
+                frequencies.update(weights.keys())
+            idf = {'documents': len(courses), 'df': dict(frequencies)}
+
+            version = f'v{time.time_ns()}'
+            os.makedirs(os.path.join(self.directory, version))
+            vectors = np.memmap(
+                self._path(version, 'vectors'), dtype=np.float32, mode='w+', shape=(max(len(courses), 1), self.width)
+            )
+            for position, (course, weights) in enumerate(zip(courses, terms)):
+                vectors[position] = self._embed(course, weights, idf)
+            vectors.flush()
+            del vectors
+            with open(self._path(version, 'vectors'), 'r+b') as handle:
+                handle.truncate(len(courses) * self.width * 4)
+            with open(self._path(version, 'published'), 'wb') as handle:
+                handle.write(bytes(course.status == 'published' for course in courses))
+            with open(self._path(version, 'idf.json'), 'w') as handle:
+                json.dump(idf, handle)
+            with open(self._path(version, 'ids'), 'wb') as handle:
+                handle.write(b''.join(f'{course.id.hex}\n'.encode() for course in courses))
+
+            link = f'{self._current}.{version}'
+            os.symlink(version, link)
+            os.replace(link, self._current)
+            # Processes still mapping an old version keep reading it until they refresh
+            for name in os.listdir(self.directory):
+                if name.startswith('v') and name != version:
+                    shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            logger.info('Course similarity index %s built with %d courses', version, len(courses))
+            return len(courses)
+
+    def update(self, course_ids):
+        """Re-embed the given courses in place, appending ones not indexed yet."""
+        from .models import Course
+
+        if not self.built:
+            return
+        with self._lock, self._file_lock():
+            self._refresh()
+            idf = self._load_idf()
+            courses = {course.id: course for course in Course.objects.filter(id__in=course_ids).only(*COURSE_FIELDS)}
+            appended = []
+            with open(self._path(self._version, 'vectors'), 'r+b') as vectors, \
+                    open(self._path(self._version, 'published'), 'r+b') as published:
+                for course_id in dict.fromkeys(course_ids):
+                    course = courses.get(course_id)
+                    if course is None:
+                        self._write_flag(published, course_id, False)
+                        continue
+                    row = self._embed(course, self._terms(course), idf).tobytes()
+                    slot = self._slots.get(course.id)
+                    if slot is None:
+                        # The next slot after the listed ones, not the end of the file: an update
+                        # that crashed before writing its ids leaves rows no id points to
+                        slot = len(self._ids) + len(appended)
+                        appended.append(course.id)
+                    vectors.seek(slot * self.width * 4)
+                    published.seek(slot)
+                    vectors.write(row)
+                    published.write(bytes([course.status == 'published']))
+            if appended:
+                with open(self._path(self._version, 'ids'), 'ab') as ids:
+                    ids.write(b''.join(f'{course_id.hex}\n'.encode() for course_id in appended))
+            self._refresh()
+
+    def _write_flag(self, published, course_id, value):
+        slot = self._slots.get(course_id)
+        if slot is not None:
+            published.seek(slot)
+            published.write(bytes([value]))
+
+    def remove(self, course_id):
+        """Stop returning a course (e.g. deleted); its slot is dropped at the next rebuild."""
+        if not self.built:
+            return
+        with self._lock, self._file_lock():
+            self._refresh()
+            with open(self._path(self._version, 'published'), 'r+b') as published:
+                self._write_flag(published, course_id, False)
+
+    # Queries
+
+    def vectors_for(self, course_ids, embed_missing=True):
+        """
+        Return the rows of ``course_ids``, embedding courses not indexed yet.
+
+        Courses that do not exist, or are not indexed when ``embed_missing``
+        is off, get a zero row, so rows line up with ``course_ids``.
+        """
+        rows = np.zeros((len(course_ids), self.width), dtype=np.float32)
+        if not self.built:
+            return rows
+        with self._lock:
+            self._refresh()
+            missing = [course_id for course_id in course_ids if course_id not in self._slots]
+        if missing and embed_missing:
+            self.update(missing)
+        with self._lock:
+            found = [(row, self._slots[course_id]) for row, course_id in enumerate(course_ids) if course_id in self._slots]
+            if found:
+                positions, slots = zip(*found)
+                rows[list(positions)] = self._vectors[list(slots)]
+        return rows
+
+    def similar_to_vectors(self, queries, k=10, exclude=()):
+        """
+        Find the published courses closest to each query row.
+
+        Args:
+            queries: Array of query rows (one per result list)
+            k: Results per query
+            exclude: Course ids never returned (e.g. the query courses themselves)
+
+        Returns:
+            list: One list of (course_id, score) per query, best first
+        """
+        if not self.built:
+            return [[] for _ in range(len(queries))]
+        with self._lock:
+            self._refresh()
+            vectors, published, ids = self._vectors, self._published, list(self._ids)
+            excluded = [self._slots[course_id] for course_id in exclude if course_id in self._slots]
+        if not len(ids) or not len(queries):
+            return [[] for _ in range(len(queries))]
+
+        results = []
+        for start in range(0, len(queries), 64):
+            scores = np.asarray(queries[start:start + 64], dtype=np.float32) @ vectors.T
+            scores[:, ~published] = -np.inf
+            scores[:, excluded] = -np.inf
+            count = min(k, scores.shape[1])
+            top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            for row, candidates in zip(scores, top):
+                candidates = candidates[np.argsort(-row[candidates])]
+                results.append([
+                    (ids[slot], float(row[slot])) for slot in candidates.tolist() if row[slot] > -np.inf
+                ])
+        return results
+
+    def similar(self, course_id, k=10):
+        """
+        Return the ``k`` published courses most similar to a course.
+
+        Runs no queries, for page views: a course not indexed yet has no
+        similar courses.
+        """
+        vectors = self.vectors_for([course_id], embed_missing=False)
+        if not vectors.any():
+            return []
+        return self.similar_to_vectors(vectors, k=k, exclude=[course_id])[0]
+
+    def similar_to_courses(self, course_ids, k=10, exclude=()):
+        """Return the courses closest to the mean of several courses, e.g. a learner's enrollments."""
+        vectors = self.vectors_for(list(course_ids))
+        if not vectors.any():
+            return []
+        profile = vectors.sum(axis=0, keepdims=True)
+        return self.similar_to_vectors(profile, k=k, exclude=set(course_ids) | set(exclude))[0]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """Return the process-wide similarity index."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CourseSimilarityIndex()
+    return _index
@@ -2,54 +2,78 @@
 Template views for courses (non-API views).
 """
 
+import logging
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
-from django.db.models import Q
+from django.core.paginator import Paginator, Page
+from django.db.models import Exists, OuterRef
 
 from .models import Course, Lesson, Category
+from .cache import TEMPLATE_PARAMS, get_catalog_page
+from .search import search_courses
+from .media import available, signed_url
+from .similarity import get_similarity_index
 from apps.enrollment.models import Enrollment, LessonProgress
 
+logger = logging.getLogger(__name__)
+
 
 def course_catalog_view(request):
     """Course catalog page with search and filters."""
-    courses = Course.objects.filter(status='published').select_related('instructor', 'category')
-    
-    # Search
-    search_query = request.GET.get('q', '')
-    if search_query:
-        courses = courses.filter(
-            Q(title__icontains=search_query) | 
-            Q(description__icontains=search_query)
-        )
+    # Get all categories for filter
+    categories = get_catalog_page('categories', {}, (), lambda: list(Category.objects.all()))
     
-    # Category filter
+    search_query = request.GET.get('q', '').strip()
     category_slug = request.GET.get('category')
-    if category_slug:
-        courses = courses.filter(category__slug=category_slug)
-    
-    # Difficulty filter
     difficulty = request.GET.get('difficulty')
-    if difficulty:
-        courses = courses.filter(difficulty=difficulty)
-    
-    # Price filter
     is_free = request.GET.get('is_free')
-    if is_free == 'true':
-        courses = courses.filter(is_free=True)
     
-    # Sorting
-    sort_by = request.GET.get('sort', '-created_at')
-    courses = courses.order_by(sort_by)
+    # Sorting (search results default to relevance)
+    sort_by = request.GET.get('sort') or '-search_rank'
+    if sort_by == '-search_rank' and not search_query:
+        sort_by = '-created_at'
     
-    # Pagination
-    paginator = Paginator(courses, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    def build_page():
+        courses = Course.objects.filter(status='published').select_related('instructor', 'category')
+        
+        # Search
+        if search_query:
+            courses = search_courses(courses, search_query)
+        
+        # Category filter
+        if category_slug:
+            courses = courses.filter(category__slug=category_slug)
+        
+        # Difficulty filter
+        if difficulty:
+            courses = courses.filter(difficulty=difficulty)
+        
+        # Price filter
+        if is_free == 'true':
+            courses = courses.filter(is_free=True)
+        
+        courses = courses.order_by(sort_by)
+        
+        # Pagination
+        page = Paginator(courses, 12).get_page(request.GET.get('page'))
+        return {
+            'count': page.paginator.count,
+            'number': page.number,
+            'courses': list(page.object_list),
+        }
+    
+    category_id = next(
+        (category.id for category in categories if category.slug == category_slug), None
+    )
+    cached = get_catalog_page('page', request.GET, TEMPLATE_PARAMS, build_page, category=category_id)
     
-    # Get all categories for filter
-    categories = Category.objects.all()
+    # Rebuild the page object around the cached slice
+    paginator = Paginator((), 12)
+    paginator.count = cached['count']
+    page_obj = Page(cached['courses'], cached['number'], paginator)
     
     context = {
         'page_obj': page_obj,
@@ -66,41 +90,55 @@ def course_catalog_view(request):
 
 def course_detail_view(request, slug):
     """Course detail page."""
-    course = get_object_or_404(
-        Course.objects.select_related('instructor', 'category'),
-        slug=slug,
-        status='published'
-    )
+    courses = Course.objects.select_related('instructor', 'category')
+    if request.user.is_authenticated:
+        # Check enrollment in the same query as the course
+        courses = courses.annotate(is_enrolled=Exists(
+            Enrollment.objects.filter(student=request.user, course=OuterRef('pk'))
+        ))
+    course = get_object_or_404(courses, slug=slug, status='published')
     
     # Get lessons
     lessons = course.lessons.all().order_by('chapter_number', 'order')
     
-    # Check if user is enrolled
-    is_enrolled = False
-    if request.user.is_authenticated:
-        is_enrolled = Enrollment.objects.filter(
-            student=request.user,
-            course=course
-        ).exists()
-    
     # Get reviews
     reviews = course.reviews.select_related('student').order_by('-created_at')[:5]
     
     context = {
         'course': course,
         'lessons': lessons,
-        'is_enrolled': is_enrolled,
+        'is_enrolled': getattr(course, 'is_enrolled', False),
         'reviews': reviews,
+        'related_courses': related_courses(course),
     }
     
     return render(request, 'courses/detail.html', context)
 
 
+def related_courses(course):
+    """
+    Published courses closest in content to ``course``, most similar first.
+    
+    Costs at most one query, for the related courses themselves; the
+    similarity index is only read here, never built.
+    """
+    try:
+        neighbors = get_similarity_index().similar(course.id, k=settings.RELATED_COURSES_COUNT)
+    except Exception:
+        logger.warning('Related courses unavailable for %s', course.id, exc_info=True)
+        return []
+    if not neighbors:
+        return []
+    order = {course_id: position for position, (course_id, _) in enumerate(neighbors)}
+    courses = Course.objects.filter(id__in=order, status='published').select_related('category')
+    return sorted(courses, key=lambda related: order[related.id])
+
+
 @login_required
 def lesson_detail_view(request, slug, lesson_id):
     """Lesson viewer page."""
     course = get_object_or_404(Course, slug=slug)
-    lesson = get_object_or_404(Lesson, id=lesson_id, course=course)
+    lesson = get_object_or_404(Lesson.objects.select_related('video_asset'), id=lesson_id, course=course)
     
     # Check if user is enrolled
     enrollment = get_object_or_404(
@@ -124,9 +162,20 @@ def lesson_detail_view(request, slug, lesson_id):
     prev_lesson = lesson_list[current_index - 1] if current_index > 0 else None
     next_lesson = lesson_list[current_index + 1] if current_index < len(lesson_list) - 1 else None
     
+    # Transcoded renditions for players that support HLS, the upload for the rest
+    hls_src = poster_src = ''
+    if available(lesson, 'hls'):
+        hls_src = signed_url(lesson, 'hls')
+        if lesson.video_asset.posters:
+            poster_src = signed_url(lesson, 'hls', lesson.video_asset.posters[0])
+    
     context = {
         'course': course,
         'lesson': lesson,
+        'video_src': lesson.video_url or (signed_url(lesson, 'video') if lesson.video_file else ''),
+        'document_src': signed_url(lesson, 'document') if lesson.document_file else '',
+        'hls_src': hls_src,
+        'poster_src': poster_src,
         'progress': progress,
         'lessons': lessons,
         'prev_lesson': prev_lesson,
@@ -149,8 +198,7 @@ def mark_lesson_complete(request, slug, lesson_id):
             lesson=lesson
         )
         
-        progress.is_completed = True
-        progress.save()
+        progress.mark_complete()
         
         messages.success(request, 'Lesson marked as complete!')
         
@@ -0,0 +1,365 @@
+"""
+Adaptive bitrate (HLS) transcoding of uploaded lesson videos.
+
+Uploading a ``Lesson.video_file`` queues a ``LessonVideo``. ``manage.py
+transcode_videos`` claims queued videos and runs each through ffmpeg in a
+pool of worker threads, one ffmpeg process per video:
+
+* ffprobe reads the duration and frame size; the duration fills in
+  ``Lesson.duration_minutes``.
+* One ffmpeg run decodes the source once and encodes every rendition in
+  ``LESSON_VIDEO_RENDITIONS`` no taller than the source, as HLS segments
+  with aligned keyframes, plus a master playlist.
+* ``LESSON_VIDEO_POSTER_COUNT`` poster frames are taken at even intervals.
+
+The output is stored under ``lesson_hls/<lesson>/<run>/`` and served
+through signed directory URLs (``apps.courses.media``). Replacing the video
+queues it again and retires the old renditions.
+
+Claims, leases and retries work like certificate rendering
+(``apps.certificates.rendering``). Worker threads only run ffmpeg and move
+files; the database is touched from the thread that claimed the batch.
+"""
+
+import json
+import logging
+import os
+import posixpath
+import shutil
+import subprocess
+import tempfile
+import traceback
+import uuid
+from concurrent.futures import as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Lesson, LessonVideo
+
+logger = logging.getLogger(__name__)
+
+MASTER_PLAYLIST = 'master.m3u8'
+
+
+class TranscodeError(Exception):
+    """ffmpeg or ffprobe could not process a video."""
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the video, or it was replaced, while it was being transcoded."""
+
+
+def sync_lesson(lesson):
+    """Queue a lesson's video for transcoding if it changed; drop the renditions of a removed one."""
+    name = lesson.video_file.name if lesson.video_file else ''
+    asset = LessonVideo.objects.filter(lesson=lesson).first()
+    if not name:
+        if asset is not None:
+            asset.delete()
+        return
+    if asset is not None and asset.source_name == name:
+        return
+    enqueue(asset or LessonVideo(lesson=lesson), name)
+
+
+def enqueue(asset, source_name):
+    """Queue a video for transcoding from ``source_name``, as part of the current transaction."""
+    retired = asset.directory
+    asset.source_name = source_name
+    asset.status = 'pending'
+    asset.attempts = 0
+    asset.available_at = timezone.now()
+    asset.claimed_by = ''
+    asset.locked_until = None
+    asset.last_error = ''
+    asset.directory = ''
+    asset.renditions = []
+    asset.posters = []
+    asset.duration_seconds = None
+    asset.transcoded_at = None
+    asset.save()
+    if retired:
+        transaction.on_commit(lambda: delete_directory(retired))
+
+
+def delete_directory(directory):
+    """Delete stored renditions; failures only leave orphaned files."""
+    try:
+        directories, files = default_storage.listdir(directory)
+        for name in files:
+            default_storage.delete(posixpath.join(directory, name))
+        for name in directories:
+            delete_directory(posixpath.join(directory, name))
+        try:
+            os.rmdir(default_storage.path(directory))
+        except (NotImplementedError, OSError):
+            pass  # Remote storages have no directories to remove
+    except FileNotFoundError:
+        pass
+    except Exception:
+        logger.warning('Failed to delete lesson video renditions in %s', directory, exc_info=True)
+
+
+def claim(batch_size):
+    """
+    Claim due videos for this worker.
+
+    Returns:
+        list: Claimed ``LessonVideo`` rows
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = Q(status='pending', available_at__lte=now) | Q(status='processing', locked_until__lt=now)
+
+    with transaction.atomic():
+        candidates = list(
+            LessonVideo.objects.filter(due)
+            .order_by('available_at')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not candidates:
+            return []
+        LessonVideo.objects.filter(due, id__in=candidates).update(
+            status='processing',
+            claimed_by=token,
+            locked_until=now + timedelta(seconds=settings.LESSON_VIDEO_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+        )
+    return list(LessonVideo.objects.filter(claimed_by=token, status='processing').order_by('available_at'))
+
+
+def _run(command, timeout):
+    try:
+        completed = subprocess.run(command, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise TranscodeError(f'{command[0]} timed out after {timeout}s')
+    if completed.returncode != 0:
+        raise TranscodeError(
+            f'{command[0]} exited with {completed.returncode}: {completed.stderr.decode(errors="replace")[-2000:]}'
+        )
+    return completed.stdout
+
+
+def probe(path):
+    """
+    Read a video's duration, frame size and whether it has sound.
+
+    Returns:
+        dict: ``duration`` (seconds), ``width``, ``height``, ``has_audio``
+    """
+    output = _run([
+        settings.FFPROBE_BINARY, '-v', 'error', '-print_format', 'json',
+        '-show_entries', 'format=duration:stream=codec_type,width,height,duration', path,
+    ], timeout=120)
+    info = json.loads(output or b'{}')
+    streams = info.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    if video is None or not video.get('height'):
+        raise TranscodeError('The file has no video stream')
+    duration = info.get('format', {}).get('duration') or video.get('duration')
+    return {
+        'duration': float(duration) if duration else 0.0,
+        'width': int(video['width']),
+        'height': int(video['height']),
+        'has_audio': any(stream.get('codec_type') == 'audio' for stream in streams),
+    }
+
+
+def renditions_for(height):
+    """Return the configured renditions no taller than the source, and always the smallest one."""
+    renditions = sorted(settings.LESSON_VIDEO_RENDITIONS, key=lambda rendition: rendition['height'])
+    return [rendition for rendition in renditions if rendition['height'] <= height] or renditions[:1]
+
+
+def hls_command(source, output_dir, renditions, has_audio):
+    """Build the ffmpeg command encoding every rendition as HLS in one decoding pass."""
+    segment = settings.LESSON_VIDEO_SEGMENT_SECONDS
+    count = len(renditions)
+    filters = [f"[0:v]split={count}" + ''.join(f'[v{index}]' for index in range(count))]
+    filters += [
+        f"[v{index}]scale=-2:{rendition['height']}[v{index}out]" for index, rendition in enumerate(renditions)
+    ]
+
+    command = [
+        settings.FFMPEG_BINARY, '-hide_banner', '-nostdin', '-y', '-i', source,
+        '-filter_complex', ';'.join(filters),
+    ]
+    streams = []
+    for index, rendition in enumerate(renditions):
+        command += ['-map', f'[v{index}out]']
+        if has_audio:
+            command += ['-map', '0:a:0']
+        streams.append(f"v:{index}{f',a:{index}' if has_audio else ''},name:{rendition['name']}")
+    for index, rendition in enumerate(renditions):
+        kbps = rendition['video_kbps']
+        command += [
+            f'-c:v:{index}', 'libx264', f'-b:v:{index}', f'{kbps}k',
+            f'-maxrate:v:{index}', f'{int(kbps * 1.07)}k', f'-bufsize:v:{index}', f'{kbps * 2}k',
+        ]
+        if has_audio:
+            command += [f'-c:a:{index}', 'aac', f'-b:a:{index}', f"{rendition['audio_kbps']}k", f'-ac:a:{index}', '2']
+    command += [
+        '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        # Keyframes on segment boundaries keep renditions switchable at every segment
+        '-sc_threshold', '0', '-force_key_frames', f'expr:gte(t,n_forced*{segment})',
+        '-f', 'hls', '-hls_time', str(segment), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', os.path.join(output_dir, '%v', 'segment_%05d.ts'),
+        '-master_pl_name', MASTER_PLAYLIST,
+        '-var_stream_map', ' '.join(streams),
+        os.path.join(output_dir, '%v', 'index.m3u8'),
+    ]
+    return command
+
+
+def poster_commands(source, output_dir, duration, height):
+    """Build one ffmpeg command per poster frame, at even intervals through the video."""
+    count = settings.LESSON_VIDEO_POSTER_COUNT
+    commands = []
+    for index in range(count):
+        position = duration * (index + 1) / (count + 1)
+        commands.append((f'poster_{index + 1}.jpg', [
+            settings.FFMPEG_BINARY, '-hide_banner', '-nostdin', '-y', '-ss', f'{position:.3f}', '-i', source,
+            '-frames:v', '1', '-vf', f'scale=-2:{min(height, 720)}', '-q:v', '3',
+            os.path.join(output_dir, f'poster_{index + 1}.jpg'),
+        ]))
+    return commands
+
+
+def transcode(source_name, directory):
+    """
+    Transcode a stored video and store its renditions and posters under ``directory``.
+
+    Runs in a worker thread: it touches storage and ffmpeg, never the database.
+
+    Returns:
+        dict: ``duration``, ``renditions`` and ``posters`` of the stored output
+    """
+    with tempfile.TemporaryDirectory(prefix='transcode-') as workdir:
+        try:
+            source = default_storage.path(source_name)
+        except NotImplementedError:
+            # Remote storage: ffmpeg needs a local copy
+            source = os.path.join(workdir, 'source' + os.path.splitext(source_name)[1])
+            with default_storage.open(source_name, 'rb') as remote, open(source, 'wb') as local:
+                shutil.copyfileobj(remote, local, 1024 * 1024)
+
+        info = probe(source)
+        renditions = renditions_for(info['height'])
+        output_dir = os.path.join(workdir, 'hls')
+        for rendition in renditions:
+            os.makedirs(os.path.join(output_dir, rendition['name']))
+        _run(hls_command(source, output_dir, renditions, info['has_audio']), timeout=settings.LESSON_VIDEO_TIMEOUT)
+
+        posters = []
+        for name, command in poster_commands(source, output_dir, info['duration'], info['height']):
+            try:
+                _run(command, timeout=120)
+                posters.append(name)
+            except TranscodeError:
+                logger.warning('Could not take poster frame %s of %s', name, source_name, exc_info=True)
+
+        for root, _, files in os.walk(output_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, output_dir).replace(os.sep, '/')
+                with open(path, 'rb') as handle:
+                    default_storage.save(posixpath.join(directory, relative), File(handle))
+
+    return {
+        'duration': info['duration'],
+        'renditions': [
+            {
+                'name': rendition['name'],
+                'height': rendition['height'],
+                'bandwidth': (rendition['video_kbps'] + (rendition['audio_kbps'] if info['has_audio'] else 0)) * 1000,
+                'playlist': f"{rendition['name']}/index.m3u8",
+            }
+            for rendition in renditions
+        ],
+        'posters': posters,
+    }
+
+
+def _store(asset, directory, result):
+    """Record a finished transcode and the lesson's duration, if the video is still ours."""
+    with transaction.atomic():
+        locked = LessonVideo.objects.select_for_update().filter(
+            pk=asset.pk, claimed_by=asset.claimed_by, status='processing', source_name=asset.source_name
+        ).first()
+        if locked is None:
+            raise LeaseLost(asset.pk)
+        locked.status = 'ready'
+        locked.directory = directory
+        locked.renditions = result['renditions']
+        locked.posters = result['posters']
+        locked.duration_seconds = result['duration']
+        locked.transcoded_at = timezone.now()
+        locked.claimed_by = ''
+        locked.locked_until = None
+        locked.last_error = ''
+        locked.save(update_fields=[
+            'status', 'directory', 'renditions', 'posters', 'duration_seconds', 'transcoded_at',
+            'claimed_by', 'locked_until', 'last_error', 'updated_at',
+        ])
+
+        if result['duration']:
+            lesson = Lesson.objects.get(pk=asset.lesson_id)
+            lesson.duration_minutes = max(1, round(result['duration'] / 60))
+            lesson.save(update_fields=['duration_minutes', 'updated_at'])
+
+
+def _fail(asset):
+    give_up = asset.attempts >= settings.LESSON_VIDEO_MAX_ATTEMPTS
+    delay = min(settings.LESSON_VIDEO_RETRY_BASE_SECONDS * 2 ** (asset.attempts - 1), 6 * 3600)
+    LessonVideo.objects.filter(
+        pk=asset.pk, claimed_by=asset.claimed_by, status='processing'
+    ).update(
+        status='failed' if give_up else 'pending',
+        available_at=timezone.now() + timedelta(seconds=delay),
+        claimed_by='',
+        locked_until=None,
+        last_error=traceback.format_exc()[-4000:],
+    )
+
+
+def process_batch(batch_size=1, pool=None):
+    """
+    Claim and transcode one batch of due videos.
+
+    Args:
+        batch_size: Videos claimed at once; match it to the pool size
+        pool: ``concurrent.futures`` executor to transcode in; in-process when None
+
+    Returns:
+        int: Number of videos claimed
+    """
+    assets = claim(batch_size)
+    if not assets:
+        return 0
+    directories = {asset.pk: f'lesson_hls/{asset.lesson_id}/{uuid.uuid4().hex}' for asset in assets}
+
+    if pool is not None:
+        futures = {pool.submit(transcode, asset.source_name, directories[asset.pk]): asset for asset in assets}
+        outcomes = ((futures[future], future.result) for future in as_completed(futures))
+    else:
+        outcomes = ((asset, lambda asset=asset: transcode(asset.source_name, directories[asset.pk])) for asset in assets)
+
+    for asset, result in outcomes:
+        try:
+            _store(asset, directories[asset.pk], result())
+        except LeaseLost:
+            logger.warning('Video %s was replaced or re-claimed while transcoding; discarding the output', asset.pk)
+            delete_directory(directories[asset.pk])
+        except Exception:
+            logger.exception('Transcoding video %s failed', asset.pk)
+            delete_directory(directories[asset.pk])
+            _fail(asset)
+    return len(assets)
@@ -4,7 +4,7 @@ URL patterns for courses API.
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, CourseViewSet, LessonViewSet
+from .views import CategoryViewSet, CourseViewSet, LessonViewSet, LessonMediaView, lesson_media_stream
 
 app_name = 'courses'
 
@@ -14,5 +14,8 @@ router.register(r'', CourseViewSet, basename='course')
 router.register(r'lessons', LessonViewSet, basename='lesson')
 
 urlpatterns = [
+    path('lessons/<uuid:pk>/media/<str:kind>/', LessonMediaView.as_view(), name='lesson_media'),
+    path('media/<str:token>/', lesson_media_stream, name='lesson_media_stream'),
+    path('media/<str:token>/<path:path>', lesson_media_stream, name='lesson_media_file'),
     path('', include(router.urls)),
 ]
@@ -2,25 +2,38 @@
 Views for courses app.
 """
 
-from rest_framework import generics, viewsets, filters, status
+import uuid
+
+from rest_framework import generics, viewsets, views, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
+from django.conf import settings
+from django.core.signing import BadSignature
+from django.db.models import Count, Q
+from django.http import Http404, HttpResponseForbidden
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
 
 from .models import Category, Course, Lesson
+from .cache import API_PARAMS, get_catalog_page
+from .filters import CourseSearchFilter, CourseOrderingFilter
+from . import media
 from .serializers import (
     CategorySerializer, CourseListSerializer, CourseDetailSerializer,
     CourseCreateUpdateSerializer, LessonSerializer
 )
 from apps.users.permissions import IsInstructor, IsInstructorOrAdmin
+from apps.core.pagination import SignedCursorPagination
 
 
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for categories."""
     
-    queryset = Category.objects.all()
+    queryset = Category.objects.annotate(
+        published_course_count=Count('courses', filter=Q(courses__status='published'))
+    ).order_by('name')
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
     lookup_field = 'slug'
@@ -29,11 +42,11 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
 class CourseViewSet(viewsets.ModelViewSet):
     """ViewSet for courses with search and filtering."""
     
-    queryset = Course.objects.filter(status='published').select_related('instructor', 'category')
+    queryset = Course.objects.filter(status='published').for_listing()
     permission_classes = [AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = SignedCursorPagination
+    filter_backends = [DjangoFilterBackend, CourseSearchFilter, CourseOrderingFilter]
     filterset_fields = ['category', 'difficulty', 'is_free']
-    search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'average_rating', 'enrollment_count', 'price']
     ordering = ['-created_at']
     lookup_field = 'slug'
@@ -59,10 +72,40 @@ class CourseViewSet(viewsets.ModelViewSet):
         # Show all courses for instructors viewing their own
         if self.request.user.is_authenticated and self.request.user.is_instructor:
             if self.request.query_params.get('my_courses'):
-                queryset = Course.objects.filter(instructor=self.request.user)
+                queryset = Course.objects.filter(instructor=self.request.user).for_listing()
+        
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related('lessons__video_asset')
         
         return queryset
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ['list', 'retrieve']:
+            # One grouped query instead of a COUNT per nested category
+            context['category_course_counts'] = Course.objects.published_counts_by_category()
+        return context
+    
+    def list(self, request, *args, **kwargs):
+        # Instructors' own listings include drafts and are never cached
+        if request.query_params.get('my_courses'):
+            return super().list(request, *args, **kwargs)
+        
+        category = request.query_params.get('category')
+        try:
+            category = uuid.UUID(category) if category else None
+        except ValueError:
+            category = None
+        
+        data = get_catalog_page(
+            f'api:{request.get_host()}',
+            request.query_params,
+            API_PARAMS,
+            build=lambda: super(CourseViewSet, self).list(request, *args, **kwargs).data,
+            category=category,
+        )
+        return Response(data)
+    
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsInstructor()]
@@ -72,7 +115,7 @@ class CourseViewSet(viewsets.ModelViewSet):
     def lessons(self, request, slug=None):
         """Get all lessons for a course."""
         course = self.get_object()
-        lessons = course.lessons.all()
+        lessons = course.lessons.select_related('video_asset')
         serializer = LessonSerializer(lessons, many=True)
         return Response(serializer.data)
 
@@ -80,7 +123,7 @@ class CourseViewSet(viewsets.ModelViewSet):
 class LessonViewSet(viewsets.ModelViewSet):
     """ViewSet for lessons."""
     
-    queryset = Lesson.objects.all()
+    queryset = Lesson.objects.select_related('video_asset')
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated, IsInstructorOrAdmin]
     
@@ -98,3 +141,46 @@ class LessonViewSet(viewsets.ModelViewSet):
             from rest_framework.exceptions import PermissionDenied
             raise PermissionDenied("You don't have permission to add lessons to this course.")
         serializer.save()
+
+
+class LessonMediaView(views.APIView):
+    """
+    Authorize access to a lesson's video or document file.
+    
+    Returns a signed URL for the player to stream from, so its range
+    requests skip the permission checks made here. ``hls`` is the master
+    playlist of the transcoded renditions, with their poster frames.
+    """
+    
+    permission_classes = [AllowAny]
+    
+    def get(self, request, pk, kind):
+        lesson = get_object_or_404(Lesson.objects.select_related('course', 'video_asset'), pk=pk)
+        if not media.available(lesson, kind):
+            raise Http404('This lesson has no such file.')
+        if not media.can_access(request.user, lesson):
+            return Response({
+                'error': 'You must be enrolled in this course to access its lessons.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        data = {
+            'url': request.build_absolute_uri(media.signed_url(lesson, kind)),
+            'expires_in': settings.LESSON_MEDIA_URL_TTL,
+        }
+        if kind == 'hls':
+            asset = lesson.video_asset
+            data['posters'] = [request.build_absolute_uri(media.signed_url(lesson, kind, name)) for name in asset.posters]
+            data['renditions'] = asset.renditions
+            data['duration_seconds'] = asset.duration_seconds
+        return Response(data)
+
+
+@require_safe
+def lesson_media_stream(request, token, path=''):
+    """Serve a lesson file through a signed URL from ``LessonMediaView``."""
+    try:
+        name = media.unsign(token, path)
+    except BadSignature:
+        return HttpResponseForbidden('This link is invalid or has expired.')
+    if name is None:
+        raise Http404('File not found.')
+    return media.serve(request, name)
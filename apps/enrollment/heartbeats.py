@@ -0,0 +1,462 @@
+"""
+Write-behind buffer for video watch-time heartbeats.
+
+Players report ``watch_time_seconds`` every few seconds. Instead of writing
+``lesson_progress`` on every report, heartbeats are coalesced per
+(enrollment, lesson), keeping the highest watch time, and flushed to the
+database in ``bulk_update`` batches by ``manage.py flush_heartbeats``.
+
+Two buffers are provided:
+
+* ``RedisHeartbeatBuffer`` keeps one hash per enrollment in Redis, so the
+  buffer is shared by all workers and survives their restarts. Flushing
+  moves hashes to an in-flight key first; anything left in flight by a
+  crashed flusher is picked up by the next run.
+* ``LocalHeartbeatBuffer`` is an in-process stand-in for development. Each
+  process appends its heartbeats to its own journal file
+  (``HEARTBEAT_JOURNAL_PATH`` plus the process id) and flushes itself from
+  a background thread and at exit. On start-up a process replays the
+  journals of processes that are no longer running.
+
+Reads merge pending values into serialized progress (see
+``LessonProgressSerializer``), so a student always sees their own latest
+heartbeat even before it is flushed. The progress payload returned to a
+heartbeat is cached per (enrollment, lesson) and dropped whenever the row
+is saved, so steady heartbeats cost no queries.
+"""
+
+import atexit
+import glob
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.core.cache import TwoTierCache
+
+logger = logging.getLogger(__name__)
+
+ENROLLMENT_LOOKUP_TIMEOUT = 10 * 60
+
+# Bounds how long lesson edits take to show in heartbeat responses
+PROGRESS_PAYLOAD_TIMEOUT = 60
+
+enrollment_cache = TwoTierCache()
+
+
+def resolve_enrollment(user, lesson_id):
+    """
+    Return the id of the user's enrollment in the course of a lesson.
+
+    Positive lookups are cached, so steady heartbeats cost no queries. The
+    first lookup also makes sure the progress row exists, so buffered watch
+    time can be merged into it on read before it is flushed.
+    """
+    from .models import Enrollment, LessonProgress
+
+    key = f'heartbeat:enrollment:{user.pk}:{lesson_id}'
+    enrollment_id = enrollment_cache.get(key)
+    if enrollment_id is None:
+        enrollment_id = Enrollment.objects.filter(
+            student=user, course__lessons=lesson_id
+        ).values_list('id', flat=True).first()
+        if enrollment_id is not None:
+            LessonProgress.objects.get_or_create(enrollment_id=enrollment_id, lesson_id=lesson_id)
+            enrollment_id = str(enrollment_id)
+            enrollment_cache.set(key, enrollment_id, ENROLLMENT_LOOKUP_TIMEOUT)
+    return enrollment_id
+
+
+def _progress_key(enrollment_id, lesson_id):
+    return f'heartbeat:progress:{enrollment_id}:{lesson_id}'
+
+
+def get_progress_payload(enrollment_id, lesson_id, serialize):
+    """
+    Return the serialized progress row of an enrollment's lesson, cached.
+
+    Args:
+        serialize: Callable turning a ``LessonProgress`` into its payload
+
+    Returns:
+        dict: The payload, or None when the row does not exist
+    """
+    from .models import LessonProgress
+
+    key = _progress_key(enrollment_id, lesson_id)
+    payload = enrollment_cache.get(key)
+    if payload is None:
+        progress = LessonProgress.objects.select_related('lesson').filter(
+            enrollment_id=enrollment_id, lesson_id=lesson_id
+        ).first()
+        if progress is None:
+            return None
+        payload = serialize(progress)
+        enrollment_cache.set(key, payload, PROGRESS_PAYLOAD_TIMEOUT)
+    return payload
+
+
+def forget_progress_payload(enrollment_id, lesson_id):
+    """Drop the cached progress payload of a row that was saved or deleted."""
+    enrollment_cache.delete(_progress_key(enrollment_id, lesson_id))
+
+
+def apply_watch_times(watch_times):
+    """
+    Write buffered watch times to ``lesson_progress``.
+
+    Existing rows are raised to the buffered value (never lowered) with one
+    ``bulk_update``; missing rows are created with ``bulk_create``.
+
+    Args:
+        watch_times: {(enrollment_id, lesson_id): seconds}
+
+    Returns:
+        int: Number of rows written
+    """
+    from apps.courses.models import Lesson
+    from .models import Enrollment, LessonProgress
+
+    if not watch_times:
+        return 0
+
+    enrollment_ids = {enrollment_id for enrollment_id, _ in watch_times}
+    lesson_ids = {lesson_id for _, lesson_id in watch_times}
+    now = timezone.now()
+
+    with transaction.atomic():
+        changed = []
+        seen = set()
+        for progress in LessonProgress.objects.filter(
+            enrollment_id__in=enrollment_ids, lesson_id__in=lesson_ids
+        ).only('id', 'enrollment_id', 'lesson_id', 'watch_time_seconds').select_for_update():
+            key = (str(progress.enrollment_id), str(progress.lesson_id))
+            if key not in watch_times:
+                continue
+            seen.add(key)
+            if watch_times[key] > progress.watch_time_seconds:
+                progress.watch_time_seconds = watch_times[key]
+                progress.last_accessed = now
+                changed.append(progress)
+        LessonProgress.objects.bulk_update(changed, ['watch_time_seconds', 'last_accessed'], batch_size=500)
+
+        missing = [key for key in watch_times if key not in seen]
+        created = []
+        if missing:
+            # Skip heartbeats for enrollments or lessons deleted since
+            live_enrollments = {str(pk) for pk in Enrollment.objects.filter(
+                id__in={enrollment_id for enrollment_id, _ in missing}
+            ).values_list('id', flat=True)}
+            live_lessons = {str(pk) for pk in Lesson.objects.filter(
+                id__in={lesson_id for _, lesson_id in missing}
+            ).values_list('id', flat=True)}
+            created = LessonProgress.objects.bulk_create([
+                LessonProgress(
+                    enrollment_id=enrollment_id,
+                    lesson_id=lesson_id,
+                    watch_time_seconds=watch_times[(enrollment_id, lesson_id)],
+                )
+                for enrollment_id, lesson_id in missing
+                if enrollment_id in live_enrollments and lesson_id in live_lessons
+            ], batch_size=500, ignore_conflicts=True)
+
+    return len(changed) + len(created)
+
+
+class BaseHeartbeatBuffer:
+    """Interface implemented by heartbeat buffers."""
+
+    def record(self, enrollment_id, lesson_id, seconds):
+        """Buffer a heartbeat and return the highest pending watch time."""
+        raise NotImplementedError
+
+    def pending(self, enrollment_id):
+        """Return {lesson_id: seconds} not yet flushed for an enrollment."""
+        raise NotImplementedError
+
+    def flush(self, batch_size=500):
+        """Write buffered heartbeats to the database; return rows written."""
+        raise NotImplementedError
+
+
+class RedisHeartbeatBuffer(BaseHeartbeatBuffer):
+    """Heartbeat buffer shared by all workers through Redis."""
+
+    # Keep the max of the stored and reported watch time, mark the enrollment dirty
+    RECORD_SCRIPT = """
+        local current = tonumber(redis.call('HGET', KEYS[1], ARGV[1]) or '-1')
+        local seconds = tonumber(ARGV[2])
+        if seconds > current then
+            redis.call('HSET', KEYS[1], ARGV[1], seconds)
+            current = seconds
+        end
+        redis.call('SADD', KEYS[2], ARGV[3])
+        return current
+    """
+
+    # Move dirty enrollments to in-flight, merging into leftovers of a crashed flush
+    CLAIM_SCRIPT = """
+        local ids = redis.call('SPOP', KEYS[1], ARGV[1])
+        for _, id in ipairs(ids) do
+            local live = ARGV[2] .. ':live:' .. id
+            local flight = ARGV[2] .. ':flight:' .. id
+            if redis.call('EXISTS', live) == 0 then
+                -- already flushed
+            elseif redis.call('EXISTS', flight) == 0 then
+                redis.call('RENAME', live, flight)
+            else
+                local values = redis.call('HGETALL', live)
+                for i = 1, #values, 2 do
+                    local current = tonumber(redis.call('HGET', flight, values[i]) or '-1')
+                    if tonumber(values[i + 1]) > current then
+                        redis.call('HSET', flight, values[i], values[i + 1])
+                    end
+                end
+                redis.call('DEL', live)
+            end
+            redis.call('SADD', KEYS[2], id)
+        end
+        return ids
+    """
+
+    lock_timeout = 300
+
+    def __init__(self, url=None, prefix='heartbeats'):
+        import redis
+
+        self.redis = redis.Redis.from_url(url or settings.HEARTBEAT_REDIS_URL, decode_responses=True)
+        self.prefix = prefix
+        self.dirty_key = f'{prefix}:dirty'
+        self.flight_key = f'{prefix}:flight'
+        self._record = self.redis.register_script(self.RECORD_SCRIPT)
+        self._claim = self.redis.register_script(self.CLAIM_SCRIPT)
+
+    def record(self, enrollment_id, lesson_id, seconds):
+        return int(self._record(
+            keys=[f'{self.prefix}:live:{enrollment_id}', self.dirty_key],
+            args=[str(lesson_id), int(seconds), str(enrollment_id)],
+        ))
+
+    def pending(self, enrollment_id):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(f'{self.prefix}:live:{enrollment_id}')
+        pipe.hgetall(f'{self.prefix}:flight:{enrollment_id}')
+        merged = {}
+        for values in pipe.execute():
+            for lesson_id, seconds in values.items():
+                merged[lesson_id] = max(int(seconds), merged.get(lesson_id, 0))
+        return merged
+
+    def flush(self, batch_size=500):
+        lock = self.redis.lock(f'{self.prefix}:flush-lock', timeout=self.lock_timeout, blocking=False)
+        if not lock.acquire():
+            return 0
+        try:
+            written = 0
+            # Finish work a crashed flusher left in flight before claiming more
+            leftovers = list(self.redis.smembers(self.flight_key))
+            for start in range(0, len(leftovers), batch_size):
+                written += self._flush_flight(leftovers[start:start + batch_size])
+            while True:
+                claimed = self._claim(keys=[self.dirty_key, self.flight_key], args=[batch_size, self.prefix])
+                if not claimed:
+                    return written
+                written += self._flush_flight(claimed)
+        finally:
+            lock.release()
+
+    def _flush_flight(self, enrollment_ids):
+        pipe = self.redis.pipeline(transaction=False)
+        for enrollment_id in enrollment_ids:
+            pipe.hgetall(f'{self.prefix}:flight:{enrollment_id}')
+        watch_times = {
+            (enrollment_id, lesson_id): int(seconds)
+            for enrollment_id, values in zip(enrollment_ids, pipe.execute())
+            for lesson_id, seconds in values.items()
+        }
+
+        written = apply_watch_times(watch_times)
+
+        # Only forget the in-flight data once it is committed
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(*[f'{self.prefix}:flight:{enrollment_id}' for enrollment_id in enrollment_ids])
+        pipe.srem(self.flight_key, *enrollment_ids)
+        pipe.execute()
+        return written
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LocalHeartbeatBuffer(BaseHeartbeatBuffer):
+    """In-process heartbeat buffer with a per-process journal file, for development."""
+
+    def __init__(self, journal_path=None, flush_interval=None):
+        self.base_path = journal_path or settings.HEARTBEAT_JOURNAL_PATH
+        self.journal_path = f'{self.base_path}.{os.getpid()}'
+        self.flush_interval = flush_interval or settings.HEARTBEAT_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._buffer = defaultdict(dict)
+        self._replay()
+        self._journal = self._open_journal()
+
+        flusher = threading.Thread(target=self._run_flusher, name='heartbeat-flusher', daemon=True)
+        flusher.start()
+        atexit.register(self.flush)
+
+    def _open_journal(self):
+        os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+        return open(self.journal_path, 'a', buffering=1)
+
+    def _orphaned_journals(self):
+        """
+        Return the journals this process takes over: its own (from an earlier
+        process with the same id) and those of processes that have exited.
+        """
+        orphans = []
+        for path in glob.glob(f'{glob.escape(self.base_path)}.*'):
+            suffix = path[len(self.base_path) + 1:]
+            pid = suffix.split('.', 1)[0]
+            if not pid.isdigit() or not (
+                suffix in (pid, f'{pid}.flushing') or suffix.startswith(f'{pid}.adopting-')
+            ):
+                continue
+            if int(pid) == os.getpid() or not _process_alive(int(pid)):
+                orphans.append(path)
+        return orphans
+
+    def _replay(self):
+        """Reload heartbeats that exited processes buffered but never flushed."""
+        os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+        adopted = []
+        for path in self._orphaned_journals():
+            # Renaming claims the journal; another process starting now may win it
+            claimed = f'{self.journal_path}.adopting-{len(adopted)}'
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            adopted.append(claimed)
+
+        for path in adopted:
+            with open(path) as journal:
+                for line in journal:
+                    try:
+                        enrollment_id, lesson_id, seconds = line.split()
+                        self._merge(enrollment_id, lesson_id, int(seconds))
+                    except ValueError:
+                        # Torn final line from a crash
+                        continue
+
+        # Compact everything adopted into this process's journal
+        compacted = f'{self.journal_path}.tmp'
+        with open(compacted, 'w') as journal:
+            for enrollment_id, lessons in self._buffer.items():
+                for lesson_id, seconds in lessons.items():
+                    journal.write(f'{enrollment_id} {lesson_id} {seconds}\n')
+        os.replace(compacted, self.journal_path)
+        for path in adopted:
+            os.remove(path)
+
+    def _merge(self, enrollment_id, lesson_id, seconds):
+        lessons = self._buffer[enrollment_id]
+        lessons[lesson_id] = max(seconds, lessons.get(lesson_id, -1))
+        return lessons[lesson_id]
+
+    def record(self, enrollment_id, lesson_id, seconds):
+        enrollment_id, lesson_id, seconds = str(enrollment_id), str(lesson_id), int(seconds)
+        with self._lock:
+            self._journal.write(f'{enrollment_id} {lesson_id} {seconds}\n')
+            return self._merge(enrollment_id, lesson_id, seconds)
+
+    def pending(self, enrollment_id):
+        with self._lock:
+            return dict(self._buffer.get(str(enrollment_id), {}))
+
+    def flush(self, batch_size=500):
+        with self._flush_lock:
+            with self._lock:
+                buffered, self._buffer = self._buffer, defaultdict(dict)
+                self._journal.close()
+                flushing_path = f'{self.journal_path}.flushing'
+                if os.path.exists(self.journal_path):
+                    os.replace(self.journal_path, flushing_path)
+                self._journal = self._open_journal()
+
+            watch_times = {
+                (enrollment_id, lesson_id): seconds
+                for enrollment_id, lessons in buffered.items()
+                for lesson_id, seconds in lessons.items()
+            }
+            try:
+                written = apply_watch_times(watch_times)
+            except Exception:
+                # Put everything back; the flushing journal is re-read on restart
+                with self._lock:
+                    for (enrollment_id, lesson_id), seconds in watch_times.items():
+                        self._journal.write(f'{enrollment_id} {lesson_id} {seconds}\n')
+                        self._merge(enrollment_id, lesson_id, seconds)
+                raise
+            if os.path.exists(flushing_path):
+                os.remove(flushing_path)
+            return written
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush watch-time heartbeats')
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+BUFFERS = {
+    'redis': RedisHeartbeatBuffer,
+    'local': LocalHeartbeatBuffer,
+}
+
+
+def get_heartbeat_buffer():
+    """Return the configured heartbeat buffer (``HEARTBEAT_BUFFER``)."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                name = settings.HEARTBEAT_BUFFER
+                buffer_class = BUFFERS.get(name) or import_string(name)
+                _buffer = buffer_class()
+    return _buffer
+
+
+def get_pending_watch_times(enrollment_id, memo):
+    """
+    Return buffered watch times of an enrollment, memoized in ``memo``.
+
+    Serializers pass their context as ``memo`` so a page of progress rows
+    costs one buffer read per enrollment.
+    """
+    pending = memo.setdefault('pending_watch_times', {})
+    if enrollment_id not in pending:
+        try:
+            pending[enrollment_id] = get_heartbeat_buffer().pending(enrollment_id)
+        except Exception:
+            logger.warning('Heartbeat buffer unavailable', exc_info=True)
+            pending[enrollment_id] = {}
+    return pending[enrollment_id]
@@ -0,0 +1,33 @@
+"""
+Django management command to flush buffered watch-time heartbeats.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.enrollment.heartbeats import get_heartbeat_buffer
+
+
+class Command(BaseCommand):
+    help = 'Writes buffered watch-time heartbeats to lesson progress in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Enrollments per bulk write')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep flushing every HEARTBEAT_FLUSH_INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        buffer = get_heartbeat_buffer()
+        while True:
+            started = time.monotonic()
+            written = buffer.flush(batch_size=options['batch_size'])
+            if written or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Flushed {written} lesson progress rows in {time.monotonic() - started:.2f}s'
+                ))
+            if not options['loop']:
+                return
+            time.sleep(settings.HEARTBEAT_FLUSH_INTERVAL)
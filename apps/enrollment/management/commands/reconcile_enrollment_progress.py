@@ -0,0 +1,59 @@
+"""
+Django management command to repair drift in enrollment progress counters.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from apps.courses.models import Lesson
+from apps.enrollment.models import Enrollment, LessonProgress
+
+
+class Command(BaseCommand):
+    help = 'Recounts lesson counters of enrollments that drifted and recomputes their progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Only reconcile enrollments in this course (id)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        lesson_counts = Lesson.objects.filter(
+            course=OuterRef('course')
+        ).order_by().values('course').annotate(count=Count('id')).values('count')
+        completed_counts = LessonProgress.objects.filter(
+            enrollment=OuterRef('pk'), is_completed=True
+        ).order_by().values('enrollment').annotate(count=Count('id')).values('count')
+
+        enrollments = Enrollment.objects.all()
+        if options['course']:
+            enrollments = enrollments.filter(course_id=options['course'])
+
+        # Only rows whose counters disagree with the recount are touched
+        drifted = enrollments.annotate(
+            actual_total=Coalesce(Subquery(lesson_counts), Value(0)),
+            actual_completed=Coalesce(Subquery(completed_counts), Value(0)),
+        ).exclude(
+            total_lessons=F('actual_total'),
+            completed_lessons=F('actual_completed'),
+        ).order_by().values_list('id', 'actual_total', 'actual_completed')
+
+        # Materialize first so repairs do not race the read cursor
+        drifted = list(drifted)
+        size = options['batch_size']
+        for start in range(0, len(drifted), size):
+            batch = [
+                Enrollment(id=enrollment_id, total_lessons=total, completed_lessons=completed)
+                for enrollment_id, total, completed in drifted[start:start + size]
+            ]
+            if not options['dry_run']:
+                self.repair(batch)
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted enrollments'))
+
+    def repair(self, batch):
+        with transaction.atomic():
+            Enrollment.objects.bulk_update(batch, ['total_lessons', 'completed_lessons'])
+            Enrollment.objects.filter(pk__in=[enrollment.id for enrollment in batch]).refresh_progress()
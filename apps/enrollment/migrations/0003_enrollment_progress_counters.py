@@ -0,0 +1,45 @@
+# Generated by Django 5.0.14 on 2026-10-16 20:47
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_lesson_counters(apps, schema_editor):
+    Enrollment = apps.get_model('enrollment', 'Enrollment')
+    LessonProgress = apps.get_model('enrollment', 'LessonProgress')
+    Lesson = apps.get_model('courses', 'Lesson')
+
+    lesson_counts = Lesson.objects.filter(
+        course=OuterRef('course')
+    ).order_by().values('course').annotate(count=Count('id')).values('count')
+    completed_counts = LessonProgress.objects.filter(
+        enrollment=OuterRef('pk'), is_completed=True
+    ).order_by().values('enrollment').annotate(count=Count('id')).values('count')
+
+    Enrollment.objects.update(
+        total_lessons=Coalesce(Subquery(lesson_counts), Value(0)),
+        completed_lessons=Coalesce(Subquery(completed_counts), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search_vector'),
+        ('enrollment', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_lessons',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_lessons',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_lesson_counters, migrations.RunPython.noop),
+    ]
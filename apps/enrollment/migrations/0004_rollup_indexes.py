@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-16 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search_vector'),
+        ('enrollment', '0003_enrollment_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['last_accessed'], name='lesson_prog_last_ac_53e15a_idx'),
+        ),
+    ]
@@ -2,12 +2,42 @@
 Enrollment and progress tracking models.
 """
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, FloatField, Q, Value, When
+from django.utils import timezone
 from apps.users.models import User
 from apps.courses.models import Course, Lesson
 import uuid
 
 
+class EnrollmentQuerySet(models.QuerySet):
+    """QuerySet for maintaining denormalized enrollment progress."""
+    
+    def refresh_progress(self):
+        """
+        Recompute progress fields from the lesson counters, in SQL.
+        
+        Only reads the counter columns, so it can follow an ``F()`` update
+        of the counters in the same transaction. Completion follows the
+        counters both ways: a lesson added to a finished course reopens it.
+        """
+        finished = Q(total_lessons__gt=0, completed_lessons__gte=F('total_lessons'))
+        return self.update(
+            progress_percentage=Case(
+                When(total_lessons=0, then=Value(0.0)),
+                When(finished, then=Value(100.0)),
+                default=F('completed_lessons') * 100.0 / F('total_lessons'),
+                output_field=FloatField(),
+            ),
+            is_completed=Case(When(finished, then=Value(True)), default=Value(False)),
+            completed_at=Case(
+                When(finished, completed_at__isnull=True, then=Value(timezone.now())),
+                When(finished, then=F('completed_at')),
+                default=None,
+            ),
+        )
+
+
 class Enrollment(models.Model):
     """Student enrollment in a course."""
     
@@ -25,10 +55,16 @@ class Enrollment(models.Model):
     is_completed = models.BooleanField(default=False)
     completed_at = models.DateTimeField(null=True, blank=True)
     
+    # Denormalized counters, kept current incrementally (see apps.enrollment.signals)
+    completed_lessons = models.PositiveIntegerField(default=0)
+    total_lessons = models.PositiveIntegerField(default=0)
+    
     # Timestamps
     enrolled_at = models.DateTimeField(auto_now_add=True)
     last_accessed = models.DateTimeField(auto_now=True)
     
+    objects = EnrollmentQuerySet.as_manager()
+    
     class Meta:
         db_table = 'enrollments'
         unique_together = ['student', 'course']
@@ -41,22 +77,28 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student.username} - {self.course.title}"
     
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.total_lessons:
+            self.total_lessons = Lesson.objects.filter(course_id=self.course_id).count()
+        super().save(*args, **kwargs)
+    
+    def record_lesson_completed(self):
+        """Count one more completed lesson, atomically."""
+        with transaction.atomic():
+            Enrollment.objects.filter(pk=self.pk).update(completed_lessons=F('completed_lessons') + 1)
+            Enrollment.objects.filter(pk=self.pk).refresh_progress()
+        self.refresh_from_db(fields=[
+            'completed_lessons', 'total_lessons', 'progress_percentage',
+            'is_completed', 'completed_at',
+        ])
+    
     def update_progress(self):
-        """Calculate and update progress percentage."""
-        total_lessons = self.course.lessons.count()
-        if total_lessons == 0:
-            self.progress_percentage = 0
-        else:
-            completed_lessons = self.lesson_progress.filter(is_completed=True).count()
-            self.progress_percentage = (completed_lessons / total_lessons) * 100
-            
-            if self.progress_percentage >= 100:
-                self.is_completed = True
-                if not self.completed_at:
-                    from django.utils import timezone
-                    self.completed_at = timezone.now()
-        
-        self.save()
+        """Recount lessons from scratch and update progress (used to repair drift)."""
+        self.total_lessons = Lesson.objects.filter(course_id=self.course_id).count()
+        self.completed_lessons = self.lesson_progress.filter(is_completed=True).count()
+        self.save(update_fields=['total_lessons', 'completed_lessons'])
+        Enrollment.objects.filter(pk=self.pk).refresh_progress()
+        self.refresh_from_db(fields=['progress_percentage', 'is_completed', 'completed_at'])
 
 
 class LessonProgress(models.Model):
@@ -85,6 +127,7 @@ class LessonProgress(models.Model):
         ordering = ['enrollment', 'lesson__order']
         indexes = [
             models.Index(fields=['enrollment', 'lesson']),
+            models.Index(fields=['last_accessed']),
         ]
     
     def __str__(self):
@@ -92,9 +135,18 @@ class LessonProgress(models.Model):
     
     def mark_complete(self):
         """Mark lesson as completed and update enrollment progress."""
-        if not self.is_completed:
-            from django.utils import timezone
+        if self.is_completed:
+            return False
+        
+        with transaction.atomic():
+            # Lock the row so concurrent requests count the lesson only once
+            locked = LessonProgress.objects.select_for_update().get(pk=self.pk)
+            if locked.is_completed:
+                self.is_completed, self.completed_at = True, locked.completed_at
+                return False
+            
             self.is_completed = True
             self.completed_at = timezone.now()
-            self.save()
-            self.enrollment.update_progress()
+            self.save(update_fields=['is_completed', 'completed_at', 'watch_time_seconds', 'last_accessed'])
+            self.enrollment.record_lesson_completed()
+        return True
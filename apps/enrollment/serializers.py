@@ -4,6 +4,7 @@ Serializers for enrollment app.
 
 from rest_framework import serializers
 from .models import Enrollment, LessonProgress
+from .heartbeats import get_pending_watch_times
 from apps.courses.serializers import CourseListSerializer, LessonSerializer
 
 
@@ -19,6 +20,15 @@ class LessonProgressSerializer(serializers.ModelSerializer):
             'watch_time_seconds', 'started_at', 'last_accessed'
         ]
         read_only_fields = ['id', 'started_at', 'last_accessed']
+    
+    def to_representation(self, instance):
+        """Include buffered heartbeats that have not been flushed yet."""
+        data = super().to_representation(instance)
+        pending = get_pending_watch_times(str(instance.enrollment_id), self.context)
+        buffered = pending.get(str(instance.lesson_id))
+        if buffered is not None and buffered > data['watch_time_seconds']:
+            data['watch_time_seconds'] = buffered
+        return data
 
 
 class EnrollmentSerializer(serializers.ModelSerializer):
@@ -0,0 +1,46 @@
+"""
+Signals for keeping enrollment lesson counters and cached progress current.
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from apps.courses.models import Lesson
+from .heartbeats import forget_progress_payload
+from .models import Enrollment, LessonProgress
+
+
+@receiver(post_save, sender=Lesson)
+def count_added_lesson(sender, instance, created, **kwargs):
+    """A new lesson raises the total of every enrollment in the course."""
+    if not created:
+        return
+    enrollments = Enrollment.objects.filter(course_id=instance.course_id)
+    enrollments.update(total_lessons=F('total_lessons') + 1)
+    enrollments.refresh_progress()
+
+
+@receiver(pre_delete, sender=Lesson)
+def count_removed_lesson(sender, instance, **kwargs):
+    """
+    A removed lesson lowers the totals, and the completed counts of the
+    enrollments that had completed it. Runs before the lesson progress
+    rows are cascade-deleted, inside the deletion transaction.
+    """
+    Enrollment.objects.filter(
+        pk__in=LessonProgress.objects.filter(lesson=instance, is_completed=True).values('enrollment_id'),
+        completed_lessons__gt=0,
+    ).update(completed_lessons=F('completed_lessons') - 1)
+    
+    enrollments = Enrollment.objects.filter(course_id=instance.course_id)
+    enrollments.filter(total_lessons__gt=0).update(total_lessons=F('total_lessons') - 1)
+    enrollments.refresh_progress()
+
+
+@receiver(post_save, sender=LessonProgress)
+@receiver(post_delete, sender=LessonProgress)
+def forget_cached_progress(sender, instance, **kwargs):
+    """Heartbeat responses must show completion and other changes to the row."""
+    enrollment_id, lesson_id = str(instance.enrollment_id), str(instance.lesson_id)
+    transaction.on_commit(lambda: forget_progress_payload(enrollment_id, lesson_id))
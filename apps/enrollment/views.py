@@ -2,17 +2,23 @@
 Views for enrollment app.
 """
 
+import logging
+
 from rest_framework import generics, views, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
 from .models import Enrollment, LessonProgress
+from .heartbeats import get_heartbeat_buffer, get_progress_payload, resolve_enrollment
 from apps.courses.models import Course, Lesson
 from .serializers import EnrollmentSerializer, EnrollmentCreateSerializer, LessonProgressSerializer
 from apps.users.permissions import IsStudent
 
+logger = logging.getLogger(__name__)
+
 
 class EnrollmentListView(generics.ListAPIView):
     """List all enrollments for the current user."""
@@ -56,15 +62,16 @@ class EnrollmentCreateView(views.APIView):
                     'error': 'Payment required for this course.'
                 }, status=status.HTTP_402_PAYMENT_REQUIRED)
         
-        # Create enrollment
-        enrollment = Enrollment.objects.create(
-            student=request.user,
-            course=course
-        )
-        
-        # Update course enrollment count
-        course.enrollment_count += 1
-        course.save(update_fields=['enrollment_count'])
+        # Create enrollment; its domain event is queued in the same transaction
+        with transaction.atomic():
+            enrollment = Enrollment.objects.create(
+                student=request.user,
+                course=course
+            )
+            
+            # Update course enrollment count
+            course.enrollment_count += 1
+            course.save(update_fields=['enrollment_count'])
         
         return Response(
             EnrollmentSerializer(enrollment).data,
@@ -78,38 +85,82 @@ class LessonProgressUpdateView(views.APIView):
     permission_classes = [IsAuthenticated, IsStudent]
     
     def post(self, request, lesson_id):
+        watch_time = request.data.get('watch_time_seconds', 0)
+        mark_complete = request.data.get('mark_complete', False)
+        
+        # Pure heartbeats are buffered and written to the database in batches
+        if watch_time and not mark_complete:
+            response = self.record_heartbeat(request, lesson_id, watch_time)
+            if response is not None:
+                return response
+        
         lesson = get_object_or_404(Lesson, id=lesson_id)
         
         # Get or create enrollment
         try:
             enrollment = Enrollment.objects.get(
                 student=request.user,
-                course=lesson.course
+                course_id=lesson.course_id
             )
         except Enrollment.DoesNotExist:
             return Response({
                 'error': 'You are not enrolled in this course.'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        # Get or create lesson progress
+        # Get or create lesson progress, writing the watch time on creation
         progress, created = LessonProgress.objects.get_or_create(
             enrollment=enrollment,
-            lesson=lesson
+            lesson=lesson,
+            defaults={'watch_time_seconds': watch_time or 0}
         )
         
-        # Update progress
-        watch_time = request.data.get('watch_time_seconds', 0)
-        mark_complete = request.data.get('mark_complete', False)
-        
-        if watch_time:
+        if watch_time and not created:
             progress.watch_time_seconds = watch_time
         
         if mark_complete and not progress.is_completed:
+            # Saves the watch time along with the completion
             progress.mark_complete()
-        
-        progress.save()
+        elif watch_time and not created:
+            progress.save(update_fields=['watch_time_seconds', 'last_accessed'])
         
         return Response(LessonProgressSerializer(progress).data)
+    
+    def record_heartbeat(self, request, lesson_id, watch_time):
+        """
+        Buffer a watch-time heartbeat without writing lesson_progress.
+        
+        The response is the same progress payload as a direct update, with
+        the buffered watch time merged in. Returns None when the buffer is
+        unavailable, so the caller writes the heartbeat directly instead.
+        """
+        try:
+            watch_time = int(watch_time)
+        except (TypeError, ValueError):
+            return Response({
+                'error': 'watch_time_seconds must be an integer.'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        enrollment_id = resolve_enrollment(request.user, lesson_id)
+        if enrollment_id is None:
+            return Response({
+                'error': 'You are not enrolled in this course.'
+            }, status=status.HTTP_403_FORBIDDEN)
+        
+        try:
+            watch_time = get_heartbeat_buffer().record(enrollment_id, lesson_id, max(watch_time, 0))
+        except Exception:
+            logger.warning('Heartbeat buffer unavailable, writing progress directly', exc_info=True)
+            return None
+        
+        # watch_time is the buffered maximum record() just returned; skip the serializer's buffer read
+        context = {'pending_watch_times': {enrollment_id: {}}}
+        data = get_progress_payload(
+            enrollment_id, lesson_id, lambda progress: LessonProgressSerializer(progress, context=context).data
+        )
+        if data is None:
+            # Cached enrollment whose progress row was deleted since
+            return None
+        return Response({**data, 'watch_time_seconds': max(data['watch_time_seconds'], watch_time)})
 
 
 class EnrollmentDetailView(generics.RetrieveAPIView):
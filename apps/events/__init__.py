@@ -0,0 +1,2 @@
+# Events app init
+default_app_config = 'apps.events.apps.EventsConfig'
@@ -0,0 +1,14 @@
+"""
+Admin configuration for events app.
+"""
+
+from django.contrib import admin
+from .models import OutboxEvent
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['event_type', 'handler', 'status', 'attempts', 'available_at', 'processed_at']
+    list_filter = ['status', 'event_type']
+    search_fields = ['idempotency_key', 'handler', 'last_error']
+    readonly_fields = ['created_at', 'processed_at']
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class EventsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.events'
+    verbose_name = 'Events'
+    
+    def ready(self):
+        import apps.events.signals
+        # Register the event handlers defined in each app's handlers.py
+        autodiscover_modules('handlers')
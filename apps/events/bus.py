@@ -0,0 +1,211 @@
+"""
+Transactional outbox for domain events.
+
+Model receivers ``publish`` a compact event (ids only) instead of doing
+their side effects inline. Publishing inserts one ``OutboxEvent`` row per
+subscribed handler in the caller's transaction, so an event exists if and
+only if the write that caused it was committed.
+
+``manage.py run_event_worker`` drains the outbox with a pool of worker
+threads. Each handler runs in a transaction together with marking its row
+done, so its database side effects are applied exactly once even when a
+worker crashes and the row is claimed again. Failed deliveries are retried
+with exponential backoff up to ``EVENTS_MAX_ATTEMPTS``.
+
+Rows are unique per (idempotency key, handler): publishing the same event
+twice, e.g. from repeated saves, is a no-op.
+
+With ``EVENTS_ASYNC = False`` events are handled in-process right after
+the publishing transaction commits, for setups without a worker. The
+handlers then run in the publishing thread through ``on_commit``, which in
+a web request means before the response is sent. Events published with
+``background=True`` (long chains such as notification fan-outs) are
+handled in a short-lived background thread instead.
+"""
+
+import logging
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+# event type -> {handler name: function}
+_handlers = {}
+
+
+class LeaseLost(Exception):
+    """Another worker claimed the event while it was being handled."""
+
+
+def handler(event_type):
+    """
+    Register a function as a handler of ``event_type``.
+
+    Handlers receive the ``OutboxEvent``; the event data is in ``payload``
+    and the time it happened in ``created_at``.
+    """
+    def register(func):
+        _handlers.setdefault(event_type, {})[f'{func.__module__}.{func.__qualname__}'] = func
+        return func
+    return register
+
+
+def _find_handler(name):
+    for functions in _handlers.values():
+        if name in functions:
+            return functions[name]
+    return None
+
+
+def _process_in_background(batch_size, extra):
+    def run():
+        try:
+            process_batch(batch_size, extra)
+        except Exception:
+            logger.exception('Failed to handle events in the background')
+        finally:
+            connection.close()
+
+    threading.Thread(target=run, name='events-background', daemon=True).start()
+
+
+def publish(event_type, key, payload, background=False):
+    """
+    Record an event in the outbox, as part of the current transaction.
+
+    Args:
+        event_type: Name of the event, e.g. 'enrollment.created'
+        key: Identifies this occurrence; repeats with the same key are ignored
+        payload: JSON-serializable event data
+        background: Without a worker (``EVENTS_ASYNC = False``), handle the
+            event in a background thread rather than the publishing one
+
+    Returns:
+        int: Number of handlers the event was queued for
+    """
+    subscribers = _handlers.get(event_type)
+    if not subscribers:
+        return 0
+
+    idempotency_key = f'{event_type}:{key}'
+    now = timezone.now()
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(
+            event_type=event_type,
+            idempotency_key=idempotency_key,
+            handler=name,
+            payload=payload,
+            available_at=now,
+        )
+        for name in subscribers
+    ], ignore_conflicts=True)
+
+    if not settings.EVENTS_ASYNC:
+        due = Q(idempotency_key=idempotency_key)
+        process = _process_in_background if background else process_batch
+        transaction.on_commit(lambda: process(len(subscribers), due), robust=True)
+    return len(subscribers)
+
+
+def claim(batch_size, extra=None):
+    """
+    Claim due events for this worker.
+
+    Events left in processing by a worker whose lease ran out are due again.
+
+    Returns:
+        list: Claimed ``OutboxEvent`` rows
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    due = Q(status='pending', available_at__lte=now) | Q(status='processing', locked_until__lt=now)
+    if extra is not None:
+        due &= extra
+
+    with transaction.atomic():
+        candidates = list(
+            OutboxEvent.objects.filter(due)
+            .order_by('available_at')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not candidates:
+            return []
+        # Re-checking ``due`` keeps concurrent claimers apart where rows cannot be locked
+        OutboxEvent.objects.filter(due, id__in=candidates).update(
+            status='processing',
+            claimed_by=token,
+            locked_until=now + timedelta(seconds=settings.EVENTS_LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+        )
+    return list(OutboxEvent.objects.filter(claimed_by=token, status='processing').order_by('available_at'))
+
+
+def dispatch(event):
+    """
+    Run the handler of a claimed event.
+
+    Returns:
+        bool: True when the event was handled
+    """
+    mine = OutboxEvent.objects.filter(pk=event.pk, claimed_by=event.claimed_by, status='processing')
+    try:
+        with transaction.atomic():
+            func = _find_handler(event.handler)
+            if func is None:
+                raise LookupError(f'No handler registered as {event.handler}')
+            func(event)
+            if not mine.update(status='done', processed_at=timezone.now(), last_error=''):
+                raise LeaseLost(event.pk)
+        return True
+    except LeaseLost:
+        logger.warning('Lease on event %s expired before it was handled; left to its new owner', event.pk)
+        return False
+    except Exception:
+        logger.exception('Handler %s failed on event %s', event.handler, event.pk)
+        give_up = event.attempts >= settings.EVENTS_MAX_ATTEMPTS
+        delay = min(settings.EVENTS_RETRY_BASE_SECONDS * 2 ** (event.attempts - 1), 3600)
+        mine.update(
+            status='failed' if give_up else 'pending',
+            available_at=timezone.now() + timedelta(seconds=delay),
+            claimed_by='',
+            locked_until=None,
+            last_error=traceback.format_exc()[-4000:],
+        )
+        return False
+
+
+def process_batch(batch_size=100, extra=None):
+    """
+    Claim and handle one batch of due events.
+
+    Returns:
+        int: Number of events claimed
+    """
+    events = claim(batch_size, extra)
+    for event in events:
+        dispatch(event)
+    return len(events)
+
+
+def purge(older_than=None):
+    """
+    Delete handled events older than ``EVENTS_RETENTION_DAYS``.
+
+    Returns:
+        int: Number of events deleted
+    """
+    older_than = older_than or timedelta(days=settings.EVENTS_RETENTION_DAYS)
+    deleted, _ = OutboxEvent.objects.filter(
+        status='done', processed_at__lt=timezone.now() - older_than
+    ).delete()
+    return deleted
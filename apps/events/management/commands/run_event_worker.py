@@ -0,0 +1,68 @@
+"""
+Django management command to handle queued domain events.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from apps.events import bus
+
+
+class Command(BaseCommand):
+    help = 'Drains the domain event outbox with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.EVENTS_WORKERS, help='Worker threads')
+        parser.add_argument('--batch-size', type=int, default=100, help='Events claimed per batch')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new events instead of exiting once the outbox is drained',
+        )
+        parser.add_argument('--purge', action='store_true', help='Delete old handled events and exit')
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            deleted = bus.purge()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} handled events'))
+            return
+
+        stop = threading.Event()
+        handled = [0] * options['workers']
+        threads = [
+            threading.Thread(
+                target=self.work, args=(index, handled, options, stop),
+                name=f'event-worker-{index}', daemon=True,
+            )
+            for index in range(options['workers'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {sum(handled)} events in {time.monotonic() - started:.2f}s'
+        ))
+
+    def work(self, index, handled, options, stop):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                claimed = bus.process_batch(options['batch_size'])
+                handled[index] += claimed
+                if not claimed:
+                    if not options['loop']:
+                        return
+                    stop.wait(settings.EVENTS_POLL_INTERVAL)
+        finally:
+            connection.close()
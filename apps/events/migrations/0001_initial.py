@@ -0,0 +1,42 @@
+# Generated by Django 5.0.14 on 2026-10-16 20:57
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('event_type', models.CharField(max_length=100)),
+                ('idempotency_key', models.CharField(max_length=200)),
+                ('handler', models.CharField(max_length=200)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('available_at', models.DateTimeField()),
+                ('claimed_by', models.CharField(blank=True, max_length=32)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'outbox_events',
+                'ordering': ['available_at'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='outbox_even_status_62eaed_idx'), models.Index(fields=['claimed_by'], name='outbox_even_claimed_be9503_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='outboxevent',
+            constraint=models.UniqueConstraint(fields=('idempotency_key', 'handler'), name='outbox_event_once_per_handler'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+"""
+Outbox of domain events waiting to be handled.
+"""
+
+from django.db import models
+import uuid
+
+
+class OutboxEvent(models.Model):
+    """One delivery of a domain event to one handler."""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    # Event
+    event_type = models.CharField(max_length=100)
+    idempotency_key = models.CharField(max_length=200)
+    handler = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict, blank=True)
+    
+    # Delivery
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField()
+    claimed_by = models.CharField(max_length=32, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'outbox_events'
+        ordering = ['available_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['idempotency_key', 'handler'], name='outbox_event_once_per_handler'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['claimed_by']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} -> {self.handler} ({self.status})"
@@ -0,0 +1,69 @@
+"""
+Receivers that turn model changes into domain events.
+
+Each receiver only queues a compact event in the outbox, inside the
+transaction of the write that caused it; the work itself is done by the
+handlers subscribed to the event (``<app>/handlers.py``).
+"""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from apps.certificates.models import Certificate
+from apps.enrollment.models import Enrollment, LessonProgress
+from apps.payments.models import PaymentTransaction
+from apps.quizzes.models import Attempt, Quiz
+from apps.reviews.models import Review
+from .bus import publish
+
+
+def _touches(update_fields, *fields):
+    """True unless the save was limited to fields other than ``fields``."""
+    return update_fields is None or any(field in update_fields for field in fields)
+
+
+@receiver(post_save, sender=Enrollment)
+def publish_enrollment_created(sender, instance, created, **kwargs):
+    if created:
+        publish('enrollment.created', instance.pk, {'enrollment_id': str(instance.pk)})
+
+
+@receiver(post_save, sender=LessonProgress)
+def publish_lesson_completed(sender, instance, update_fields=None, **kwargs):
+    if instance.is_completed and instance.completed_at and _touches(update_fields, 'is_completed'):
+        publish('lesson.completed', instance.pk, {'progress_id': str(instance.pk)})
+
+
+@receiver(post_save, sender=Attempt)
+def publish_quiz_submitted(sender, instance, update_fields=None, **kwargs):
+    if instance.submitted_at and _touches(update_fields, 'submitted_at'):
+        publish('quiz.submitted', instance.pk, {'attempt_id': str(instance.pk)})
+
+
+@receiver(post_save, sender=Quiz)
+def publish_quiz_created(sender, instance, created, **kwargs):
+    if created:
+        publish('quiz.created', instance.pk, {'quiz_id': str(instance.pk)})
+
+
+@receiver(post_save, sender=Review)
+def publish_review_created(sender, instance, created, **kwargs):
+    if created:
+        publish('review.created', instance.pk, {'review_id': str(instance.pk)})
+
+
+@receiver(post_save, sender=Certificate)
+def publish_certificate_issued(sender, instance, created, **kwargs):
+    if created:
+        publish('certificate.issued', instance.pk, {'certificate_id': str(instance.pk)})
+
+
+@receiver(post_save, sender=Certificate)
+def publish_certificate_ready(sender, instance, update_fields=None, **kwargs):
+    if instance.status == 'ready' and _touches(update_fields, 'status'):
+        publish('certificate.ready', instance.pk, {'certificate_id': str(instance.pk)})
+
+
+@receiver(post_save, sender=PaymentTransaction)
+def publish_payment_completed(sender, instance, update_fields=None, **kwargs):
+    if instance.status == 'completed' and _touches(update_fields, 'status'):
+        publish('payment.completed', instance.pk, {'payment_id': str(instance.pk)})
@@ -0,0 +1,219 @@
+"""
+Event handlers for the gamification system.
+
+Points, streaks and achievements are awarded by the event worker from
+domain events (see ``apps.events``), not while the request that caused
+them is being served.
+"""
+from django.utils import timezone
+from apps.certificates.models import Certificate
+from apps.enrollment.models import LessonProgress, Enrollment
+from apps.events.bus import handler
+from apps.quizzes.models import Attempt
+from apps.reviews.models import Review
+from .models import (
+    PointsTransaction,
+    LearningStreak,
+    Achievement
+)
+
+
+@handler('lesson.completed')
+def update_points_for_lesson_completion(event):
+    """
+    Award points when a lesson is completed.
+    """
+    progress = LessonProgress.objects.select_related(
+        'enrollment__student', 'lesson'
+    ).filter(pk=event.payload['progress_id'], is_completed=True).first()
+    if progress is None:
+        return
+
+    # Check if points transaction already exists
+    if not PointsTransaction.objects.filter(
+        user=progress.enrollment.student,
+        lesson=progress.lesson,
+        transaction_type='lesson_completion'
+    ).exists():
+        # Award points for lesson completion
+        PointsTransaction.objects.create(
+            user=progress.enrollment.student,
+            transaction_type='lesson_completion',
+            points=10,  # 10 points per lesson
+            description=f"Completed lesson: {progress.lesson.title}",
+            lesson=progress.lesson
+        )
+
+        # Update streak for the day the lesson was completed
+        update_learning_streak(progress.enrollment.student, timezone.localdate(event.created_at))
+
+
+@handler('enrollment.created')
+def award_points_for_course_enrollment(event):
+    """
+    Award points when a user enrolls in a course.
+    """
+    enrollment = Enrollment.objects.select_related('student', 'course').filter(
+        pk=event.payload['enrollment_id']
+    ).first()
+    if enrollment is None:
+        return
+
+    # Check if points transaction already exists
+    if not PointsTransaction.objects.filter(
+        user=enrollment.student,
+        course=enrollment.course,
+        transaction_type='enrollment'
+    ).exists():
+        PointsTransaction.objects.create(
+            user=enrollment.student,
+            transaction_type='enrollment',
+            points=5,  # 5 points per enrollment
+            description=f"Enrolled in course: {enrollment.course.title}",
+            course=enrollment.course
+        )
+
+
+@handler('quiz.submitted')
+def award_points_for_quiz_completion(event):
+    """
+    Award points when a quiz is completed.
+    """
+    attempt = Attempt.objects.select_related('student', 'quiz').filter(
+        pk=event.payload['attempt_id'], submitted_at__isnull=False
+    ).first()
+    if attempt is None:
+        return
+
+    # Check if points transaction already exists
+    if not PointsTransaction.objects.filter(
+        user=attempt.student,
+        quiz=attempt.quiz,
+        transaction_type='quiz_completion'
+    ).exists():
+        points = 5 if attempt.passed else 2  # More points for passing
+        PointsTransaction.objects.create(
+            user=attempt.student,
+            transaction_type='quiz_completion',
+            points=points,
+            description=f"Completed quiz: {attempt.quiz.title} ({'Passed' if attempt.passed else 'Failed'})",
+            quiz=attempt.quiz
+        )
+
+
+@handler('review.created')
+def award_points_for_review_submission(event):
+    """
+    Award points when a user submits a review.
+    """
+    review = Review.objects.select_related('student', 'course').filter(pk=event.payload['review_id']).first()
+    if review is None:
+        return
+
+    # Check if points transaction already exists
+    if not PointsTransaction.objects.filter(
+        user=review.student,
+        transaction_type='review_submission'
+    ).exists():
+        PointsTransaction.objects.create(
+            user=review.student,
+            transaction_type='review_submission',
+            points=15,  # 15 points for review
+            description=f"Submitted review for course: {review.course.title}"
+        )
+
+
+@handler('certificate.issued')
+def award_points_for_course_completion(event):
+    """
+    Award points when a user completes a course and gets a certificate.
+    """
+    certificate = Certificate.objects.select_related('student', 'course').filter(
+        pk=event.payload['certificate_id']
+    ).first()
+    if certificate is None:
+        return
+
+    # Check if points transaction already exists
+    if not PointsTransaction.objects.filter(
+        user=certificate.student,
+        course=certificate.course,
+        transaction_type='course_completion'
+    ).exists():
+        # Award 100 points per completed course
+        PointsTransaction.objects.create(
+            user=certificate.student,
+            transaction_type='course_completion',
+            points=100,
+            description=f"Completed course: {certificate.course_name}",
+            course=certificate.course
+        )
+
+        # Create course completion achievement
+        Achievement.objects.create(
+            user=certificate.student,
+            title=f"Completed {certificate.course_name}",
+            description=f"Successfully completed the course {certificate.course_name}",
+            icon="fas fa-graduation-cap",
+            points=100,
+            achievement_type='course_completion',
+            course=certificate.course
+        )
+
+
+def update_learning_streak(user, today=None):
+    """
+    Update the user's learning streak with activity on ``today``.
+    """
+    today = today or timezone.localdate()
+
+    # Get or create the user's streak record
+    streak, created = LearningStreak.objects.get_or_create(user=user)
+
+    # Events can be handled out of order; older activity cannot extend the streak
+    if streak.last_activity_date is not None and today < streak.last_activity_date:
+        return
+
+    # If this is the first activity or yesterday's activity
+    if streak.last_activity_date is None or streak.last_activity_date == today:
+        # Either first activity or same day activity - no change to streak
+        streak.last_activity_date = today
+    elif (today - streak.last_activity_date).days == 1:
+        # Consecutive day - increment streak
+        streak.current_streak += 1
+        streak.last_activity_date = today
+        # Update longest streak if needed
+        if streak.current_streak > streak.longest_streak:
+            streak.longest_streak = streak.current_streak
+    else:
+        # Not consecutive - reset streak
+        streak.current_streak = 1
+        streak.last_activity_date = today
+
+    streak.save()
+
+    # Award streak bonus if applicable
+    if streak.current_streak > 1 and streak.current_streak % 5 == 0:  # Every 5 days
+        # Check if streak bonus was already awarded for this streak length
+        if not PointsTransaction.objects.filter(
+            user=user,
+            transaction_type='streak_bonus',
+            description=f"Learning streak of {streak.current_streak} days"
+        ).exists():
+            bonus_points = streak.current_streak * 2  # 2 points per day in streak
+            PointsTransaction.objects.create(
+                user=user,
+                transaction_type='streak_bonus',
+                points=bonus_points,
+                description=f"Learning streak of {streak.current_streak} days"
+            )
+
+            # Create streak achievement
+            Achievement.objects.create(
+                user=user,
+                title=f"{streak.current_streak} Day Streak!",
+                description=f"Achieved a learning streak of {streak.current_streak} days",
+                icon="fas fa-fire",
+                points=bonus_points,
+                achievement_type='streak'
+            )
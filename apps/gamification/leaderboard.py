@@ -0,0 +1,569 @@
+"""
+Sorted-set leaderboards.
+
+Every ``PointsTransaction`` increments the user's score on a handful of
+boards: the global board and, when the points belong to a course, that
+course's board, each in three windows (all-time, the current ISO week and
+the current day). Boards are kept in a sorted-set store so an update, a
+rank lookup and a top-N / around-me page are all O(log n) instead of a
+full sort of the table:
+
+* ``RedisLeaderboardStore`` keeps one sorted set per board, shared by all
+  workers. Windowed boards expire on their own a while after the window
+  closes.
+* ``LocalLeaderboardStore`` keeps each board in an indexable skip list in
+  process memory, for tests and single-node deploys.
+
+Ranks use standard competition ranking: users with equal points share a
+rank and the next rank is skipped (1, 2, 2, 4). ``/api/gamification/leaderboard/``
+serves the top of a board and ``.../leaderboard/me/`` a user's rank and
+the users around them.
+
+``manage.py checkpoint_leaderboard`` copies the global all-time board into
+the ``Leaderboard`` table, and can rebuild every board from the ledger
+after the store was lost.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from apps.courses.models import Lesson
+from apps.quizzes.models import Quiz
+
+from .ledger import week_start
+from .models import Leaderboard, PointsTransaction
+
+WINDOWS = ('all', 'weekly', 'daily')
+
+POINTS_PER_LEVEL = 100
+
+# How long a closed window stays readable, e.g. for "last week's winners"
+WINDOW_RETENTION = {
+    'weekly': timedelta(days=14),
+    'daily': timedelta(days=2),
+}
+
+
+class SkipList:
+    """
+    Indexable skip list of unique, ordered keys.
+
+    Each link records how many bottom-level nodes it spans, so the position
+    of a key and the key at a position are found in O(log n) like lookups.
+    """
+
+    max_levels = 32
+
+    class _Node:
+        __slots__ = ('key', 'next', 'width')
+
+        def __init__(self, key, levels):
+            self.key = key
+            self.next = [None] * levels
+            self.width = [1] * levels
+
+    def __init__(self, seed=None):
+        self._random = random.Random(seed)
+        self.head = self._Node(None, self.max_levels)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _random_levels(self):
+        levels = 1
+        while levels < self.max_levels and self._random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def _predecessors(self, key):
+        """Return the last node before ``key`` on every level and the steps taken."""
+        chain = [None] * self.max_levels
+        steps = [0] * self.max_levels
+        node = self.head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key):
+        chain, steps = self._predecessors(key)
+        levels = self._random_levels()
+        new = self._Node(key, levels)
+        distance = 0
+        for level in range(levels):
+            previous = chain[level]
+            new.next[level] = previous.next[level]
+            previous.next[level] = new
+            new.width[level] = previous.width[level] - distance
+            previous.width[level] = distance + 1
+            distance += steps[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._predecessors(key)
+        target = chain[0].next[0]
+        if target is None or target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            chain[level].width[level] += target.width[level] - 1
+            chain[level].next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key):
+        """Return the number of keys ordered before ``key``."""
+        position = 0
+        node = self.head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not None and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        return position
+
+    def slice(self, start, stop):
+        """Return the keys at positions ``start`` to ``stop`` (exclusive)."""
+        if start >= min(stop, self.size):
+            return []
+        remaining = start + 1
+        node = self.head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not None and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        while node is not None and len(keys) < stop - start:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class BaseLeaderboardStore:
+    """
+    Interface implemented by leaderboard stores.
+
+    Entries are ``(member, score, rank)`` tuples ordered by descending score.
+    """
+
+    def increment(self, updates):
+        """Apply ``(board, member, delta, expire_at)`` updates."""
+        raise NotImplementedError
+
+    def rank(self, board, member):
+        """Return ``(rank, score)`` of a member, or None when not on the board."""
+        raise NotImplementedError
+
+    def position(self, board, member):
+        """Return the 0-based position of a member, or None."""
+        raise NotImplementedError
+
+    def page(self, board, offset, count):
+        """Return the entries at positions ``offset`` to ``offset + count``."""
+        raise NotImplementedError
+
+    def replace(self, board, scores, expire_at=None):
+        """Replace a board with ``{member: score}``."""
+        raise NotImplementedError
+
+    def size(self, board):
+        raise NotImplementedError
+
+
+def _ranked(entries, greater_than_first, offset):
+    """Attach competition ranks to a page of ``(member, score)`` pairs."""
+    ranked = []
+    previous_score = rank = None
+    for position, (member, score) in enumerate(entries):
+        if position == 0:
+            rank = greater_than_first + 1
+        elif score != previous_score:
+            rank = offset + position + 1
+        ranked.append((member, score, rank))
+        previous_score = score
+    return ranked
+
+
+class RedisLeaderboardStore(BaseLeaderboardStore):
+    """Leaderboards kept in Redis sorted sets, shared by all workers."""
+
+    # Competition rank: one plus the number of members with a higher score
+    RANK_SCRIPT = """
+        local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+        if not score then
+            return false
+        end
+        return {redis.call('ZCOUNT', KEYS[1], '(' .. score, '+inf') + 1, score}
+    """
+
+    def __init__(self, url=None, prefix='leaderboard'):
+        import redis
+
+        self.redis = redis.Redis.from_url(url or settings.LEADERBOARD_REDIS_URL, decode_responses=True)
+        self.prefix = prefix
+        self._rank = self.redis.register_script(self.RANK_SCRIPT)
+
+    def _key(self, board):
+        return f'{self.prefix}:{board}'
+
+    def increment(self, updates):
+        pipe = self.redis.pipeline(transaction=False)
+        for board, member, delta, expire_at in updates:
+            pipe.zincrby(self._key(board), delta, member)
+            if expire_at is not None:
+                pipe.expireat(self._key(board), int(expire_at))
+        pipe.execute()
+
+    def rank(self, board, member):
+        found = self._rank(keys=[self._key(board)], args=[member])
+        if not found:
+            return None
+        rank, score = found
+        return int(rank), int(float(score))
+
+    def position(self, board, member):
+        return self.redis.zrevrank(self._key(board), member)
+
+    def page(self, board, offset, count):
+        key = self._key(board)
+        entries = [
+            (member, int(score))
+            for member, score in self.redis.zrevrange(key, offset, offset + count - 1, withscores=True)
+        ]
+        if not entries:
+            return []
+        greater = self.redis.zcount(key, f'({entries[0][1]}', '+inf')
+        return _ranked(entries, greater, offset)
+
+    def replace(self, board, scores, expire_at=None):
+        key = self._key(board)
+        if not scores:
+            self.redis.delete(key)
+            return
+        # Build aside and swap in, so readers never see a half-built board
+        staging = f'{key}:rebuild'
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(staging)
+        items = list(scores.items())
+        for start in range(0, len(items), 1000):
+            pipe.zadd(staging, dict(items[start:start + 1000]))
+        pipe.rename(staging, key)
+        if expire_at is not None:
+            pipe.expireat(key, int(expire_at))
+        pipe.execute()
+
+    def size(self, board):
+        return self.redis.zcard(self._key(board))
+
+
+class LocalLeaderboardStore(BaseLeaderboardStore):
+    """In-process leaderboards for tests and single-node deploys."""
+
+    purge_interval = 60
+
+    def __init__(self):
+        # board -> (scores {member: score}, SkipList of (-score, member), expire_at)
+        self._boards = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0
+
+    def _board(self, board, create=False):
+        entry = self._boards.get(board)
+        if entry is not None and entry[2] is not None and entry[2] <= time.time():
+            del self._boards[board]
+            entry = None
+        if entry is None and create:
+            entry = self._boards[board] = [{}, SkipList(), None]
+        return entry
+
+    def _purge(self):
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        for board in [name for name, entry in self._boards.items() if entry[2] is not None and entry[2] <= now]:
+            del self._boards[board]
+
+    def increment(self, updates):
+        with self._lock:
+            self._purge()
+            for board, member, delta, expire_at in updates:
+                scores, ordered, _ = entry = self._board(board, create=True)
+                current = scores.get(member)
+                if current is not None:
+                    ordered.remove((-current, member))
+                scores[member] = (current or 0) + delta
+                ordered.insert((-scores[member], member))
+                if expire_at is not None:
+                    entry[2] = expire_at
+
+    def rank(self, board, member):
+        with self._lock:
+            entry = self._board(board)
+            if entry is None or member not in entry[0]:
+                return None
+            score = entry[0][member]
+            # Members with a higher score sort before (-score, '')
+            return entry[1].index((-score, '')) + 1, score
+
+    def position(self, board, member):
+        with self._lock:
+            entry = self._board(board)
+            if entry is None or member not in entry[0]:
+                return None
+            return entry[1].index((-entry[0][member], member))
+
+    def page(self, board, offset, count):
+        with self._lock:
+            entry = self._board(board)
+            if entry is None:
+                return []
+            entries = [(member, -negated) for negated, member in entry[1].slice(offset, offset + count)]
+            if not entries:
+                return []
+            greater = entry[1].index((-entries[0][1], ''))
+        return _ranked(entries, greater, offset)
+
+    def replace(self, board, scores, expire_at=None):
+        ordered = SkipList()
+        for member, score in scores.items():
+            ordered.insert((-score, member))
+        with self._lock:
+            if scores:
+                self._boards[board] = [dict(scores), ordered, expire_at]
+            else:
+                self._boards.pop(board, None)
+
+    def size(self, board):
+        with self._lock:
+            entry = self._board(board)
+            return 0 if entry is None else len(entry[0])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+STORES = {
+    'redis': RedisLeaderboardStore,
+    'local': LocalLeaderboardStore,
+}
+
+
+def get_leaderboard_store():
+    """Return the configured leaderboard store (``LEADERBOARD_STORE``)."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                name = settings.LEADERBOARD_STORE
+                store_class = STORES.get(name) or import_string(name)
+                _store = store_class()
+    return _store
+
+
+def board_name(window='all', course_id=None, day=None):
+    """
+    Return the name of a board.
+
+    Args:
+        window: 'all', 'weekly' or 'daily'
+        course_id: Course primary key, or None for the global board
+        day: Any date inside the window (today by default)
+    """
+    if window not in WINDOWS:
+        raise ValueError(f'Unknown leaderboard window: {window}')
+    scope = f'course:{course_id}' if course_id else 'global'
+    if window == 'all':
+        return f'{scope}:all'
+    day = day or timezone.localdate()
+    period = week_start(day) if window == 'weekly' else day
+    return f'{scope}:{window}:{period.isoformat()}'
+
+
+def _expire_at(window, day):
+    """Return the epoch second at which a windowed board may be dropped."""
+    if window == 'all':
+        return None
+    start = week_start(day) if window == 'weekly' else day
+    expires = timezone.make_aware(datetime.combine(start + WINDOW_RETENTION[window], dt_time.min))
+    return expires.timestamp()
+
+
+def _board_updates(user_id, points, course_id=None, day=None):
+    day = day or timezone.localdate()
+    scopes = [None, course_id] if course_id else [None]
+    return [
+        (board_name(window, scope, day), str(user_id), points, _expire_at(window, day))
+        for scope in scopes
+        for window in WINDOWS
+    ]
+
+
+def transaction_course_id(points_transaction):
+    """
+    Return the course a ledger entry belongs to, if any.
+
+    The lesson or quiz is looked up by id rather than through the relation:
+    when a revoked entry's lesson or quiz has been deleted meanwhile, the
+    entry resolves to no course (and only the global boards) instead of
+    raising.
+    """
+    if points_transaction.course_id:
+        return points_transaction.course_id
+    for field, model in (('lesson', Lesson), ('quiz', Quiz)):
+        related_id = getattr(points_transaction, f'{field}_id')
+        if not related_id:
+            continue
+        if PointsTransaction._meta.get_field(field).is_cached(points_transaction):
+            return getattr(points_transaction, field).course_id
+        return model.objects.filter(pk=related_id).values_list('course_id', flat=True).first()
+    return None
+
+
+def record_points(user_id, points, course_id=None, day=None, store=None):
+    """Add points to every board the user scores on."""
+    (store or get_leaderboard_store()).increment(_board_updates(user_id, points, course_id, day))
+
+
+def record_transaction(points_transaction, revoke=False):
+    """Apply a ledger entry to the boards (or take it back when ``revoke``)."""
+    day = timezone.localdate(points_transaction.created_at) if points_transaction.created_at else None
+    points = -points_transaction.points if revoke else points_transaction.points
+    record_points(points_transaction.user_id, points, transaction_course_id(points_transaction), day)
+
+
+def get_rank(user_id, window='all', course_id=None, day=None):
+    """
+    Return a user's standing on a board.
+
+    Returns:
+        dict: ``{'user_id', 'points', 'rank'}``, or None when the user has no points there
+    """
+    found = get_leaderboard_store().rank(board_name(window, course_id, day), str(user_id))
+    if found is None:
+        return None
+    rank, points = found
+    return {'user_id': str(user_id), 'points': points, 'rank': rank}
+
+
+def _as_dicts(entries):
+    return [{'user_id': member, 'points': score, 'rank': rank} for member, score, rank in entries]
+
+
+def get_top(count=10, window='all', course_id=None, day=None, offset=0):
+    """Return a page of a board, best first."""
+    return _as_dicts(get_leaderboard_store().page(board_name(window, course_id, day), offset, count))
+
+
+def get_around(user_id, radius=5, window='all', course_id=None, day=None):
+    """Return the ``radius`` users above and below a user on a board, and the user."""
+    store = get_leaderboard_store()
+    board = board_name(window, course_id, day)
+    position = store.position(board, str(user_id))
+    if position is None:
+        return []
+    start = max(0, position - radius)
+    return _as_dicts(store.page(board, start, position - start + radius + 1))
+
+
+def level_for_points(points):
+    """Return the level reached with ``points``."""
+    return 1 + max(points, 0) // POINTS_PER_LEVEL
+
+
+def checkpoint(batch_size=1000, store=None):
+    """
+    Copy the global all-time board into the ``Leaderboard`` table.
+
+    The board is read a page at a time, and only the rows of the users on
+    each page are loaded. Rows this run did not write (users no longer on
+    the board, or duplicate rows of one user) are deleted at the end.
+
+    Returns:
+        int: Number of rows written
+    """
+    store = store or get_leaderboard_store()
+    board = board_name('all')
+    now = timezone.now()
+    written = 0
+    offset = 0
+    while True:
+        entries = store.page(board, offset, batch_size)
+        if not entries:
+            break
+        existing = {}
+        for entry_id, user_id in Leaderboard.objects.filter(
+            user_id__in=[member for member, _, _ in entries]
+        ).order_by('last_updated').values_list('id', 'user_id'):
+            # The most recently updated row of each user wins
+            existing[str(user_id)] = entry_id
+        rows = [
+            Leaderboard(
+                id=existing.get(member), user_id=member, points=score,
+                level=level_for_points(score), rank=rank, last_updated=now,
+            )
+            for member, score, rank in entries
+        ]
+        with transaction.atomic():
+            Leaderboard.objects.bulk_update(
+                [row for row in rows if row.id is not None], ['points', 'level', 'rank', 'last_updated'],
+            )
+            Leaderboard.objects.bulk_create([row for row in rows if row.id is None])
+        written += len(rows)
+        offset += batch_size
+
+    # An empty board more likely means a lost store than a lost table; keep the last checkpoint then
+    if written:
+        Leaderboard.objects.filter(last_updated__lt=now).delete()
+    return written
+
+
+def rebuild(today=None, store=None):
+    """
+    Recompute every current board from the points ledger.
+
+    Returns:
+        int: Number of boards written
+    """
+    store = store or get_leaderboard_store()
+    today = today or timezone.localdate()
+
+    def midnight(day):
+        return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+    rows = PointsTransaction.objects.order_by().values(
+        'user_id',
+        scope_course=Coalesce('course_id', 'lesson__course_id', 'quiz__course_id'),
+    ).annotate(
+        total=Sum('points'),
+        weekly=Sum('points', filter=Q(created_at__gte=midnight(week_start(today)))),
+        daily=Sum('points', filter=Q(created_at__gte=midnight(today))),
+    )
+
+    boards = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        scopes = [None, row['scope_course']] if row['scope_course'] else [None]
+        for window, key in (('all', 'total'), ('weekly', 'weekly'), ('daily', 'daily')):
+            if row[key] is None:
+                continue
+            for scope in scopes:
+                boards[window, scope][str(row['user_id'])] += row[key]
+
+    for (window, scope), scores in boards.items():
+        store.replace(board_name(window, scope, today), dict(scores), _expire_at(window, today))
+    return len(boards)
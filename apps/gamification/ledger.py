@@ -0,0 +1,180 @@
+"""
+Points ledger for the gamification system.
+
+``PointsTransaction`` rows are the ledger; ``UserPoints`` holds running
+totals derived from it (all-time, current week, current month). Each
+transaction updates the totals with a single ``F()``-based UPDATE in the
+transaction that records it, so totals never need a ``SUM`` over the
+user's history. Badge eligibility is then one range query on the indexed
+``points_required`` column.
+
+``manage.py rebuild_points_ledger`` recomputes every total from the ledger.
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import Achievement, Badge, PointsTransaction, UserBadge, UserPoints
+
+
+def week_start(day=None):
+    """Return the Monday of the week containing ``day`` (today by default)."""
+    day = day or timezone.localdate()
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day=None):
+    """Return the first day of the month containing ``day`` (today by default)."""
+    day = day or timezone.localdate()
+    return day.replace(day=1)
+
+
+def _period_update(points_field, start_field, start, points, revoke):
+    """
+    Build the UPDATE expressions for one period total.
+
+    Adding points to the stored period accumulates; adding to a newer period
+    rolls over; points of an older period only count all-time. Revoking only
+    touches the stored period.
+    """
+    same_period = Q(**{start_field: start})
+    if revoke:
+        return {
+            points_field: Case(When(same_period, then=F(points_field) - points), default=F(points_field)),
+        }
+    newer_stored = Q(**{f'{start_field}__gt': start})
+    # The points field must be assigned before its start date: MySQL
+    # evaluates SET clauses left to right against already-updated columns
+    return {
+        points_field: Case(
+            When(same_period, then=F(points_field) + points),
+            When(newer_stored, then=F(points_field)),
+            default=Value(points),
+        ),
+        start_field: Case(When(newer_stored, then=F(start_field)), default=Value(start)),
+    }
+
+
+def apply_points(user_id, points, day=None, revoke=False):
+    """
+    Add (or revoke) points on a user's running totals, atomically.
+
+    Args:
+        user_id: User primary key
+        points: Points of the transaction
+        day: Date the points were earned (today by default)
+        revoke: Remove the points instead, e.g. when a transaction is deleted
+
+    Returns:
+        int: The user's new all-time total
+    """
+    day = day or timezone.localdate()
+    updates = {'total_points': F('total_points') + (-points if revoke else points)}
+    updates.update(_period_update('weekly_points', 'week_start', week_start(day), points, revoke))
+    updates.update(_period_update('monthly_points', 'month_start', month_start(day), points, revoke))
+
+    with transaction.atomic():
+        UserPoints.objects.get_or_create(user_id=user_id)
+        UserPoints.objects.filter(user_id=user_id).update(**updates, updated_at=timezone.now())
+        return UserPoints.objects.filter(user_id=user_id).values_list('total_points', flat=True).get()
+
+
+def award_badges(user_id, total_points):
+    """
+    Award every badge the user qualifies for and does not have yet.
+
+    Unique constraints on (user, badge) keep concurrent awards from
+    recording a badge or its achievement twice.
+
+    Returns:
+        list: Newly awarded badges
+    """
+    badges = list(
+        Badge.objects.filter(points_required__lte=total_points)
+        .exclude(user_badges__user_id=user_id)
+    )
+    if not badges:
+        return []
+
+    UserBadge.objects.bulk_create(
+        [UserBadge(user_id=user_id, badge=badge) for badge in badges],
+        ignore_conflicts=True,
+    )
+    Achievement.objects.bulk_create([
+        Achievement(
+            user_id=user_id,
+            title=f"Earned {badge.name}",
+            description=badge.description,
+            icon=badge.icon,
+            points=badge.points_required,
+            achievement_type='achievement',
+            badge=badge,
+        )
+        for badge in badges
+    ], ignore_conflicts=True)
+    return badges
+
+
+def record_transaction(points_transaction):
+    """Apply a new ledger entry to the running totals and award badges."""
+    day = timezone.localdate(points_transaction.created_at) if points_transaction.created_at else None
+    total = apply_points(points_transaction.user_id, points_transaction.points, day)
+    return award_badges(points_transaction.user_id, total)
+
+
+def revoke_transaction(points_transaction):
+    """Remove a deleted ledger entry from the running totals."""
+    day = timezone.localdate(points_transaction.created_at) if points_transaction.created_at else None
+    apply_points(points_transaction.user_id, points_transaction.points, day, revoke=True)
+
+
+def rebuild_totals(today=None):
+    """
+    Recompute every user's totals from the ledger.
+
+    Returns:
+        int: Number of users with ledger entries
+    """
+    this_week = week_start(today)
+    this_month = month_start(today)
+
+    def midnight(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    rows = PointsTransaction.objects.order_by().values('user_id').annotate(
+        total=Sum('points'),
+        weekly=Sum('points', filter=Q(created_at__gte=midnight(this_week))),
+        monthly=Sum('points', filter=Q(created_at__gte=midnight(this_month))),
+    )
+    totals = [
+        UserPoints(
+            user_id=row['user_id'],
+            total_points=row['total'] or 0,
+            weekly_points=row['weekly'] or 0,
+            week_start=this_week,
+            monthly_points=row['monthly'] or 0,
+            month_start=this_month,
+            updated_at=timezone.now(),
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        UserPoints.objects.exclude(user_id__in=PointsTransaction.objects.values('user_id')).update(
+            total_points=0, weekly_points=0, monthly_points=0,
+            week_start=this_week, month_start=this_month,
+        )
+        UserPoints.objects.bulk_create(
+            totals,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                'total_points', 'weekly_points', 'week_start',
+                'monthly_points', 'month_start', 'updated_at',
+            ],
+        )
+    return len(totals)
@@ -0,0 +1,39 @@
+"""
+Django management command to checkpoint leaderboards into the database.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.gamification import leaderboard
+
+
+class Command(BaseCommand):
+    help = 'Copies the global leaderboard into the Leaderboard table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='First recompute every current board from the points ledger',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep checkpointing every LEADERBOARD_CHECKPOINT_INTERVAL seconds',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            boards = leaderboard.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {boards} leaderboards'))
+
+        while True:
+            started = time.monotonic()
+            written = leaderboard.checkpoint(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Checkpointed {written} leaderboard entries in {time.monotonic() - started:.2f}s'
+            ))
+            if not options['loop']:
+                return
+            time.sleep(settings.LEADERBOARD_CHECKPOINT_INTERVAL)
@@ -0,0 +1,24 @@
+"""
+Django management command to recompute running point totals from the ledger.
+"""
+
+from django.core.management.base import BaseCommand
+from apps.gamification import ledger
+from apps.gamification.models import UserPoints
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every user\'s point totals from their points transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--badges', action='store_true', help='Also award badges users now qualify for')
+
+    def handle(self, *args, **options):
+        count = ledger.rebuild_totals()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt point totals for {count} users'))
+
+        if options['badges']:
+            awarded = 0
+            for user_id, total in UserPoints.objects.filter(total_points__gt=0).values_list('user_id', 'total_points').iterator():
+                awarded += len(ledger.award_badges(user_id, total))
+            self.stdout.write(self.style.SUCCESS(f'Awarded {awarded} badges'))
@@ -0,0 +1,140 @@
+# Generated by Django 5.0.14 on 2026-10-16 23:49
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('courses', '0006_backfill_search_vector'),
+        ('quizzes', '0003_rollup_indexes'),
+        ('users', '0004_user_created_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Achievement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('icon', models.CharField(blank=True, max_length=50)),
+                ('points', models.IntegerField(default=10)),
+                ('achievement_type', models.CharField(choices=[('course_completion', 'Course Completion'), ('quiz_mastery', 'Quiz Mastery'), ('streak', 'Learning Streak'), ('enrollment', 'Course Enrollment'), ('review', 'Review Submission'), ('social', 'Social Interaction')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='achievements', to='courses.course')),
+                ('lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='achievements', to='courses.lesson')),
+                ('quiz', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='achievements', to='quizzes.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achievements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'achievements',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Badge',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('icon', models.CharField(blank=True, max_length=50)),
+                ('color', models.CharField(default='blue', max_length=20)),
+                ('points_required', models.IntegerField(default=0)),
+                ('courses_required', models.IntegerField(default=0)),
+                ('lessons_completed', models.IntegerField(default=0)),
+                ('quizzes_passed', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'badges',
+                'ordering': ['name'],
+                'indexes': [models.Index(fields=['points_required'], name='badges_points__5d5679_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Leaderboard',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('points', models.IntegerField(default=0)),
+                ('level', models.IntegerField(default=1)),
+                ('rank', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'leaderboard',
+                'ordering': ['-points', 'last_updated'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LearningStreak',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('current_streak', models.IntegerField(default=0)),
+                ('longest_streak', models.IntegerField(default=0)),
+                ('last_activity_date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='learning_streaks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'learning_streaks',
+            },
+        ),
+        migrations.CreateModel(
+            name='PointsTransaction',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('transaction_type', models.CharField(choices=[('achievement', 'Achievement'), ('course_completion', 'Course Completion'), ('lesson_completion', 'Lesson Completion'), ('quiz_completion', 'Quiz Completion'), ('review_submission', 'Review Submission'), ('streak_bonus', 'Streak Bonus'), ('referral', 'Referral'), ('penalty', 'Penalty')], max_length=20)),
+                ('points', models.IntegerField()),
+                ('description', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='courses.course')),
+                ('lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='courses.lesson')),
+                ('quiz', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='quizzes.quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='points_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'points_transactions',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserPoints',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='points', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_points', models.IntegerField(default=0)),
+                ('weekly_points', models.IntegerField(default=0)),
+                ('week_start', models.DateField(blank=True, null=True)),
+                ('monthly_points', models.IntegerField(default=0)),
+                ('month_start', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'user_points',
+                'indexes': [models.Index(fields=['-total_points'], name='user_points_total_p_cf4c6c_idx'), models.Index(fields=['week_start', '-weekly_points'], name='user_points_week_st_e239f4_idx'), models.Index(fields=['month_start', '-monthly_points'], name='user_points_month_s_81a120_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserBadge',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('earned_at', models.DateTimeField(auto_now_add=True)),
+                ('badge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_badges', to='gamification.badge')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_badges', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_badges',
+                'ordering': ['-earned_at'],
+                'unique_together': {('user', 'badge')},
+            },
+        ),
+    ]
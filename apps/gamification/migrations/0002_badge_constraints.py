@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-16 23:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gamification', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='userbadge',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='achievement',
+            name='badge',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='achievements', to='gamification.badge'),
+        ),
+        migrations.AddConstraint(
+            model_name='achievement',
+            constraint=models.UniqueConstraint(fields=('user', 'badge'), name='unique_badge_achievement'),
+        ),
+        migrations.AddConstraint(
+            model_name='userbadge',
+            constraint=models.UniqueConstraint(fields=('user', 'badge'), name='unique_user_badge'),
+        ),
+    ]
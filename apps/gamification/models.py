@@ -35,6 +35,9 @@ class Badge(models.Model):
     class Meta:
         db_table = 'badges'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['points_required']),
+        ]
     
     def __str__(self):
         return self.name
@@ -61,8 +64,10 @@ class UserBadge(models.Model):
     
     class Meta:
         db_table = 'user_badges'
-        unique_together = ['user', 'badge']
         ordering = ['-earned_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'badge'], name='unique_user_badge'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.badge.name}"
@@ -118,6 +123,14 @@ class Achievement(models.Model):
         blank=True,
         related_name='achievements'
     )
+    # Set on badge achievements, each of which a user earns once
+    badge = models.ForeignKey(
+        Badge,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='achievements'
+    )
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -125,6 +138,9 @@ class Achievement(models.Model):
     class Meta:
         db_table = 'achievements'
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'badge'], name='unique_badge_achievement'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.title}"
@@ -214,6 +230,49 @@ class PointsTransaction(models.Model):
         return f"{self.user.username} - {self.transaction_type} ({self.points:+d})"
 
 
+class UserPoints(models.Model):
+    """
+    Running point totals per user, maintained from the points ledger.
+    
+    Period totals belong to the period starting at ``week_start`` /
+    ``month_start``; they roll over on the first transaction of a new period.
+    """
+    user = models.OneToOneField(
+        User, 
+        on_delete=models.CASCADE, 
+        primary_key=True,
+        related_name='points'
+    )
+    
+    total_points = models.IntegerField(default=0)
+    weekly_points = models.IntegerField(default=0)
+    week_start = models.DateField(null=True, blank=True)
+    monthly_points = models.IntegerField(default=0)
+    month_start = models.DateField(null=True, blank=True)
+    
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'user_points'
+        indexes = [
+            models.Index(fields=['-total_points']),
+            models.Index(fields=['week_start', '-weekly_points']),
+            models.Index(fields=['month_start', '-monthly_points']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.total_points} pts"
+    
+    def points_this_week(self, today=None):
+        from .ledger import week_start
+        return self.weekly_points if self.week_start == week_start(today) else 0
+    
+    def points_this_month(self, today=None):
+        from .ledger import month_start
+        return self.monthly_points if self.month_start == month_start(today) else 0
+
+
 class LearningStreak(models.Model):
     """
     Track user's learning streaks.
@@ -0,0 +1,28 @@
+"""
+Serializers for gamification app.
+"""
+
+from rest_framework import serializers
+
+from .leaderboard import WINDOWS
+
+
+class LeaderboardQuerySerializer(serializers.Serializer):
+    """Which leaderboard to read: the global board or a course's, in one window."""
+    
+    window = serializers.ChoiceField(choices=WINDOWS, default='all')
+    course = serializers.UUIDField(required=False)
+    day = serializers.DateField(required=False)
+
+
+class LeaderboardPageSerializer(LeaderboardQuerySerializer):
+    """A page of a leaderboard, best first."""
+    
+    offset = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=10)
+
+
+class LeaderboardAroundSerializer(LeaderboardQuerySerializer):
+    """The current user's standing and the users ranked near them."""
+    
+    radius = serializers.IntegerField(min_value=0, max_value=50, default=5)
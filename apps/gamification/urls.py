@@ -0,0 +1,13 @@
+"""
+URL patterns for gamification API.
+"""
+
+from django.urls import path
+from .views import LeaderboardView, LeaderboardAroundMeView
+
+app_name = 'gamification'
+
+urlpatterns = [
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', LeaderboardAroundMeView.as_view(), name='leaderboard_me'),
+]
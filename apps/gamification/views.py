@@ -0,0 +1,71 @@
+"""
+Views for gamification app.
+"""
+
+from rest_framework import views
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from apps.users.models import User
+
+from . import leaderboard
+from .serializers import LeaderboardAroundSerializer, LeaderboardPageSerializer
+
+
+def board_arguments(params):
+    """Return the ``leaderboard`` keyword arguments selecting a board."""
+    return {'window': params['window'], 'course_id': params.get('course'), 'day': params.get('day')}
+
+
+def with_users(entries):
+    """Add the username and level to leaderboard entries, with one query."""
+    usernames = dict(User.objects.filter(
+        id__in=[entry['user_id'] for entry in entries]
+    ).values_list('id', 'username'))
+    usernames = {str(user_id): username for user_id, username in usernames.items()}
+    for entry in entries:
+        entry['username'] = usernames.get(entry['user_id'])
+        entry['level'] = leaderboard.level_for_points(entry['points'])
+    return entries
+
+
+class LeaderboardView(views.APIView):
+    """Top of the global or a course leaderboard, in the all-time, weekly or daily window."""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = LeaderboardPageSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        entries = leaderboard.get_top(
+            count=params['limit'], offset=params['offset'], **board_arguments(params)
+        )
+        return Response({
+            'window': params['window'],
+            'course': params.get('course'),
+            'results': with_users(entries),
+        })
+
+
+class LeaderboardAroundMeView(views.APIView):
+    """The current user's rank on a leaderboard and the users around them."""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        serializer = LeaderboardAroundSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        rank = leaderboard.get_rank(request.user.id, **board_arguments(params))
+        around = []
+        if rank is not None:
+            around = leaderboard.get_around(request.user.id, radius=params['radius'], **board_arguments(params))
+        return Response({
+            'window': params['window'],
+            'course': params.get('course'),
+            'rank': rank and with_users([rank])[0],
+            'around': with_users(around),
+        })
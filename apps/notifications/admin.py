@@ -3,7 +3,7 @@ Admin configuration for notifications app.
 """
 
 from django.contrib import admin
-from .models import Notification
+from .models import BroadcastNotification, BroadcastReceipt, Notification
 
 
 @admin.register(Notification)
@@ -12,3 +12,17 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ['notification_type', 'is_read', 'created_at']
     search_fields = ['user__username', 'title', 'message']
     readonly_fields = ['created_at', 'read_at']
+
+
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    list_display = ['title', 'audience', 'course', 'notification_type', 'created_at']
+    list_filter = ['audience', 'notification_type', 'created_at']
+    search_fields = ['title', 'message']
+    raw_id_fields = ['course']
+
+
+@admin.register(BroadcastReceipt)
+class BroadcastReceiptAdmin(admin.ModelAdmin):
+    list_display = ['broadcast', 'user', 'read_at']
+    raw_id_fields = ['broadcast', 'user']
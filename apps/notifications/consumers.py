@@ -6,6 +6,8 @@ from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 
+from .fanout import ALL_BROADCASTS_GROUP, broadcast_group
+
 User = get_user_model()
 
 
@@ -23,19 +25,24 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         # Create user-specific group
         self.group_name = f'notifications_{self.user.id}'
         
-        # Join group
+        # Join group, and the broadcast groups of everyone and of each enrolled course
         await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
         )
+        await self.channel_layer.group_add(ALL_BROADCASTS_GROUP, self.channel_name)
+        self.course_ids = await self.get_course_ids()
+        for course_id in self.course_ids:
+            await self.channel_layer.group_add(broadcast_group(course_id), self.channel_name)
         
         await self.accept()
         
         # Send unread count on connection
-        unread_count = await self.get_unread_count()
+        unread_count, broadcast_count = await self.get_unread_count()
         await self.send_json({
             'type': 'unread_count',
-            'count': unread_count
+            'count': unread_count,
+            'broadcasts': broadcast_count
         })
     
     async def disconnect(self, close_code):
@@ -45,6 +52,9 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
                 self.group_name,
                 self.channel_name
             )
+            await self.channel_layer.group_discard(ALL_BROADCASTS_GROUP, self.channel_name)
+            for course_id in getattr(self, 'course_ids', ()):
+                await self.channel_layer.group_discard(broadcast_group(course_id), self.channel_name)
     
     async def receive_json(self, content):
         """Handle messages from WebSocket."""
@@ -59,11 +69,32 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
         """Send notification to WebSocket."""
         await self.send_json(event['data'])
     
+    async def broadcast_message(self, event):
+        """Send a broadcast to WebSocket."""
+        await self.send_json(event['data'])
+    
+    async def enrollment_created(self, event):
+        """Start receiving the broadcasts of a course the user just enrolled in."""
+        course_id = event['course_id']
+        if course_id not in self.course_ids:
+            self.course_ids.add(course_id)
+            await self.channel_layer.group_add(broadcast_group(course_id), self.channel_name)
+    
     @database_sync_to_async
     def get_unread_count(self):
-        """Get unread notification count."""
-        from apps.notifications.models import Notification
-        return Notification.objects.filter(user=self.user, is_read=False).count()
+        """Get unread notification and broadcast counts (cached, counted only on a miss)."""
+        from apps.notifications.dispatch import get_unread_count
+        from apps.notifications.fanout import get_unread_broadcast_count
+        return get_unread_count(self.user.id), get_unread_broadcast_count(self.user, self.course_ids)
+    
+    @database_sync_to_async
+    def get_course_ids(self):
+        """Get the ids of the courses the user is enrolled in."""
+        from apps.enrollment.models import Enrollment
+        return {
+            str(course_id)
+            for course_id in Enrollment.objects.filter(student=self.user).values_list('course_id', flat=True)
+        }
     
     @database_sync_to_async
     def mark_notification_read(self, notification_id):
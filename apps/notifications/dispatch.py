@@ -0,0 +1,212 @@
+"""
+Live delivery of notifications to connected WebSockets.
+
+New notifications are pushed to the ``notifications_<user_id>`` group that
+``NotificationConsumer`` joins, as ``notification.message`` events:
+
+    {'type': 'notification', 'notification': {...}, 'unread_count': 3}
+
+Pushes are queued once the creating transaction commits and sent by a
+background event loop. Everything queued during one tick of that loop goes
+out together (``asyncio.gather`` over the group sends), so a fan-out to
+thousands of students costs one scheduling round rather than one blocking
+``async_to_sync`` call per notification.
+
+Unread counts are cached per user. New notifications increment the
+cached counters; a fan-out increments only the counters that are cached,
+i.e. those of recently active users. Reads and deletes drop the counter
+instead, so it is counted afresh on the next read rather than drifting.
+Only a cache miss costs a ``COUNT``, and an unavailable cache degrades to
+counting every time. Counters expire after ``UNREAD_COUNT_TIMEOUT``.
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+UNREAD_COUNT_TIMEOUT = 10 * 60
+
+# Group sends awaited together per gather, to bound the load on the layer
+PUSH_CHUNK_SIZE = 500
+
+
+def group_name(user_id):
+    return f'notifications_{user_id}'
+
+
+def _unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def _cache_call(method, *args, default=None):
+    """Call the shared cache, degrading to ``default`` if it is unavailable."""
+    try:
+        return getattr(cache, method)(*args)
+    except Exception:
+        logger.warning('Unread counter cache %s(%s) failed', method, args[:1], exc_info=True)
+        return default
+
+
+def get_unread_count(user_id):
+    """Return the number of unread notifications of a user."""
+    count = _cache_call('get', _unread_key(user_id))
+    if count is None:
+        from .models import Notification
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        _cache_call('add', _unread_key(user_id), count, UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_unread_counts(deltas):
+    """
+    Apply ``{user_id: delta}`` to the cached unread counters.
+
+    Counters that are not cached are left alone; they are counted on the
+    next read.
+
+    Returns:
+        dict: New counts of the counters that were cached
+    """
+    keys = {_unread_key(user_id): user_id for user_id, delta in deltas.items() if delta}
+    counts = {}
+    for key in _cache_call('get_many', list(keys), default={}):
+        user_id = keys[key]
+        try:
+            count = cache.incr(key, deltas[user_id])
+        except ValueError:
+            # Expired since get_many
+            continue
+        except Exception:
+            logger.warning('Unread counter cache incr(%s) failed', key, exc_info=True)
+            continue
+        if count < 0:
+            _cache_call('delete', key)
+            continue
+        counts[user_id] = count
+    return counts
+
+
+def forget_unread_count(user_id):
+    """Drop a user's cached unread counter; the next read counts it."""
+    _cache_call('delete', _unread_key(user_id))
+
+
+class NotificationPusher:
+    """Sends queued channel-layer messages from a background event loop."""
+
+    def __init__(self):
+        self._queue = []
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='notification-pusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.drain)
+
+    def push(self, messages):
+        """Queue ``(group, message)`` pairs; safe to call from any thread."""
+        if not messages:
+            return
+        with self._lock:
+            self._queue.extend(messages)
+            if self._scheduled:
+                return
+            self._scheduled = True
+            self._idle.clear()
+        # One flush per tick picks up everything queued until it runs
+        self._loop.call_soon_threadsafe(lambda: self._loop.create_task(self._flush()))
+
+    async def _flush(self):
+        with self._lock:
+            batch, self._queue = self._queue, []
+            self._scheduled = False
+        layer = get_channel_layer()
+        try:
+            if layer is None:
+                return
+            for start in range(0, len(batch), PUSH_CHUNK_SIZE):
+                results = await asyncio.gather(
+                    *(layer.group_send(group, message) for group, message in batch[start:start + PUSH_CHUNK_SIZE]),
+                    return_exceptions=True,
+                )
+                for result in results:
+                    if isinstance(result, Exception):
+                        logger.warning('Notification push failed: %s', result)
+        finally:
+            with self._lock:
+                if not self._scheduled:
+                    self._idle.set()
+
+    def drain(self, timeout=5):
+        """Wait until everything queued so far has been sent."""
+        return self._idle.wait(timeout)
+
+
+_pusher = None
+_pusher_lock = threading.Lock()
+
+
+def get_pusher():
+    global _pusher
+    if _pusher is None:
+        with _pusher_lock:
+            if _pusher is None:
+                _pusher = NotificationPusher()
+    return _pusher
+
+
+def _notification_message(notification, unread_count):
+    from .serializers import NotificationSerializer
+
+    data = {'type': 'notification', 'notification': NotificationSerializer(notification).data}
+    if unread_count is not None:
+        data['unread_count'] = unread_count
+    return group_name(notification.user_id), {'type': 'notification.message', 'data': data}
+
+
+def notifications_created(notifications):
+    """
+    Count and push new notifications once the current transaction commits.
+
+    Call after ``bulk_create``; single saves are covered by the post_save
+    receiver in ``signals.py``.
+    """
+    notifications = list(notifications)
+    if not notifications:
+        return
+
+    def deliver():
+        deltas = {}
+        for notification in notifications:
+            deltas[notification.user_id] = deltas.get(notification.user_id, 0) + 1
+        counts = adjust_unread_counts(deltas)
+        get_pusher().push([
+            _notification_message(notification, counts.get(notification.user_id))
+            for notification in notifications
+        ])
+
+    transaction.on_commit(deliver, robust=True)
+
+
+def unread_count_changed(user_id):
+    """
+    Recount a user's unread notifications after reads or deletes and push
+    the count to their sockets, once the current transaction commits.
+    """
+    def deliver():
+        forget_unread_count(user_id)
+        get_pusher().push([(group_name(user_id), {
+            'type': 'notification.message',
+            'data': {'type': 'unread_count', 'count': get_unread_count(user_id)},
+        })])
+
+    transaction.on_commit(deliver, robust=True)
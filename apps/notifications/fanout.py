@@ -0,0 +1,180 @@
+"""
+Fan-out of one notification to a whole audience.
+
+Audiences below ``NOTIFICATION_BROADCAST_THRESHOLD`` get one
+``Notification`` row per user, created ``NOTIFICATION_FANOUT_CHUNK_SIZE``
+students at a time. Each chunk is created, counted and pushed in its own
+transaction, which also queues the next chunk as a
+``notifications.course_fan_out`` event, so memory stays bounded by one
+chunk and a crash resumes after the last committed one.
+
+Larger audiences get a single ``BroadcastNotification`` that every member
+reads by reference, plus a ``BroadcastReceipt`` per user who reads it.
+Cached unread broadcast counts are keyed on a generation per course (and
+one for broadcasts to everyone), so a broadcast only invalidates the counts
+of that course's students. It is
+pushed to the ``course_<id>_broadcasts`` group, which ``NotificationConsumer``
+joins for each course the user is enrolled in (and for courses they enroll
+in while connected), or to ``notifications_broadcasts`` for everyone.
+
+Fan-outs run in event handlers (see ``handlers.py``), off the request that
+triggered them. Without an event worker (``EVENTS_ASYNC = False``) the
+first chunk is created in the request and the rest of the chain runs in a
+background thread, one chunk at a time, so an instructor's request does not
+wait for the whole course.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.core.cache import Generations, TwoTierCache
+from apps.events.bus import publish
+
+from .dispatch import get_pusher, group_name, notifications_created
+from .models import BroadcastNotification, BroadcastReceipt, Notification
+
+ALL_BROADCASTS_GROUP = 'notifications_broadcasts'
+
+FAN_OUT_EVENT = 'notifications.course_fan_out'
+
+UNREAD_BROADCASTS_TIMEOUT = 10 * 60
+
+broadcast_generations = Generations(TwoTierCache(), prefix='broadcasts')
+
+
+def broadcast_group(course_id=None):
+    """Return the channel group of a course's broadcasts, or of broadcasts to everyone."""
+    return f'course_{course_id}_broadcasts' if course_id else ALL_BROADCASTS_GROUP
+
+
+def fan_out(course_id, fields, run, after=None, chunk_size=None):
+    """
+    Notify the next chunk of a course's students, in the current transaction.
+
+    Students are taken in ``student_id`` order after ``after``. When the
+    chunk is full, the next one is queued as a ``FAN_OUT_EVENT`` in the
+    same transaction.
+
+    Args:
+        course_id: Course whose enrolled students are notified
+        fields: Notification fields shared by every row
+        run: Identifies this fan-out; makes queuing a chunk twice a no-op
+        after: Last student id of the previous chunk
+        chunk_size: Rows per chunk (``NOTIFICATION_FANOUT_CHUNK_SIZE``)
+
+    Returns:
+        int: Number of notifications created
+    """
+    from apps.enrollment.models import Enrollment
+
+    chunk_size = chunk_size or settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+    students = Enrollment.objects.filter(course_id=course_id).order_by('student_id')
+    if after:
+        students = students.filter(student_id__gt=after)
+    student_ids = list(students.values_list('student_id', flat=True)[:chunk_size])
+
+    notifications = Notification.objects.bulk_create(
+        [Notification(user_id=user_id, **fields) for user_id in student_ids]
+    )
+    # bulk_create sends no post_save, so count and push the chunk explicitly
+    notifications_created(notifications)
+
+    if len(student_ids) == chunk_size:
+        after = str(student_ids[-1])
+        publish(FAN_OUT_EVENT, f'{run}:{after}', {
+            'course_id': str(course_id), 'fields': fields, 'run': run,
+            'after': after, 'chunk_size': chunk_size,
+        }, background=True)
+    return len(notifications)
+
+
+def broadcast(audience='course', course=None, **fields):
+    """
+    Store one notification for a whole audience and push it to open sockets.
+
+    Returns:
+        BroadcastNotification
+    """
+    from .serializers import BroadcastNotificationSerializer
+
+    item = BroadcastNotification.objects.create(audience=audience, course=course, **fields)
+
+    def deliver():
+        broadcast_generations.bump(_generation_name(course.id if course else None))
+        data = BroadcastNotificationSerializer(item).data
+        get_pusher().push([(broadcast_group(course.id if course else None), {
+            'type': 'broadcast.message',
+            'data': {'type': 'broadcast', 'broadcast': data},
+        })])
+
+    transaction.on_commit(deliver, robust=True)
+    return item
+
+
+def enrolled(user_id, course_id):
+    """Subscribe a user's open sockets to a course's broadcasts once the enrollment commits."""
+    message = {'type': 'enrollment.created', 'course_id': str(course_id)}
+    transaction.on_commit(lambda: get_pusher().push([(group_name(user_id), message)]), robust=True)
+
+
+def notify_course(course, chunk_size=None, **fields):
+    """
+    Notify every student enrolled in a course.
+
+    Uses per-user rows for small courses and a broadcast for large ones,
+    judged by the course's denormalized ``enrollment_count``. The first
+    chunk of rows is created in the current transaction, later chunks by
+    their own events.
+
+    Returns:
+        int: Number of rows created now (1 for a broadcast)
+    """
+    if course.enrollment_count >= settings.NOTIFICATION_BROADCAST_THRESHOLD:
+        broadcast('course', course, **fields)
+        return 1
+    return fan_out(course.id, fields, run=uuid.uuid4().hex, chunk_size=chunk_size)
+
+
+def _generation_name(course_id=None):
+    return f'course:{course_id}' if course_id else 'all'
+
+
+def _unread_broadcasts_key(user, course_ids=None):
+    """Build a user's unread broadcasts key from the generations of their courses."""
+    if course_ids is None:
+        from apps.enrollment.models import Enrollment
+        course_ids = Enrollment.objects.filter(student=user).values_list('course_id', flat=True)
+    names = [_generation_name()] + sorted(_generation_name(course_id) for course_id in course_ids)
+    state = ','.join(f'{name}={generation}' for name, generation in zip(names, broadcast_generations.get(*names)))
+    return f'notifications:broadcast-unread:{user.id}:{hashlib.blake2b(state.encode(), digest_size=16).hexdigest()}'
+
+
+def get_unread_broadcast_count(user, course_ids=None):
+    """
+    Return the number of broadcasts visible to a user and not read yet.
+
+    Pass the ids of the user's courses when already known to save a query.
+    """
+    key = _unread_broadcasts_key(user, course_ids)
+    count = cache.get(key)
+    if count is None:
+        count = BroadcastNotification.objects.visible_to(user).exclude(receipts__user=user).count()
+        cache.set(key, count, UNREAD_BROADCASTS_TIMEOUT)
+    return count
+
+
+def mark_broadcast_read(broadcast_item, user):
+    """
+    Record that a user read a broadcast.
+
+    Returns:
+        bool: True when this is the first read
+    """
+    _, created = BroadcastReceipt.objects.get_or_create(broadcast=broadcast_item, user=user)
+    if created:
+        cache.delete(_unread_broadcasts_key(user))
+    return created
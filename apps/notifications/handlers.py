@@ -0,0 +1,91 @@
+"""
+Event handlers for automatic notification creation.
+"""
+
+from apps.certificates.models import Certificate
+from apps.enrollment.models import Enrollment
+from apps.events.bus import handler
+from apps.payments.models import PaymentTransaction
+from apps.quizzes.models import Quiz
+from .fanout import FAN_OUT_EVENT, enrolled, fan_out, notify_course
+from .models import Notification
+
+
+@handler('enrollment.created')
+def create_enrollment_notification(event):
+    """Create notification when student enrolls in a course."""
+    enrollment = Enrollment.objects.select_related('course').filter(pk=event.payload['enrollment_id']).first()
+    if enrollment is None:
+        return
+    Notification.objects.create(
+        user_id=enrollment.student_id,
+        notification_type='enrollment',
+        title='Successfully Enrolled!',
+        message=f'You have successfully enrolled in "{enrollment.course.title}".',
+        action_url=f'/student/courses/{enrollment.course.id}/',
+        metadata={'course_id': str(enrollment.course.id)}
+    )
+    enrolled(enrollment.student_id, enrollment.course_id)
+
+
+@handler('quiz.created')
+def create_quiz_added_notification(event):
+    """Notify enrolled students when a new quiz is added."""
+    quiz = Quiz.objects.select_related('course').filter(pk=event.payload['quiz_id']).first()
+    if quiz is None:
+        return
+    # Streams the enrolled students in batches, or broadcasts to large courses
+    notify_course(
+        quiz.course,
+        notification_type='quiz_added',
+        title='New Quiz Available!',
+        message=f'A new quiz "{quiz.title}" has been added to "{quiz.course.title}".',
+        action_url=f'/student/courses/{quiz.course.id}/quizzes/{quiz.id}/',
+        metadata={'course_id': str(quiz.course.id), 'quiz_id': str(quiz.id)}
+    )
+
+
+@handler(FAN_OUT_EVENT)
+def continue_course_fan_out(event):
+    """Notify the next chunk of a course's students (see ``notify_course``)."""
+    fan_out(**event.payload)
+
+
+@handler('certificate.ready')
+def create_certificate_notification(event):
+    """Create notification when the certificate PDF is ready."""
+    certificate = Certificate.objects.filter(pk=event.payload['certificate_id']).first()
+    if certificate is None:
+        return
+    Notification.objects.create(
+        user_id=certificate.student_id,
+        notification_type='certificate',
+        title='Certificate Earned! 🎉',
+        message=f'Congratulations! You have earned a certificate for completing "{certificate.course_name}".',
+        action_url=f'/certificates/{certificate.id}/',
+        metadata={'certificate_id': str(certificate.id)}
+    )
+
+
+@handler('payment.completed')
+def create_payment_notification(event):
+    """Create notification for a completed payment."""
+    payment = PaymentTransaction.objects.filter(pk=event.payload['payment_id'], status='completed').first()
+    if payment is None:
+        return
+    # Outbox rows are purged after EVENTS_RETENTION_DAYS, after which a
+    # completed payment saved again publishes a new event
+    if Notification.objects.filter(
+        user_id=payment.user_id,
+        notification_type='payment',
+        metadata__payment_id=str(payment.id),
+    ).exists():
+        return
+    Notification.objects.create(
+        user_id=payment.user_id,
+        notification_type='payment',
+        title='Payment Successful!',
+        message=f'Your payment of {payment.amount} {payment.currency} has been processed successfully.',
+        action_url='/student/dashboard/',
+        metadata={'payment_id': str(payment.id)}
+    )
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.14 on 2026-10-16 21:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_course_search_vector'),
+        ('notifications', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('audience', models.CharField(choices=[('course', 'Course Students'), ('all', 'All Users')], default='course', max_length=20)),
+                ('notification_type', models.CharField(choices=[('enrollment', 'Enrollment'), ('quiz_added', 'Quiz Added'), ('certificate', 'Certificate Generated'), ('payment', 'Payment'), ('course_update', 'Course Update'), ('system', 'System')], max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('action_url', models.URLField(blank=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_notifications', to='courses.course')),
+            ],
+            options={
+                'db_table': 'broadcast_notifications',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BroadcastReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('read_at', models.DateTimeField(auto_now_add=True)),
+                ('broadcast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='receipts', to='notifications.broadcastnotification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_receipts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'broadcast_receipts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['course', '-created_at'], name='broadcast_n_course__9e702d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='broadcastnotification',
+            index=models.Index(fields=['audience', '-created_at'], name='broadcast_n_audienc_798b1e_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='broadcastreceipt',
+            unique_together={('broadcast', 'user')},
+        ),
+    ]
@@ -3,6 +3,8 @@ Notification model for real-time notifications.
 """
 
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
+from apps.courses.models import Course
 from apps.users.models import User
 import uuid
 
@@ -55,6 +57,89 @@ class Notification(models.Model):
         """Mark notification as read."""
         if not self.is_read:
             from django.utils import timezone
+            from .dispatch import unread_count_changed
             self.is_read = True
             self.read_at = timezone.now()
             self.save()
+            unread_count_changed(self.user_id)
+
+
+class BroadcastNotificationQuerySet(models.QuerySet):
+    """QuerySet for broadcasts addressed to an audience."""
+    
+    def visible_to(self, user):
+        """Broadcasts for everyone, or for a course the user was enrolled in when it was sent."""
+        from apps.enrollment.models import Enrollment
+        enrolled = Enrollment.objects.filter(
+            student=user,
+            course=OuterRef('course'),
+            enrolled_at__lte=OuterRef('created_at'),
+        )
+        return self.filter(Q(audience='all') | (Q(audience='course') & Q(Exists(enrolled))))
+    
+    def with_read_state(self, user):
+        return self.annotate(is_read=Exists(
+            BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user=user)
+        ))
+
+
+class BroadcastNotification(models.Model):
+    """
+    A notification stored once and read by reference by its whole audience.
+    
+    Used instead of per-user rows for very large audiences; reads are
+    tracked with one ``BroadcastReceipt`` per user who opened it.
+    """
+    
+    AUDIENCE_CHOICES = [
+        ('course', 'Course Students'),
+        ('all', 'All Users'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    audience = models.CharField(max_length=20, choices=AUDIENCE_CHOICES, default='course')
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='broadcast_notifications'
+    )
+    
+    # Notification content
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPE_CHOICES)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    action_url = models.URLField(blank=True)
+    metadata = models.JSONField(default=dict, blank=True)
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = BroadcastNotificationQuerySet.as_manager()
+    
+    class Meta:
+        db_table = 'broadcast_notifications'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['course', '-created_at']),
+            models.Index(fields=['audience', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_audience_display()} - {self.title}"
+
+
+class BroadcastReceipt(models.Model):
+    """Records that a user has read a broadcast."""
+    
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'broadcast_receipts'
+        unique_together = ['broadcast', 'user']
+    
+    def __str__(self):
+        return f"{self.user.username} read {self.broadcast_id}"
@@ -3,7 +3,7 @@ Serializers for notifications app.
 """
 
 from rest_framework import serializers
-from .models import Notification
+from .models import BroadcastNotification, Notification
 
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -16,3 +16,18 @@ class NotificationSerializer(serializers.ModelSerializer):
             'action_url', 'is_read', 'read_at', 'metadata', 'created_at'
         ]
         read_only_fields = ['id', 'created_at', 'read_at']
+
+
+class BroadcastNotificationSerializer(serializers.ModelSerializer):
+    """Serializer for broadcast notifications."""
+    
+    course = serializers.UUIDField(source='course_id', read_only=True)
+    is_read = serializers.BooleanField(read_only=True, default=False)
+    
+    class Meta:
+        model = BroadcastNotification
+        fields = [
+            'id', 'audience', 'course', 'notification_type', 'title', 'message',
+            'action_url', 'metadata', 'is_read', 'created_at'
+        ]
+        read_only_fields = fields
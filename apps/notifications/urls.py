@@ -5,7 +5,8 @@ URL patterns for notifications API.
 from django.urls import path
 from .views import (
     NotificationListView, NotificationMarkReadView,
-    NotificationMarkAllReadView, NotificationUnreadCountView
+    NotificationMarkAllReadView, NotificationUnreadCountView,
+    BroadcastListView, BroadcastMarkReadView
 )
 
 app_name = 'notifications'
@@ -15,4 +16,6 @@ urlpatterns = [
     path('unread-count/', NotificationUnreadCountView.as_view(), name='unread_count'),
     path('<uuid:pk>/mark-read/', NotificationMarkReadView.as_view(), name='mark_read'),
     path('mark-all-read/', NotificationMarkAllReadView.as_view(), name='mark_all_read'),
+    path('broadcasts/', BroadcastListView.as_view(), name='broadcast_list'),
+    path('broadcasts/<uuid:pk>/mark-read/', BroadcastMarkReadView.as_view(), name='broadcast_mark_read'),
 ]
@@ -7,8 +7,11 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 
-from .models import Notification
-from .serializers import NotificationSerializer
+from .dispatch import get_unread_count, unread_count_changed
+from .fanout import get_unread_broadcast_count, mark_broadcast_read
+from .models import BroadcastNotification, Notification
+from .serializers import BroadcastNotificationSerializer, NotificationSerializer
+from apps.core.pagination import SignedCursorPagination
 
 
 class NotificationListView(generics.ListAPIView):
@@ -16,6 +19,8 @@ class NotificationListView(generics.ListAPIView):
     
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SignedCursorPagination
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         queryset = Notification.objects.filter(user=self.request.user)
@@ -50,22 +55,16 @@ class NotificationMarkAllReadView(views.APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
-        notifications = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        )
-        
         from django.utils import timezone
-        now = timezone.now()
         
-        for notification in notifications:
-            notification.is_read = True
-            notification.read_at = now
-        
-        Notification.objects.bulk_update(notifications, ['is_read', 'read_at'])
+        updated = Notification.objects.filter(
+            user=request.user,
+            is_read=False
+        ).update(is_read=True, read_at=timezone.now())
+        unread_count_changed(request.user.id)
         
         return Response({
-            'message': f'{notifications.count()} notifications marked as read.'
+            'message': f'{updated} notifications marked as read.'
         })
 
 
@@ -75,9 +74,36 @@ class NotificationUnreadCountView(views.APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False
-        ).count()
-        
-        return Response({'count': count})
+        return Response({
+            'count': get_unread_count(request.user.id),
+            'broadcasts': get_unread_broadcast_count(request.user),
+        })
+
+
+class BroadcastListView(generics.ListAPIView):
+    """List broadcast notifications addressed to the current user."""
+    
+    serializer_class = BroadcastNotificationSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = SignedCursorPagination
+    cursor_ordering = '-created_at'
+    
+    def get_queryset(self):
+        return BroadcastNotification.objects.visible_to(
+            self.request.user
+        ).with_read_state(self.request.user).order_by('-created_at')
+
+
+class BroadcastMarkReadView(views.APIView):
+    """Mark a broadcast notification as read."""
+    
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, pk):
+        broadcast = get_object_or_404(
+            BroadcastNotification.objects.visible_to(request.user),
+            id=pk
+        )
+        mark_broadcast_read(broadcast, request.user)
+        broadcast.is_read = True
+        return Response(BroadcastNotificationSerializer(broadcast).data)
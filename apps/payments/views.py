@@ -15,6 +15,7 @@ from .models import PaymentTransaction
 from apps.courses.models import Course
 from .serializers import PaymentTransactionSerializer
 from .services import create_checkout_session, handle_successful_payment
+from apps.core.pagination import SignedCursorPagination
 
 
 class CreateCheckoutSessionView(views.APIView):
@@ -100,6 +101,8 @@ class PaymentHistoryView(generics.ListAPIView):
     
     serializer_class = PaymentTransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SignedCursorPagination
+    cursor_ordering = '-created_at'
     
     def get_queryset(self):
         return PaymentTransaction.objects.filter(user=self.request.user).order_by('-created_at')
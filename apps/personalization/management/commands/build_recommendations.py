@@ -0,0 +1,38 @@
+"""
+Django management command to rebuild course neighbors and recommendations.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.personalization import recommender
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds similar courses from learner interactions and stores every user\'s course recommendations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--neighbors', type=int, default=settings.RECOMMENDATIONS_NEIGHBORS,
+            help='Similar courses kept per course',
+        )
+        parser.add_argument(
+            '--per-user', type=int, default=settings.RECOMMENDATIONS_PER_USER,
+            help='Recommendations stored per user',
+        )
+        parser.add_argument(
+            '--min-support', type=int, default=settings.RECOMMENDATIONS_MIN_SUPPORT,
+            help='Shared learners needed before two courses count as similar',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        built = recommender.build(
+            k=options['neighbors'], per_user=options['per_user'], min_support=options['min_support'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Built {built['neighbors']} course neighbors and {built['recommendations']} recommendations "
+            f"from {built['interactions']} interactions of {built['users']} users with {built['courses']} courses "
+            f"in {time.monotonic() - started:.2f}s"
+        ))
@@ -101,11 +101,35 @@ class Recommendation(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'content_type', '-confidence_score']),
+        ]
 
     def __str__(self):
         return f"Recommendation for {self.user.username}: {self.title}"
 
 
+class CourseNeighbor(models.Model):
+    """
+    Model for storing a course's most similar courses by learner interactions.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()  # Cosine similarity of the two courses' learners, 0-1
+    support = models.IntegerField(default=0)  # Learners who interacted with both
+    
+    class Meta:
+        unique_together = ('course', 'neighbor')
+        ordering = ['course', '-score']
+        indexes = [
+            models.Index(fields=['course', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} ~ {self.neighbor_id} ({self.score:.3f})"
+
+
 class UserActivity(models.Model):
     """
     Model for tracking user activities for personalization.
@@ -0,0 +1,423 @@
+"""
+Item-based collaborative filtering for course recommendations.
+
+``build()`` runs offline (``manage.py build_recommendations``):
+
+1. A sparse user x course matrix of implicit feedback is assembled from
+   enrollments (weighted by progress), lesson progress, reviews (ratings
+   below 3 count against a course) and course activity.
+2. Course-course cosine similarity is computed with sparse matrix products,
+   a block of courses at a time, shrunk towards 0 for pairs with few
+   shared learners, and the top ``RECOMMENDATIONS_NEIGHBORS`` per course are
+   stored as ``CourseNeighbor`` rows.
+3. Every user's interactions are multiplied by the neighbor matrix; the
+   best published courses they are not enrolled in become ``Recommendation``
+   rows, keeping the seen / acted-upon flags of ones that survive.
+
+``recommend()`` serves a user from those rows with a few indexed lookups:
+stored recommendations, merged with the neighbors of their most recent
+enrollments (which may be newer than the last build), minus enrolled
+courses. Learners whose courses have too few co-enrolled neighbors (new
+courses, niche topics) are topped up with courses similar in content from
+``apps.courses.similarity``, and new users with the most popular courses.
+"""
+
+import logging
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from apps.courses.models import Course
+from apps.courses.similarity import get_similarity_index
+from apps.enrollment.models import Enrollment, LessonProgress
+from apps.reviews.models import Review
+
+from .models import CourseNeighbor, Recommendation, UserActivity
+
+logger = logging.getLogger(__name__)
+
+POPULAR_CACHE_KEY = 'recommendations:popular'
+
+CONTENT_REASON = 'Similar in content to courses you are taking'
+
+COURSE_BLOCK_SIZE = 2000
+USER_BLOCK_SIZE = 1000
+
+
+def _interactions():
+    """
+    Return implicit feedback as parallel lists of users, courses and weights.
+
+    Pairs may repeat across sources; the matrix sums them.
+    """
+    users, courses, weights = [], [], []
+
+    def add(rows):
+        for user_id, course_id, weight in rows:
+            users.append(user_id)
+            courses.append(course_id)
+            weights.append(float(weight))
+
+    add(
+        (student_id, course_id, 1 + float(progress) / 100)
+        for student_id, course_id, progress in Enrollment.objects.order_by().values_list(
+            'student_id', 'course_id', 'progress_percentage'
+        ).iterator(chunk_size=5000)
+    )
+    add(
+        (row['enrollment__student_id'], row['enrollment__course_id'], min(1.0, 0.1 * row['started']))
+        for row in LessonProgress.objects.order_by().values(
+            'enrollment__student_id', 'enrollment__course_id'
+        ).annotate(started=Count('id')).iterator(chunk_size=5000)
+    )
+    add(
+        (student_id, course_id, (rating - 3) / 2)
+        for student_id, course_id, rating in Review.objects.order_by().values_list(
+            'student_id', 'course_id', 'rating'
+        ).iterator(chunk_size=5000)
+    )
+    add(
+        (row['user_id'], row['content_id'], min(1.0, 0.25 * row['count']))
+        for row in UserActivity.objects.filter(
+            # content_id is not a foreign key, so it may name a deleted course
+            content_type='course', content_id__in=Course.objects.values('id')
+        ).order_by().values('user_id', 'content_id').annotate(count=Count('id')).iterator(chunk_size=5000)
+    )
+    return users, courses, weights
+
+
+def _codes(values):
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+def build_matrix():
+    """
+    Assemble the user x course interaction matrix.
+
+    Returns:
+        tuple: (CSR matrix, user ids by row, course ids by column)
+    """
+    from scipy import sparse
+
+    users, courses, weights = _interactions()
+    user_codes, user_ids = _codes(users)
+    course_codes, course_ids = _codes(courses)
+    matrix = sparse.coo_matrix(
+        (np.array(weights, dtype=np.float32), (user_codes, course_codes)),
+        shape=(len(user_ids), len(course_ids)),
+    ).tocsr()
+    matrix.sum_duplicates()
+    # Courses a learner rated down overall are not a positive signal
+    matrix.data = np.maximum(matrix.data, 0)
+    matrix.eliminate_zeros()
+    return matrix, user_ids, course_ids
+
+
+def _top_k(indices, data, k):
+    """Return the ``k`` entries with the largest data, largest first."""
+    if len(data) <= k:
+        order = np.argsort(-data)
+    else:
+        part = np.argpartition(-data, k)[:k]
+        order = part[np.argsort(-data[part])]
+    return indices[order], data[order]
+
+
+def compute_neighbors(matrix, k, min_support, shrinkage):
+    """
+    Find the ``k`` most similar courses of every course.
+
+    Similarity is the cosine of the courses' interaction columns, multiplied
+    by ``support / (support + shrinkage)`` where support counts learners of
+    both courses.
+
+    Returns:
+        scipy.sparse.csr_matrix: course x course scores, at most ``k`` per row
+        scipy.sparse.csr_matrix: the matching support counts
+    """
+    from scipy import sparse
+
+    courses = matrix.shape[1]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    normalized = (matrix @ sparse.diags(1 / np.maximum(norms, 1e-12))).tocsc()
+    binary = matrix.copy()
+    binary.data[:] = 1
+    binary = binary.tocsc()
+
+    rows, cols, scores, supports = [], [], [], []
+    for start in range(0, courses, COURSE_BLOCK_SIZE):
+        stop = min(start + COURSE_BLOCK_SIZE, courses)
+        similarity = (normalized[:, start:stop].T @ normalized).tocsr()
+        support = (binary[:, start:stop].T @ binary).tocsr()
+        # Weights are positive, so both products have the same sparsity pattern
+        similarity.sort_indices()
+        support.sort_indices()
+        for offset in range(stop - start):
+            course = start + offset
+            row = slice(similarity.indptr[offset], similarity.indptr[offset + 1])
+            neighbors, values, counts = similarity.indices[row], similarity.data[row], support.data[row]
+            keep = (neighbors != course) & (counts >= min_support)
+            shrunk = values[keep] * counts[keep] / (counts[keep] + shrinkage)
+            top, top_values = _top_k(np.arange(len(shrunk)), shrunk, k)
+            rows.extend([course] * len(top))
+            cols.extend(neighbors[keep][top].tolist())
+            scores.extend(top_values.tolist())
+            supports.extend(counts[keep][top].tolist())
+
+    shape = (courses, courses)
+    return (
+        sparse.csr_matrix((np.array(scores, dtype=np.float32), (rows, cols)), shape=shape),
+        sparse.csr_matrix((np.array(supports, dtype=np.int32), (rows, cols)), shape=shape),
+    )
+
+
+def _save_neighbors(neighbors, support, course_ids):
+    rows = []
+    for course in range(neighbors.shape[0]):
+        row = slice(neighbors.indptr[course], neighbors.indptr[course + 1])
+        for neighbor, score, count in zip(
+            neighbors.indices[row].tolist(), neighbors.data[row].tolist(), support.data[row].tolist()
+        ):
+            rows.append(CourseNeighbor(
+                course_id=course_ids[course], neighbor_id=course_ids[neighbor], score=round(score, 6), support=count,
+            ))
+    with transaction.atomic():
+        CourseNeighbor.objects.all().delete()
+        CourseNeighbor.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def _save_recommendations(user_ids, picks, titles):
+    """
+    Replace the course recommendations of a block of users.
+
+    Recommendations that are still picked keep their id and flags; ones no
+    longer picked are dropped unless the user acted on them.
+    """
+    existing = defaultdict(dict)
+    for recommendation in Recommendation.objects.filter(user_id__in=user_ids, content_type='course'):
+        existing[recommendation.user_id][recommendation.content_id] = recommendation
+
+    created, updated, stale = [], [], []
+    for user_id in user_ids:
+        current = existing.get(user_id, {})
+        chosen = picks.get(user_id, [])
+        for course_id, score, reason in chosen:
+            recommendation = current.pop(course_id, None)
+            if recommendation is None:
+                recommendation = Recommendation(user_id=user_id, content_type='course', content_id=course_id)
+                created.append(recommendation)
+            else:
+                updated.append(recommendation)
+            recommendation.title = titles[course_id][:200]
+            recommendation.confidence_score = round(score, 4)
+            recommendation.reason = reason
+        stale.extend(recommendation.pk for recommendation in current.values() if not recommendation.is_acted_upon)
+
+    with transaction.atomic():
+        Recommendation.objects.filter(pk__in=stale).delete()
+        Recommendation.objects.bulk_update(updated, ['title', 'confidence_score', 'reason'], batch_size=1000)
+        Recommendation.objects.bulk_create(created, batch_size=1000)
+    return len(created) + len(updated)
+
+
+def _content_picks(block_users, picks, interactions, course_ids, enrolled, published, per_user):
+    """
+    Top up users with fewer than ``per_user`` picks with courses similar in content.
+
+    Each user's profile is the interaction-weighted sum of their courses'
+    similarity rows; content picks rank below the collaborative ones.
+    """
+    short = [
+        offset for offset, user_id in enumerate(block_users)
+        if len(picks.get(user_id, [])) < per_user and interactions.indptr[offset + 1] > interactions.indptr[offset]
+    ]
+    if not short:
+        return
+    try:
+        index = get_similarity_index()
+        sources = sorted(set(interactions[short].indices.tolist()))
+        rows = index.vectors_for([course_ids[course] for course in sources])
+        profiles = interactions[short][:, sources] @ rows
+        k = per_user + max(interactions.indptr[offset + 1] - interactions.indptr[offset] for offset in short)
+        neighbors = index.similar_to_vectors(profiles, k=k)
+    except Exception:
+        logger.warning('Content-based top-up skipped', exc_info=True)
+        return
+
+    for offset, similar in zip(short, neighbors):
+        user_id = block_users[offset]
+        chosen = picks.setdefault(user_id, [])
+        own = slice(interactions.indptr[offset], interactions.indptr[offset + 1])
+        taken = {course_ids[course] for course in interactions.indices[own].tolist()}
+        taken |= {course_ids[course] for course in enrolled[user_id] - {None}}
+        taken |= {course_id for course_id, _, _ in chosen}
+        floor = chosen[-1][1] if chosen else 1.0
+        for course_id, similarity in similar:
+            if len(chosen) >= per_user:
+                break
+            if course_id in published and course_id not in taken:
+                chosen.append((course_id, floor * similarity, CONTENT_REASON))
+
+
+def recommend_offline(matrix, neighbors, user_ids, course_ids, per_user):
+    """
+    Score every user against the neighbor matrix and store their top courses.
+
+    Returns:
+        int: Number of recommendations written
+    """
+    published = dict(Course.objects.filter(status='published').values_list('id', 'title'))
+    titles = dict(Course.objects.filter(id__in=course_ids).values_list('id', 'title'))
+    titles.update(published)
+    allowed = np.array([course_id in published for course_id in course_ids])
+    column = {course_id: code for code, course_id in enumerate(course_ids)}
+    by_source = neighbors.tocsc()
+    written = 0
+
+    for start in range(0, len(user_ids), USER_BLOCK_SIZE):
+        block_users = user_ids[start:start + USER_BLOCK_SIZE]
+        enrolled = defaultdict(set)
+        for student_id, course_id in Enrollment.objects.filter(student_id__in=block_users).values_list(
+            'student_id', 'course_id'
+        ):
+            enrolled[student_id].add(column.get(course_id))
+
+        interactions = matrix[start:start + len(block_users)]
+        scores = (interactions @ neighbors).tocsr()
+        picks = {}
+        for offset, user_id in enumerate(block_users):
+            row = slice(scores.indptr[offset], scores.indptr[offset + 1])
+            candidates, values = scores.indices[row], scores.data[row]
+            keep = allowed[candidates] & ~np.isin(candidates, list(enrolled[user_id] - {None}))
+            candidates, values = candidates[keep], values[keep]
+            if not len(candidates):
+                continue
+            top, top_values = _top_k(candidates, values, per_user)
+            best = top_values[0]
+            own = slice(interactions.indptr[offset], interactions.indptr[offset + 1])
+            own_courses, own_weights = interactions.indices[own], interactions.data[own]
+            chosen = []
+            for course, value in zip(top.tolist(), top_values.tolist()):
+                # The course the user interacted with that contributes most explains the pick
+                col = slice(by_source.indptr[course], by_source.indptr[course + 1])
+                sources = dict(zip(by_source.indices[col].tolist(), by_source.data[col].tolist()))
+                contributions = [weight * sources.get(source, 0) for source, weight in zip(own_courses.tolist(), own_weights.tolist())]
+                because = titles.get(course_ids[own_courses[int(np.argmax(contributions))]], 'your courses')
+                chosen.append((course_ids[course], value / best, f'Learners who took "{because}" also took this course'))
+            picks[user_id] = chosen
+        _content_picks(block_users, picks, interactions, course_ids, enrolled, published, per_user)
+        written += _save_recommendations(block_users, picks, titles)
+    return written
+
+
+def build(k=None, per_user=None, min_support=None, shrinkage=None):
+    """
+    Rebuild course neighbors and every user's recommendations.
+
+    Returns:
+        dict: Sizes of what was built
+    """
+    k = k or settings.RECOMMENDATIONS_NEIGHBORS
+    per_user = per_user or settings.RECOMMENDATIONS_PER_USER
+    min_support = settings.RECOMMENDATIONS_MIN_SUPPORT if min_support is None else min_support
+    shrinkage = settings.RECOMMENDATIONS_SHRINKAGE if shrinkage is None else shrinkage
+
+    matrix, user_ids, course_ids = build_matrix()
+    neighbors, support = compute_neighbors(matrix, k, min_support, shrinkage)
+    stored_neighbors = _save_neighbors(neighbors, support, course_ids)
+    recommendations = recommend_offline(matrix, neighbors, user_ids, course_ids, per_user)
+
+    popularity = np.asarray((matrix > 0).sum(axis=0)).ravel()
+    published = dict(Course.objects.filter(status='published').values_list('id', 'title'))
+    popular = [
+        (course_ids[course], published[course_ids[course]])
+        for course in np.argsort(-popularity).tolist() if course_ids[course] in published
+    ][:settings.RECOMMENDATIONS_POPULAR]
+    cache.set(POPULAR_CACHE_KEY, popular, None)
+
+    return {
+        'users': len(user_ids), 'courses': len(course_ids), 'interactions': matrix.nnz,
+        'neighbors': stored_neighbors, 'recommendations': recommendations,
+    }
+
+
+def _content_recommendations(course_ids, limit, excluded):
+    """Return up to ``limit`` published courses similar in content to ``course_ids``."""
+    try:
+        similar = get_similarity_index().similar_to_courses(course_ids, k=limit, exclude=excluded)
+    except Exception:
+        logger.warning('Content-based recommendations unavailable', exc_info=True)
+        return []
+    titles = dict(Course.objects.filter(
+        id__in=[course_id for course_id, _ in similar], status='published'
+    ).values_list('id', 'title'))
+    return [
+        (course_id, {'score': score, 'title': titles[course_id], 'description': '', 'reason': CONTENT_REASON})
+        for course_id, score in similar if course_id in titles
+    ]
+
+
+def recommend(user, limit=10):
+    """
+    Return up to ``limit`` course recommendations for ``user``, best first.
+
+    Returns:
+        list: dicts with id, title, description, content_type, confidence_score and reason
+    """
+    enrolled = list(Enrollment.objects.filter(student=user).order_by('-enrolled_at').values_list('course_id', flat=True))
+    excluded = set(enrolled)
+    merged = {}
+
+    for course_id, score, title, description, reason in Recommendation.objects.filter(
+        user=user, content_type='course', is_acted_upon=False
+    ).order_by('-confidence_score').values_list(
+        'content_id', 'confidence_score', 'title', 'description', 'reason'
+    )[:limit * 2]:
+        if course_id not in excluded:
+            merged[course_id] = {'score': score, 'title': title, 'description': description, 'reason': reason}
+
+    recent = enrolled[:settings.RECOMMENDATIONS_RECENT_COURSES]
+    if recent:
+        rank = {course_id: position for position, course_id in enumerate(recent)}
+        for source_id, source_title, neighbor_id, neighbor_title, score in CourseNeighbor.objects.filter(
+            Q(course_id__in=recent) & Q(neighbor__status='published')
+        ).values_list('course_id', 'course__title', 'neighbor_id', 'neighbor__title', 'score'):
+            if neighbor_id in excluded:
+                continue
+            # More recent enrollments count for more
+            weighted = score / (1 + rank[source_id])
+            entry = merged.setdefault(neighbor_id, {
+                'score': 0.0, 'title': neighbor_title, 'description': '',
+                'reason': f'Learners who took "{source_title}" also took this course',
+            })
+            entry['score'] += weighted
+
+    results = sorted(merged.items(), key=lambda item: -item[1]['score'])[:limit]
+    if len(results) < limit and recent:
+        results.extend(_content_recommendations(recent, limit - len(results), excluded | merged.keys()))
+    if len(results) < limit:
+        chosen = excluded | {course_id for course_id, _ in results}
+        for course_id, title in cache.get(POPULAR_CACHE_KEY) or []:
+            if len(results) >= limit:
+                break
+            if course_id not in chosen:
+                results.append((course_id, {'score': 0.0, 'title': title, 'description': '', 'reason': 'Popular with learners'}))
+
+    return [
+        {
+            'id': course_id,
+            'title': entry['title'],
+            'description': entry['description'],
+            'content_type': 'course',
+            'confidence_score': round(entry['score'], 4),
+            'reason': entry['reason'],
+        }
+        for course_id, entry in results
+    ]
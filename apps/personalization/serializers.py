@@ -22,7 +22,7 @@ class CourseSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'category', 'difficulty_level', 'estimated_duration']
+        fields = ['id', 'title', 'description', 'category', 'difficulty', 'duration_hours']
         read_only_fields = ['id']
 
 
@@ -3,6 +3,7 @@ from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
+from apps.personalization import recommender
 from apps.personalization.models import UserPreference, LearningPath, Recommendation, UserActivity
 from apps.personalization.serializers import (
     UserPreferenceSerializer, LearningPathSerializer, 
@@ -130,33 +131,21 @@ def track_user_activity(request):
 @permission_classes([IsAuthenticated])
 def get_personalized_recommendations(request):
     """
-    Get personalized recommendations based on user activity and preferences.
+    Get personalized course recommendations.
+
+    Reads the recommendations built offline by ``build_recommendations``
+    and merges in courses similar to the user's latest enrollments.
     """
-    # In a real implementation, this would use ML algorithms to generate recommendations
-    # For now, we'll return a mock response based on user's learning path
     user = request.user
     preferences = UserPreference.objects.filter(user=user).first()
     
-    # Get user's learning paths
-    learning_paths = LearningPath.objects.filter(user=user)
-    
-    # Get user's recent activities
-    recent_activities = UserActivity.objects.filter(user=user).order_by('-created_at')[:10]
-    
-    # Mock recommendations based on recent activities
-    mock_recommendations = []
-    for activity in recent_activities:
-        if activity.content_type == 'course_enrollment':
-            mock_recommendations.append({
-                'id': activity.id,
-                'title': f'Similar course to {activity.metadata.get("course_title", "your recent course")}',
-                'description': 'Based on your interest in this topic',
-                'content_type': 'course',
-                'confidence_score': 0.8
-            })
+    try:
+        limit = min(50, max(1, int(request.query_params.get('limit', 10))))
+    except ValueError:
+        limit = 10
     
     return Response({
-        'recommendations': mock_recommendations,
+        'recommendations': recommender.recommend(user, limit=limit),
         'learning_style': preferences.learning_style if preferences else 'visual',
         'next_steps': ['Complete your current course', 'Try a related quiz', 'Join a study group']
     }, status=status.HTTP_200_OK)
\ No newline at end of file
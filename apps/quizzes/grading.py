@@ -0,0 +1,152 @@
+"""
+Quiz grading engine.
+
+A quiz's answer key is loaded with a single query and compiled into a
+compact structure: the set of correct answer ids for each choice question
+and the set of normalized accepted strings for each short-answer question.
+Grading an attempt and building its detailed breakdown then happen in one
+pass over that structure, without touching the database.
+
+Compiled keys are cached per quiz and invalidated by the Question/Answer
+signal handlers in ``apps.quizzes.signals``.
+"""
+
+from collections import namedtuple
+
+from apps.core.cache import TwoTierCache, Generations
+
+
+ANSWER_KEY_TIMEOUT = 60 * 60
+
+CHOICE_TYPES = ('mcq', 'true_false')
+
+QuestionKey = namedtuple('QuestionKey', [
+    'id', 'text', 'type', 'points', 'explanation',
+    'correct_ids', 'accepted', 'correct_answers',
+])
+AnswerKey = namedtuple('AnswerKey', ['quiz_id', 'questions', 'total_points'])
+GradeResult = namedtuple('GradeResult', ['total_points', 'earned_points', 'score', 'results'])
+
+answer_key_cache = TwoTierCache()
+# Generations are always read from the shared cache so an edited key is
+# never graded against in another process
+answer_key_generations = Generations(answer_key_cache, prefix='quiz-key', l1_timeout=0)
+
+
+def normalize_answer(value):
+    """Normalize a short answer for comparison (case-insensitive, trimmed)."""
+    return str(value).lower().strip()
+
+
+def compile_answer_key(quiz_id):
+    """
+    Load and compile the answer key of a quiz in one query.
+
+    Args:
+        quiz_id: Quiz primary key
+
+    Returns:
+        AnswerKey: Questions in quiz order with their correct answers
+    """
+    from .models import Question
+
+    rows = Question.objects.filter(quiz_id=quiz_id).order_by('order', 'answers__order').values_list(
+        'id', 'question_text', 'question_type', 'points', 'explanation',
+        'answers__id', 'answers__answer_text', 'answers__is_correct',
+    )
+
+    questions = {}
+    for (question_id, text, question_type, points, explanation,
+         answer_id, answer_text, is_correct) in rows:
+        question = questions.get(question_id)
+        if question is None:
+            question = questions[question_id] = {
+                'id': str(question_id), 'text': text, 'type': question_type,
+                'points': points, 'explanation': explanation,
+                'correct_ids': set(), 'accepted': set(), 'correct_answers': [],
+            }
+        if answer_id is None or not is_correct:
+            continue
+        if question_type in CHOICE_TYPES:
+            question['correct_ids'].add(str(answer_id))
+            question['correct_answers'].append({'id': str(answer_id), 'text': answer_text})
+        elif question_type == 'short_answer':
+            question['accepted'].add(normalize_answer(answer_text))
+            question['correct_answers'].append(answer_text)
+
+    compiled = tuple(
+        QuestionKey(
+            id=question['id'],
+            text=question['text'],
+            type=question['type'],
+            points=question['points'],
+            explanation=question['explanation'],
+            correct_ids=frozenset(question['correct_ids']),
+            accepted=frozenset(question['accepted']),
+            correct_answers=tuple(question['correct_answers']),
+        )
+        for question in questions.values()
+    )
+    return AnswerKey(
+        quiz_id=str(quiz_id),
+        questions=compiled,
+        total_points=sum(question.points for question in compiled),
+    )
+
+
+def get_answer_key(quiz_id):
+    """Return the compiled answer key of a quiz, from cache when possible."""
+    generation, = answer_key_generations.get(quiz_id)
+    return answer_key_cache.get_or_set(
+        f'quiz-key:{quiz_id}:{generation}',
+        lambda: compile_answer_key(quiz_id),
+        ANSWER_KEY_TIMEOUT,
+    )
+
+
+def invalidate_answer_key(quiz_id):
+    """Drop the cached answer key of a quiz."""
+    answer_key_generations.bump(quiz_id)
+
+
+def grade(answer_key, answers, detailed=False):
+    """
+    Grade submitted answers against a compiled key in a single pass.
+
+    Args:
+        answer_key: AnswerKey from get_answer_key()
+        answers: Submitted answers, {question_id: answer_id or answer_text}
+        detailed: Also build the per-question breakdown
+
+    Returns:
+        GradeResult: Points, percentage score and optional breakdown
+    """
+    earned_points = 0
+    results = [] if detailed else None
+
+    for question in answer_key.questions:
+        student_answer = answers.get(question.id)
+        correct = False
+
+        if student_answer not in (None, ''):
+            if question.type in CHOICE_TYPES:
+                correct = str(student_answer) in question.correct_ids
+            elif question.type == 'short_answer':
+                correct = normalize_answer(student_answer) in question.accepted
+
+        if correct:
+            earned_points += question.points
+
+        if detailed:
+            results.append({
+                'question_id': question.id,
+                'question_text': question.text,
+                'student_answer': student_answer,
+                'correct': correct,
+                'explanation': question.explanation,
+                'correct_answers': list(question.correct_answers),
+            })
+
+    total_points = answer_key.total_points
+    score = (earned_points / total_points * 100) if total_points > 0 else 0
+    return GradeResult(total_points, earned_points, score, results)
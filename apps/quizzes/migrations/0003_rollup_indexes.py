@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-16 21:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['submitted_at'], name='attempts_submitt_fc265f_idx'),
+        ),
+    ]
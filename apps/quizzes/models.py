@@ -8,6 +8,17 @@ from apps.courses.models import Course
 import uuid
 
 
+class QuizQuerySet(models.QuerySet):
+    """QuerySet with the annotations used by quiz listings."""
+    
+    def with_totals(self):
+        """Annotate question count and total points in the same query."""
+        return self.annotate(
+            question_count=models.Count('questions'),
+            question_points=models.Sum('questions__points'),
+        )
+
+
 class Quiz(models.Model):
     """Quiz model for course assessments."""
     
@@ -32,6 +43,8 @@ class Quiz(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = QuizQuerySet.as_manager()
+    
     class Meta:
         db_table = 'quizzes'
         verbose_name_plural = 'Quizzes'
@@ -42,10 +55,15 @@ class Quiz(models.Model):
     
     @property
     def total_questions(self):
+        # Use the with_totals() annotation when the queryset provided it
+        if hasattr(self, 'question_count'):
+            return self.question_count
         return self.questions.count()
     
     @property
     def total_points(self):
+        if hasattr(self, 'question_points'):
+            return self.question_points or 0
         return self.questions.aggregate(
             total=models.Sum('points')
         )['total'] or 0
@@ -139,42 +157,27 @@ class Attempt(models.Model):
         indexes = [
             models.Index(fields=['student', 'quiz']),
             models.Index(fields=['-started_at']),
+            models.Index(fields=['submitted_at']),
         ]
     
     def __str__(self):
         return f"{self.student.username} - {self.quiz.title} - {self.score}%"
     
-    def calculate_score(self):
-        """Calculate the score based on answers."""
-        total_points = 0
-        earned_points = 0
+    def calculate_score(self, detailed=False):
+        """
+        Calculate the score based on answers.
+        
+        Grades against the quiz's compiled answer key (see apps.quizzes.grading)
+        and returns the GradeResult, including the per-question breakdown when
+        ``detailed`` is set.
+        """
+        from .grading import get_answer_key, grade
         
-        for question in self.quiz.questions.all():
-            total_points += question.points
-            question_id = str(question.id)
-            
-            if question_id in self.answers:
-                student_answer = self.answers[question_id]
-                
-                if question.question_type in ['mcq', 'true_false']:
-                    # Check if selected answer is correct
-                    try:
-                        answer = question.answers.get(id=student_answer)
-                        if answer.is_correct:
-                            earned_points += question.points
-                    except Answer.DoesNotExist:
-                        pass
-                elif question.question_type == 'short_answer':
-                    # For short answer, check against correct answers (case-insensitive)
-                    correct_answers = question.answers.filter(is_correct=True)
-                    student_answer_lower = str(student_answer).lower().strip()
-                    for correct in correct_answers:
-                        if correct.answer_text.lower().strip() == student_answer_lower:
-                            earned_points += question.points
-                            break
+        result = grade(get_answer_key(self.quiz_id), self.answers, detailed=detailed)
         
-        self.total_points = total_points
-        self.earned_points = earned_points
-        self.score = (earned_points / total_points * 100) if total_points > 0 else 0
+        self.total_points = result.total_points
+        self.earned_points = result.earned_points
+        self.score = result.score
         self.passed = self.score >= self.quiz.passing_score
         self.save()
+        return result
@@ -0,0 +1,28 @@
+"""
+Signals for keeping compiled quiz answer keys current.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Question, Answer
+from .grading import invalidate_answer_key
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_key_on_question_change(sender, instance, **kwargs):
+    """Question points, type and text are part of the answer key."""
+    quiz_id = instance.quiz_id
+    transaction.on_commit(lambda: invalidate_answer_key(quiz_id))
+
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_key_on_answer_change(sender, instance, **kwargs):
+    """Answer text and correctness are part of the answer key."""
+    quiz_id = Question.objects.filter(
+        pk=instance.question_id
+    ).values_list('quiz_id', flat=True).first()
+    if quiz_id:
+        transaction.on_commit(lambda: invalidate_answer_key(quiz_id))
@@ -0,0 +1,79 @@
+"""
+Precompiled student-facing quiz payloads.
+
+The student view of a quiz (questions and answer choices, with
+``is_correct`` stripped, plus totals) is serialized once per quiz version
+and cached. A version changes when the quiz row is saved (``updated_at``)
+or when its questions or answers change (the answer-key generation bumped
+by ``apps.quizzes.signals``), so the snapshot and the grading key are
+always invalidated together.
+
+Per request only the question shuffle is applied, with an RNG seeded by
+quiz and student so a student sees the same order on every reload.
+"""
+
+import hashlib
+import random
+
+from .grading import answer_key_cache, answer_key_generations
+
+
+SNAPSHOT_TIMEOUT = 60 * 60
+
+
+def get_quiz_version(quiz):
+    """Return a string identifying the current content of a quiz."""
+    generation, = answer_key_generations.get(quiz.id)
+    return f'{quiz.updated_at.timestamp()}:{generation}'
+
+
+def build_snapshot(quiz_id):
+    """
+    Serialize the student-safe payload of a quiz.
+
+    Args:
+        quiz_id: Quiz primary key
+
+    Returns:
+        dict: QuizDetailSerializer payload without ``is_correct``
+    """
+    from .models import Quiz
+    from .serializers import QuizDetailSerializer
+
+    quiz = Quiz.objects.with_totals().prefetch_related('questions__answers').get(pk=quiz_id)
+    data = QuizDetailSerializer(quiz).data
+    for question in data['questions']:
+        for answer in question['answers']:
+            answer.pop('is_correct', None)
+    return data
+
+
+def get_snapshot(quiz):
+    """
+    Return the cached snapshot of a quiz and its ETag.
+
+    Returns:
+        tuple: (payload, etag)
+    """
+    version = get_quiz_version(quiz)
+    payload = answer_key_cache.get_or_set(
+        f'quiz-snapshot:{quiz.id}:{version}',
+        lambda: build_snapshot(quiz.id),
+        SNAPSHOT_TIMEOUT,
+    )
+    return payload, hashlib.md5(f'{quiz.id}:{version}'.encode()).hexdigest()
+
+
+def personalize_snapshot(payload, etag, quiz, user):
+    """
+    Apply the per-student question order to a snapshot.
+
+    Returns:
+        tuple: (payload, etag) for this student
+    """
+    if not quiz.randomize_questions:
+        return payload, f'"{etag}"'
+
+    questions = list(payload['questions'])
+    random.Random(f'{quiz.id}:{user.id}').shuffle(questions)
+    return {**payload, 'questions': questions}, f'"{etag}-{user.id}"'
@@ -7,9 +7,10 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-import random
+from django.utils.http import parse_etags
 
-from .models import Quiz, Question, Answer, Attempt
+from .models import Quiz, Question, Attempt
+from .snapshots import get_snapshot, personalize_snapshot
 from apps.courses.models import Course
 from apps.enrollment.models import Enrollment
 from .serializers import (
@@ -17,6 +18,7 @@ from .serializers import (
     AttemptSerializer, AttemptSubmitSerializer
 )
 from apps.users.permissions import IsStudent, IsInstructorOrAdmin
+from apps.core.pagination import SignedCursorPagination
 
 
 class QuizListView(generics.ListAPIView):
@@ -28,7 +30,7 @@ class QuizListView(generics.ListAPIView):
     def get_queryset(self):
         course_id = self.request.query_params.get('course_id')
         if course_id:
-            return Quiz.objects.filter(course_id=course_id)
+            return Quiz.objects.filter(course_id=course_id).with_totals().order_by('-created_at')
         return Quiz.objects.none()
 
 
@@ -52,7 +54,7 @@ class QuizDetailView(generics.RetrieveAPIView):
         if request.user.is_student:
             enrollment_exists = Enrollment.objects.filter(
                 student=request.user,
-                course=quiz.course
+                course_id=quiz.course_id
             ).exists()
             
             if not enrollment_exists:
@@ -60,16 +62,17 @@ class QuizDetailView(generics.RetrieveAPIView):
                     'error': 'You must be enrolled in this course to access quizzes.'
                 }, status=status.HTTP_403_FORBIDDEN)
         
-        serializer = self.get_serializer(quiz)
-        data = serializer.data
+        # Instructors and admins see correct answers, so they bypass the snapshot
+        if request.user.is_instructor or request.user.is_admin_user:
+            quiz = Quiz.objects.with_totals().prefetch_related('questions__answers').get(pk=quiz.pk)
+            serializer = self.get_serializer(quiz)
+            return Response(serializer.data)
         
-        # Randomize questions if enabled
-        if quiz.randomize_questions and 'questions' in data:
-            questions = data['questions']
-            random.shuffle(questions)
-            data['questions'] = questions
+        data, etag = personalize_snapshot(*get_snapshot(quiz), quiz, request.user)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
         
-        return Response(data)
+        return Response(data, headers={'ETag': etag})
 
 
 class AttemptSubmitView(views.APIView):
@@ -116,58 +119,16 @@ class AttemptSubmitView(views.APIView):
             answers=answers
         )
         
-        # Calculate score
-        attempt.calculate_score()
+        # Grade and build the breakdown in one pass over the answer key
         attempt.submitted_at = timezone.now()
-        attempt.save()
+        result = attempt.calculate_score(detailed=quiz.show_answers_after_submission)
         
         # Prepare response
         response_data = AttemptSerializer(attempt).data
         
         # Add detailed results if show_answers_after_submission is enabled
         if quiz.show_answers_after_submission:
-            results = []
-            for question in quiz.questions.all():
-                question_id = str(question.id)
-                student_answer = answers.get(question_id)
-                
-                question_result = {
-                    'question_id': question_id,
-                    'question_text': question.question_text,
-                    'student_answer': student_answer,
-                    'correct': False,
-                    'explanation': question.explanation,
-                    'correct_answers': []
-                }
-                
-                if question.question_type in ['mcq', 'true_false']:
-                    correct_answers = question.answers.filter(is_correct=True)
-                    question_result['correct_answers'] = [
-                        {'id': str(ans.id), 'text': ans.answer_text}
-                        for ans in correct_answers
-                    ]
-                    
-                    if student_answer:
-                        try:
-                            answer = question.answers.get(id=student_answer)
-                            question_result['correct'] = answer.is_correct
-                        except Answer.DoesNotExist:
-                            pass
-                
-                elif question.question_type == 'short_answer':
-                    correct_answers = question.answers.filter(is_correct=True)
-                    question_result['correct_answers'] = [ans.answer_text for ans in correct_answers]
-                    
-                    if student_answer:
-                        student_answer_lower = str(student_answer).lower().strip()
-                        for correct in correct_answers:
-                            if correct.answer_text.lower().strip() == student_answer_lower:
-                                question_result['correct'] = True
-                                break
-                
-                results.append(question_result)
-            
-            response_data['detailed_results'] = results
+            response_data['detailed_results'] = result.results
         
         return Response(response_data, status=status.HTTP_201_CREATED)
 
@@ -177,6 +138,8 @@ class AttemptListView(generics.ListAPIView):
     
     serializer_class = AttemptSerializer
     permission_classes = [IsAuthenticated, IsStudent]
+    pagination_class = SignedCursorPagination
+    cursor_ordering = '-started_at'
     
     def get_queryset(self):
         queryset = Attempt.objects.filter(student=self.request.user)
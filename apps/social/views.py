@@ -9,6 +9,7 @@ from apps.social.serializers import (
     DiscussionSerializer, CommentSerializer, StudyGroupSerializer, 
     GroupPostSerializer, UserConnectionSerializer
 )
+from apps.core.pagination import SignedCursorPagination
 
 
 class DiscussionListCreateView(generics.ListCreateAPIView):
@@ -17,6 +18,8 @@ class DiscussionListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = DiscussionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SignedCursorPagination
+    cursor_ordering = '-created_at'
 
     def get_queryset(self):
         # Filter discussions by course or lesson if provided in query params
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-16 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at'], name='users_created_6541e9_idx'),
+        ),
+    ]
@@ -65,6 +65,7 @@ class User(AbstractUser):
         indexes = [
             models.Index(fields=['email']),
             models.Index(fields=['role']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
@@ -55,6 +55,7 @@ INSTALLED_APPS = [
     'apps.personalization',
     'apps.accessibility',
     'apps.analytics',
+    'apps.events',
 ]
 
 MIDDLEWARE = [
@@ -100,6 +101,22 @@ DATABASES = {
     }
 }
 
+# Cache
+# Redis is the shared (L2) cache; 'local' is the per-process L1 used by apps.core.cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_URL', default='redis://localhost:6379/1'),
+        'KEY_PREFIX': 'elearning',
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'elearning-l1',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+LOCAL_CACHE_ALIAS = 'local'
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
@@ -208,8 +225,135 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'certificate_verify_batch': config('CERTIFICATES_VERIFY_BATCH_RATE', default='60/minute'),
+    },
 }
 
+# Course search
+# Dotted path to a backend in apps.courses.search; chosen by database vendor when empty
+COURSE_SEARCH_BACKEND = config('COURSE_SEARCH_BACKEND', default='')
+COURSE_SEARCH_MAX_RESULTS = 1000
+
+# Related courses: memory-mapped content embeddings (apps.courses.similarity)
+COURSE_SIMILARITY_DIR = config('COURSE_SIMILARITY_DIR', default=str(BASE_DIR / 'var' / 'course-similarity'))
+COURSE_SIMILARITY_DIMENSIONS = 256  # Hashed text features; changing it needs rebuild_course_similarity
+RELATED_COURSES_COUNT = 4
+
+# Protected lesson files (apps.courses.media): lifetime of signed URLs (clients
+# request a fresh one when it runs out), and the nginx internal location to hand
+# them to (e.g. /protected-media/); empty streams from Django
+LESSON_MEDIA_URL_TTL = 60 * 10
+LESSON_MEDIA_ACCEL_PREFIX = config('LESSON_MEDIA_ACCEL_PREFIX', default='')
+
+# HLS transcoding of lesson videos (apps.courses.transcoding), run by transcode_videos
+FFMPEG_BINARY = config('FFMPEG_BINARY', default='ffmpeg')
+FFPROBE_BINARY = config('FFPROBE_BINARY', default='ffprobe')
+LESSON_VIDEO_TRANSCODE_WORKERS = config('LESSON_VIDEO_TRANSCODE_WORKERS', default=2, cast=int)  # Concurrent ffmpeg runs
+LESSON_VIDEO_RENDITIONS = [  # Renditions taller than the upload are skipped
+    {'name': '360p', 'height': 360, 'video_kbps': 800, 'audio_kbps': 96},
+    {'name': '480p', 'height': 480, 'video_kbps': 1400, 'audio_kbps': 128},
+    {'name': '720p', 'height': 720, 'video_kbps': 2800, 'audio_kbps': 128},
+    {'name': '1080p', 'height': 1080, 'video_kbps': 5000, 'audio_kbps': 192},
+]
+LESSON_VIDEO_SEGMENT_SECONDS = 6
+LESSON_VIDEO_POSTER_COUNT = 3
+LESSON_VIDEO_POLL_INTERVAL = 5
+LESSON_VIDEO_TIMEOUT = 60 * 60  # Longest ffmpeg run
+LESSON_VIDEO_LEASE_SECONDS = 2 * 60 * 60  # Must exceed LESSON_VIDEO_TIMEOUT plus the poster frames
+LESSON_VIDEO_MAX_ATTEMPTS = 3
+LESSON_VIDEO_RETRY_BASE_SECONDS = 60
+
+# Published catalog cache (seconds); invalidated early through generation counters
+CATALOG_CACHE_TIMEOUT = config('CATALOG_CACHE_TIMEOUT', default=300, cast=int)
+CATALOG_CACHE_L1_TIMEOUT = 5
+
+# Watch-time heartbeats: 'redis' (shared by workers) or 'local' (single process, journaled)
+HEARTBEAT_BUFFER = config('HEARTBEAT_BUFFER', default='redis')
+HEARTBEAT_REDIS_URL = config('HEARTBEAT_REDIS_URL', default='redis://localhost:6379/2')
+HEARTBEAT_JOURNAL_PATH = config('HEARTBEAT_JOURNAL_PATH', default=str(BASE_DIR / 'var' / 'heartbeats.journal'))
+HEARTBEAT_FLUSH_INTERVAL = config('HEARTBEAT_FLUSH_INTERVAL', default=10, cast=int)
+
+# Leaderboards: 'redis' sorted sets (shared by workers) or 'local' skip lists (single process)
+LEADERBOARD_STORE = config('LEADERBOARD_STORE', default='redis')
+LEADERBOARD_REDIS_URL = config('LEADERBOARD_REDIS_URL', default='redis://localhost:6379/3')
+LEADERBOARD_CHECKPOINT_INTERVAL = config('LEADERBOARD_CHECKPOINT_INTERVAL', default=300, cast=int)
+
+# Domain event outbox. With EVENTS_ASYNC off, handlers run via on_commit in the thread that
+# published the event, i.e. inside the web request, after its transaction commits and before
+# the response is sent. Only turn it on where run_event_worker is running, or events queue up unhandled.
+EVENTS_ASYNC = config('EVENTS_ASYNC', default=False, cast=bool)
+EVENTS_WORKERS = config('EVENTS_WORKERS', default=4, cast=int)
+EVENTS_POLL_INTERVAL = 1
+EVENTS_LEASE_SECONDS = 300
+EVENTS_MAX_ATTEMPTS = 8
+EVENTS_RETRY_BASE_SECONDS = 5
+EVENTS_RETENTION_DAYS = 7
+
+# Certificate PDFs, rendered by render_certificates in a process pool. With CERTIFICATES_ASYNC off they
+# are rendered via on_commit in the request thread. Follows EVENTS_ASYNC unless set: setups with workers run both.
+CERTIFICATES_ASYNC = config('CERTIFICATES_ASYNC', default=EVENTS_ASYNC, cast=bool)
+CERTIFICATES_RENDER_WORKERS = config('CERTIFICATES_RENDER_WORKERS', default=0, cast=int)  # 0: one per core
+CERTIFICATES_POLL_INTERVAL = 1
+CERTIFICATES_LEASE_SECONDS = 300
+CERTIFICATES_MAX_ATTEMPTS = 5
+CERTIFICATES_RETRY_BASE_SECONDS = 30
+
+# Public certificate verification (apps.certificates.verification)
+CERTIFICATES_VERIFY_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+CERTIFICATES_VERIFY_MISS_TIMEOUT = 60  # Unknown IDs that got past the bloom filter
+CERTIFICATES_VERIFY_MAX_AGE = 60 * 60 * 24  # HTTP max-age of verification responses
+CERTIFICATES_VERIFY_MISS_MAX_AGE = 60
+CERTIFICATES_VERIFY_BATCH_MAX = 500
+CERTIFICATES_VERIFY_BLOOM = config('CERTIFICATES_VERIFY_BLOOM', default=True, cast=bool)
+CERTIFICATES_VERIFY_BLOOM_ERROR_RATE = 0.001
+CERTIFICATES_VERIFY_BLOOM_MIN_CAPACITY = 100000
+CERTIFICATES_VERIFY_BLOOM_OVERLAP = 300  # Seconds; longest issuing transaction the filter catches up with
+
+# Notification fan-out: rows per bulk insert, and the audience size that switches to one broadcast row
+NOTIFICATION_FANOUT_CHUNK_SIZE = 1000
+NOTIFICATION_BROADCAST_THRESHOLD = config('NOTIFICATION_BROADCAST_THRESHOLD', default=5000, cast=int)
+
+# Behavior event ingestion: 'redis' (shared, drained by flush_behavior_events) or 'local' (single process)
+ANALYTICS_INGEST_BUFFER = config('ANALYTICS_INGEST_BUFFER', default='redis')
+ANALYTICS_INGEST_REDIS_URL = config('ANALYTICS_INGEST_REDIS_URL', default='redis://localhost:6379/4')
+ANALYTICS_INGEST_MAX_EVENTS = 1000
+ANALYTICS_INGEST_BATCH_SIZE = 5000
+ANALYTICS_INGEST_BUFFER_LIMIT = config('ANALYTICS_INGEST_BUFFER_LIMIT', default=500000, cast=int)
+ANALYTICS_INGEST_FLUSH_INTERVAL = 1
+ANALYTICS_INGEST_RETRY_AFTER = 2
+
+# Behavior tracking storage: monthly partitions (PostgreSQL) and compressed archives of expired months
+ANALYTICS_PARTITIONS_AHEAD = 3
+ANALYTICS_BEHAVIOR_RETENTION_MONTHS = config('ANALYTICS_BEHAVIOR_RETENTION_MONTHS', default=6, cast=int)
+ANALYTICS_ARCHIVE_DIR = config('ANALYTICS_ARCHIVE_DIR', default=str(BASE_DIR / 'var' / 'analytics-archive'))
+
+# LearningAnalytics rollups: events per transaction, and how far behind real time sources are read
+ANALYTICS_ROLLUP_BATCH_SIZE = 50000
+ANALYTICS_ROLLUP_LAG_SECONDS = 60
+ANALYTICS_ROLLUP_INTERVAL = config('ANALYTICS_ROLLUP_INTERVAL', default=300, cast=int)
+
+# Platform analytics snapshots: schedule, daily buckets kept, retention, and single-flight refresh
+ANALYTICS_SNAPSHOT_INTERVAL = config('ANALYTICS_SNAPSHOT_INTERVAL', default=300, cast=int)
+ANALYTICS_SNAPSHOT_SERIES_DAYS = 30
+ANALYTICS_SNAPSHOT_RETENTION_DAYS = 7
+ANALYTICS_SNAPSHOT_LOCK_TIMEOUT = 120
+ANALYTICS_SNAPSHOT_WAIT_TIMEOUT = 5
+
+# Dashboard time series: 'sql' (date_trunc pushdown), 'numpy' (cached column blocks) or 'auto' by database vendor
+ANALYTICS_TIMESERIES_ENGINE = config('ANALYTICS_TIMESERIES_ENGINE', default='auto')
+ANALYTICS_TIMESERIES_MAX_DAYS = 366
+ANALYTICS_TIMESERIES_BLOCK_TIMEOUT = 60 * 60 * 24  # Days that can no longer change
+ANALYTICS_TIMESERIES_LIVE_TIMEOUT = 60  # Ranges that include today
+
+# Course recommendations (apps.personalization.recommender), rebuilt by build_recommendations
+RECOMMENDATIONS_NEIGHBORS = 20  # Similar courses kept per course
+RECOMMENDATIONS_PER_USER = 20
+RECOMMENDATIONS_MIN_SUPPORT = 2  # Shared learners needed before two courses count as similar
+RECOMMENDATIONS_SHRINKAGE = 10
+RECOMMENDATIONS_RECENT_COURSES = 5  # Latest enrollments whose neighbors are merged in when serving
+RECOMMENDATIONS_POPULAR = 50
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=config('JWT_ACCESS_TOKEN_LIFETIME', default=60, cast=int)),
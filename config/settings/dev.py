@@ -8,6 +8,13 @@ DEBUG = True
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '0.0.0.0']
 
+# Without CACHE_URL the shared cache is per process, so the dev server runs without Redis
+if not config('CACHE_URL', default=''):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'elearning-shared',
+    }
+
 # Development apps
 INSTALLED_APPS += [
     'django_extensions',
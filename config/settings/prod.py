@@ -16,6 +16,9 @@ SECURE_HSTS_SECONDS = 31536000
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
 
+# The in-memory search index is per process; production searches PostgreSQL
+COURSE_SEARCH_BACKEND = config('COURSE_SEARCH_BACKEND', default='apps.courses.search.PostgresSearchBackend')
+
 # Logging
 LOGGING = {
     'version': 1,
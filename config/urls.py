@@ -8,6 +8,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import TemplateView
 
+from apps.courses.media import serve_public_media
+
 urlpatterns = [
     # Admin
     path('admin/', admin.site.urls),
@@ -24,6 +26,9 @@ urlpatterns = [
     path('api/payments/', include('apps.payments.urls')),
     path('api/notifications/', include('apps.notifications.urls')),
     path('api/reviews/', include('apps.reviews.urls')),
+    path('api/analytics/', include('apps.analytics.urls')),
+    path('api/personalization/', include('apps.personalization.urls')),
+    path('api/gamification/', include('apps.gamification.urls')),
     
     # Allauth URLs
     path('accounts/', include('allauth.urls')),
@@ -38,7 +43,8 @@ urlpatterns = [
 
 # Serve media files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Lesson files are only reachable through signed URLs (apps.courses.media)
+    urlpatterns += static(settings.MEDIA_URL, serve_public_media, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
     
     # Debug toolbar
@@ -0,0 +1,159 @@
+"""
+Benchmark certificate rendering throughput.
+
+Compares drawing every certificate on a ReportLab canvas (what
+``generate_certificate_pdf`` used to do) with stamping it from a compiled
+layout (``apps.certificates.layouts``), on one core and, with
+``--processes``, across a process pool like ``render_certificates``:
+
+    python scripts/benchmark_certificate_rendering.py --count 5000 --processes 4
+
+``--layout`` takes a layout JSON file (as stored in ``CertificateTemplate``);
+the built-in layout is used otherwise. ``--output`` writes one stamped
+certificate for inspection. The script exits with status 1 when the
+single-core speedup is below ``--min-speedup``.
+
+No database is needed.
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib import colors
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+from apps.certificates.layouts import DEFAULT_LAYOUT, MARGIN, PAGE_SIZES, compile_layout
+
+STUDENTS = ['Ada Lovelace', 'Alan Turing', 'Grace Brewster Murray Hopper', 'Edsger W. Dijkstra', 'Barbara Liskov']
+COURSES = [
+    'Python for Data Analysis',
+    'Distributed Systems',
+    'An Extremely Long Course Name About Distributed Systems and the Art of Building Reliable Software at Scale',
+    'Introduction to Machine Learning with Scikit-Learn and PyTorch',
+]
+
+
+def sample_fields(count):
+    """Yield ``count`` field sets cycling through names of different lengths."""
+    for index, (student, course) in zip(range(count), itertools.cycle(itertools.product(STUDENTS, COURSES))):
+        yield {
+            'student_name': student,
+            'course_name': course,
+            'instructor_name': 'Grace Hopper',
+            'completion_date': 'October 16, 2026',
+            'certificate_id': f'CERT-{index:012d}',
+            'verification_url': f'https://example.com/certificates/verify/{index}/',
+        }
+
+
+def draw_with_canvas(layout, fields):
+    """Draw a layout element by element on a fresh canvas, as before compiled layouts."""
+    width, height = PAGE_SIZES[layout.get('page_size', 'A4')]
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(width, height))
+    bottoms = {}
+    for spec in layout['elements']:
+        if spec['type'] == 'rect':
+            inset = spec.get('inset', 0)
+            pdf.setStrokeColor(colors.HexColor(spec.get('stroke', '#000000')))
+            pdf.setLineWidth(spec.get('line_width', 1))
+            pdf.rect(inset, inset, width - 2 * inset, height - 2 * inset)
+        elif spec['type'] == 'line':
+            y = height - spec['top'] if 'top' in spec else spec['y']
+            if 'length' in spec:
+                x1, x2 = width / 2 - spec['length'] / 2, width / 2 + spec['length'] / 2
+            else:
+                x1, x2 = (value if value >= 0 else width + value for value in (spec['x1'], spec['x2']))
+            pdf.setStrokeColor(colors.HexColor(spec.get('stroke', '#000000')))
+            pdf.setLineWidth(spec.get('line_width', 1))
+            pdf.line(x1, y, x2, y)
+        else:
+            font, size = spec.get('font', 'Helvetica'), spec.get('size', 12)
+            leading = spec.get('leading', size * 1.25)
+            if 'after' in spec:
+                y = bottoms[spec['after']['id']] - spec['after']['gap']
+            else:
+                y = height - spec['top'] if 'top' in spec else spec['y']
+            pdf.setFont(font, size)
+            pdf.setFillColor(colors.HexColor(spec.get('color', '#000000')))
+            lines = simpleSplit(spec['text'].format_map(fields), font, size, spec.get('width', width - 2 * MARGIN))
+            for line in lines[:spec.get('max_lines', 1)]:
+                pdf.drawCentredString(width / 2, y, line)
+                y -= leading
+            if spec.get('id'):
+                bottoms[spec['id']] = y + leading
+    pdf.showPage()
+    pdf.save()
+    return buffer.getvalue()
+
+
+def stamp_batch(layout, batch):
+    compiled = compile_layout(layout)
+    return sum(len(compiled.render(fields)) for fields in batch)
+
+
+def measure(label, func, count):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed
+    print(f'{label:<32} {count:>7} certificates  {elapsed:8.2f}s  {rate:10.1f}/s  {elapsed / count * 1000:7.3f} ms each')
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=2000, help='Certificates per run')
+    parser.add_argument('--layout', help='Layout JSON file (default: built-in layout)')
+    parser.add_argument('--processes', type=int, default=0, help='Also measure a process pool of this size')
+    parser.add_argument('--output', help='Write one stamped certificate to this path')
+    parser.add_argument('--min-speedup', type=float, default=10.0, help='Fail below this single-core speedup')
+    args = parser.parse_args()
+
+    layout = DEFAULT_LAYOUT
+    if args.layout:
+        with open(args.layout) as handle:
+            layout = json.load(handle)
+    fields = list(sample_fields(args.count))
+
+    started = time.perf_counter()
+    compiled = compile_layout(layout)
+    print(f'Compiled layout in {(time.perf_counter() - started) * 1000:.2f} ms')
+    if args.output:
+        with open(args.output, 'wb') as handle:
+            handle.write(compiled.render(fields[0]))
+
+    baseline_count = max(1, args.count // 10)
+    baseline = measure(
+        'canvas, 1 core', lambda: [draw_with_canvas(layout, item) for item in fields[:baseline_count]], baseline_count
+    )
+    stamped = measure('compiled layout, 1 core', lambda: [compiled.render(item) for item in fields], args.count)
+
+    if args.processes:
+        chunk = max(1, args.count // (args.processes * 8))
+        batches = [fields[start:start + chunk] for start in range(0, args.count, chunk)]
+        with ProcessPoolExecutor(max_workers=args.processes) as pool:
+            # Start the workers before timing
+            list(pool.map(stamp_batch, [layout] * args.processes, [fields[:1]] * args.processes))
+            measure(
+                f'compiled layout, {args.processes} processes',
+                lambda: list(pool.map(stamp_batch, [layout] * len(batches), batches)),
+                args.count,
+            )
+
+    speedup = stamped / baseline
+    print(f'Speedup per core: {speedup:.1f}x')
+    return 0 if speedup >= args.min_speedup else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Benchmark how many notification WebSockets a single daphne worker can hold.
+
+Run daphne on its own (one process), then point this script at it:
+
+    daphne -p 8000 config.asgi:application
+    python scripts/benchmark_notification_sockets.py --sockets 5000 --pid <daphne pid>
+
+The script opens ``--sockets`` authenticated connections to
+``/ws/notifications/`` spread over ``--users`` benchmark users, ramping at
+``--rate`` connections per second. It then creates one notification per
+user through the regular dispatch pipeline and measures how long each
+socket takes to receive it. Connect latency, failures, delivery latency
+and the worker's memory (with ``--pid``) are reported.
+
+Both processes must share the channel layer (Redis) and the database.
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.dev')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+
+from apps.notifications.dispatch import get_pusher
+from apps.notifications.models import Notification
+
+User = get_user_model()
+
+
+def percentile(values, fraction):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def session_cookies(count):
+    """Create (or reuse) benchmark users and return a session cookie for each."""
+    cookies = []
+    for index in range(count):
+        user, created = User.objects.get_or_create(
+            username=f'ws_bench_{index}',
+            defaults={'email': f'ws_bench_{index}@example.com', 'role': 'student'},
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookies.append((user, f'{settings.SESSION_COOKIE_NAME}={session.session_key}'))
+    return cookies
+
+
+class Stats:
+    def __init__(self):
+        self.connect_times = []
+        self.failures = 0
+        self.open = 0
+        self.sent_at = None
+        self.deliveries = []
+
+
+async def read_frames(reader, stats):
+    """Read server frames until the socket closes, timing notification deliveries."""
+    while True:
+        header = await reader.readexactly(2)
+        opcode, length = header[0] & 0x0F, header[1] & 0x7F
+        if length == 126:
+            length = int.from_bytes(await reader.readexactly(2), 'big')
+        elif length == 127:
+            length = int.from_bytes(await reader.readexactly(8), 'big')
+        payload = await reader.readexactly(length)
+        if opcode == 0x8:
+            return
+        if stats.sent_at is not None and b'"notification"' in payload:
+            stats.deliveries.append(time.perf_counter() - stats.sent_at)
+
+
+async def open_socket(url, cookie, origin, stats):
+    """
+    Open one WebSocket and keep it until the server closes it.
+
+    A minimal client (handshake and unmasked server frames only) keeps the
+    benchmark free of extra dependencies; autobahn's asyncio flavour cannot
+    be loaded next to daphne's Twisted one.
+    """
+    parts = urlsplit(url)
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((
+            f'GET {parts.path} HTTP/1.1\r\n'
+            f'Host: {parts.netloc}\r\n'
+            'Upgrade: websocket\r\nConnection: Upgrade\r\n'
+            f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n'
+            f'Origin: {origin}\r\nCookie: {cookie}\r\n\r\n'
+        ).encode())
+        response = await reader.readuntil(b'\r\n\r\n')
+    except (OSError, asyncio.IncompleteReadError):
+        stats.failures += 1
+        return
+    if not response.startswith(b'HTTP/1.1 101'):
+        stats.failures += 1
+        writer.close()
+        return
+
+    stats.open += 1
+    stats.connect_times.append(time.perf_counter() - started)
+    try:
+        await read_frames(reader, stats)
+    except (OSError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        stats.open -= 1
+        writer.close()
+
+
+def memory_mb(pid):
+    if pid is None:
+        return None
+    import psutil
+    return psutil.Process(pid).memory_info().rss / 1024 / 1024
+
+
+async def run(options):
+    stats = Stats()
+    cookies = await asyncio.to_thread(session_cookies, options.users)
+    baseline = memory_mb(options.pid)
+
+    started = time.perf_counter()
+    sockets = []
+    for index in range(options.sockets):
+        user, cookie = cookies[index % len(cookies)]
+        sockets.append(asyncio.ensure_future(open_socket(options.url, cookie, options.origin, stats)))
+        await asyncio.sleep(1 / options.rate)
+    # Let the last handshakes finish
+    deadline = time.perf_counter() + options.settle
+    while stats.open + stats.failures < options.sockets and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+    ramp = time.perf_counter() - started
+    held = memory_mb(options.pid)
+
+    # One notification per user reaches every socket of that user
+    def notify():
+        stats.sent_at = time.perf_counter()
+        for user, _ in cookies:
+            Notification.objects.create(
+                user=user, notification_type='system',
+                title='Benchmark', message='Socket delivery benchmark',
+            )
+        get_pusher().drain(timeout=options.settle)
+
+    await asyncio.to_thread(notify)
+    expected = stats.open
+    deadline = time.perf_counter() + options.settle
+    while len(stats.deliveries) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+
+    print(f'Sockets requested:   {options.sockets} over {ramp:.1f}s')
+    print(f'Sockets open:        {stats.open} ({stats.failures} failed to connect)')
+    print(f'Connect latency:     p50 {percentile(stats.connect_times, .5) * 1000:.1f} ms, '
+          f'p99 {percentile(stats.connect_times, .99) * 1000:.1f} ms')
+    print(f'Delivered:           {len(stats.deliveries)}/{expected}')
+    if stats.deliveries:
+        print(f'Delivery latency:    p50 {percentile(stats.deliveries, .5) * 1000:.1f} ms, '
+              f'p99 {percentile(stats.deliveries, .99) * 1000:.1f} ms, '
+              f'mean {statistics.mean(stats.deliveries) * 1000:.1f} ms')
+    if baseline is not None:
+        per_socket = (held - baseline) * 1024 / max(stats.open, 1)
+        print(f'Worker memory:       {baseline:.0f} MB idle, {held:.0f} MB held ({per_socket:.1f} KB per socket)')
+
+    for socket in sockets:
+        socket.cancel()
+    await asyncio.gather(*sockets, return_exceptions=True)
+
+    if options.cleanup:
+        await asyncio.to_thread(lambda: Notification.objects.filter(user__username__startswith='ws_bench_').delete())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='ws://localhost:8000/ws/notifications/')
+    parser.add_argument('--origin', default='http://localhost:8000')
+    parser.add_argument('--sockets', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=200, help='New connections per second')
+    parser.add_argument('--settle', type=float, default=30, help='Seconds to wait for handshakes and deliveries')
+    parser.add_argument('--pid', type=int, help='daphne process id, to report its memory')
+    parser.add_argument('--cleanup', action='store_true', help='Delete the benchmark notifications afterwards')
+    options = parser.parse_args()
+    asyncio.run(run(options))
+
+
+if __name__ == '__main__':
+    main()
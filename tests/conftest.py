@@ -0,0 +1,72 @@
+"""
+Shared fixtures.
+
+Services that are backed by Redis in production (the shared cache, the
+heartbeat, ingest and leaderboard buffers, the channel layer) run on their
+in-process stand-ins, so the suite needs no Redis. File-based indexes live
+in a per-test temporary directory.
+"""
+
+import pytest
+
+from apps.analytics import ingest
+from apps.certificates import verification
+from apps.courses import search, similarity
+from apps.enrollment import heartbeats
+from apps.gamification import leaderboard
+
+
+@pytest.fixture(autouse=True)
+def local_services(settings, tmp_path, monkeypatch):
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{tmp_path.name}'},
+        'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-l1-{tmp_path.name}'},
+    }
+    # The manifest only exists after collectstatic
+    settings.STATICFILES_STORAGE = 'django.contrib.staticfiles.storage.StaticFilesStorage'
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+    settings.HEARTBEAT_BUFFER = 'local'
+    settings.HEARTBEAT_JOURNAL_PATH = str(tmp_path / 'heartbeats.journal')
+    settings.LEADERBOARD_STORE = 'local'
+    settings.ANALYTICS_INGEST_BUFFER = 'local'
+    settings.COURSE_SIMILARITY_DIR = str(tmp_path / 'similarity')
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.EVENTS_ASYNC = False
+
+    # Process-wide singletons are rebuilt from the settings above
+    monkeypatch.setattr(heartbeats, '_buffer', None)
+    monkeypatch.setattr(leaderboard, '_store', None)
+    monkeypatch.setattr(ingest, '_buffer', None)
+    monkeypatch.setattr(search, '_backend', None)
+    monkeypatch.setattr(similarity, '_index', None)
+    monkeypatch.setattr(verification, 'known_certificates', verification.KnownCertificates())
+
+
+@pytest.fixture
+def student(django_user_model):
+    return django_user_model.objects.create_user(
+        email='student@example.com', username='student', password='password', role='student',
+    )
+
+
+@pytest.fixture
+def instructor(django_user_model):
+    return django_user_model.objects.create_user(
+        email='instructor@example.com', username='instructor', password='password', role='instructor',
+    )
+
+
+@pytest.fixture
+def make_course(instructor):
+    from apps.courses.models import Course
+
+    def make(title='Course', **fields):
+        fields.setdefault('description', f'About {title}')
+        fields.setdefault('status', 'published')
+        return Course.objects.create(title=title, instructor=instructor, **fields)
+    return make
+
+
+@pytest.fixture
+def course(make_course):
+    return make_course('Python Basics')
@@ -0,0 +1,95 @@
+"""
+Versioned catalog cache and its invalidation.
+"""
+
+import pytest
+from django.core.cache import caches
+
+from apps.core.cache import TwoTierCache
+from apps.courses.cache import API_PARAMS, get_catalog_page, invalidate_catalog
+from apps.courses.models import Category
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def builds():
+    calls = []
+
+    def page(params, category=None):
+        def build():
+            calls.append(params)
+            return {'build': len(calls)}
+        return get_catalog_page('api', params, API_PARAMS, build, category)
+    page.calls = calls
+    return page
+
+
+def test_pages_are_built_once_per_normalized_query(builds):
+    first = builds({'difficulty': 'beginner', 'page': '1', 'utm_source': 'mail'})
+    again = builds({'page': '1 ', 'difficulty': 'beginner'})
+
+    assert first == again == {'build': 1}
+    assert builds({'difficulty': 'advanced'}) == {'build': 2}
+
+
+def test_invalidating_a_category_rebuilds_only_its_listings(builds):
+    builds({}, category=1)
+    builds({}, category=2)
+
+    invalidate_catalog(1)
+
+    assert builds({}, category=1) == {'build': 3}
+    assert builds({}, category=2) == {'build': 2}
+
+
+def test_unfiltered_listings_are_invalidated_by_any_change(builds):
+    builds({})
+
+    invalidate_catalog(7)
+
+    assert builds({}) == {'build': 2}
+
+
+def test_course_edits_invalidate_on_commit(builds, course, django_capture_on_commit_callbacks):
+    builds({})
+
+    with django_capture_on_commit_callbacks(execute=True):
+        course.title = 'Python Fundamentals'
+        course.save()
+
+    assert builds({}) == {'build': 2}
+
+
+def test_counter_only_updates_keep_the_cache(builds, course, django_capture_on_commit_callbacks):
+    builds({})
+
+    with django_capture_on_commit_callbacks(execute=True):
+        course.enrollment_count = 5
+        course.save(update_fields=['enrollment_count'])
+
+    assert builds({}) == {'build': 1}
+
+
+def test_category_changes_invalidate_their_listings(builds, django_capture_on_commit_callbacks):
+    category = Category.objects.create(name='Data', slug='data')
+    builds({}, category=category.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        category.name = 'Data Science'
+        category.save()
+
+    assert builds({}, category=category.id) == {'build': 2}
+
+
+def test_shared_cache_outage_degrades_to_computing(monkeypatch):
+    cache = TwoTierCache()
+
+    def down(*args, **kwargs):
+        raise ConnectionError('redis down')
+    for method in ('get', 'set', 'add', 'delete', 'get_many', 'set_many'):
+        monkeypatch.setattr(caches['default'], method, down)
+
+    assert cache.get_or_set('key', lambda: 'value') == 'value'
+    # Still served from the process-local tier
+    assert cache.get('key') == 'value'
@@ -0,0 +1,78 @@
+"""
+Compiled certificate layouts and the template preview.
+"""
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.certificates.layouts import DEFAULT_LAYOUT, FIELDS, LayoutError, compile_layout
+from apps.certificates.models import CertificateTemplate
+
+SAMPLE = {name: f'sample {name}' for name in FIELDS}
+
+
+def test_rendering_appends_to_the_compiled_static_prefix():
+    layout = compile_layout(DEFAULT_LAYOUT)
+
+    first = layout.render(SAMPLE)
+    second = layout.render({**SAMPLE, 'student_name': 'Someone Else Entirely'})
+
+    assert first.startswith(b'%PDF') and first.rstrip().endswith(b'%%EOF')
+    assert first.startswith(layout.prefix) and second.startswith(layout.prefix)
+    assert first != second
+
+
+def test_long_values_still_render():
+    layout = compile_layout(DEFAULT_LAYOUT)
+
+    assert layout.render({**SAMPLE, 'course_name': 'Very long course title ' * 40}).startswith(b'%PDF')
+
+
+@pytest.mark.parametrize('layout', [
+    {},
+    {'elements': 'rect'},
+    {'page_size': 'A0', 'elements': []},
+    {'elements': [{'type': 'text', 'text': '{grade}', 'top': 100}]},
+    {'elements': [{'type': 'circle'}]},
+])
+def test_invalid_layouts_are_refused(layout):
+    with pytest.raises(LayoutError):
+        compile_layout(layout)
+
+
+@pytest.mark.django_db
+class TestPreview:
+    @pytest.fixture
+    def template(self, instructor):
+        return CertificateTemplate.objects.create(name='Classic', instructor=instructor, layout=DEFAULT_LAYOUT)
+
+    @pytest.fixture
+    def client(self, instructor):
+        client = APIClient()
+        client.force_authenticate(instructor)
+        return client
+
+    def url(self, template):
+        return reverse('certificates:template_preview', args=[template.pk])
+
+    def test_preview_renders_a_pdf(self, client, template):
+        response = client.get(self.url(template))
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/pdf'
+        assert response.content.startswith(b'%PDF')
+
+    def test_preview_is_read_only(self, client, template):
+        for method in (client.put, client.patch, client.delete):
+            assert method(self.url(template), {'name': 'Changed'}, format='json').status_code == 405
+        assert CertificateTemplate.objects.filter(pk=template.pk, name='Classic').exists()
+
+    def test_preview_of_another_instructors_template_is_not_found(self, template, django_user_model):
+        other = django_user_model.objects.create_user(
+            username='other', email='other@example.com', password='password', role='instructor',
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+
+        assert client.get(self.url(template)).status_code == 404
@@ -0,0 +1,72 @@
+"""
+Background rendering queue of certificate PDFs.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.certificates import rendering
+from apps.certificates.models import Certificate
+from apps.certificates.rendering import LeaseLost, claim, process_batch
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def certificate(student, course):
+    return Certificate.objects.create(student=student, course=course)
+
+
+def test_pending_certificates_without_available_at_are_due(certificate):
+    assert certificate.available_at is None
+
+    claimed = claim(10)
+
+    assert [row.pk for row in claimed] == [certificate.pk]
+    assert (claimed[0].status, claimed[0].attempts) == ('rendering', 1)
+    assert claimed[0].locked_until > timezone.now()
+    assert claim(10) == []
+
+
+def test_expired_lease_is_claimed_again_and_the_old_owner_cannot_store(certificate):
+    first, = claim(10)
+    Certificate.objects.filter(pk=certificate.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    second, = claim(10)
+
+    assert second.claimed_by != first.claimed_by
+    assert second.attempts == 2
+    with pytest.raises(LeaseLost):
+        rendering._store(first, b'%PDF-')
+
+
+def test_rendered_certificates_become_ready(certificate):
+    assert process_batch() == 1
+
+    certificate.refresh_from_db()
+    assert certificate.status == 'ready'
+    assert certificate.pdf_file.read().startswith(b'%PDF')
+    assert (certificate.claimed_by, certificate.locked_until) == ('', None)
+
+
+def test_failed_renders_back_off_then_give_up(certificate, settings, monkeypatch):
+    settings.CERTIFICATES_MAX_ATTEMPTS = 2
+
+    def broken(context):
+        raise RuntimeError('font missing')
+
+    monkeypatch.setattr(rendering, 'render_certificate_pdf', broken)
+
+    process_batch()
+    certificate.refresh_from_db()
+    assert certificate.status == 'pending'
+    assert certificate.available_at > timezone.now()
+    assert 'font missing' in certificate.last_error
+    assert process_batch() == 0
+
+    Certificate.objects.filter(pk=certificate.pk).update(available_at=timezone.now())
+    process_batch()
+    certificate.refresh_from_db()
+    assert certificate.status == 'failed'
@@ -0,0 +1,89 @@
+"""
+Incremental enrollment progress counters.
+"""
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from apps.courses.models import Lesson
+from apps.enrollment.models import Enrollment, LessonProgress
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lessons(course):
+    return [Lesson.objects.create(course=course, title=f'Lesson {order}', order=order) for order in range(1, 3)]
+
+
+@pytest.fixture
+def enrollment(student, course, lessons):
+    return Enrollment.objects.create(student=student, course=course)
+
+
+def complete(enrollment, lesson):
+    progress, _ = LessonProgress.objects.get_or_create(enrollment=enrollment, lesson=lesson)
+    return progress.mark_complete()
+
+
+def test_new_enrollments_start_with_the_course_total(enrollment):
+    assert (enrollment.completed_lessons, enrollment.total_lessons) == (0, 2)
+
+
+def test_completing_lessons_updates_progress(enrollment, lessons):
+    assert complete(enrollment, lessons[0])
+    enrollment.refresh_from_db()
+    assert enrollment.progress_percentage == 50
+    assert not enrollment.is_completed
+
+    complete(enrollment, lessons[1])
+    enrollment.refresh_from_db()
+    assert enrollment.progress_percentage == 100
+    assert enrollment.is_completed
+    assert enrollment.completed_at is not None
+
+
+def test_a_lesson_is_counted_once(enrollment, lessons):
+    assert complete(enrollment, lessons[0])
+    assert not complete(enrollment, lessons[0])
+
+    enrollment.refresh_from_db()
+    assert enrollment.completed_lessons == 1
+
+
+def test_adding_a_lesson_reopens_a_finished_course(enrollment, lessons, course):
+    for lesson in lessons:
+        complete(enrollment, lesson)
+
+    Lesson.objects.create(course=course, title='Bonus', order=3)
+
+    enrollment.refresh_from_db()
+    assert (enrollment.completed_lessons, enrollment.total_lessons) == (2, 3)
+    assert round(enrollment.progress_percentage) == 67
+    assert not enrollment.is_completed
+    assert enrollment.completed_at is None
+
+
+def test_removing_a_completed_lesson_lowers_both_counters(enrollment, lessons):
+    complete(enrollment, lessons[0])
+
+    lessons[0].delete()
+
+    enrollment.refresh_from_db()
+    assert (enrollment.completed_lessons, enrollment.total_lessons) == (0, 1)
+    assert enrollment.progress_percentage == 0
+
+
+def test_reconciliation_repairs_drifted_counters(enrollment, lessons):
+    complete(enrollment, lessons[0])
+    Enrollment.objects.filter(pk=enrollment.pk).update(completed_lessons=0, total_lessons=7)
+    output = StringIO()
+
+    call_command('reconcile_enrollment_progress', stdout=output)
+
+    assert 'Repaired 1 drifted enrollments' in output.getvalue()
+    enrollment.refresh_from_db()
+    assert (enrollment.completed_lessons, enrollment.total_lessons) == (1, 2)
+    assert enrollment.progress_percentage == 50
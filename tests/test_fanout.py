@@ -0,0 +1,91 @@
+"""
+Chunked fan-out of a notification to a course's students.
+"""
+
+import threading
+
+import pytest
+from django.db.models import Q
+
+from apps.enrollment.models import Enrollment
+from apps.events import bus
+from apps.events.models import OutboxEvent
+from apps.notifications.fanout import FAN_OUT_EVENT, notify_course
+from apps.notifications.models import Notification
+
+pytestmark = pytest.mark.django_db
+
+
+class RecordedThread:
+    """Records background event threads and runs them only when asked."""
+
+    def __init__(self, started, target):
+        self.started = started
+        self.target = target
+
+    def start(self):
+        self.started.append(self.target)
+
+
+@pytest.fixture
+def background(monkeypatch):
+    started = []
+    thread_class = threading.Thread
+
+    def make_thread(target=None, name=None, **kwargs):
+        if name == 'events-background':
+            return RecordedThread(started, target)
+        return thread_class(target=target, name=name, **kwargs)
+
+    monkeypatch.setattr(bus.threading, 'Thread', make_thread)
+    # Background runs close their connection when they end; keep the test's open
+    monkeypatch.setattr(bus.connection, 'close', lambda: None)
+    return started
+
+
+@pytest.fixture
+def students(course, django_user_model, settings):
+    settings.NOTIFICATION_BROADCAST_THRESHOLD = 1000
+    users = [
+        django_user_model.objects.create_user(username=f'student{n}', email=f'student{n}@example.com', password='pass')
+        for n in range(5)
+    ]
+    for user in users:
+        Enrollment.objects.create(student=user, course=course)
+    return users
+
+
+def notify(course):
+    return notify_course(course, chunk_size=2, notification_type='system', title='News', message='Body')
+
+
+def test_request_creates_one_chunk_and_hands_the_rest_to_a_background_thread(
+    course, students, background, django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        assert notify(course) == 2
+
+    assert Notification.objects.filter(title='News').count() == 2
+    assert len(background) == 1
+
+    # Each background chunk hands the next one to a new thread
+    while background:
+        with django_capture_on_commit_callbacks(execute=True):
+            background.pop(0)()
+
+    assert Notification.objects.filter(title='News').count() == 5
+    assert not OutboxEvent.objects.filter(event_type=FAN_OUT_EVENT).exclude(status='done').exists()
+
+
+def test_chunks_are_queued_for_the_worker_when_events_are_async(
+    course, students, background, settings, django_capture_on_commit_callbacks,
+):
+    settings.EVENTS_ASYNC = True
+    with django_capture_on_commit_callbacks(execute=True):
+        notify(course)
+
+    assert not background
+    assert OutboxEvent.objects.filter(event_type=FAN_OUT_EVENT, status='pending').count() == 1
+
+    assert bus.process_batch(extra=Q(event_type=FAN_OUT_EVENT)) == 1
+    assert Notification.objects.filter(title='News').count() == 4
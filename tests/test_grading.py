@@ -0,0 +1,96 @@
+"""
+Quiz grading against compiled answer keys.
+"""
+
+import pytest
+
+from apps.quizzes.grading import compile_answer_key, get_answer_key, grade
+from apps.quizzes.models import Answer, Question, Quiz
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quiz(course):
+    quiz = Quiz.objects.create(course=course, title='Basics')
+
+    choice = Question.objects.create(quiz=quiz, question_text='Pick one', question_type='mcq', points=2, order=1)
+    Answer.objects.create(question=choice, answer_text='Right', is_correct=True, order=1)
+    Answer.objects.create(question=choice, answer_text='Wrong', is_correct=False, order=2)
+
+    true_false = Question.objects.create(quiz=quiz, question_text='True?', question_type='true_false', points=1, order=2)
+    Answer.objects.create(question=true_false, answer_text='True', is_correct=True, order=1)
+    Answer.objects.create(question=true_false, answer_text='False', is_correct=False, order=2)
+
+    short = Question.objects.create(quiz=quiz, question_text='Name it', question_type='short_answer', points=1, order=3)
+    Answer.objects.create(question=short, answer_text='Python', is_correct=True, order=1)
+    Answer.objects.create(question=short, answer_text='CPython', is_correct=True, order=2)
+    return quiz
+
+
+def correct_answer(question):
+    return str(question.answers.get(is_correct=True, order=1).id)
+
+
+def test_compiled_key_lists_questions_in_order_with_their_correct_answers(quiz, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        key = compile_answer_key(quiz.id)
+
+    assert [question.text for question in key.questions] == ['Pick one', 'True?', 'Name it']
+    assert key.total_points == 4
+    choice, _, short = key.questions
+    assert choice.correct_ids == {correct_answer(quiz.questions.get(order=1))}
+    assert short.accepted == {'python', 'cpython'}
+
+
+def test_all_correct_answers_score_full_marks(quiz):
+    choice, true_false, short = quiz.questions.order_by('order')
+    answers = {
+        str(choice.id): correct_answer(choice),
+        str(true_false.id): correct_answer(true_false),
+        str(short.id): '  PYTHON ',
+    }
+
+    result = grade(compile_answer_key(quiz.id), answers)
+
+    assert (result.earned_points, result.total_points, result.score) == (4, 4, 100)
+    assert result.results is None
+
+
+def test_wrong_and_missing_answers_earn_nothing(quiz):
+    choice, true_false, short = quiz.questions.order_by('order')
+    wrong = str(choice.answers.get(is_correct=False).id)
+
+    result = grade(compile_answer_key(quiz.id), {str(choice.id): wrong, str(short.id): ''}, detailed=True)
+
+    assert result.earned_points == 0
+    assert result.score == 0
+    assert [item['correct'] for item in result.results] == [False, False, False]
+    assert result.results[2]['correct_answers'] == ['Python', 'CPython']
+
+
+def test_partial_credit_is_weighted_by_points(quiz):
+    choice = quiz.questions.get(order=1)
+
+    result = grade(compile_answer_key(quiz.id), {str(choice.id): correct_answer(choice)})
+
+    assert result.earned_points == 2
+    assert result.score == 50
+
+
+def test_quiz_without_questions_scores_zero(course):
+    empty = Quiz.objects.create(course=course, title='Empty')
+
+    result = grade(compile_answer_key(empty.id), {})
+
+    assert (result.total_points, result.score) == (0, 0)
+
+
+def test_editing_an_answer_invalidates_the_cached_key(quiz, django_capture_on_commit_callbacks):
+    short = quiz.questions.get(order=3)
+    assert 'django' not in get_answer_key(quiz.id).questions[2].accepted
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Answer.objects.create(question=short, answer_text='Django', is_correct=True, order=3)
+
+    assert 'django' in get_answer_key(quiz.id).questions[2].accepted
@@ -0,0 +1,128 @@
+"""
+Write-behind buffering of watch-time heartbeats.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.courses.models import Lesson
+from apps.enrollment import heartbeats
+from apps.enrollment.heartbeats import LocalHeartbeatBuffer, get_heartbeat_buffer
+from apps.enrollment.models import Enrollment, LessonProgress
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def idle_flusher(settings):
+    # Keep the flusher thread asleep so rows are only written when a test flushes
+    settings.HEARTBEAT_FLUSH_INTERVAL = 3600
+
+
+@pytest.fixture
+def lesson(course):
+    return Lesson.objects.create(course=course, title='Intro', order=1)
+
+
+@pytest.fixture
+def enrollment(student, course, lesson):
+    return Enrollment.objects.create(student=student, course=course)
+
+
+@pytest.fixture
+def client(student):
+    client = APIClient()
+    client.force_authenticate(student)
+    return client
+
+
+def beat(client, lesson, seconds, **data):
+    return client.post(
+        reverse('enrollment:lesson_progress', args=[lesson.id]), {'watch_time_seconds': seconds, **data}, format='json',
+    )
+
+
+def stored(enrollment, lesson):
+    return LessonProgress.objects.get(enrollment=enrollment, lesson=lesson).watch_time_seconds
+
+
+def test_heartbeats_are_buffered_until_flushed(client, enrollment, lesson):
+    assert beat(client, lesson, 30).data['watch_time_seconds'] == 30
+    response = beat(client, lesson, 20)
+
+    # A late, lower report never lowers the watch time
+    assert response.data['watch_time_seconds'] == 30
+    assert stored(enrollment, lesson) == 0
+
+    assert get_heartbeat_buffer().flush() == 1
+    assert stored(enrollment, lesson) == 30
+
+
+def test_steady_heartbeats_cost_no_queries(client, enrollment, lesson, django_assert_num_queries):
+    beat(client, lesson, 10)
+
+    with django_assert_num_queries(0):
+        response = beat(client, lesson, 20)
+
+    assert response.status_code == 200
+    assert response.data['lesson']['title'] == 'Intro'
+    get_heartbeat_buffer().flush()
+
+
+def test_completion_shows_up_in_later_heartbeats(client, enrollment, lesson, django_capture_on_commit_callbacks):
+    assert beat(client, lesson, 10).data['is_completed'] is False
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert beat(client, lesson, 15, mark_complete=True).data['is_completed'] is True
+
+    assert beat(client, lesson, 20).data['is_completed'] is True
+    get_heartbeat_buffer().flush()
+
+
+def test_students_outside_the_course_are_refused(client, lesson):
+    assert beat(client, lesson, 10).status_code == 403
+
+
+def test_each_process_writes_its_own_journal(settings, enrollment, lesson):
+    buffer = LocalHeartbeatBuffer()
+    buffer.record(enrollment.id, lesson.id, 40)
+
+    assert buffer.journal_path == f'{settings.HEARTBEAT_JOURNAL_PATH}.{os.getpid()}'
+    with open(buffer.journal_path) as journal:
+        assert journal.read() == f'{enrollment.id} {lesson.id} 40\n'
+    buffer.flush()
+
+
+def test_journals_of_exited_processes_are_replayed(settings, enrollment, lesson):
+    exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    dead_journal = f'{settings.HEARTBEAT_JOURNAL_PATH}.{exited.stdout.strip()}'
+    live_journal = f'{settings.HEARTBEAT_JOURNAL_PATH}.{os.getppid()}'
+    os.makedirs(os.path.dirname(dead_journal), exist_ok=True)
+    with open(dead_journal, 'w') as journal:
+        journal.write(f'{enrollment.id} {lesson.id} 50\n{enrollment.id} {lesson.id} 45\n{enrollment.id} torn')
+    with open(live_journal, 'w') as journal:
+        journal.write(f'{enrollment.id} {lesson.id} 90\n')
+
+    buffer = LocalHeartbeatBuffer()
+
+    assert buffer.pending(enrollment.id) == {str(lesson.id): 50}
+    assert not os.path.exists(dead_journal)
+    # A running process keeps its journal
+    assert os.path.exists(live_journal)
+    assert buffer.flush() == 1
+    assert stored(enrollment, lesson) == 50
+
+
+def test_unavailable_buffer_writes_directly(client, enrollment, lesson, monkeypatch):
+    def down():
+        raise ConnectionError('redis down')
+    monkeypatch.setattr(heartbeats, 'get_heartbeat_buffer', down)
+    monkeypatch.setattr('apps.enrollment.views.get_heartbeat_buffer', down)
+
+    assert beat(client, lesson, 25).status_code == 200
+    assert stored(enrollment, lesson) == 25
@@ -0,0 +1,192 @@
+"""
+Batched behavior event ingestion.
+"""
+
+import json
+import uuid
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.analytics import ingest
+from apps.analytics.ingest import IngestError, LocalIngestBuffer, parse_events, validate_event
+from apps.analytics.models import UserBehaviorTracking
+
+
+@pytest.fixture(autouse=True)
+def idle_flusher(settings):
+    # Keep the flusher thread asleep so rows are only written when a test flushes
+    settings.ANALYTICS_INGEST_BATCH_SIZE = 1000
+    settings.ANALYTICS_INGEST_FLUSH_INTERVAL = 3600
+
+
+@pytest.fixture
+def client(student):
+    client = APIClient()
+    client.force_authenticate(student)
+    return client
+
+
+def event(**fields):
+    return {'event_type': 'page_view', 'content_type': 'course', 'content_id': str(uuid.uuid4()), **fields}
+
+
+def test_events_are_read_from_a_list_an_object_or_ndjson():
+    events = [event(), event()]
+
+    assert parse_events(json.dumps(events).encode()) == events
+    assert parse_events(json.dumps({'events': events}).encode()) == events
+    ndjson = '\n'.join(json.dumps(item) for item in events) + '\n\n'
+    assert parse_events(ndjson.encode(), 'application/x-ndjson') == events
+
+
+@pytest.mark.parametrize('body, content_type', [
+    (b'{"events": ', ''),
+    (b'{"event_type": "page_view"}', ''),
+    (b'\xff\xfe', ''),
+    (b'[1]\n{', 'application/x-ndjson'),
+])
+def test_malformed_bodies_are_refused(body, content_type):
+    with pytest.raises(IngestError):
+        parse_events(body, content_type)
+
+
+def test_requests_over_the_event_limit_are_refused(settings):
+    settings.ANALYTICS_INGEST_MAX_EVENTS = 2
+
+    with pytest.raises(IngestError):
+        parse_events(json.dumps([event()] * 3).encode())
+    with pytest.raises(IngestError):
+        parse_events(b'{}\n{}\n{}', 'application/x-ndjson')
+
+
+def test_valid_event_becomes_a_row():
+    content_id = uuid.uuid4()
+
+    row, errors = validate_event(event(content_id=str(content_id), duration_seconds=12.5, page_url='/courses/'), 7)
+
+    assert errors is None
+    assert row['user_id'] == 7
+    assert row['content_id'] == content_id.hex
+    assert row['duration_seconds'] == 12.5
+    assert row['metadata'] == {}
+    assert row['timestamp'] is not None
+
+
+@pytest.mark.parametrize('fields, field', [
+    ({'event_type': 'launch'}, 'event_type'),
+    ({'event_type': None}, 'event_type'),
+    ({'content_type': 'planet'}, 'content_type'),
+    ({'content_id': 'not-a-uuid'}, 'content_id'),
+    ({'session_id': 'x' * 101}, 'session_id'),
+    ({'page_url': 42}, 'page_url'),
+    ({'duration_seconds': -1}, 'duration_seconds'),
+    ({'duration_seconds': True}, 'duration_seconds'),
+    ({'metadata': ['tag']}, 'metadata'),
+    ({'metadata': {'blob': 'x' * 5000}}, 'metadata'),
+])
+def test_invalid_fields_are_reported(fields, field):
+    row, errors = validate_event(event(**fields), 1)
+
+    assert row is None
+    assert list(errors) == [field]
+
+
+def test_non_objects_are_rejected():
+    assert validate_event('page_view', 1) == (None, {'non_field_errors': 'Expected an object.'})
+
+
+def test_full_buffer_accepts_nothing():
+    buffer = LocalIngestBuffer(limit=3)
+    assert buffer.offer([{}, {}])
+    assert not buffer.offer([{}, {}])
+    assert buffer.offer([{}])
+
+
+@pytest.mark.django_db
+def test_view_queues_valid_events_and_reports_invalid_ones(client, student):
+    events = [event(), event(event_type='launch'), event(content_type='lesson')]
+
+    response = client.post(reverse('ingest-behavior-events'), events, format='json')
+
+    assert response.status_code == 202
+    assert response.data['accepted'] == 2
+    assert response.data['rejected'] == [{'index': 1, 'errors': {'event_type': 'Missing or unknown event type.'}}]
+    assert not UserBehaviorTracking.objects.exists()
+
+    assert ingest.get_ingest_buffer().flush() == 2
+    assert UserBehaviorTracking.objects.filter(user=student).count() == 2
+
+
+@pytest.mark.django_db
+def test_view_accepts_ndjson(client):
+    body = '\n'.join(json.dumps(event()) for _ in range(3))
+
+    response = client.post(
+        reverse('ingest-behavior-events'), body, content_type='application/x-ndjson'
+    )
+
+    assert response.data['accepted'] == 3
+    ingest.get_ingest_buffer().flush()
+    assert UserBehaviorTracking.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_view_refuses_malformed_bodies(client):
+    response = client.post(
+        reverse('ingest-behavior-events'), '{"events": ', content_type='application/json'
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_view_asks_clients_to_back_off_when_the_buffer_is_full(client, settings):
+    settings.ANALYTICS_INGEST_BUFFER_LIMIT = 1
+
+    response = client.post(reverse('ingest-behavior-events'), [event(), event()], format='json')
+
+    assert response.status_code == 429
+    assert response['Retry-After'] == str(settings.ANALYTICS_INGEST_RETRY_AFTER)
+    assert ingest.get_ingest_buffer().flush() == 0
+
+
+@pytest.mark.django_db
+def test_reinserting_a_flushed_batch_does_not_duplicate_events(student):
+    rows = [validate_event(event(), student.pk)[0] for _ in range(3)]
+
+    ingest.write_events(rows)
+    ingest.write_events(rows)
+
+    assert UserBehaviorTracking.objects.count() == 3
+
+
+@pytest.mark.django_db
+def test_events_of_deleted_users_are_dropped_and_the_buffer_advances(student, settings):
+    buffer = LocalIngestBuffer()
+    buffer.offer([validate_event(event(), uuid.uuid4())[0], validate_event(event(), student.pk)[0]])
+
+    assert buffer.flush() == 1
+    assert buffer.flush() == 0
+    assert UserBehaviorTracking.objects.filter(user=student).count() == 1
+
+
+@pytest.mark.django_db
+def test_a_refused_batch_is_written_row_by_row(student, monkeypatch):
+    from django.db import IntegrityError
+
+    rows = [validate_event(event(), student.pk)[0] for _ in range(3)]
+    bad_id = rows[1]['id']
+    bulk_create = UserBehaviorTracking.objects.bulk_create
+
+    def refuse_bad_row(objs, *args, **kwargs):
+        if any(obj.id == bad_id for obj in objs):
+            raise IntegrityError('violates foreign key constraint')
+        return bulk_create(objs, *args, **kwargs)
+
+    monkeypatch.setattr(UserBehaviorTracking.objects, 'bulk_create', refuse_bad_row)
+
+    assert ingest.write_events(rows) == 2
+    assert not UserBehaviorTracking.objects.filter(id=bad_id).exists()
+    assert UserBehaviorTracking.objects.count() == 2
@@ -0,0 +1,73 @@
+"""
+Sorted-set leaderboards fed by points transactions.
+"""
+
+import pytest
+
+from apps.courses.models import Lesson
+from apps.gamification import leaderboard
+from apps.gamification.leaderboard import SkipList, board_name, get_leaderboard_store, get_rank, get_top
+from apps.gamification.models import PointsTransaction
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lesson(course):
+    return Lesson.objects.create(course=course, title='Intro', order=1)
+
+
+def earn(user, points, **related):
+    return PointsTransaction.objects.create(
+        user=user, transaction_type='lesson_completion', points=points, description='Lesson', **related
+    )
+
+
+def score(board, user):
+    found = get_leaderboard_store().rank(board, str(user.id))
+    return None if found is None else found[1]
+
+
+def test_skip_list_keeps_order_and_positions():
+    keys = SkipList(seed=1)
+    for key in (5, 1, 9, 3, 7):
+        keys.insert(key)
+    keys.remove(9)
+
+    assert keys.slice(0, 10) == [1, 3, 5, 7]
+    assert keys.index(5) == 2
+    with pytest.raises(KeyError):
+        keys.remove(9)
+
+
+def test_equal_scores_share_a_rank(student, instructor, django_user_model):
+    other = django_user_model.objects.create_user(username='other', email='other@example.com', password='pass')
+    leaderboard.record_points(student.id, 50)
+    leaderboard.record_points(instructor.id, 50)
+    leaderboard.record_points(other.id, 10)
+
+    assert [entry['rank'] for entry in get_top()] == [1, 1, 3]
+    assert get_rank(other.id)['rank'] == 3
+
+
+def test_transaction_scores_on_global_and_course_boards(student, course, lesson, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        earn(student, 20, lesson=lesson)
+
+    assert score(board_name('all'), student) == 20
+    assert score(board_name('all', course.id), student) == 20
+
+
+def test_revoke_after_lesson_was_deleted_still_clears_global_board(
+    student, course, lesson, django_capture_on_commit_callbacks,
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        earn(student, 20, lesson=lesson)
+    points_transaction = PointsTransaction.objects.get(user=student)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        lesson.delete()
+        points_transaction.delete()
+
+    assert score(board_name('all'), student) == 0
+    assert score(board_name('weekly'), student) == 0
@@ -0,0 +1,72 @@
+"""
+Running point totals and badge awards kept from the points ledger.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from apps.gamification import ledger
+from apps.gamification.models import Achievement, Badge, PointsTransaction, UserBadge, UserPoints
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def badge():
+    return Badge.objects.create(name='Starter', description='First 50 points', points_required=50)
+
+
+def earn(user, points):
+    return PointsTransaction.objects.create(
+        user=user, transaction_type='lesson_completion', points=points, description='Lesson'
+    )
+
+
+def test_transactions_update_running_totals(student):
+    earn(student, 30)
+    earn(student, 20)
+
+    totals = UserPoints.objects.get(user=student)
+    assert (totals.total_points, totals.weekly_points, totals.monthly_points) == (50, 50, 50)
+
+
+def test_deleting_a_transaction_revokes_its_points(student):
+    earn(student, 30)
+    earn(student, 20).delete()
+
+    assert UserPoints.objects.get(user=student).total_points == 30
+
+
+def test_badge_is_awarded_when_threshold_is_reached(student, badge):
+    earn(student, 40)
+    assert not UserBadge.objects.filter(user=student).exists()
+
+    earn(student, 10)
+    assert UserBadge.objects.filter(user=student, badge=badge).count() == 1
+    assert Achievement.objects.filter(user=student, badge=badge).count() == 1
+
+
+def test_concurrent_awards_record_a_badge_once(student, badge, monkeypatch):
+    ledger.award_badges(student.id, 100)
+
+    # A second worker that read the eligible badges before the first committed
+    stale = SimpleNamespace(exclude=lambda **kwargs: [badge])
+    monkeypatch.setattr(ledger, 'Badge', SimpleNamespace(objects=SimpleNamespace(filter=lambda **kwargs: stale)))
+    ledger.award_badges(student.id, 100)
+
+    assert UserBadge.objects.filter(user=student, badge=badge).count() == 1
+    assert Achievement.objects.filter(user=student, badge=badge).count() == 1
+
+
+def test_rebuild_totals_reconciles_drifted_counters(student, instructor):
+    earn(student, 30)
+    earn(student, 20)
+    UserPoints.objects.filter(user=student).update(total_points=999, weekly_points=0)
+    UserPoints.objects.create(user=instructor, total_points=15, weekly_points=15, monthly_points=15)
+
+    assert ledger.rebuild_totals() == 1
+
+    student_totals = UserPoints.objects.get(user=student)
+    assert (student_totals.total_points, student_totals.weekly_points) == (50, 50)
+    assert UserPoints.objects.get(user=instructor).total_points == 0
@@ -0,0 +1,152 @@
+"""
+Protected lesson file delivery and ``Range`` handling.
+"""
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.courses.media import parse_range, serve_public_media
+from apps.courses.models import Lesson
+from apps.enrollment.models import Enrollment
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('', None),
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 1023)),
+    ('bytes=1000-5000', (1000, 1023)),
+    ('bytes=-100', (924, 1023)),
+    ('bytes=-5000', (0, 1023)),
+    (' bytes=5-5 ', (5, 5)),
+    ('bytes=-', None),
+    ('bytes=9-3', None),
+    ('bytes=0-1,5-9', None),
+    ('items=0-9', None),
+])
+def test_ranges_are_parsed(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+
+@pytest.mark.parametrize('header', ['bytes=1024-', 'bytes=2000-3000', 'bytes=-0'])
+def test_unsatisfiable_ranges_are_refused(header):
+    with pytest.raises(ValueError):
+        parse_range(header, len(CONTENT))
+
+
+def test_empty_files_are_sent_whole():
+    assert parse_range('bytes=0-10', 0) is None
+
+
+@pytest.fixture
+def lesson(course):
+    name = default_storage.save('lesson_videos/intro.mp4', ContentFile(CONTENT))
+    return Lesson.objects.create(course=course, title='Intro', video_file=name)
+
+
+@pytest.fixture
+def client(student):
+    client = APIClient()
+    client.force_authenticate(student)
+    return client
+
+
+def stream_url(client, lesson):
+    response = client.get(reverse('courses:lesson_media', args=[lesson.id, 'video']))
+    assert response.status_code == 200
+    return response.data['url']
+
+
+def body(response):
+    return b''.join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_only_enrolled_students_get_a_link(client, student, lesson):
+    url = reverse('courses:lesson_media', args=[lesson.id, 'video'])
+    assert client.get(url).status_code == 403
+
+    Enrollment.objects.create(student=student, course=lesson.course)
+    assert client.get(url).status_code == 200
+    assert client.get(reverse('courses:lesson_media', args=[lesson.id, 'document'])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_signed_link_streams_the_file(client, student, lesson):
+    Enrollment.objects.create(student=student, course=lesson.course)
+    url = stream_url(client, lesson)
+
+    # The link works without the session that obtained it
+    response = APIClient().get(url)
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'video/mp4'
+    assert response['Accept-Ranges'] == 'bytes'
+    assert body(response) == CONTENT
+
+
+@pytest.mark.django_db
+def test_range_requests_get_partial_content(client, student, lesson):
+    Enrollment.objects.create(student=student, course=lesson.course)
+    url = stream_url(client, lesson)
+
+    response = client.get(url, HTTP_RANGE='bytes=100-199')
+
+    assert response.status_code == 206
+    assert response['Content-Range'] == f'bytes 100-199/{len(CONTENT)}'
+    assert response['Content-Length'] == '100'
+    assert body(response) == CONTENT[100:200]
+
+
+@pytest.mark.django_db
+def test_ranges_past_the_end_are_unsatisfiable(client, student, lesson):
+    Enrollment.objects.create(student=student, course=lesson.course)
+
+    response = client.get(stream_url(client, lesson), HTTP_RANGE=f'bytes={len(CONTENT)}-')
+
+    assert response.status_code == 416
+    assert response['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+
+@pytest.mark.django_db
+def test_nginx_serves_the_file_when_configured(client, student, lesson, settings):
+    settings.LESSON_MEDIA_ACCEL_PREFIX = '/protected/'
+    Enrollment.objects.create(student=student, course=lesson.course)
+
+    response = client.get(stream_url(client, lesson))
+
+    assert response['X-Accel-Redirect'] == '/protected/lesson_videos/intro.mp4'
+    assert response.content == b''
+
+
+@pytest.mark.django_db
+def test_tampered_links_are_refused(client):
+    assert client.get(reverse('courses:lesson_media_stream', args=['forged:token'])).status_code == 403
+
+
+@pytest.mark.parametrize('path', [
+    'lesson_videos/intro.mp4',
+    'lesson_documents/notes.pdf',
+    'lesson_hls/1/run/master.m3u8',
+    'avatars/../lesson_videos/intro.mp4',
+])
+def test_development_media_route_refuses_lesson_files(rf, settings, path):
+    default_storage.save('lesson_videos/intro.mp4', ContentFile(CONTENT))
+
+    with pytest.raises(Http404):
+        serve_public_media(rf.get('/media/' + path), path, document_root=settings.MEDIA_ROOT)
+
+
+def test_development_media_route_serves_other_uploads(rf, settings):
+    name = default_storage.save('avatars/me.png', ContentFile(b'png'))
+
+    response = serve_public_media(rf.get('/media/' + name), name, document_root=settings.MEDIA_ROOT)
+
+    assert response.status_code == 200
+    assert body(response) == b'png'
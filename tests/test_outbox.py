@@ -0,0 +1,134 @@
+"""
+Transactional outbox: publishing, delivery, retries and leases.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.events.bus import claim, dispatch, handler, process_batch, publish, purge
+from apps.events.models import OutboxEvent
+
+pytestmark = pytest.mark.django_db
+
+handled = []
+
+
+@handler('tests.recorded')
+def record_event(event):
+    handled.append(event.payload['value'])
+
+
+@handler('tests.recorded')
+def record_event_again(event):
+    handled.append(-event.payload['value'])
+
+
+@handler('tests.failing')
+def fail(event):
+    raise RuntimeError('handler failed')
+
+
+@pytest.fixture(autouse=True)
+def reset_handled():
+    handled.clear()
+
+
+def test_publish_queues_one_row_per_handler():
+    assert publish('tests.recorded', 'a', {'value': 1}) == 2
+
+    assert sorted(OutboxEvent.objects.values_list('handler', flat=True)) == [
+        f'{__name__}.record_event', f'{__name__}.record_event_again',
+    ]
+    assert set(OutboxEvent.objects.values_list('status', flat=True)) == {'pending'}
+
+
+def test_publishing_the_same_event_twice_is_a_noop():
+    publish('tests.recorded', 'a', {'value': 1})
+    publish('tests.recorded', 'a', {'value': 1})
+
+    assert OutboxEvent.objects.count() == 2
+
+
+def test_events_without_handlers_are_not_stored():
+    assert publish('tests.unhandled', 'a', {}) == 0
+    assert not OutboxEvent.objects.exists()
+
+
+def test_worker_runs_each_handler_once(settings):
+    settings.EVENTS_ASYNC = True
+    publish('tests.recorded', 'a', {'value': 3})
+
+    assert process_batch() == 2
+    assert process_batch() == 0
+
+    assert sorted(handled) == [-3, 3]
+    assert set(OutboxEvent.objects.values_list('status', flat=True)) == {'done'}
+
+
+def test_events_are_handled_after_commit_without_a_worker(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        publish('tests.recorded', 'a', {'value': 5})
+        assert handled == []
+
+    assert sorted(handled) == [-5, 5]
+
+
+def test_failed_delivery_is_retried_with_backoff_then_given_up(settings):
+    settings.EVENTS_ASYNC = True
+    settings.EVENTS_MAX_ATTEMPTS = 2
+    publish('tests.failing', 'a', {})
+
+    process_batch()
+    event = OutboxEvent.objects.get()
+    assert (event.status, event.attempts) == ('pending', 1)
+    assert event.available_at > timezone.now()
+    assert 'handler failed' in event.last_error
+    # Not due again until the backoff has passed
+    assert process_batch() == 0
+
+    OutboxEvent.objects.update(available_at=timezone.now())
+    process_batch()
+    event.refresh_from_db()
+    assert (event.status, event.attempts) == ('failed', 2)
+
+
+def test_event_of_a_worker_whose_lease_expired_is_claimed_again(settings):
+    settings.EVENTS_ASYNC = True
+    publish('tests.recorded', 'a', {'value': 7})
+    stale = claim(10)
+    OutboxEvent.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+
+    assert process_batch() == 2
+    owners = dict(OutboxEvent.objects.values_list('id', 'claimed_by'))
+    # The first worker finishing late rolls back its work and leaves the rows alone
+    assert not any(dispatch(event) for event in stale)
+
+    assert set(OutboxEvent.objects.values_list('status', flat=True)) == {'done'}
+    assert dict(OutboxEvent.objects.values_list('id', 'claimed_by')) == owners
+
+
+def test_purge_deletes_only_old_handled_events(settings):
+    settings.EVENTS_ASYNC = True
+    publish('tests.recorded', 'a', {'value': 1})
+    publish('tests.failing', 'b', {})
+    process_batch()
+    OutboxEvent.objects.update(processed_at=timezone.now() - timedelta(days=30))
+
+    assert purge() == 2
+    assert list(OutboxEvent.objects.values_list('event_type', flat=True)) == ['tests.failing']
+
+
+def test_payment_notification_is_created_once(student, django_capture_on_commit_callbacks):
+    from apps.notifications.models import Notification
+    from apps.payments.models import PaymentTransaction
+
+    with django_capture_on_commit_callbacks(execute=True):
+        payment = PaymentTransaction.objects.create(user=student, amount=10, status='completed')
+    # A later completion publishes again once the first event was purged
+    OutboxEvent.objects.all().delete()
+    with django_capture_on_commit_callbacks(execute=True):
+        payment.save()
+
+    assert Notification.objects.filter(user=student, notification_type='payment').count() == 1
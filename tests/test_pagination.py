@@ -0,0 +1,97 @@
+"""
+Signed keyset pagination.
+"""
+
+from datetime import timedelta
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.notifications.models import Notification
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def notifications(student):
+    now = timezone.now()
+    rows = Notification.objects.bulk_create([
+        Notification(user=student, notification_type='system', title=f'Notice {number}', message='...')
+        for number in range(7)
+    ])
+    for number, notification in enumerate(rows):
+        Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(minutes=number))
+    return rows
+
+
+@pytest.fixture
+def client(student):
+    client = APIClient()
+    client.force_authenticate(student)
+    return client
+
+
+def titles(response):
+    return [item['title'] for item in response.data['results']]
+
+
+def cursor(link):
+    return parse_qs(urlsplit(link).query)['cursor'][0]
+
+
+def test_pages_follow_the_ordering_without_overlap(client, notifications):
+    url = reverse('notifications:notification_list')
+
+    first = client.get(url, {'page_size': 3})
+    second = client.get(first.data['next'])
+    third = client.get(second.data['next'])
+
+    assert titles(first) == ['Notice 0', 'Notice 1', 'Notice 2']
+    assert titles(second) == ['Notice 3', 'Notice 4', 'Notice 5']
+    assert titles(third) == ['Notice 6']
+    assert third.data['next'] is None
+    assert titles(client.get(third.data['previous'])) == ['Notice 3', 'Notice 4', 'Notice 5']
+    assert 'count' not in first.data
+
+
+def test_new_rows_do_not_shift_later_pages(client, notifications, student):
+    url = reverse('notifications:notification_list')
+    first = client.get(url, {'page_size': 3})
+
+    Notification.objects.create(user=student, notification_type='system', title='Newest', message='...')
+
+    assert titles(client.get(first.data['next'])) == ['Notice 3', 'Notice 4', 'Notice 5']
+
+
+def test_tampered_cursors_are_refused(client, notifications):
+    url = reverse('notifications:notification_list')
+    token = cursor(client.get(url, {'page_size': 3}).data['next'])
+    payload, signature = token.rsplit(':', 1)
+
+    assert client.get(url, {'cursor': f'{payload}:{signature[::-1]}'}).status_code == 404
+    assert client.get(url, {'cursor': 'garbage'}).status_code == 404
+
+
+def test_cursors_only_work_on_the_endpoint_that_issued_them(client, notifications):
+    token = cursor(client.get(reverse('notifications:notification_list'), {'page_size': 3}).data['next'])
+
+    response = client.get(reverse('notifications:broadcast_list'), {'cursor': token})
+
+    assert response.status_code == 404
+
+
+def test_totals_are_opt_in(client, notifications):
+    response = client.get(reverse('notifications:notification_list'), {'include_count': 'true', 'page_size': 3})
+
+    assert response.data['count'] == 7
+    assert response.data['count_is_approximate'] is False
+
+
+def test_page_numbers_still_work(client, notifications):
+    response = client.get(reverse('notifications:notification_list'), {'page': 1})
+
+    assert response.data['count'] == 7
+    assert len(response.data['results']) == 7
@@ -0,0 +1,79 @@
+"""
+Monthly behavior partitions and their archives.
+"""
+
+from datetime import date, datetime, timezone as dt_timezone
+
+import pytest
+
+from apps.analytics import archive
+from apps.analytics.models import UserBehaviorTracking
+from apps.analytics.partitions import add_months, month_bounds, month_range, parse_month, stored_months
+from apps.core.ids import uuid7
+
+
+def track(user, moment, event_type='page_view'):
+    return UserBehaviorTracking.objects.create(
+        id=uuid7(int(moment.timestamp() * 1000)), user=user, event_type=event_type, timestamp=moment,
+    )
+
+
+@pytest.mark.parametrize('month, count, expected', [
+    (date(2024, 1, 1), 1, date(2024, 2, 1)),
+    (date(2024, 12, 1), 1, date(2025, 1, 1)),
+    (date(2024, 1, 1), -1, date(2023, 12, 1)),
+    (date(2024, 3, 1), -14, date(2023, 1, 1)),
+])
+def test_add_months_crosses_years(month, count, expected):
+    assert add_months(month, count) == expected
+
+
+def test_month_bounds_cover_exactly_the_month():
+    month = parse_month('2024-02')
+    start, end = month_range(month)
+    lower, upper = month_bounds(month)
+
+    assert (start, end) == (
+        datetime(2024, 2, 1, tzinfo=dt_timezone.utc), datetime(2024, 3, 1, tzinfo=dt_timezone.utc),
+    )
+    first = uuid7(int(start.timestamp() * 1000))
+    last = uuid7(int(end.timestamp() * 1000) - 1)
+    assert lower <= first < upper
+    assert lower <= last < upper
+    assert uuid7(int(end.timestamp() * 1000)) >= upper
+    assert month_bounds(add_months(month, 1))[0] == upper
+
+
+def test_malformed_months_are_refused():
+    with pytest.raises(ValueError):
+        parse_month('2024-13')
+
+
+@pytest.mark.django_db
+def test_expired_months_are_archived_then_dropped(student, instructor, settings, tmp_path):
+    settings.ANALYTICS_ARCHIVE_DIR = str(tmp_path / 'archive')
+    january = datetime(2020, 1, 15, tzinfo=dt_timezone.utc)
+    for _ in range(3):
+        track(student, january)
+    track(instructor, january, 'search')
+    track(student, datetime(2020, 2, 3, tzinfo=dt_timezone.utc))
+    recent = track(student, datetime.now(dt_timezone.utc))
+
+    assert stored_months()[:2] == [date(2020, 1, 1), date(2020, 2, 1)]
+    assert archive.expire_months(keep_months=1) == [(date(2020, 1, 1), 4), (date(2020, 2, 1), 1)]
+
+    assert list(UserBehaviorTracking.objects.values_list('id', flat=True)) == [recent.id]
+    manifest = archive.load_manifest()['months']['2020-01']
+    assert (manifest['rows'], manifest['users'], manifest['event_types']) == (4, 2, {'page_view': 3, 'search': 1})
+    assert len(list(archive.read_month(date(2020, 1, 1)))) == 4
+    assert [row['event_type'] for row in archive.read_month(date(2020, 1, 1), instructor.id)] == ['search']
+
+
+@pytest.mark.django_db
+def test_dry_run_only_counts(student, settings, tmp_path):
+    settings.ANALYTICS_ARCHIVE_DIR = str(tmp_path / 'archive')
+    track(student, datetime(2020, 1, 15, tzinfo=dt_timezone.utc))
+
+    assert archive.expire_months(keep_months=1, dry_run=True) == [(date(2020, 1, 1), 1)]
+    assert UserBehaviorTracking.objects.count() == 1
+    assert archive.load_manifest() == {'months': {}}
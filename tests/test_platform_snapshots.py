@@ -0,0 +1,71 @@
+"""
+Scheduled platform analytics snapshots and the deltas added on top of them.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.analytics import snapshots
+from apps.analytics.models import PlatformSnapshot, UserBehaviorTracking
+from apps.core.ids import uuid7
+from apps.enrollment.models import Enrollment
+
+pytestmark = pytest.mark.django_db
+
+
+def track(user, moment, id_moment=None):
+    """Record an event; ``id_moment`` gives it an id of another time, like a legacy row."""
+    id_moment = id_moment or moment
+    return UserBehaviorTracking.objects.create(
+        id=uuid7(int(id_moment.timestamp() * 1000)), user=user, event_type='page_view', timestamp=moment,
+    )
+
+
+def test_delta_counts_rows_created_since_the_snapshot(student, instructor, course):
+    snapshot = snapshots.take_snapshot()
+    assert snapshot.metrics['total_users'] == 2
+
+    Enrollment.objects.create(student=student, course=course)
+    now = timezone.now()
+    track(student, now)
+    track(student, now - timedelta(days=40), id_moment=now)
+
+    change = snapshots.delta(snapshot)
+    assert (change['new_users'], change['new_enrollments'], change['events']) == (0, 1, 1)
+
+
+def test_series_counts_new_days_and_skips_out_of_range_timestamps(student, instructor):
+    now = timezone.now()
+    moment = now - timedelta(seconds=1)
+    track(student, moment)
+    track(instructor, moment)
+    track(student, now - timedelta(days=40), id_moment=moment)
+
+    series = snapshots.build_series(now)
+
+    assert len(series['days']) == 30
+    assert series['days'][-1] == timezone.localdate(now).isoformat()
+    assert (series['events'][-1], series['active_users'][-1], series['new_users'][-1]) == (2, 2, 2)
+    assert sum(series['events']) == 2
+
+
+def test_settled_days_are_carried_over_from_the_previous_snapshot(student):
+    now = timezone.now()
+    yesterday = timezone.localdate(now) - timedelta(days=1)
+    days = [(yesterday - timedelta(days=offset)).isoformat() for offset in range(29, -1, -1)]
+    previous = PlatformSnapshot.objects.create(
+        as_of=now - timedelta(minutes=5), metrics={},
+        series={'days': days, **{name: [0] * 29 + [7] for name in snapshots.SERIES}},
+    )
+
+    # A legacy row whose id falls in the recounted range but whose day was settled
+    track(student, now - timedelta(days=10), id_moment=now - timedelta(seconds=1))
+
+    series = snapshots.build_series(now, previous)
+
+    # Yesterday was settled when the previous snapshot was taken, so it is not recounted
+    assert series['events'][-2] == 7
+    assert sum(series['events']) == 7
+    assert series['new_users'][-1] == 1
@@ -0,0 +1,83 @@
+"""
+Query budgets of the course endpoints.
+
+Each endpoint is requested against a small and a large catalog. It fails
+when it exceeds its budget, or when its query count grows with the number
+of courses, which is how N+1 regressions show up.
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.courses.models import Category, Course, Lesson
+from apps.courses.similarity import get_similarity_index
+
+# (name, path template, maximum queries)
+QUERY_BUDGETS = [
+    ('api course list', '/api/courses/', 4),
+    ('api course list by category', '/api/courses/?category={category.id}', 5),
+    ('api course detail', '/api/courses/{course.slug}/', 4),
+    ('api category list', '/api/courses/categories/', 2),
+    ('catalog page', '/courses/', 3),
+    ('course detail page', '/courses/{course.slug}/', 5),
+]
+
+SMALL_CATALOG = 3
+LARGE_CATALOG = 30
+LESSONS_PER_COURSE = 5
+
+
+def create_courses(django_user_model, instructor, categories, start, stop):
+    for i in range(start, stop):
+        # A new instructor per course exposes per-row profile lookups
+        course = Course.objects.create(
+            instructor=instructor if i % 2 else django_user_model.objects.create_user(
+                email=f'budget-{i}@example.com', username=f'budget-{i}', password='password', role='instructor',
+            ),
+            category=categories[i % len(categories)],
+            title=f'Budget Course {i}',
+            description='Query budget check',
+            status='published',
+        )
+        Lesson.objects.bulk_create([
+            Lesson(course=course, title=f'Lesson {j}', order=j, duration_minutes=10)
+            for j in range(LESSONS_PER_COURSE)
+        ])
+    # Index the catalog so the detail page also loads its related courses
+    get_similarity_index().rebuild()
+
+
+def measure(client, category):
+    course = Course.objects.filter(category=category).order_by('created_at').first()
+    counts = {}
+    for name, path, _ in QUERY_BUDGETS:
+        url = path.format(course=course, category=category)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert response.status_code == 200, f'{name}: GET {url} returned {response.status_code}'
+        counts[name] = len(queries)
+    return counts
+
+
+@pytest.mark.django_db
+def test_course_endpoints_stay_within_query_budgets(settings, client, django_user_model, instructor):
+    # Caching would hide the queries being measured
+    settings.CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+        'local': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    }
+    categories = [Category.objects.create(name=f'Budget Category {i}') for i in range(3)]
+
+    create_courses(django_user_model, instructor, categories, 0, SMALL_CATALOG)
+    small = measure(client, categories[0])
+    create_courses(django_user_model, instructor, categories, SMALL_CATALOG, LARGE_CATALOG)
+    large = measure(client, categories[0])
+
+    failures = []
+    for name, _, budget in QUERY_BUDGETS:
+        if large[name] > budget:
+            failures.append(f'{name}: {large[name]} queries, budget is {budget}')
+        elif large[name] > small[name]:
+            failures.append(f'{name}: grows from {small[name]} to {large[name]} queries with catalog size')
+    assert not failures, '\n'.join(failures)
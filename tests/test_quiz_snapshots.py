@@ -0,0 +1,99 @@
+"""
+Cached student-facing quiz payloads.
+"""
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.enrollment.models import Enrollment
+from apps.quizzes.models import Answer, Question, Quiz
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def quiz(course):
+    quiz = Quiz.objects.create(course=course, title='Basics', randomize_questions=False)
+    for order in range(1, 4):
+        question = Question.objects.create(quiz=quiz, question_text=f'Question {order}', question_type='mcq', order=order)
+        Answer.objects.create(question=question, answer_text='Right', is_correct=True, order=1)
+        Answer.objects.create(question=question, answer_text='Wrong', is_correct=False, order=2)
+    return quiz
+
+
+@pytest.fixture
+def client(student, course):
+    Enrollment.objects.create(student=student, course=course)
+    client = APIClient()
+    client.force_authenticate(student)
+    return client
+
+
+def url(quiz):
+    return reverse('quizzes:quiz_detail', args=[quiz.id])
+
+
+def test_students_never_see_correct_answers(client, quiz):
+    response = client.get(url(quiz))
+
+    assert response.status_code == 200
+    assert [question['question_text'] for question in response.data['questions']] == [
+        'Question 1', 'Question 2', 'Question 3',
+    ]
+    assert all('is_correct' not in answer for question in response.data['questions'] for answer in question['answers'])
+
+
+def test_snapshots_are_served_from_the_cache(client, quiz, django_assert_max_num_queries):
+    etag = client.get(url(quiz))['ETag']
+
+    # Authentication, the quiz and the enrollment check; no questions or answers
+    with django_assert_max_num_queries(3):
+        response = client.get(url(quiz))
+
+    assert response['ETag'] == etag
+    assert client.get(url(quiz), HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+def test_editing_a_question_changes_the_snapshot(client, quiz, django_capture_on_commit_callbacks):
+    etag = client.get(url(quiz))['ETag']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Question.objects.filter(quiz=quiz, order=1).get().answers.create(answer_text='Maybe', order=3)
+
+    response = client.get(url(quiz), HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert [answer['answer_text'] for answer in response.data['questions'][0]['answers']] == ['Right', 'Wrong', 'Maybe']
+
+
+def test_shuffled_order_is_stable_per_student(client, quiz, student):
+    quiz.randomize_questions = True
+    quiz.save()
+
+    first = client.get(url(quiz))
+    again = client.get(url(quiz))
+
+    order = [question['id'] for question in first.data['questions']]
+    assert order == [question['id'] for question in again.data['questions']]
+    assert sorted(order) == sorted(str(question.id) for question in quiz.questions.all())
+    # The ETag is per student, since the order is
+    assert first['ETag'].endswith(f'-{student.id}"')
+
+
+def test_students_outside_the_course_are_refused(quiz, django_user_model):
+    outsider = django_user_model.objects.create_user(
+        email='outsider@example.com', username='outsider', password='password', role='student',
+    )
+    client = APIClient()
+    client.force_authenticate(outsider)
+
+    assert client.get(url(quiz)).status_code == 403
+
+
+def test_instructors_see_correct_answers(quiz, instructor):
+    client = APIClient()
+    client.force_authenticate(instructor)
+
+    response = client.get(url(quiz))
+
+    assert response.data['questions'][0]['answers'][0]['is_correct'] is True
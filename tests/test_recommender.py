@@ -0,0 +1,98 @@
+"""
+Collaborative filtering course recommendations.
+"""
+
+import uuid
+
+import pytest
+
+from apps.enrollment.models import Enrollment
+from apps.personalization import recommender
+from apps.personalization.models import CourseNeighbor, Recommendation, UserActivity
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def learners(django_user_model):
+    return [
+        django_user_model.objects.create_user(
+            email=f'learner{number}@example.com', username=f'learner{number}', password='password', role='student',
+        )
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def catalog(make_course):
+    return make_course('Python Basics'), make_course('Django Web'), make_course('Rust Systems')
+
+
+def enroll(users, *courses):
+    for user in users:
+        for course in courses:
+            Enrollment.objects.create(student=user, course=course)
+
+
+def test_courses_taken_together_become_neighbors(learners, catalog):
+    python, django, rust = catalog
+    enroll(learners, python, django)
+    enroll(learners[:1], rust)
+
+    summary = recommender.build()
+
+    assert summary['users'] == 3
+    assert summary['courses'] == 3
+    pairs = set(CourseNeighbor.objects.values_list('course', 'neighbor'))
+    assert pairs == {(python.id, django.id), (django.id, python.id)}
+    # Shrinkage discounts similarity backed by only a few learners
+    assert 0 < CourseNeighbor.objects.get(course=python).score < 0.5
+
+
+def test_learners_are_recommended_neighbors_of_their_courses(learners, catalog, student):
+    python, django, _ = catalog
+    enroll(learners, python, django)
+    enroll([student], python)
+
+    recommender.build()
+
+    assert Recommendation.objects.filter(user=student, content_id=django.id).exists()
+    first = recommender.recommend(student)[0]
+    assert first['id'] == django.id
+    assert first['reason'] == 'Learners who took "Python Basics" also took this course'
+    assert python.id not in [course['id'] for course in recommender.recommend(student)]
+
+
+def test_new_enrollments_are_served_before_the_next_build(learners, catalog, student):
+    python, django, _ = catalog
+    enroll(learners, python, django)
+    recommender.build()
+
+    enroll([student], django)
+
+    assert recommender.recommend(student)[0]['id'] == python.id
+
+
+def test_activity_on_deleted_courses_is_ignored(learners, catalog):
+    python, django, _ = catalog
+    enroll(learners, python)
+    UserActivity.objects.create(user=learners[0], activity_type='view', content_type='course', content_id=uuid.uuid4())
+
+    summary = recommender.build()
+
+    assert summary['courses'] == 1
+
+
+def test_new_learners_get_the_most_popular_courses(learners, catalog, student):
+    python, django, rust = catalog
+    enroll(learners, django)
+    enroll(learners[:2], python)
+    rust.status = 'draft'
+    rust.save()
+    enroll(learners[:1], rust)
+
+    recommender.build()
+
+    recommendations = recommender.recommend(student)
+    assert [course['id'] for course in recommendations] == [django.id, python.id]
+    assert {course['reason'] for course in recommendations} == {'Popular with learners'}
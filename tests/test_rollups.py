@@ -0,0 +1,157 @@
+"""
+Incremental learning analytics rollups.
+"""
+
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.analytics import rollups
+from apps.analytics.models import LearningAnalytics, UserBehaviorTracking
+from apps.core.ids import uuid7
+from apps.courses.models import Lesson
+from apps.enrollment.models import Enrollment
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def lesson(course):
+    return Lesson.objects.create(course=course, title='Variables', order=1)
+
+
+@pytest.fixture
+def track(student):
+    def track(event_type, content_type, content_id, duration=None, age=timedelta(minutes=5)):
+        timestamp = timezone.now() - age
+        return UserBehaviorTracking.objects.create(
+            id=uuid7(int(timestamp.timestamp() * 1000)), timestamp=timestamp, user=student,
+            event_type=event_type, content_type=content_type, content_id=content_id, duration_seconds=duration,
+        )
+    return track
+
+
+def row(user, course=None, lesson=None):
+    return LearningAnalytics.objects.get(user=user, course=course, lesson=lesson, quiz=None)
+
+
+def test_events_are_counted_per_user_course_and_lesson(student, course, lesson, track):
+    track('page_view', 'course', course.id, duration=30)
+    track('video_play', 'lesson', lesson.id, duration=60)
+    track('video_complete', 'lesson', lesson.id)
+    track('comment_add', 'lesson', lesson.id)
+
+    assert rollups.run()['events'] == 4
+
+    overall = row(student)
+    assert (overall.page_views, overall.video_views, overall.comments_made) == (1, 1, 1)
+    assert overall.time_spent_seconds == 90
+    assert overall.video_completion_rate == 100.0
+
+    in_course = row(student, course)
+    assert (in_course.page_views, in_course.video_views, in_course.time_spent_seconds) == (1, 1, 90)
+
+    in_lesson = row(student, course, lesson)
+    assert (in_lesson.page_views, in_lesson.video_views, in_lesson.time_spent_seconds) == (0, 1, 60)
+
+
+def test_events_on_missing_content_only_count_towards_the_user(student, track):
+    track('page_view', 'course', uuid.uuid4())
+    track('page_view', 'lesson', uuid.uuid4())
+
+    rollups.run()
+
+    assert row(student).page_views == 2
+    assert list(LearningAnalytics.objects.values_list('course', 'lesson')) == [(None, None)]
+
+
+def test_each_event_is_counted_once(student, course, track, settings):
+    track('page_view', 'course', course.id, age=timedelta(minutes=15))
+    track('page_view', 'course', course.id, age=timedelta(minutes=5))
+
+    settings.ANALYTICS_ROLLUP_LAG_SECONDS = 600
+    assert rollups.run()['events'] == 1
+    assert rollups.run()['events'] == 0
+
+    settings.ANALYTICS_ROLLUP_LAG_SECONDS = 60
+    assert rollups.run()['events'] == 1
+    assert rollups.run()['events'] == 0
+
+    assert row(student, course).page_views == 2
+
+
+def test_recent_events_wait_for_the_rollup_lag(student, course, track):
+    track('page_view', 'course', course.id, age=timedelta(seconds=0))
+
+    assert rollups.run()['events'] == 0
+    assert not LearningAnalytics.objects.exists()
+
+
+def test_backfill_in_small_batches_counts_everything(student, course, track):
+    for minutes in range(5, 10):
+        track('page_view', 'course', course.id, age=timedelta(minutes=minutes))
+
+    assert rollups.run(batch_size=2)['events'] == 5
+
+    assert row(student, course).page_views == 5
+
+
+def test_completion_is_taken_from_the_enrollment(student, course):
+    Enrollment.objects.create(
+        student=student, course=course, progress_percentage=50, completed_lessons=1, total_lessons=2,
+    )
+    # Backdate the enrollment past the rollup lag
+    Enrollment.objects.filter(student=student).update(enrolled_at=timezone.now() - timedelta(minutes=5))
+
+    assert rollups.run()['progress_students'] == 1
+
+    in_course = row(student, course)
+    assert in_course.course_completion_rate == 50.0
+    assert (in_course.lessons_completed, in_course.total_lessons) == (1, 2)
+    assert in_course.performance_score == 50.0
+
+
+def test_scores_stay_within_bounds():
+    idle = LearningAnalytics()
+    busy = LearningAnalytics(
+        page_views=10 ** 6, video_views=10 ** 6, time_spent_seconds=10 ** 9, comments_made=10 ** 6,
+        quiz_attempts=10 ** 6, quiz_average_score=100.0, course_completion_rate=100.0,
+    )
+
+    rollups.score_rows([idle, busy])
+
+    assert (idle.engagement_score, idle.performance_score) == (0.0, 0.0)
+    assert (busy.engagement_score, busy.performance_score) == (100.0, 100.0)
+
+
+def test_fractional_durations_are_rounded_not_truncated(student, course, track):
+    track('page_view', 'course', course.id, duration=30.7)
+
+    rollups.run()
+
+    assert row(student).time_spent_seconds == 31
+
+
+def test_events_still_buffered_hold_back_the_watermark(student, course, track, settings):
+    from apps.analytics import ingest
+
+    settings.ANALYTICS_INGEST_BATCH_SIZE = 1000
+    settings.ANALYTICS_INGEST_FLUSH_INTERVAL = 3600
+    received = timezone.now() - timedelta(minutes=10)
+    buffered, _ = ingest.validate_event(
+        {'event_type': 'page_view', 'content_type': 'course', 'content_id': str(course.id)}, student.pk,
+    )
+    buffered['id'] = uuid7(int(received.timestamp() * 1000)).hex
+    buffer = ingest.get_ingest_buffer()
+    buffer.offer([buffered])
+    track('page_view', 'course', course.id, age=timedelta(minutes=5))
+
+    assert buffer.oldest_pending() <= received
+    assert rollups.run()['events'] == 0
+
+    buffer.flush()
+    assert buffer.oldest_pending() is None
+    assert rollups.run()['events'] == 2
+    assert row(student).page_views == 2
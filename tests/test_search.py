@@ -0,0 +1,71 @@
+"""
+In-memory course search and its cross-process invalidation.
+"""
+
+import pytest
+
+from apps.courses import search
+from apps.courses.models import Course
+from apps.courses.search import InMemorySearchBackend
+
+pytestmark = pytest.mark.django_db
+
+
+class InlineThread:
+    """Runs a background build in the calling thread, inside the test transaction."""
+
+    def __init__(self, target, **kwargs):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+@pytest.fixture
+def inline_builds(monkeypatch):
+    monkeypatch.setattr(search.threading, 'Thread', InlineThread)
+    # The build closes its connection when it ends; keep the test's open
+    monkeypatch.setattr(search.connection, 'close', lambda: None)
+
+
+def ids(backend, query):
+    return [course_id for course_id, _ in backend.search(query)]
+
+
+def test_queries_before_the_first_build_fall_back_to_a_plain_match(make_course, monkeypatch):
+    python = make_course('Python Basics')
+    make_course('Rust Systems')
+    monkeypatch.setattr(InMemorySearchBackend, '_refresh', lambda self: None)
+
+    found = InMemorySearchBackend().filter_queryset(Course.objects.all(), 'python')
+
+    assert list(found) == [python]
+
+
+def test_ranked_matches_with_prefix_expansion(make_course, inline_builds):
+    python = make_course('Python Basics', description='Learn programming')
+    django = make_course('Django Web', description='Web programming with Python')
+    make_course('Rust Systems')
+
+    backend = InMemorySearchBackend()
+
+    assert ids(backend, 'python') == [python.id, django.id]
+    assert set(ids(backend, 'progr')) == {python.id, django.id}
+    assert ids(backend, 'python web') == [django.id]
+
+
+def test_writes_in_one_process_reach_the_others(make_course, inline_builds):
+    writer, reader = InMemorySearchBackend(), InMemorySearchBackend()
+    writer.rebuild()
+    assert ids(reader, 'kotlin') == []
+
+    course = make_course('Kotlin Basics')
+    writer.index_course(course)
+
+    assert ids(writer, 'kotlin') == [course.id]
+    assert ids(reader, 'kotlin') == [course.id]
+
+    Course.objects.filter(pk=course.pk).delete()
+    writer.remove_course(course.id)
+
+    assert ids(reader, 'kotlin') == []
@@ -0,0 +1,73 @@
+"""
+Memory-mapped course similarity index.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from apps.courses.similarity import CourseSimilarityIndex
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def courses(make_course):
+    return [
+        make_course('Python Basics', description='Learn Python programming from scratch'),
+        make_course('Advanced Python', description='Python decorators, generators and programming patterns'),
+        make_course('Watercolor Painting', description='Brushes, paper and colour mixing'),
+    ]
+
+
+@pytest.fixture
+def index(courses):
+    index = CourseSimilarityIndex()
+    assert index.rebuild() == 3
+    return index
+
+
+def files(index, name):
+    return os.path.join(index.directory, 'current', name)
+
+
+def test_similar_courses_rank_by_content(index, courses):
+    python, advanced, painting = courses
+
+    similar = [course_id for course_id, _ in index.similar(python.id)]
+
+    assert similar[0] == advanced.id
+    assert python.id not in similar
+
+
+def test_update_rewrites_a_row_in_place(index, courses):
+    painting = courses[2]
+    before = index.vectors_for([painting.id]).copy()
+    painting.description = 'Python programming for painters'
+    painting.save()
+
+    index.update([painting.id])
+
+    assert len(index._ids) == 3
+    assert not np.allclose(index.vectors_for([painting.id]), before)
+
+
+def test_append_after_an_interrupted_update_uses_the_next_slot(index, courses, make_course):
+    # An update that crashed after writing its row but before listing its id
+    with open(files(index, 'vectors'), 'ab') as vectors, open(files(index, 'published'), 'ab') as published:
+        vectors.write(np.ones(index.width, dtype=np.float32).tobytes())
+        published.write(b'\x01')
+    added = make_course('Python for Data', description='Python programming with data')
+
+    index.update([added.id, added.id])
+
+    assert index._slots[added.id] == 3
+    assert len(index._ids) == 4
+    expected = index._embed(added, index._terms(added), index._load_idf())
+    assert np.allclose(index.vectors_for([added.id])[0], expected)
+    assert os.path.getsize(files(index, 'vectors')) == 4 * index.width * 4
+
+    # Another process maps the appended slot from the files alone
+    reader = CourseSimilarityIndex()
+    assert np.allclose(reader.vectors_for([added.id], embed_missing=False)[0], expected)
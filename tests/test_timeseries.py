@@ -0,0 +1,105 @@
+"""
+Dashboard time-series queries on both engines.
+"""
+
+from datetime import datetime, time as dt_time, timedelta
+
+import pytest
+from django.utils import timezone
+
+from apps.analytics import timeseries
+from apps.analytics.models import UserBehaviorTracking
+from apps.analytics.timeseries import QueryError, normalize_spec, run_query
+from apps.core.ids import uuid7
+from apps.enrollment.models import Enrollment
+
+pytestmark = pytest.mark.django_db
+
+
+def at(days_ago, hour=12):
+    day = timezone.localdate() - timedelta(days=days_ago)
+    return datetime.combine(day, dt_time(hour), tzinfo=timezone.get_current_timezone())
+
+
+def track(user, moment, event_type='page_view', duration=None):
+    return UserBehaviorTracking.objects.create(
+        id=uuid7(int(moment.timestamp() * 1000)), user=user, event_type=event_type,
+        content_type='lesson', duration_seconds=duration, timestamp=moment,
+    )
+
+
+@pytest.fixture
+def events(student, instructor):
+    track(student, at(3), duration=10)
+    track(student, at(3, 15), 'video_play', duration=30)
+    track(instructor, at(2), duration=25)
+    track(student, at(1), 'video_play')
+
+
+def spec(**fields):
+    return {'source': 'behavior', 'days': 4, **fields}
+
+
+@pytest.fixture(params=['sql', 'numpy'])
+def engine(request, settings):
+    settings.ANALYTICS_TIMESERIES_ENGINE = request.param
+    return request.param
+
+
+def test_counts_per_day(engine, events):
+    result = run_query(spec())
+
+    assert result['engine'] == engine
+    assert result['buckets'] == [(timezone.localdate() - timedelta(days=offset)).isoformat() for offset in (3, 2, 1, 0)]
+    assert result['series'] == [{'key': None, 'values': [2, 1, 1, 0]}]
+
+
+def test_grouped_sums_and_averages(engine, events):
+    grouped = run_query(spec(aggregate='sum', metric='duration_seconds', group_by='event_type'))
+    assert grouped['series'] == [
+        {'key': 'page_view', 'values': [10.0, 25.0, 0.0, 0.0]},
+        {'key': 'video_play', 'values': [30.0, 0.0, 0.0, 0.0]},
+    ]
+
+    averages = run_query(spec(aggregate='avg', metric='duration_seconds'))
+    assert averages['series'] == [{'key': None, 'values': [20.0, 25.0, None, None]}]
+
+
+def test_hourly_buckets_and_filters_scope_to_a_user(engine, events, student):
+    result = run_query(spec(interval='hour', days=4, filters={'event_type': ['page_view']}), scope=student.id)
+
+    values = result['series'][0]['values']
+    assert len(values) == 4 * 24
+    assert values[12] == 1
+    assert sum(values) == 1
+
+
+def test_invalid_specs_are_refused():
+    with pytest.raises(QueryError):
+        normalize_spec({'source': 'payments'})
+    with pytest.raises(QueryError):
+        normalize_spec(spec(aggregate='sum'))
+    with pytest.raises(QueryError):
+        normalize_spec(spec(interval='hour', days=60))
+
+
+def test_only_append_only_sources_cache_closed_days_for_long(student, course, settings, monkeypatch):
+    settings.ANALYTICS_TIMESERIES_ENGINE = 'numpy'
+    Enrollment.objects.filter(pk=Enrollment.objects.create(student=student, course=course).pk).update(enrolled_at=at(3))
+    track(student, at(3))
+    timeouts = {}
+    l2_call = timeseries.timeseries_cache._l2_call
+
+    def record(method, *args, **kwargs):
+        if method == 'set' and args[0].startswith('timeseries:block:'):
+            timeouts[args[0]] = args[2]
+        return l2_call(method, *args, **kwargs)
+
+    monkeypatch.setattr(timeseries.timeseries_cache, '_l2_call', record)
+    closed = {'start': at(3).date().isoformat(), 'end': at(2).date().isoformat()}
+    run_query({'source': 'enrollments', **closed})
+    run_query({'source': 'behavior', **closed})
+
+    live, block = settings.ANALYTICS_TIMESERIES_LIVE_TIMEOUT, settings.ANALYTICS_TIMESERIES_BLOCK_TIMEOUT
+    assert {timeout for key, timeout in timeouts.items() if ':enrollments:' in key} == {live}
+    assert {timeout for key, timeout in timeouts.items() if ':behavior:' in key} == {block}
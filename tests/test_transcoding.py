@@ -0,0 +1,102 @@
+"""
+ffmpeg command building and probing for lesson video transcoding.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+from apps.courses import transcoding
+from apps.courses.transcoding import TranscodeError
+
+RENDITIONS = [
+    {'name': '720p', 'height': 720, 'video_kbps': 2800, 'audio_kbps': 128},
+    {'name': '360p', 'height': 360, 'video_kbps': 800, 'audio_kbps': 96},
+]
+
+
+@pytest.fixture(autouse=True)
+def renditions(settings):
+    settings.LESSON_VIDEO_RENDITIONS = RENDITIONS
+    settings.LESSON_VIDEO_SEGMENT_SECONDS = 4
+    settings.LESSON_VIDEO_POSTER_COUNT = 3
+    settings.FFMPEG_BINARY = 'ffmpeg'
+
+
+def option(command, name):
+    return command[command.index(name) + 1]
+
+
+@pytest.mark.parametrize('height, expected', [
+    (1080, ['360p', '720p']),
+    (720, ['360p', '720p']),
+    (480, ['360p']),
+    (240, ['360p']),
+])
+def test_renditions_are_capped_at_the_source_height(height, expected):
+    assert [rendition['name'] for rendition in transcoding.renditions_for(height)] == expected
+
+
+def test_hls_command_decodes_once_and_encodes_every_rendition():
+    renditions = transcoding.renditions_for(1080)
+
+    command = transcoding.hls_command('in.mp4', 'out', renditions, has_audio=True)
+
+    assert command[0] == 'ffmpeg'
+    assert command.count('-i') == 1 and option(command, '-i') == 'in.mp4'
+    assert option(command, '-filter_complex') == (
+        '[0:v]split=2[v0][v1];[v0]scale=-2:360[v0out];[v1]scale=-2:720[v1out]'
+    )
+    assert [command[index + 1] for index, part in enumerate(command) if part == '-map'] == [
+        '[v0out]', '0:a:0', '[v1out]', '0:a:0',
+    ]
+    assert option(command, '-b:v:0') == '800k' and option(command, '-maxrate:v:0') == '856k'
+    assert option(command, '-bufsize:v:1') == '5600k' and option(command, '-b:a:1') == '128k'
+    assert option(command, '-var_stream_map') == 'v:0,a:0,name:360p v:1,a:1,name:720p'
+    assert option(command, '-force_key_frames') == 'expr:gte(t,n_forced*4)'
+    assert option(command, '-hls_time') == '4'
+    assert option(command, '-master_pl_name') == transcoding.MASTER_PLAYLIST
+    assert option(command, '-hls_segment_filename') == os.path.join('out', '%v', 'segment_%05d.ts')
+    assert command[-1] == os.path.join('out', '%v', 'index.m3u8')
+
+
+def test_hls_command_leaves_out_audio_for_silent_videos():
+    command = transcoding.hls_command('in.mp4', 'out', transcoding.renditions_for(360), has_audio=False)
+
+    assert '0:a:0' not in command
+    assert not any(part.startswith('-c:a') for part in command)
+    assert option(command, '-var_stream_map') == 'v:0,name:360p'
+
+
+def test_posters_are_spread_through_the_video():
+    commands = transcoding.poster_commands('in.mp4', 'out', duration=100, height=1080)
+
+    assert [name for name, _ in commands] == ['poster_1.jpg', 'poster_2.jpg', 'poster_3.jpg']
+    assert [option(command, '-ss') for _, command in commands] == ['25.000', '50.000', '75.000']
+    assert option(commands[0][1], '-vf') == 'scale=-2:720'
+    assert commands[0][1][-1] == os.path.join('out', 'poster_1.jpg')
+
+
+def test_probe_reads_duration_size_and_audio(monkeypatch):
+    output = {
+        'streams': [{'codec_type': 'video', 'width': 1920, 'height': 1080}, {'codec_type': 'audio'}],
+        'format': {'duration': '61.5'},
+    }
+    monkeypatch.setattr(transcoding, '_run', lambda command, timeout: json.dumps(output).encode())
+
+    assert transcoding.probe('in.mp4') == {'duration': 61.5, 'width': 1920, 'height': 1080, 'has_audio': True}
+
+
+def test_probe_refuses_files_without_video(monkeypatch):
+    output = {'streams': [{'codec_type': 'audio'}], 'format': {'duration': '10'}}
+    monkeypatch.setattr(transcoding, '_run', lambda command, timeout: json.dumps(output).encode())
+
+    with pytest.raises(TranscodeError):
+        transcoding.probe('in.mp3')
+
+
+def test_failed_runs_raise_with_the_exit_status():
+    with pytest.raises(TranscodeError, match='exited with 3'):
+        transcoding._run([sys.executable, '-c', 'import sys; sys.exit(3)'], timeout=30)
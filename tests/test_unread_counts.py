@@ -0,0 +1,64 @@
+"""
+Cached unread notification counters.
+"""
+
+import pytest
+from django.core.cache import cache
+
+from apps.notifications import dispatch
+from apps.notifications.dispatch import get_unread_count
+from apps.notifications.models import Notification
+
+pytestmark = pytest.mark.django_db
+
+
+def notify(user, title='Hello'):
+    return Notification.objects.create(user=user, notification_type='system', title=title, message='Body')
+
+
+def cached_count(user):
+    return cache.get(dispatch._unread_key(user.id))
+
+
+def test_new_notifications_increment_a_cached_counter(student, django_capture_on_commit_callbacks):
+    assert get_unread_count(student.id) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        notify(student)
+        notify(student, 'Again')
+
+    assert cached_count(student) == 2
+
+
+def test_reads_and_deletes_recount_instead_of_decrementing(student, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        first, second, third = notify(student), notify(student), notify(student)
+    # A counter that drifted from the table is corrected by the next read
+    cache.set(dispatch._unread_key(student.id), 10)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.mark_as_read()
+    assert cached_count(student) == 2
+
+    with django_capture_on_commit_callbacks(execute=True):
+        second.delete()
+    assert cached_count(student) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first.delete()
+    assert cached_count(student) == 1
+
+
+def test_unavailable_cache_falls_back_to_counting(student, monkeypatch):
+    notify(student)
+
+    class BrokenCache:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError('cache is down')
+            return fail
+
+    monkeypatch.setattr(dispatch, 'cache', BrokenCache())
+
+    assert get_unread_count(student.id) == 1
+    assert dispatch.adjust_unread_counts({student.id: 1}) == {}
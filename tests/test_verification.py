@@ -0,0 +1,137 @@
+"""
+Public certificate verification.
+"""
+
+import uuid
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from apps.certificates import verification
+from apps.certificates.models import Certificate
+from apps.certificates.verification import BloomFilter, lookup, lookup_many, normalize, sign
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def certificate(student, course):
+    return Certificate.objects.create(student=student, course=course)
+
+
+def test_ids_are_normalized():
+    value = uuid.uuid4()
+
+    assert normalize(f'  {str(value).upper()} ') == str(value)
+    assert normalize(value.hex) == str(value)
+    assert normalize('cert-abcdef123456') == 'CERT-ABCDEF123456'
+    assert normalize('CERT-ABC') is None
+    assert normalize('../etc/passwd') is None
+
+
+def test_certificates_are_found_by_uuid_or_certificate_id(certificate):
+    by_uuid = lookup(str(certificate.id))
+    by_code = lookup(certificate.certificate_id.lower())
+
+    assert by_uuid == by_code
+    assert by_uuid['certificate_id'] == certificate.certificate_id
+    assert by_uuid['course_name'] == 'Python Basics'
+    assert by_uuid['student_name'] == 'student'
+
+
+def test_unknown_and_malformed_ids_are_not_found(certificate, django_assert_num_queries):
+    lookup(str(certificate.id))
+
+    # Rejected by the bloom filter, or malformed, without touching the database
+    with django_assert_num_queries(0):
+        found = lookup_many([str(uuid.uuid4()), 'CERT-000000000000', 'nonsense'])
+
+    assert set(found.values()) == {None}
+
+
+def test_payloads_are_signed(certificate):
+    payload = dict(lookup(str(certificate.id)))
+    signature = payload.pop('signature')
+
+    assert signature == sign(payload)
+    payload['student_name'] = 'Someone Else'
+    assert signature != sign(payload)
+
+
+def test_lookups_are_served_from_the_cache(certificate, django_assert_num_queries):
+    lookup(certificate.certificate_id)
+
+    with django_assert_num_queries(0):
+        assert lookup(str(certificate.id))['id'] == str(certificate.id)
+
+
+def test_new_certificates_pass_a_filter_built_before_them(
+    student, make_course, certificate, django_capture_on_commit_callbacks,
+):
+    lookup(str(certificate.id))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        issued = Certificate.objects.create(student=student, course=make_course('Django Web'))
+
+    assert lookup(issued.certificate_id)['id'] == str(issued.id)
+
+
+def test_deleted_certificates_stop_verifying(certificate, django_capture_on_commit_callbacks):
+    code = certificate.certificate_id
+    lookup(code)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        certificate.delete()
+
+    assert lookup(code) is None
+
+
+def test_bloom_filter_has_no_false_negatives():
+    keys = [str(uuid.uuid4()) for _ in range(1000)]
+    bloom = BloomFilter(len(keys), 0.01)
+    bloom.add(keys)
+
+    assert bloom.contains(keys).all()
+    others = [str(uuid.uuid4()) for _ in range(1000)]
+    assert bloom.contains(others).sum() < 50
+
+
+def test_filter_failures_let_lookups_through(certificate, monkeypatch):
+    def broken():
+        raise RuntimeError('cache down')
+    monkeypatch.setattr(verification.known_certificates, '_refresh', broken)
+
+    assert lookup(str(certificate.id))['id'] == str(certificate.id)
+
+
+def test_view_answers_conditional_requests(certificate):
+    client = APIClient()
+    url = reverse('certificates:certificate_verify', args=[certificate.id])
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data['valid'] is True
+    assert response['ETag'] == f'"{response.data["signature"]}"'
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+    by_code = client.get(reverse('certificates:certificate_verify_code', args=[certificate.certificate_id]))
+    assert by_code['ETag'] == response['ETag']
+
+
+def test_view_reports_unknown_certificates():
+    response = APIClient().get(reverse('certificates:certificate_verify_code', args=['CERT-000000000000']))
+
+    assert response.status_code == 404
+    assert response.data['valid'] is False
+
+
+def test_batch_view_answers_in_request_order(certificate):
+    ids = ['nonsense', certificate.certificate_id, str(certificate.id)]
+
+    response = APIClient().post(reverse('certificates:certificate_verify_batch'), {'ids': ids}, format='json')
+
+    assert response.status_code == 200
+    assert response.data['valid_count'] == 2
+    assert [result['query'] for result in response.data['results']] == ids
+    assert [result['valid'] for result in response.data['results']] == [False, True, True]